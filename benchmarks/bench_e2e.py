@@ -0,0 +1,154 @@
+"""
+端到端基准：Xvfb + 合成 EMR 表单 + 模拟视觉服务
+
+在每个分辨率下启动独立的 Xvfb 虚拟显示，打开合成 EMR 表单 (benchmarks/emr_form.py)，
+以真实的 Perception -> Brain (指向进程内模拟服务) -> Executor (XTEST) 流水线完成录入，
+随后核对表单内容并输出迭代数、总耗时与各阶段平均耗时。无需真实 EMR、显示器或 API Key。
+    
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --resolutions 1920x1080x24 --values WBC=7.2,Hgb=135 --latency fixed:0.5
+
+依赖: Xvfb、python-xlib、tkinter。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_vision_server import add_server_arguments, server_from_args
+from medipilot.perception.screen import Perception, PerceptionError
+from medipilot.cognition.engine import Brain
+from medipilot.execution.action import Executor, ExecutionError, create_backend
+from medipilot.orchestration.display import VirtualDisplay, DisplayError
+from medipilot.orchestration.pipeline import AgentPipeline
+from configs.settings import config
+
+FORM_SCRIPT = str(Path(__file__).parent / "emr_form.py")
+DEFAULT_VALUES = "WBC=7.2,RBC=4.5,Hgb=135,PLT=210"
+
+def build_plans(geometry: Dict[str, Dict[str, int]], values: Dict[str, str]) -> List[Dict[str, Any]]:
+    """按输入框坐标生成 "理想模型" 的计划序列：逐个字段 click -> type，最后 finish"""
+    plans: List[Dict[str, Any]] = []
+    for name, value in values.items():
+        box = geometry[name]
+        center = [box["x"] + box["width"] // 2, box["y"] + box["height"] // 2]
+        plans.append({"thought": f"定位 {name} 输入框", "action": "click", "coordinate": center,
+                      "reasoning": f"聚焦 {name}"})
+        plans.append({"thought": f"录入 {name}", "action": "type", "coordinate": center, "text": value,
+                      "reasoning": f"录入 {name}={value}"})
+    plans.append({"thought": "全部录入完毕", "action": "finish", "reasoning": "所有字段已录入"})
+    return plans
+
+def _wait_for_file(path: str, process: subprocess.Popen, timeout: float = 15.0) -> Dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"表单进程退出，退出码 {process.returncode}")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        time.sleep(0.05)
+    raise RuntimeError("等待表单就绪超时")
+
+def run_once(resolution: str, values: Dict[str, str], columns: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    在指定分辨率下运行一次端到端录入
+    
+    Returns:
+        dict: 分辨率、迭代数、总耗时、各阶段平均耗时 (ms)、字段核对结果
+    """
+    with VirtualDisplay(resolution=resolution) as display, tempfile.TemporaryDirectory() as workdir:
+        geometry_path = os.path.join(workdir, "geometry.json")
+        state_path = os.path.join(workdir, "state.json")
+        form = subprocess.Popen(
+            [sys.executable, FORM_SCRIPT, "--fields", ",".join(values), "--columns", str(columns),
+             "--geometry", geometry_path, "--state", state_path],
+            env=display.env(),
+        )
+        server = server_from_args(args)
+        executor = None
+        try:
+            geometry = _wait_for_file(geometry_path, form)
+            server.plans = build_plans(geometry, values)
+            port = server.start()
+            config.OPENAI_BASE_URL = f"http://127.0.0.1:{port}/v1"
+            
+            perception = Perception(display=display.name)
+            brain = Brain(model="mock")
+            executor = Executor(backend=create_backend("xtest", display_name=display.name))
+            task = "，".join(f"{name}: {value}" for name, value in values.items())
+            pipeline = AgentPipeline(perception, brain, executor, task, max_iterations=len(server.plans) * 2)
+            
+            start = time.perf_counter()
+            finished = pipeline.run()
+            wall = time.perf_counter() - start
+            
+            # 等待表单处理完最后的按键事件
+            time.sleep(0.5)
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            wrong = {name: state.get(name) for name, value in values.items() if state.get(name) != value}
+            return {
+                "resolution": resolution,
+                "finished": finished,
+                "iterations": pipeline.iteration_count,
+                "wall_s": wall,
+                "stages_ms": pipeline.summary(),
+                "fields": len(values),
+                "wrong_fields": wrong,
+                "server": server.stats,
+            }
+        finally:
+            if executor is not None:
+                executor.close()
+            server.stop()
+            form.terminate()
+            form.wait(timeout=5)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Xvfb + 合成 EMR 表单端到端基准")
+    parser.add_argument("--resolutions", nargs="+", default=["1280x800x24", "1920x1080x24", "2560x1440x24"],
+                        help="Xvfb 屏幕规格")
+    parser.add_argument("--values", default=DEFAULT_VALUES, help="待录入字段，如 WBC=7.2,Hgb=135")
+    parser.add_argument("--columns", type=int, default=2, help="表单字段列数")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    add_server_arguments(parser)
+    parser.set_defaults(latency="fixed:0")
+    args = parser.parse_args()
+    
+    values = dict(item.split("=", 1) for item in args.values.split(",") if item)
+    config.OPENAI_API_KEY = config.OPENAI_API_KEY or "sk-mock"
+    
+    results = []
+    for resolution in args.resolutions:
+        try:
+            results.append(run_once(resolution, values, args.columns, args))
+        except (DisplayError, PerceptionError, ExecutionError, RuntimeError, OSError) as e:
+            print(f"❌ {resolution}: {e}")
+            sys.exit(1)
+    
+    stages = AgentPipeline.STAGES + ("total",)
+    print(f"\n{'分辨率':<14}{'迭代':>6}{'耗时(s)':>10}{'字段':>8}" + "".join(f"{s:>10}" for s in stages))
+    for r in results:
+        correct = r["fields"] - len(r["wrong_fields"])
+        print(f"{r['resolution']:<14}{r['iterations']:>6}{r['wall_s']:>10.2f}{correct:>5}/{r['fields']:<2}"
+              + "".join(f"{r['stages_ms'].get(s, 0.0):>10.0f}" for s in stages))
+        if r["wrong_fields"]:
+            print(f"  ⚠️  录入不一致: {json.dumps(r['wrong_fields'], ensure_ascii=False)}")
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if any(r["wrong_fields"] or not r["finished"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+输入后端单动作延迟微基准
+
+对比 PyAutoGUI 与 XTEST 后端执行 move / click / type / scroll 的单次耗时。
+会真实移动鼠标并输入字符，请在 Xvfb 等虚拟显示中运行，例如:
+    
+    Xvfb :99 -screen 0 1920x1080x24 &
+    DISPLAY=:99 python benchmarks/bench_input_latency.py --iterations 50
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medipilot.execution.action import INPUT_BACKENDS, InputBackend
+from medipilot.utils.stats import summarize
+
+def _time_action(action: Callable[[], None], iterations: int) -> List[float]:
+    """重复执行动作，返回每次耗时（毫秒）"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        action()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def bench_backend(backend: InputBackend, iterations: int) -> Dict[str, Dict[str, float]]:
+    """
+    测量单个后端的各动作延迟
+    
+    Args:
+        backend: 输入后端实例
+        iterations: 每个动作的重复次数
+    
+    Returns:
+        dict: {动作名: 统计结果}
+    """
+    w, h = backend.screen_size()
+    # 在屏幕中心附近两点间往返，远离触发熔断的角落
+    points = [(w // 2 - 50, h // 2), (w // 2 + 50, h // 2)]
+    state = {"i": 0}
+    
+    def _next_point():
+        state["i"] += 1
+        return points[state["i"] % 2]
+    
+    actions = {
+        "move": lambda: backend.move_to(*_next_point()),
+        "click": lambda: backend.click(*_next_point()),
+        "type": lambda: backend.write("7.2"),
+        "scroll": lambda: backend.scroll(-1),
+    }
+    return {name: summarize(_time_action(fn, iterations)) for name, fn in actions.items()}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="输入后端单动作延迟微基准")
+    parser.add_argument("--backends", nargs="+", default=list(INPUT_BACKENDS),
+                        choices=list(INPUT_BACKENDS), help="待测后端")
+    parser.add_argument("--iterations", type=int, default=20, help="每个动作的重复次数")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+    
+    results = {}
+    for name in args.backends:
+        try:
+            backend = INPUT_BACKENDS[name]()
+        except Exception as e:
+            print(f"跳过后端 {name}: {e}")
+            continue
+        try:
+            results[name] = bench_backend(backend, args.iterations)
+        finally:
+            backend.close()
+    
+    print(f"{'后端':<12}{'动作':<8}{'mean(ms)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}")
+    for name, actions in results.items():
+        for action, s in actions.items():
+            print(f"{name:<12}{action:<8}{s['mean']:>10.2f}{s['p50']:>10.2f}"
+                  f"{s['p95']:>10.2f}{s['max']:>10.2f}")
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
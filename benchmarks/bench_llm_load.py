@@ -0,0 +1,140 @@
+"""
+认知层并发压测
+
+以多个并发 Brain 实例（各自独立的 OpenAI 客户端，与批处理会话一致）持续调用视觉接口，
+统计吞吐量、尾延迟与各类错误。默认在进程内启动模拟服务，也可指向已有网关:
+    
+    python benchmarks/bench_llm_load.py --clients 16 --requests 50 --latency lognormal:1.0,0.35 --rate-limit 0.05
+    python benchmarks/bench_llm_load.py --base-url http://gateway.local/v1 --clients 32 --duration 120
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+from benchmarks.mock_vision_server import add_server_arguments, server_from_args
+from medipilot.cognition.engine import Brain, Prompts, PromptCacheStats
+from medipilot.utils.stats import summarize
+from configs.settings import config
+
+def run_load(
+    clients: int,
+    requests: Optional[int] = None,
+    duration: Optional[float] = None,
+    image_size: tuple = (1280, 800),
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    并发调用 Brain.call_vision（使用当前的 OPENAI_BASE_URL）
+    
+    Args:
+        clients: 并发 Brain 实例数
+        requests: 每个实例的请求数（与 duration 二选一）
+        duration: 压测时长（秒）
+        image_size: 请求图像尺寸
+        model: 模型名称
+    
+    Returns:
+        dict: 请求总数、吞吐量 (rps)、按结果的计数、延迟分布（毫秒）与提示缓存命中统计
+    """
+    image = Image.new("RGB", image_size, color="white")
+    prompt = Prompts.operation("WBC: 7.2")
+    latencies: Dict[str, List[float]] = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+    # 所有实例共用一份提示缓存统计
+    cache_stats = PromptCacheStats()
+    
+    def _worker() -> None:
+        brain = Brain(model=model)
+        brain.cache_stats = cache_stats
+        done = 0
+        while (requests is None or done < requests) and (deadline is None or time.perf_counter() < deadline):
+            start = time.perf_counter()
+            result = brain.call_vision(image, prompt)
+            elapsed = (time.perf_counter() - start) * 1000
+            outcome = result.get("error_type", "ok") if result.get("action") == "error" else "ok"
+            with lock:
+                latencies.setdefault(outcome, []).append(elapsed)
+            done += 1
+    
+    threads = [threading.Thread(target=_worker, name=f"load-{i}") for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        "clients": clients,
+        "requests": total,
+        "elapsed_s": elapsed,
+        "rps": total / elapsed if elapsed > 0 else 0.0,
+        "outcomes": {name: len(samples) for name, samples in latencies.items()},
+        "latency_ms": summarize(latencies.get("ok", []), quantiles=(50, 90, 99)),
+        "error_latency_ms": summarize(
+            [v for name, samples in latencies.items() if name != "ok" for v in samples],
+            quantiles=(50, 99)
+        ),
+        "prompt_cache": cache_stats.summary(),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="认知层并发压测（默认使用进程内模拟服务）")
+    parser.add_argument("--base-url", help="已有的 OpenAI 兼容端点；不指定时启动进程内模拟服务")
+    parser.add_argument("--clients", type=int, default=8, help="并发 Brain 实例数")
+    parser.add_argument("--requests", type=int, help="每个实例的请求数（默认 20）")
+    parser.add_argument("--duration", type=float, help="压测时长（秒），与 --requests 二选一")
+    parser.add_argument("--image", default="1280x800", help="请求图像尺寸 WxH")
+    parser.add_argument("--model", help="模型名称（默认 VISION_MODEL）")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    
+    server = None
+    if args.base_url:
+        config.OPENAI_BASE_URL = args.base_url
+    else:
+        server = server_from_args(args)
+        port = server.start()
+        config.OPENAI_BASE_URL = f"http://127.0.0.1:{port}/v1"
+        config.OPENAI_API_KEY = config.OPENAI_API_KEY or "sk-mock"
+    
+    width, height = (int(v) for v in args.image.lower().split("x"))
+    requests = args.requests if args.requests or args.duration else 20
+    try:
+        result = run_load(args.clients, requests=requests, duration=args.duration,
+                          image_size=(width, height), model=args.model)
+    finally:
+        if server is not None:
+            server.stop()
+    if server is not None:
+        result["server"] = server.stats
+    
+    s = result["latency_ms"]
+    print(f"\n端点: {config.OPENAI_BASE_URL} | 并发: {result['clients']}")
+    print(f"请求: {result['requests']} | 耗时: {result['elapsed_s']:.1f}s | 吞吐: {result['rps']:.2f} req/s")
+    print(f"结果: {json.dumps(result['outcomes'], ensure_ascii=False)}")
+    print(f"成功延迟(ms): mean={s['mean']:.0f} p50={s['p50']:.0f} p90={s['p90']:.0f} "
+          f"p99={s['p99']:.0f} max={s['max']:.0f}")
+    cache = result["prompt_cache"]
+    print(f"提示缓存: 命中率 {cache['hit_ratio']:.0%} | 命中调用 {cache['hit_calls']}/{cache['calls']}")
+    if server is not None:
+        # 客户端自动重试 429 / 5xx，服务端统计反映注入的故障总数
+        print(f"服务端: {json.dumps(result['server'], ensure_ascii=False)}")
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+感知热点函数微基准
+
+在合成帧（1080p / 1440p / 4K / 多显示器宽屏）上测量 capture、privacy_filter、
+apply_som_overlay、整帧分块 (Tiler.split) 与 Brain._encode_image 的耗时与峰值内存，扫描 SoM 网格大小与隐私区域大小。
+结果写入 JSON 基线，compare 子命令对比两份结果并标出超过阈值的回归。
+    
+    python benchmarks/bench_perception.py run --output benchmarks/baselines/perception.json
+    python benchmarks/bench_perception.py run --output current.json --compare benchmarks/baselines/perception.json
+    python benchmarks/bench_perception.py compare baseline.json current.json --threshold 0.15
+
+说明:
+- 无显示器时 capture 使用内存中的合成 BGRA 缓冲区，只测量 MSS 抓取之后的像素转换开销；
+  加 --real-capture 则在当前 $DISPLAY 上真实截屏（分辨率以实际屏幕为准）。
+- 峰值内存来自 tracemalloc，覆盖 Python 与 NumPy 分配；Pillow / OpenCV 内部缓冲区不计入。
+- 基线与机器相关，应在同一台（CI）机器上生成与对比。
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+from medipilot.perception.screen import Perception
+from medipilot.perception.buffers import release
+from medipilot.perception.tiles import Tiler
+from medipilot.cognition.engine import Brain
+from medipilot.utils.stats import summarize
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+    "dual-1080p": (3840, 1080),
+    "triple-1080p": (5760, 1080),
+}
+FUNCTIONS = ("capture", "privacy_filter", "apply_som_overlay", "split_tiles", "encode_image")
+GRID_SIZES = (40, 80, 160)
+# 隐私区域 (y1, y2, x1, x2)：默认抬头、半屏与整屏
+PRIVACY_REGIONS: Dict[str, Callable[[int, int], Tuple[int, int, int, int]]] = {
+    "header": lambda w, h: (0, 150, 0, 400),
+    "half": lambda w, h: (0, h // 2, 0, w),
+    "full": lambda w, h: (0, h, 0, w),
+}
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> Image.Image:
+    """生成类 EMR 界面的合成帧：浅色背景、表格线与随机"文字"块（决定 JPEG 编码成本）"""
+    rng = np.random.default_rng(seed)
+    pixels = np.full((height, width, 3), 244, dtype=np.uint8)
+    pixels[:150, :, :] = (223, 231, 239)
+    for y in range(200, height - 32, 48):
+        pixels[y, :, :] = 200
+        for x in range(40, width - 200, 320):
+            block = rng.integers(0, 2, size=(14, 160), dtype=np.uint8) * 200
+            pixels[y + 16:y + 30, x:x + 160, :] = 40 + block[:, :, None]
+    return Image.fromarray(pixels)
+
+class _SyntheticScreen:
+    """代替 MSS 的内存截屏源，返回预先生成的 BGRA 缓冲区"""
+    
+    class _Shot:
+        def __init__(self, size: Tuple[int, int], bgra: bytes) -> None:
+            self.size = size
+            self.bgra = bgra
+            self.raw = bytearray(bgra)
+    
+    def __init__(self, frame: Image.Image) -> None:
+        w, h = frame.size
+        self.monitors = [{}, {"left": 0, "top": 0, "width": w, "height": h}]
+        self._shot = self._Shot(frame.size, frame.convert("RGBA").tobytes("raw", "BGRA"))
+    
+    def grab(self, monitor: Dict[str, int]) -> "_SyntheticScreen._Shot":
+        return self._shot
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    测量函数耗时（毫秒）与单次调用的 tracemalloc 峰值（KB）
+    
+    耗时与内存分两轮测量，避免 tracemalloc 的开销计入耗时。
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    stats = summarize(samples, quantiles=(50, 95))
+    return {
+        "median_ms": stats["p50"], "mean_ms": stats["mean"], "p95_ms": stats["p95"],
+        "min_ms": min(samples), "peak_kb": peak / 1024, "repeat": repeat,
+    }
+
+def run_suite(
+    resolutions: List[str],
+    functions: List[str],
+    repeat: int,
+    real_capture: bool = False
+) -> Dict[str, Dict[str, float]]:
+    """
+    运行基准
+    
+    Returns:
+        dict: {"函数[参数]": 测量结果}
+    """
+    perception = Perception(headless=not real_capture)
+    # _encode_image 只依赖图像本身，无需初始化 API 客户端
+    brain = Brain.__new__(Brain)
+    results: Dict[str, Dict[str, float]] = {}
+    
+    def _record(name: str, func: Callable[[], Any]) -> None:
+        results[name] = measure(func, repeat)
+        r = results[name]
+        print(f"{name:<48}{r['median_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['peak_kb'] / 1024:>10.1f}")
+    
+    print(f"{'基准':<48}{'p50(ms)':>10}{'p95(ms)':>10}{'峰值(MB)':>10}")
+    if real_capture and "capture" in functions:
+        _record("capture[display]", lambda: release(perception.capture()))
+    
+    for res in resolutions:
+        w, h = RESOLUTIONS[res]
+        frame = synthetic_frame(w, h)
+        if "capture" in functions and not real_capture:
+            perception._local.sct = _SyntheticScreen(frame)
+            # 与流水线一致：输出帧用完即归还缓冲池（FRAME_POOL_SIZE=0 时测量不复用的情况）
+            _record(f"capture[{res}]", lambda: release(perception.capture()))
+        if "privacy_filter" in functions:
+            for region_name, region in PRIVACY_REGIONS.items():
+                _record(f"privacy_filter[{res},{region_name}]",
+                        lambda r=region(w, h): release(perception.privacy_filter(frame, region=r)))
+        if "apply_som_overlay" in functions:
+            for grid in GRID_SIZES:
+                _record(f"apply_som_overlay[{res},grid={grid}]",
+                        lambda g=grid: release(perception.apply_som_overlay(frame, grid_size=g)))
+        if "split_tiles" in functions:
+            # 每次使用新的分块器，全部分块都需要叠加 SoM（最坏情况）
+            _record(f"split_tiles[{res}]",
+                    lambda: release(*(t.image for t in Tiler(perception).split(frame))))
+        if "encode_image" in functions:
+            _record(f"encode_image[{res}]", lambda: brain._encode_image(frame))
+    return results
+
+def compare_results(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    threshold: float = 0.15,
+    memory_threshold: float = 0.25
+) -> List[Dict[str, Any]]:
+    """
+    对比两份结果（按中位耗时与峰值内存）
+    
+    Returns:
+        List[dict]: 每个共有基准一项，regression 为 True 表示超出阈值
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        base, cur = baseline[name], current[name]
+        time_ratio = cur["median_ms"] / base["median_ms"] if base["median_ms"] > 0 else 1.0
+        mem_ratio = cur["peak_kb"] / base["peak_kb"] if base["peak_kb"] > 0 else 1.0
+        rows.append({
+            "name": name,
+            "baseline_ms": base["median_ms"],
+            "current_ms": cur["median_ms"],
+            "time_ratio": time_ratio,
+            "memory_ratio": mem_ratio,
+            # 内存只在绝对增量也超过 256KB 时计为回归，避免小分配的比例抖动
+            "regression": time_ratio > 1 + threshold or (
+                mem_ratio > 1 + memory_threshold and cur["peak_kb"] - base["peak_kb"] > 256
+            ),
+        })
+    return rows
+
+def _print_comparison(rows: List[Dict[str, Any]], threshold: float) -> bool:
+    print(f"\n{'基准':<48}{'基线(ms)':>10}{'当前(ms)':>10}{'耗时':>9}{'内存':>9}")
+    for row in rows:
+        flag = "  ⚠️ 回归" if row["regression"] else ""
+        print(f"{row['name']:<48}{row['baseline_ms']:>10.2f}{row['current_ms']:>10.2f}"
+              f"{row['time_ratio'] - 1:>+9.0%}{row['memory_ratio'] - 1:>+9.0%}{flag}")
+    regressions = [row for row in rows if row["regression"]]
+    print(f"\n{len(rows)} 项对比，{len(regressions)} 项超出阈值 (耗时 +{threshold:.0%})")
+    return not regressions
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="感知热点函数微基准")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run = commands.add_parser("run", help="运行基准并写入 JSON")
+    run.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    run.add_argument("--functions", nargs="+", default=list(FUNCTIONS), choices=list(FUNCTIONS))
+    run.add_argument("--repeat", type=int, default=10, help="每项重复次数")
+    run.add_argument("--real-capture", action="store_true", help="在当前 $DISPLAY 上真实截屏")
+    run.add_argument("--output", help="结果 JSON 路径（如 benchmarks/baselines/perception.json）")
+    run.add_argument("--compare", metavar="BASELINE", help="运行后与基线对比")
+    run.add_argument("--threshold", type=float, default=0.15, help="耗时回归阈值（比例）")
+    
+    compare = commands.add_parser("compare", help="对比两份结果")
+    compare.add_argument("baseline", help="基线 JSON")
+    compare.add_argument("current", help="当前结果 JSON")
+    compare.add_argument("--threshold", type=float, default=0.15, help="耗时回归阈值（比例）")
+    args = parser.parse_args(argv)
+    
+    if args.command == "compare":
+        rows = compare_results(_load(args.baseline)["results"], _load(args.current)["results"], args.threshold)
+        sys.exit(0 if _print_comparison(rows, args.threshold) else 1)
+    
+    results = run_suite(args.resolutions, args.functions, args.repeat, real_capture=args.real_capture)
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "pillow": PIL.__version__,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入 {args.output}")
+    if args.compare:
+        rows = compare_results(_load(args.compare)["results"], results, args.threshold)
+        sys.exit(0 if _print_comparison(rows, args.threshold) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+启动耗时基准：从进程启动到首个动作 (time to first action)
+
+每次运行启动一个新的 Python 子进程，依次测量:
+- import: 导入 main（含全部业务模块）的耗时；
+- init:   init_components 创建（并预热）感知、认知、执行三个组件的耗时；
+- first_action: 从子进程创建到执行层发出第一个输入动作的总耗时（含解释器启动与 --disclaimer 等待）。
+认知层指向进程内模拟服务，执行层使用只记录动作的后端；无 $DISPLAY 时以合成画面代替截屏。
+--disclaimer 模拟用户阅读并确认免责声明的时间，后台预导入在此期间进行。
+import 阶段有意保留 Pillow 的即时导入（约 40ms，不会连带导入 numpy）：每种模式的第一帧截屏都要用到它，
+且 16 个模块在函数签名中以 Image.Image 作类型注解，定义时即会触发导入，改为延迟导入收益很小。
+openai、cv2、numpy、mss 为延迟导入（见 medipilot/utils/lazy.py）。
+    
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --modes sequential warmup --disclaimer 2 --latency fixed:0.8
+
+模式:
+    sequential  顺序初始化，不预导入、不预热（原有行为）
+    parallel    确认期间后台预导入，并行初始化，不预热
+    warmup      确认期间后台预导入，并行初始化并预热（main.py 的默认方式）
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_vision_server import add_server_arguments, server_from_args
+from medipilot.utils.stats import summarize
+
+MODES = ("sequential", "parallel", "warmup")
+_CLICK_PLAN = {"thought": "基准: 点击输入框", "action": "click", "coordinate": [960, 540], "reasoning": "首个动作"}
+
+class _SyntheticScreen:
+    """无显示器时代替 MSS 的截屏源（纯 Pillow，不引入额外导入开销）"""
+    
+    class _Shot:
+        def __init__(self, size: tuple, bgra: bytes) -> None:
+            self.size = size
+            self.bgra = bgra
+            self.raw = bytearray(bgra)
+    
+    def __init__(self, width: int = 1920, height: int = 1080) -> None:
+        from PIL import Image
+        frame = Image.new("RGBA", (width, height), color=(244, 244, 244, 255))
+        self.monitors = [{}, {"left": 0, "top": 0, "width": width, "height": height}]
+        self._shot = self._Shot((width, height), frame.tobytes("raw", "BGRA"))
+    
+    def grab(self, monitor: Dict[str, int]) -> "_SyntheticScreen._Shot":
+        return self._shot
+
+def _child(mode: str, t0: float, synthetic: bool, disclaimer: float) -> Dict[str, float]:
+    """子进程：导入、模拟确认免责声明、初始化并运行一次迭代，返回各阶段耗时（秒）"""
+    start = time.perf_counter()
+    import main
+    from medipilot.perception.screen import Perception
+    from medipilot.execution.action import Executor
+    from medipilot.orchestration.pipeline import AgentPipeline
+    from medipilot.orchestration.replay import ReplayBackend
+    import_s = time.perf_counter() - start
+    
+    if mode != "sequential":
+        main.preload_dependencies()
+    time.sleep(disclaimer)
+    
+    first_action: List[float] = []
+    
+    class _FirstActionBackend(ReplayBackend):
+        def move_to(self, x: int, y: int) -> None:
+            first_action.append(time.time())
+            super().move_to(x, y)
+    
+    class _SyntheticPerception(Perception):
+        def _create_sct(self) -> Any:
+            return _SyntheticScreen()
+    
+    start = time.perf_counter()
+    perception, brain, executor = main.init_components(
+        perception_factory=_SyntheticPerception if synthetic else Perception,
+        executor_factory=lambda: Executor(backend=_FirstActionBackend()),
+        warm_up=mode == "warmup",
+        parallel=mode != "sequential",
+    )
+    init_s = time.perf_counter() - start
+    
+    AgentPipeline(perception, brain, executor, "WBC: 7.2", max_iterations=1).run()
+    if not first_action:
+        raise RuntimeError("未执行任何动作")
+    return {"import_s": import_s, "init_s": init_s, "first_action_s": first_action[0] - t0}
+
+def run_mode(
+    mode: str,
+    runs: int,
+    base_url: str,
+    synthetic: bool,
+    disclaimer: float = 1.0,
+    verbose: bool = False
+) -> Dict[str, Any]:
+    """
+    以指定模式启动 runs 个子进程
+    
+    Returns:
+        dict: 各阶段耗时分布（毫秒）
+    """
+    env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "sk-mock")
+    samples: Dict[str, List[float]] = {"import_s": [], "init_s": [], "first_action_s": []}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            # 在临时目录运行，日志与归档不写入仓库
+            t0 = time.time()
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, "--t0", repr(t0),
+                 "--disclaimer", str(disclaimer)]
+                + (["--synthetic"] if synthetic else []),
+                cwd=workdir, env=env, capture_output=True, text=True, timeout=120,
+            )
+        if verbose:
+            sys.stderr.write(proc.stderr)
+        if proc.returncode != 0:
+            raise RuntimeError(f"子进程失败 ({mode}): {proc.stderr.strip().splitlines()[-1:]}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        for key in samples:
+            samples[key].append(result[key] * 1000)
+    return {key.replace("_s", "_ms"): summarize(values, quantiles=(50,)) for key, values in samples.items()}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="启动耗时基准（time to first action）")
+    parser.add_argument("--runs", type=int, default=5, help="每种模式的子进程数")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--disclaimer", type=float, default=1.0, help="模拟确认免责声明的时间（秒）")
+    parser.add_argument("--real-capture", action="store_true", help="在当前 $DISPLAY 上真实截屏")
+    parser.add_argument("--verbose", action="store_true", help="输出子进程日志")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--t0", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--synthetic", action="store_true", help=argparse.SUPPRESS)
+    add_server_arguments(parser)
+    parser.set_defaults(latency="fixed:0")
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(_child(args.child, args.t0, args.synthetic, args.disclaimer)))
+        return
+    
+    synthetic = not (args.real_capture and os.environ.get("DISPLAY"))
+    server = server_from_args(args)
+    server.plans = [_CLICK_PLAN]
+    port = server.start()
+    results = {}
+    try:
+        for mode in args.modes:
+            results[mode] = run_mode(mode, args.runs, f"http://127.0.0.1:{port}/v1", synthetic, args.disclaimer, args.verbose)
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        server.stop()
+    
+    print(f"\n{'模式':<14}{'import(ms)':>12}{'init(ms)':>12}{'首个动作(ms)':>14}   (中位数，{args.runs} 次)")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['import_ms']['p50']:>12.0f}{r['init_ms']['p50']:>12.0f}{r['first_action_ms']['p50']:>14.0f}")
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+合成 EMR 录入表单（Tk）
+
+模拟电子病历的化验结果录入界面，供端到端基准在 Xvfb 中使用：
+- 顶部为含虚构患者信息的抬头，位于默认 PRIVACY_REGION (0-150, 0-400) 内，用于验证脱敏路径；
+- 下方按 --columns 排列字段标签与输入框；
+- 窗口就绪后将各输入框的屏幕坐标写入 --geometry，输入框内容变化时写入 --state。
+    
+    DISPLAY=:99 python benchmarks/emr_form.py --fields WBC,RBC,Hgb,PLT --geometry g.json --state s.json
+"""
+import argparse
+import json
+import os
+import tkinter as tk
+from typing import Dict, List
+
+# 虚构的患者信息（不对应任何真实人员）
+PII_HEADER = ("患者: 张三 (测试)", "病历号: MRN-0000000", "出生日期: 1970-01-01")
+
+def _write_json(path: str, data: Dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def build_form(root: tk.Tk, fields: List[str], columns: int, state_path: str) -> Dict[str, tk.Entry]:
+    """构建表单控件，返回 {字段名: 输入框}"""
+    width, height = root.winfo_screenwidth(), root.winfo_screenheight()
+    font_size = max(10, height // 60)
+    root.geometry(f"{width}x{height}+0+0")
+    root.configure(bg="#f4f6f8")
+    
+    header = tk.Frame(root, bg="#dfe7ef", width=width, height=150)
+    header.place(x=0, y=0)
+    for i, line in enumerate(PII_HEADER):
+        tk.Label(header, text=line, bg="#dfe7ef", font=("Helvetica", font_size)).place(x=12, y=12 + i * 40)
+    tk.Label(
+        root, text="检验结果录入", bg="#f4f6f8", font=("Helvetica", font_size + 4, "bold")
+    ).place(x=width // 2, y=170, anchor="n")
+    
+    values: Dict[str, str] = {name: "" for name in fields}
+    entries: Dict[str, tk.Entry] = {}
+    top = 240
+    cell_w = width // columns
+    row_h = max(60, height // 12)
+    for i, name in enumerate(fields):
+        row, col = divmod(i, columns)
+        x = col * cell_w + 40
+        y = top + row * row_h
+        tk.Label(root, text=name, bg="#f4f6f8", font=("Helvetica", font_size)).place(x=x, y=y)
+        var = tk.StringVar()
+        # 关闭光标闪烁，否则画面永远不会"稳定"
+        entry = tk.Entry(root, textvariable=var, font=("Helvetica", font_size), width=12, insertofftime=0)
+        entry.place(x=x + cell_w // 3, y=y)
+        
+        def _on_change(*_args, name=name, var=var) -> None:
+            values[name] = var.get()
+            _write_json(state_path, values)
+        
+        var.trace_add("write", _on_change)
+        entries[name] = entry
+    _write_json(state_path, values)
+    return entries
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成 EMR 录入表单")
+    parser.add_argument("--fields", default="WBC,RBC,Hgb,PLT", help="字段名，逗号分隔")
+    parser.add_argument("--columns", type=int, default=2, help="字段列数")
+    parser.add_argument("--geometry", required=True, help="输入框屏幕坐标输出路径 (JSON)")
+    parser.add_argument("--state", required=True, help="输入框内容输出路径 (JSON)")
+    args = parser.parse_args()
+    
+    root = tk.Tk()
+    root.title("Synthetic EMR")
+    entries = build_form(root, [f.strip() for f in args.fields.split(",") if f.strip()], args.columns, args.state)
+    root.update()
+    
+    geometry = {
+        name: {
+            "x": entry.winfo_rootx(), "y": entry.winfo_rooty(),
+            "width": entry.winfo_width(), "height": entry.winfo_height(),
+        }
+        for name, entry in entries.items()
+    }
+    _write_json(args.geometry, geometry)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+本地 OpenAI 兼容视觉模型模拟服务
+
+实现 Brain 使用的 POST /v1/chat/completions（含 response_format=json_object 的 JSON 内容）
+与预热用的 GET /v1/models，
+按延迟分布返回脚本化或基于规则的计划，并可按比例注入限流 (429)、服务端错误 (5xx)、
+超时与非法 JSON，用于网关容量评估与并发测试。无需 API Key，不产生费用。
+usage 中的 cached_tokens 按与近期请求的最长公共文本前缀模拟服务端提示缓存（达到最小长度后按 128 token 取整）。
+    
+    python benchmarks/mock_vision_server.py --port 8900 --latency lognormal:1.2,0.4 --rate-limit 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=sk-mock python main.py
+
+延迟分布（单位：秒）:
+    fixed:0.8          固定延迟
+    uniform:0.5,1.5    均匀分布
+    lognormal:1.2,0.4  对数正态分布（中位数, sigma），更贴近真实模型的长尾
+    exp:1.0            指数分布（均值）
+"""
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# 基于规则的操作计划：按成功响应的序号循环 click -> type -> finish
+_RULE_PLANS: List[Dict[str, Any]] = [
+    {"thought": "模拟: 定位输入框", "action": "click", "coordinate": [960, 540], "reasoning": "聚焦输入框"},
+    {"thought": "模拟: 录入数值", "action": "type", "coordinate": [960, 540], "text": "7.2", "reasoning": "录入数值"},
+    {"thought": "模拟: 录入完成", "action": "finish", "reasoning": "所有数据录入完毕"},
+]
+
+_RULE_FINDINGS: Dict[str, Any] = {
+    "thought": "模拟: 检验单区域识别",
+    "findings": [
+        {"metric": "WBC", "value": "7.2", "confidence": 0.98, "target_field_hint": "白细胞"},
+        {"metric": "Hgb", "value": "135", "confidence": 0.95, "target_field_hint": "血红蛋白"},
+    ],
+    "scan_quality": "High",
+}
+
+# 单张图像折算的输入 token 数（粗略估计）
+IMAGE_TOKENS = 765
+# 模拟提示缓存：记住最近的请求前缀数量与命中粒度
+_CACHE_ENTRIES = 64
+_CACHE_GRANULARITY = 128
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    解析延迟分布描述
+    
+    Returns:
+        Callable: 给定随机数生成器返回一次延迟（秒）
+    
+    Raises:
+        ValueError: 格式错误时抛出
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"无效的延迟分布: '{spec}'（示例: fixed:0.8 / uniform:0.5,1.5 / lognormal:1.2,0.4 / exp:1.0）")
+
+class MockVisionServer:
+    """
+    OpenAI 兼容的视觉模型模拟服务
+    
+    Attributes:
+        plans: 脚本化计划（按请求顺序循环返回），为空时使用内置规则
+        latency: 延迟分布描述
+        rate_limit: 返回 429 的比例
+        server_error: 返回 500 / 503 的比例
+        timeout: 挂起请求（超过客户端超时）的比例
+        malformed: 返回非法 JSON 内容的比例
+        hang_seconds: 模拟超时时的挂起时长
+        cache_min_tokens: 模拟提示缓存生效的最小公共前缀长度（token），0 表示不模拟
+        stats: 按结果统计的请求数 (ok / rate_limit / server_error / timeout / malformed)
+    """
+    
+    def __init__(
+        self,
+        plans: Optional[List[Dict[str, Any]]] = None,
+        latency: str = "fixed:0",
+        rate_limit: float = 0.0,
+        server_error: float = 0.0,
+        timeout: float = 0.0,
+        malformed: float = 0.0,
+        hang_seconds: float = 60.0,
+        seed: Optional[int] = None,
+        cache_min_tokens: int = 1024
+    ) -> None:
+        self.plans = plans or []
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.server_error = server_error
+        self.timeout = timeout
+        self.malformed = malformed
+        self.hang_seconds = hang_seconds
+        self.cache_min_tokens = cache_min_tokens
+        self.stats: Dict[str, int] = {}
+        
+        self._sample_latency = parse_latency(latency)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._served = 0
+        self._prefixes: deque = deque(maxlen=_CACHE_ENTRIES)
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def _next(self) -> tuple:
+        """抽取本次请求的序号、延迟与注入的故障（在锁内保证可复现）"""
+        with self._lock:
+            self._counter += 1
+            index = self._counter
+            roll = self._rng.random()
+            delay = max(0.0, self._sample_latency(self._rng))
+        fault = None
+        for name, ratio in (
+            ("rate_limit", self.rate_limit), ("server_error", self.server_error),
+            ("timeout", self.timeout), ("malformed", self.malformed)
+        ):
+            if roll < ratio:
+                fault = name
+                break
+            roll -= ratio
+        return index, delay, fault
+    
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+    
+    def next_plan(self, prompt: str) -> Dict[str, Any]:
+        """
+        返回下一个计划：脚本优先，否则按提示词类型套用规则
+        
+        仅在成功响应时推进序号，注入故障（客户端重试或重新请求）不会跳过脚本中的步骤。
+        """
+        if not self.plans and "findings" in prompt:
+            return _RULE_FINDINGS
+        plans = self.plans or _RULE_PLANS
+        with self._lock:
+            self._served += 1
+            return plans[(self._served - 1) % len(plans)]
+    
+    def cached_tokens(self, prefix: str) -> int:
+        """
+        模拟服务端提示缓存：与近期请求的最长公共前缀折算的 token 数
+        
+        与真实服务一致，前缀不足 cache_min_tokens 时不命中，超过后按 128 token 向下取整。
+        """
+        if not self.cache_min_tokens:
+            return 0
+        with self._lock:
+            common = 0
+            for previous in self._prefixes:
+                length = min(len(prefix), len(previous))
+                matched = next((i for i in range(length) if prefix[i] != previous[i]), length)
+                common = max(common, matched)
+            self._prefixes.append(prefix)
+        tokens = common // 2 // _CACHE_GRANULARITY * _CACHE_GRANULARITY
+        return tokens if tokens >= self.cache_min_tokens else 0
+    
+    def completion(self, body: Dict[str, Any], index: int, content: str) -> Dict[str, Any]:
+        """构造 chat.completion 响应体"""
+        text_chars = 0
+        images = 0
+        # 缓存前缀：按消息顺序拼接的文本，遇到第一张图像截止（图像每次都不同）
+        prefix: List[str] = []
+        for message in body.get("messages", []):
+            parts = message.get("content")
+            if isinstance(parts, str):
+                text_chars += len(parts)
+                if not images:
+                    prefix.append(parts)
+                continue
+            for part in parts or []:
+                if part.get("type") == "text":
+                    text_chars += len(part.get("text", ""))
+                    if not images:
+                        prefix.append(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+        prompt_tokens = text_chars // 2 + images * IMAGE_TOKENS
+        cached_tokens = min(self.cached_tokens("".join(prefix)), prompt_tokens)
+        completion_tokens = max(1, len(content) // 2)
+        return {
+            "id": f"chatcmpl-mock-{index}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+    
+    def _handler(self) -> type:
+        server = self
+        
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _error(self, status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+                self._send(status, {"error": {"message": message, "type": error_type, "code": None}}, headers)
+            
+            def do_GET(self) -> None:
+                # 客户端预热 (Brain.warm_up) 使用模型列表建立连接
+                if self.path.rstrip("/") not in ("/v1/models", "/models"):
+                    self._error(404, f"未知路径: {self.path}", "invalid_request_error")
+                    return
+                self._send(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+            
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+                    self._error(404, f"未知路径: {self.path}", "invalid_request_error")
+                    return
+                try:
+                    body = json.loads(raw)
+                except json.JSONDecodeError:
+                    self._error(400, "请求体不是合法 JSON", "invalid_request_error")
+                    return
+                
+                index, delay, fault = server._next()
+                if fault == "rate_limit":
+                    server._count(fault)
+                    self._error(429, "模拟限流", "rate_limit_error", {"Retry-After": "1"})
+                    return
+                if fault == "server_error":
+                    server._count(fault)
+                    self._error(503 if index % 2 else 500, "模拟服务端错误", "server_error")
+                    return
+                if fault == "timeout":
+                    server._count(fault)
+                    time.sleep(server.hang_seconds)
+                    self.close_connection = True
+                    return
+                
+                time.sleep(delay)
+                prompt = " ".join(
+                    part.get("text", "") for message in body.get("messages", [])
+                    for part in (message.get("content") if isinstance(message.get("content"), list) else [])
+                )
+                if fault == "malformed":
+                    content = "模拟的非 JSON 输出"
+                else:
+                    content = json.dumps(server.next_plan(prompt), ensure_ascii=False)
+                server._count(fault or "ok")
+                self._send(200, server.completion(body, index, content))
+            
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+        
+        return _Handler
+    
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """
+        在后台线程启动服务
+        
+        Returns:
+            int: 实际监听端口（port=0 时由系统分配）
+        """
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="mock-vision", daemon=True).start()
+        return self._server.server_address[1]
+    
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def load_plans(path: str) -> List[Dict[str, Any]]:
+    """读取脚本化计划：JSON 数组或每行一个 JSON 对象"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """模拟服务的公共命令行参数（供压测脚本复用）"""
+    parser.add_argument("--plans", help="脚本化计划文件（JSON 数组或 JSONL），默认使用内置规则")
+    parser.add_argument("--latency", default="lognormal:1.0,0.35", help="延迟分布，如 fixed:0.8 / lognormal:1.2,0.4")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--server-error", type=float, default=0.0, help="返回 5xx 的比例")
+    parser.add_argument("--timeout", type=float, default=0.0, help="挂起请求（模拟超时）的比例")
+    parser.add_argument("--malformed", type=float, default=0.0, help="返回非法 JSON 内容的比例")
+    parser.add_argument("--hang-seconds", type=float, default=60.0, help="模拟超时时的挂起时长")
+    parser.add_argument("--seed", type=int, help="随机种子（复现延迟与故障序列）")
+    parser.add_argument("--cache-min-tokens", type=int, default=1024,
+                        help="模拟提示缓存的最小前缀长度（token），0 表示不模拟")
+
+def server_from_args(args: argparse.Namespace) -> MockVisionServer:
+    return MockVisionServer(
+        plans=load_plans(args.plans) if args.plans else None,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        server_error=args.server_error,
+        timeout=args.timeout,
+        malformed=args.malformed,
+        hang_seconds=args.hang_seconds,
+        seed=args.seed,
+        cache_min_tokens=args.cache_min_tokens,
+    )
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容视觉模型模拟服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8900, help="监听端口")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    try:
+        server = server_from_args(args)
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    port = server.start(args.host, args.port)
+    print(f"模拟服务已启动: OPENAI_BASE_URL=http://{args.host}:{port}/v1 (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"\n请求统计: {json.dumps(server.stats, ensure_ascii=False)}")
+
+if __name__ == "__main__":
+    main()
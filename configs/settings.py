@@ -1,6 +1,7 @@
 import os
 import sys
-from typing import Tuple
+import importlib.util
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
 # 加载 .env 环境变量
@@ -10,6 +11,12 @@ class ConfigError(Exception):
     """配置错误异常"""
     pass
 
+def _parse_region(value: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """解析 "y1,y2,x1,x2" 格式的区域配置，未设置时返回 None"""
+    if not value:
+        return None
+    return tuple(int(part) for part in value.split(","))
+
 class Config:
     """
     全局配置类
@@ -20,11 +27,73 @@ class Config:
         OPENAI_BASE_URL (str): API基础URL
         VISION_MODEL (str): 视觉理解模型名称
         EXTRACTION_MODEL (str): 数据提取模型名称
+        PROMPT_CACHE_KEY (str): 随请求发送的提示缓存路由键（prompt_cache_key），留空则不发送
+        LLM_INPUT_PRICE (float): 输入 token 单价（美元 / 百万 token），用于估算提示缓存节省的费用
+        LLM_CACHED_INPUT_PRICE (float): 命中提示缓存的输入 token 单价（美元 / 百万 token）
         LOG_LEVEL (str): 日志级别
-        SCREENSHOT_DELAY (float): 截屏间隔（秒）
+        AUDIT_FLUSH_LEVEL (str): 写入后立即刷新的最低日志级别
+        AUDIT_FLUSH_INTERVAL (float): 低级别日志的批量刷新间隔（秒）
+        AUDIT_BATCH_SIZE (int): 后台写入线程单批最多处理的记录数
+        AUDIT_FSYNC (bool): 刷新时是否同步落盘 (fsync)
+        EVENT_LOG_ENABLED (bool): 是否输出结构化事件日志 (JSONL)
+        AUDIT_ROTATE_MAX_MB (float): 单个日志文件的轮转大小上限（MB），0 表示仅按日期轮转
+        AUDIT_COMPRESSION (str): 归档压缩方式 (gzip / zstd / none)
+        AUDIT_INDEX_PATH (str): 审计事件 SQLite 索引路径，留空则不建索引
+        SCREENSHOT_ARCHIVE_DIR (str): 审计截图归档目录，留空则不归档
+        SCREENSHOT_ARCHIVE_QUOTA_MB (float): 审计截图归档磁盘配额（MB）
+        FINDINGS_DB_PATH (str): 化验单提取结果 SQLite 存储路径，留空则不存储、不复用
+        FINDINGS_REUSE_CONFIDENCE (float): 提取结果自动视为已核验（可直接复用）的最低置信度
+        CHECKPOINT_PATH (str): 主循环断点续跑检查点路径，留空则不保存
+        CHECKPOINT_SCREEN_TOLERANCE (float): 续跑前画面校验允许的平均灰度差（0~1）
+        METRICS_ENABLED (bool): 是否记录运行指标
+        METRICS_HOST (str): 指标 HTTP 端点监听地址
+        METRICS_PORT (int): 指标 HTTP 端点端口，0 表示不启动端点
+        METRICS_DUMP_PATH (str): 退出时指标转储文件路径，留空则不转储
+        DAEMON_HOST (str): 守护进程任务提交 API 监听地址
+        DAEMON_PORT (int): 守护进程任务提交 API 端口
+        DAEMON_TOKEN (str): 任务提交 API 的访问令牌（Authorization: Bearer），留空则启动时随机生成
+        DAEMON_TOKEN_FILE (str): 随机生成的访问令牌写入的文件（权限 0600）
+        PROFILE_DIR (str): 剖析报告目录
+        PROFILE_ITERATIONS (int): 每次触发剖析的迭代数
+        PROFILE_MEMORY (bool): 剖析时是否同时记录 tracemalloc 内存快照
+        PROFILE_TRIGGER_PATH (str): 剖析触发文件，创建后于下一次迭代开始剖析，留空则只响应 SIGUSR1
+        STARTUP_WARMUP (bool): 启动时是否并行预热组件（首次截屏、首次编码、API 连接）
+        SCREENSHOT_DELAY (float): 截屏间隔（秒），流水线模式下为等待画面稳定的上限
+        SETTLE_POLL_INTERVAL (float): 画面稳定检测采样间隔（秒）
+        SETTLE_STABLE_FRAMES (int): 判定画面稳定所需的连续一致采样次数
+        FRAME_POOL_SIZE (int): 整帧缓冲池每种尺寸缓存的空闲缓冲区数，0 表示不复用
+        REPORT_MONITOR (int): 显示化验单的显示器编号（MSS 编号，1 为主显示器）
+        EMR_MONITOR (int): 显示电子病历、接受输入操作的显示器编号；与 REPORT_MONITOR 不同时启用双显示器模式
         PAUSE_INTERVAL (float): 动作执行间隔（秒）
         FAILSAFE (bool): 紧急熔断开关
+        INPUT_BACKEND (str): 输入后端 (pyautogui / xtest)
+        EMERGENCY_STOP_KEY (str): 紧急停止热键 (X11 keysym 名称)
+        XTEST_PAUSE (float): XTEST 后端动作间隔（秒）
+        VERIFY_ENABLED (bool): 是否在输入动作后做本地校验
+        VERIFY_REGION_WIDTH (int): 输入坐标周围校验区域的宽度（像素）
+        VERIFY_REGION_HEIGHT (int): 输入坐标周围校验区域的高度（像素）
+        VERIFY_MIN_CHANGE (float): 校验区域变化比例低于该值视为输入未生效
+        VERIFY_MAX_CHANGE (float): 校验区域变化比例高于该值视为无法在本地确认
+        VERIFY_TIMEOUT (float): 输入后等待校验区域稳定的上限（秒）
+        VERIFY_DIGIT_TEMPLATES (str): 数字模板目录，留空则只做差异比较
+        VERIFY_TEMPLATE_THRESHOLD (float): 数字模板匹配的最低相关系数
         PRIVACY_REGION (Tuple[int, int, int, int]): 隐私保护区域
+        REPORT_PANE_REGION (Optional[Tuple[int, int, int, int]]): 化验单报告区域
+        REPORT_SCROLL_AMOUNT (int): 报告区域每次滚动量
+        REPORT_MAX_PAGES (int): 滚动截取的最大页数
+        MODEL_TILE_HEIGHT (int): 发送给模型的长图分块最大高度（像素）
+        TILE_SIZE (int): 高分辨率整屏分块提取的分块边长上限（像素）
+        TILE_OVERLAP (int): 相邻整屏分块的最小重叠（像素）
+        TILE_BLANK_STDDEV (float): 灰度标准差低于该值的分块视为空白并跳过
+        TERMINOLOGY_PATH (str): 补充术语表 JSON 路径，留空则只使用内置术语
+        TERMINOLOGY_MAX_DISTANCE (int): 指标名称模糊匹配的最大编辑距离（另受别名长度 15% 与中文名称开头两字相同的约束），0 表示只做精确匹配
+        TASK_DESCRIPTION (str): 默认任务描述
+        WORKLIST_SESSIONS (int): 批处理并行会话数
+        COGNITION_MAX_CONCURRENCY (int): 共享认知池并发上限
+        COGNITION_RPM (float): 共享认知池每分钟请求上限
+        XVFB_RESOLUTION (str): 批处理虚拟显示规格
+        REPORT_VIEWER_CMD (str): 批处理打开化验单的命令模板
+        EMR_OPEN_CMD (str): 批处理打开目标病人病历的命令模板
         DISCLAIMER_TEXT (str): 法律免责声明
     """
     
@@ -37,11 +106,67 @@ class Config:
     VISION_MODEL: str = os.getenv("VISION_MODEL", "gpt-4o")
     # 提取模型：用于结构化数据处理
     EXTRACTION_MODEL: str = os.getenv("EXTRACTION_MODEL", "gpt-4o")
+    # 提示缓存 - 提示词为固定前缀 + 动态内容，服务端可复用前缀；路由键让同类请求落到同一缓存
+    PROMPT_CACHE_KEY: str = os.getenv("PROMPT_CACHE_KEY", "")
+    # 输入 token 单价（美元 / 百万 token），仅用于估算提示缓存节省的费用
+    LLM_INPUT_PRICE: float = float(os.getenv("LLM_INPUT_PRICE", "2.5"))
+    LLM_CACHED_INPUT_PRICE: float = float(os.getenv("LLM_CACHED_INPUT_PRICE", "1.25"))
     
     # --- 系统运行参数 ---
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # 审计日志持久化策略 - 动作等 INFO 及以上记录立即刷新，DEBUG 批量刷新
+    AUDIT_FLUSH_LEVEL: str = os.getenv("AUDIT_FLUSH_LEVEL", "INFO")
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "256"))
+    AUDIT_FSYNC: bool = os.getenv("AUDIT_FSYNC", "false").lower() in ("1", "true", "yes")
+    # 结构化事件日志 - 每个阶段一条 JSON 记录，用于分析各阶段耗时分布
+    EVENT_LOG_ENABLED: bool = os.getenv("EVENT_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+    # 日志归档 - 跨天或超过大小上限时移入 logs/archive/ 并压缩，事件同时写入 SQLite 索引
+    AUDIT_ROTATE_MAX_MB: float = float(os.getenv("AUDIT_ROTATE_MAX_MB", "100"))
+    AUDIT_COMPRESSION: str = os.getenv("AUDIT_COMPRESSION", "gzip")
+    AUDIT_INDEX_PATH: str = os.getenv("AUDIT_INDEX_PATH", "logs/audit_index.sqlite3")
+    # 审计截图归档（可选）- 保存发送给模型的脱敏帧，相同帧只存一份，超出配额淘汰最旧数据
+    SCREENSHOT_ARCHIVE_DIR: str = os.getenv("SCREENSHOT_ARCHIVE_DIR", "")
+    SCREENSHOT_ARCHIVE_QUOTA_MB: float = float(os.getenv("SCREENSHOT_ARCHIVE_QUOTA_MB", "2048"))
+    # 提取结果存储（可选）- 按化验单内容哈希保存 findings，已核验的报告再次打开时不再调用模型
+    FINDINGS_DB_PATH: str = os.getenv("FINDINGS_DB_PATH", "")
+    FINDINGS_REUSE_CONFIDENCE: float = float(os.getenv("FINDINGS_REUSE_CONFIDENCE", "0.9"))
+    # 断点续跑 - 每个已确认的动作执行后原子写入任务状态，python main.py --resume 从中断处继续
+    CHECKPOINT_PATH: str = os.getenv("CHECKPOINT_PATH", "logs/checkpoint.json")
+    CHECKPOINT_SCREEN_TOLERANCE: float = float(os.getenv("CHECKPOINT_SCREEN_TOLERANCE", "0.05"))
+    
+    # --- 运行指标 (Prometheus 文本格式) ---
+    # 默认关闭；仅监听本机地址，供本地 Prometheus / node exporter 抓取
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "9464"))
+    METRICS_DUMP_PATH: str = os.getenv("METRICS_DUMP_PATH", "logs/metrics.prom")
+    
+    # --- 守护进程模式 (python main.py --daemon) ---
+    # 组件常驻预热，通过本机 HTTP API 提交任务；仅监听本机地址，非本机地址必须设置访问令牌
+    DAEMON_HOST: str = os.getenv("DAEMON_HOST", "127.0.0.1")
+    DAEMON_PORT: int = int(os.getenv("DAEMON_PORT", "8765"))
+    DAEMON_TOKEN: str = os.getenv("DAEMON_TOKEN", "")
+    DAEMON_TOKEN_FILE: str = os.getenv("DAEMON_TOKEN_FILE", "logs/daemon.token")
+    
+    # --- 按需剖析 (无需重启: kill -USR1 <pid> 或创建触发文件) ---
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "logs/profiles")
+    PROFILE_ITERATIONS: int = int(os.getenv("PROFILE_ITERATIONS", "5"))
+    PROFILE_MEMORY: bool = os.getenv("PROFILE_MEMORY", "true").lower() in ("1", "true", "yes")
+    PROFILE_TRIGGER_PATH: str = os.getenv("PROFILE_TRIGGER_PATH", "logs/profile.trigger")
+    
+    # --- 启动 (感知、认知、执行三个组件并行初始化) ---
+    STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
     # 截屏采样间隔 (秒) - 避免过快操作导致系统卡顿
     SCREENSHOT_DELAY: float = float(os.getenv("SCREENSHOT_DELAY", "1.0"))
+    # 画面稳定检测 - 动作生效后连续多次采样一致即开始下一步，SCREENSHOT_DELAY 为等待上限
+    SETTLE_POLL_INTERVAL: float = float(os.getenv("SETTLE_POLL_INTERVAL", "0.1"))
+    SETTLE_STABLE_FRAMES: int = int(os.getenv("SETTLE_STABLE_FRAMES", "2"))
+    # 整帧缓冲池 - 截屏、脱敏与 SoM 复用预分配的整帧图像，避免每次迭代分配新缓冲区
+    FRAME_POOL_SIZE: int = int(os.getenv("FRAME_POOL_SIZE", "4"))
+    # 显示器角色（MSS 编号，0 为所有显示器拼接的虚拟屏幕）：两者不同时报告提取与 EMR 操作分屏并行
+    REPORT_MONITOR: int = int(os.getenv("REPORT_MONITOR", "1"))
+    EMR_MONITOR: int = int(os.getenv("EMR_MONITOR", "1"))
     
     # --- 隐私与安全配置 (核心) ---
     # 动作执行间隔 (秒) - 模拟人类操作节奏，避免被系统识别为脚本
@@ -49,10 +174,58 @@ class Config:
     # 紧急熔断机制: 鼠标移动到屏幕角落时强制停止
     FAILSAFE: bool = True
     
+    # 输入后端: pyautogui (默认，跨平台) 或 xtest (Linux X11 低延迟直连)
+    INPUT_BACKEND: str = os.getenv("INPUT_BACKEND", "pyautogui")
+    # 紧急停止热键 (X11 keysym 名称)，留空则禁用。仅 xtest 后端生效
+    EMERGENCY_STOP_KEY: str = os.getenv("EMERGENCY_STOP_KEY", "Pause")
+    # XTEST 后端动作间隔 (秒)，默认不额外休眠
+    XTEST_PAUSE: float = float(os.getenv("XTEST_PAUSE", "0.0"))
+    # 输入后本地校验 - 比较输入框附近小区域的前后差异（可选数字模板），确认的输入不再需要模型核对
+    VERIFY_ENABLED: bool = os.getenv("VERIFY_ENABLED", "true").lower() in ("1", "true", "yes")
+    VERIFY_REGION_WIDTH: int = int(os.getenv("VERIFY_REGION_WIDTH", "320"))
+    VERIFY_REGION_HEIGHT: int = int(os.getenv("VERIFY_REGION_HEIGHT", "48"))
+    VERIFY_MIN_CHANGE: float = float(os.getenv("VERIFY_MIN_CHANGE", "0.003"))
+    VERIFY_MAX_CHANGE: float = float(os.getenv("VERIFY_MAX_CHANGE", "0.5"))
+    VERIFY_TIMEOUT: float = float(os.getenv("VERIFY_TIMEOUT", "0.5"))
+    VERIFY_DIGIT_TEMPLATES: str = os.getenv("VERIFY_DIGIT_TEMPLATES", "")
+    VERIFY_TEMPLATE_THRESHOLD: float = float(os.getenv("VERIFY_TEMPLATE_THRESHOLD", "0.8"))
+    
     # 隐私保护区域 (ROI): [y1, y2, x1, x2]
     # 默认覆盖左上角病人信息区。实际部署时需根据医院 EMR 系统布局调整。
     PRIVACY_REGION: Tuple[int, int, int, int] = (0, 150, 0, 400)
-
+    
+    # --- 多页报告滚动拼接 ---
+    # 化验单报告所在区域 "y1,y2,x1,x2"，未设置时使用整屏
+    REPORT_PANE_REGION: Optional[Tuple[int, int, int, int]] = _parse_region(os.getenv("REPORT_PANE_REGION"))
+    # 每次滚动量（负数向下）；过大会导致相邻页面没有重叠而无法去重
+    REPORT_SCROLL_AMOUNT: int = int(os.getenv("REPORT_SCROLL_AMOUNT", "-5"))
+    REPORT_MAX_PAGES: int = int(os.getenv("REPORT_MAX_PAGES", "10"))
+    # 长图按此高度分块后发送，应与模型的输入尺寸上限匹配
+    MODEL_TILE_HEIGHT: int = int(os.getenv("MODEL_TILE_HEIGHT", "2048"))
+    # 高分辨率整屏分块提取：分块边长与重叠均按 SoM 网格取整，重叠应大于一行指标的宽度
+    TILE_SIZE: int = int(os.getenv("TILE_SIZE", "1024"))
+    TILE_OVERLAP: int = int(os.getenv("TILE_OVERLAP", "160"))
+    TILE_BLANK_STDDEV: float = float(os.getenv("TILE_BLANK_STDDEV", "2.0"))
+    # 指标名称与单位的本地规范化：内置常用血常规/生化术语，可用 JSON 文件补充医院自己的写法
+    TERMINOLOGY_PATH: str = os.getenv("TERMINOLOGY_PATH", "")
+    TERMINOLOGY_MAX_DISTANCE: int = int(os.getenv("TERMINOLOGY_MAX_DISTANCE", "2"))
+    
+    # --- 任务与批处理配置 ---
+    TASK_DESCRIPTION: str = os.getenv(
+        "TASK_DESCRIPTION",
+        "从屏幕显示的化验单中提取 WBC, RBC, Hgb, PLT 指标，"
+        "并录入到电子病历系统对应的输入框中。"
+    )
+    # 批处理模式：每个会话独占一个 Xvfb 虚拟显示
+    WORKLIST_SESSIONS: int = int(os.getenv("WORKLIST_SESSIONS", "2"))
+    XVFB_RESOLUTION: str = os.getenv("XVFB_RESOLUTION", "1920x1080x24")
+    # 所有会话共享的认知池限额（需低于 API 账户的速率限制）
+    COGNITION_MAX_CONCURRENCY: int = int(os.getenv("COGNITION_MAX_CONCURRENCY", "4"))
+    COGNITION_RPM: float = float(os.getenv("COGNITION_RPM", "60"))
+    # 命令模板，可用占位符 {report} 与 {patient_id}；病人标识仅用于本地打开病历，不会发送给模型
+    REPORT_VIEWER_CMD: str = os.getenv("REPORT_VIEWER_CMD", "xdg-open {report}")
+    EMR_OPEN_CMD: str = os.getenv("EMR_OPEN_CMD", "")
+    
     # --- 法律与临床免责声明 ---
     DISCLAIMER_TEXT: str = """
     【严正声明 / DISCLAIMER】
@@ -92,17 +265,197 @@ class Config:
                 f"有效值: {', '.join(valid_log_levels)}"
             )
         
+        if cls.AUDIT_FLUSH_LEVEL.upper() not in valid_log_levels:
+            raise ConfigError(
+                f"无效的审计刷新级别: '{cls.AUDIT_FLUSH_LEVEL}'。"
+                f"有效值: {', '.join(valid_log_levels)}"
+            )
+        
+        valid_compressions = ["gzip", "zstd", "none"]
+        if cls.AUDIT_COMPRESSION.lower() not in valid_compressions:
+            raise ConfigError(
+                f"无效的日志压缩方式: '{cls.AUDIT_COMPRESSION}'。"
+                f"有效值: {', '.join(valid_compressions)}"
+            )
+        
+        if cls.AUDIT_COMPRESSION.lower() == "zstd" and importlib.util.find_spec("zstandard") is None:
+            raise ConfigError(
+                "AUDIT_COMPRESSION=zstd 需要安装 zstandard: pip install zstandard"
+            )
+        
+        if cls.AUDIT_ROTATE_MAX_MB < 0:
+            raise ConfigError(
+                f"AUDIT_ROTATE_MAX_MB 不能为负数，当前值: {cls.AUDIT_ROTATE_MAX_MB}"
+            )
+        
+        if cls.SCREENSHOT_ARCHIVE_QUOTA_MB <= 0:
+            raise ConfigError(
+                f"SCREENSHOT_ARCHIVE_QUOTA_MB 必须大于 0，当前值: {cls.SCREENSHOT_ARCHIVE_QUOTA_MB}"
+            )
+        
+        if not 0 < cls.FINDINGS_REUSE_CONFIDENCE <= 1:
+            raise ConfigError(
+                f"FINDINGS_REUSE_CONFIDENCE 必须在 0 到 1 之间，当前值: {cls.FINDINGS_REUSE_CONFIDENCE}"
+            )
+        
+        if not 0 < cls.CHECKPOINT_SCREEN_TOLERANCE < 1:
+            raise ConfigError(
+                f"CHECKPOINT_SCREEN_TOLERANCE 必须在 0 到 1 之间，当前值: {cls.CHECKPOINT_SCREEN_TOLERANCE}"
+            )
+        
+        if not 0 <= cls.METRICS_PORT <= 65535:
+            raise ConfigError(
+                f"METRICS_PORT 必须在 0-65535 之间，当前值: {cls.METRICS_PORT}"
+            )
+        
+        if not 0 <= cls.DAEMON_PORT <= 65535:
+            raise ConfigError(
+                f"DAEMON_PORT 必须在 0-65535 之间，当前值: {cls.DAEMON_PORT}"
+            )
+        
+        if cls.DAEMON_HOST not in ("127.0.0.1", "localhost", "::1") and not cls.DAEMON_TOKEN:
+            raise ConfigError(
+                f"DAEMON_HOST 为非本机地址 ({cls.DAEMON_HOST}) 时必须设置 DAEMON_TOKEN"
+            )
+        
+        if cls.PROFILE_ITERATIONS < 1:
+            raise ConfigError(
+                f"PROFILE_ITERATIONS 必须至少为 1，当前值: {cls.PROFILE_ITERATIONS}"
+            )
+        
+        if cls.AUDIT_FLUSH_INTERVAL <= 0 or cls.AUDIT_BATCH_SIZE < 1:
+            raise ConfigError(
+                "AUDIT_FLUSH_INTERVAL 必须大于 0，AUDIT_BATCH_SIZE 必须至少为 1，"
+                f"当前值: {cls.AUDIT_FLUSH_INTERVAL}, {cls.AUDIT_BATCH_SIZE}"
+            )
+        
         # 验证时间参数
         if cls.SCREENSHOT_DELAY <= 0:
             raise ConfigError(
                 f"SCREENSHOT_DELAY 必须大于 0，当前值: {cls.SCREENSHOT_DELAY}"
             )
         
+        if cls.SETTLE_POLL_INTERVAL <= 0:
+            raise ConfigError(
+                f"SETTLE_POLL_INTERVAL 必须大于 0，当前值: {cls.SETTLE_POLL_INTERVAL}"
+            )
+        
+        if cls.SETTLE_STABLE_FRAMES < 1:
+            raise ConfigError(
+                f"SETTLE_STABLE_FRAMES 必须至少为 1，当前值: {cls.SETTLE_STABLE_FRAMES}"
+            )
+        
+        if cls.FRAME_POOL_SIZE < 0:
+            raise ConfigError(
+                f"FRAME_POOL_SIZE 不能为负数，当前值: {cls.FRAME_POOL_SIZE}"
+            )
+        
+        if cls.REPORT_MONITOR < 0 or cls.EMR_MONITOR < 0:
+            raise ConfigError(
+                "REPORT_MONITOR 与 EMR_MONITOR 不能为负数，"
+                f"当前值: {cls.REPORT_MONITOR}, {cls.EMR_MONITOR}"
+            )
+        
         if cls.PAUSE_INTERVAL <= 0:
             raise ConfigError(
                 f"PAUSE_INTERVAL 必须大于 0，当前值: {cls.PAUSE_INTERVAL}"
             )
         
+        # 验证输入后端
+        valid_backends = ["pyautogui", "xtest"]
+        if cls.INPUT_BACKEND.lower() not in valid_backends:
+            raise ConfigError(
+                f"无效的输入后端: '{cls.INPUT_BACKEND}'。"
+                f"有效值: {', '.join(valid_backends)}"
+            )
+        
+        if cls.XTEST_PAUSE < 0:
+            raise ConfigError(
+                f"XTEST_PAUSE 不能为负数，当前值: {cls.XTEST_PAUSE}"
+            )
+        
+        if cls.VERIFY_REGION_WIDTH < 8 or cls.VERIFY_REGION_HEIGHT < 8:
+            raise ConfigError(
+                "VERIFY_REGION_WIDTH 与 VERIFY_REGION_HEIGHT 必须至少为 8，"
+                f"当前值: {cls.VERIFY_REGION_WIDTH}, {cls.VERIFY_REGION_HEIGHT}"
+            )
+        
+        if not 0 <= cls.VERIFY_MIN_CHANGE < cls.VERIFY_MAX_CHANGE <= 1:
+            raise ConfigError(
+                "VERIFY_MIN_CHANGE 与 VERIFY_MAX_CHANGE 必须满足 0 <= 下限 < 上限 <= 1，"
+                f"当前值: {cls.VERIFY_MIN_CHANGE}, {cls.VERIFY_MAX_CHANGE}"
+            )
+        
+        if cls.VERIFY_TIMEOUT < 0:
+            raise ConfigError(
+                f"VERIFY_TIMEOUT 不能为负数，当前值: {cls.VERIFY_TIMEOUT}"
+            )
+        
+        if cls.VERIFY_DIGIT_TEMPLATES and not os.path.isdir(cls.VERIFY_DIGIT_TEMPLATES):
+            raise ConfigError(
+                f"VERIFY_DIGIT_TEMPLATES 目录不存在: {cls.VERIFY_DIGIT_TEMPLATES}"
+            )
+        
+        if not 0 < cls.VERIFY_TEMPLATE_THRESHOLD <= 1:
+            raise ConfigError(
+                f"VERIFY_TEMPLATE_THRESHOLD 必须在 0 到 1 之间，当前值: {cls.VERIFY_TEMPLATE_THRESHOLD}"
+            )
+        
+        # 验证报告区域与分块参数
+        if cls.REPORT_PANE_REGION is not None:
+            if len(cls.REPORT_PANE_REGION) != 4:
+                raise ConfigError(
+                    f"REPORT_PANE_REGION 格式错误: {cls.REPORT_PANE_REGION}，应为 y1,y2,x1,x2"
+                )
+            ry1, ry2, rx1, rx2 = cls.REPORT_PANE_REGION
+            if not (0 <= ry1 < ry2 and 0 <= rx1 < rx2):
+                raise ConfigError(
+                    f"REPORT_PANE_REGION 坐标无效: {cls.REPORT_PANE_REGION}"
+                )
+        
+        if cls.REPORT_MAX_PAGES < 1 or cls.MODEL_TILE_HEIGHT < 256:
+            raise ConfigError(
+                "REPORT_MAX_PAGES 必须至少为 1，MODEL_TILE_HEIGHT 必须至少为 256，"
+                f"当前值: {cls.REPORT_MAX_PAGES}, {cls.MODEL_TILE_HEIGHT}"
+            )
+        
+        if cls.TILE_SIZE < 256 or not 0 <= cls.TILE_OVERLAP < cls.TILE_SIZE // 2:
+            raise ConfigError(
+                "TILE_SIZE 必须至少为 256，TILE_OVERLAP 必须在 0 到 TILE_SIZE 的一半之间，"
+                f"当前值: {cls.TILE_SIZE}, {cls.TILE_OVERLAP}"
+            )
+        
+        if cls.TILE_BLANK_STDDEV < 0:
+            raise ConfigError(
+                f"TILE_BLANK_STDDEV 不能为负数，当前值: {cls.TILE_BLANK_STDDEV}"
+            )
+        
+        if not 0 <= cls.TERMINOLOGY_MAX_DISTANCE <= 3:
+            raise ConfigError(
+                f"TERMINOLOGY_MAX_DISTANCE 必须在 0 到 3 之间，当前值: {cls.TERMINOLOGY_MAX_DISTANCE}"
+            )
+        
+        if cls.TERMINOLOGY_PATH and not os.path.isfile(cls.TERMINOLOGY_PATH):
+            raise ConfigError(f"补充术语表不存在: {cls.TERMINOLOGY_PATH}")
+        
+        if not 0 <= cls.LLM_CACHED_INPUT_PRICE <= cls.LLM_INPUT_PRICE:
+            raise ConfigError(
+                "LLM_CACHED_INPUT_PRICE 与 LLM_INPUT_PRICE 必须满足 0 <= 缓存单价 <= 输入单价，"
+                f"当前值: {cls.LLM_CACHED_INPUT_PRICE}, {cls.LLM_INPUT_PRICE}"
+            )
+        
+        # 验证批处理参数
+        if cls.WORKLIST_SESSIONS < 1 or cls.COGNITION_MAX_CONCURRENCY < 1:
+            raise ConfigError(
+                "WORKLIST_SESSIONS 与 COGNITION_MAX_CONCURRENCY 必须至少为 1，"
+                f"当前值: {cls.WORKLIST_SESSIONS}, {cls.COGNITION_MAX_CONCURRENCY}"
+            )
+        
+        if cls.COGNITION_RPM <= 0:
+            raise ConfigError(
+                f"COGNITION_RPM 必须大于 0，当前值: {cls.COGNITION_RPM}"
+            )
+        
         # 验证隐私区域
         y1, y2, x1, x2 = cls.PRIVACY_REGION
         if not (0 <= y1 < y2 and 0 <= x1 < x2):
@@ -135,6 +488,9 @@ class Config:
         print(f"截屏间隔: {cls.SCREENSHOT_DELAY}秒")
         print(f"隐私区域: {cls.PRIVACY_REGION}")
         print(f"紧急熔断: {'启用' if cls.FAILSAFE else '禁用'}")
+        print(f"输入后端: {cls.INPUT_BACKEND}")
+        if cls.REPORT_MONITOR != cls.EMR_MONITOR:
+            print(f"双显示器: 报告 #{cls.REPORT_MONITOR} | EMR #{cls.EMR_MONITOR}")
         print("=" * 60)
 
 # 创建全局配置实例
@@ -1,12 +1,30 @@
-import time
+import os
 import sys
-from typing import NoReturn
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, NoReturn, Optional, List, Tuple
 from medipilot.perception.screen import Perception, PerceptionError
-from medipilot.cognition.engine import Brain, Prompts, CognitionError
-from medipilot.execution.action import Executor, ExecutionError
+from medipilot.cognition.engine import Brain, CognitionError
+from medipilot.execution.action import Executor, ExecutionError, EmergencyStop
+from medipilot.execution.verify import VerificationError, default_verifier
+from medipilot.orchestration.pipeline import AgentPipeline
+from medipilot.orchestration.checkpoint import Checkpoint, CheckpointError
+from medipilot.orchestration.daemon import AgentDaemon, DaemonError, write_token_file
+from medipilot.orchestration.display import DisplayError
+from medipilot.orchestration.worklist import WorklistScheduler, WorklistError, load_jobs
+from medipilot.orchestration.replay import SessionRecorder
+from medipilot.orchestration.split_screen import SplitScreenSession, SplitScreenError
+from medipilot.utils.findings_store import FindingsStore, FindingsStoreError, default_store
 from medipilot.utils.logger import audit_logger
+from medipilot.utils import events, lazy, metrics, profiling
 from configs.settings import config, ConfigError
 
+def preload_dependencies() -> None:
+    """在用户阅读免责声明期间后台导入重量级依赖（仅导入，不截屏、不连接 API）"""
+    backend = "pyautogui" if config.INPUT_BACKEND == "pyautogui" else "Xlib.display"
+    lazy.preload("openai", "numpy", "cv2", "mss", backend)
+
 def show_disclaimer() -> None:
     """
     展示法律免责声明并确认
@@ -28,6 +46,77 @@ def show_disclaimer() -> None:
         else:
             print("请输入 'y' 或 'n'")
 
+def start_metrics() -> None:
+    """启动本地指标端点（METRICS_ENABLED 关闭时跳过）"""
+    try:
+        port = metrics.start()
+    except OSError as e:
+        audit_logger.warning(f"指标端点启动失败，继续运行: {e}")
+        return
+    if port:
+        audit_logger.info(f"指标端点: http://{config.METRICS_HOST}:{port}/metrics")
+
+def init_components(
+    perception_factory: Callable[[], Perception] = Perception,
+    brain_factory: Callable[[], Brain] = Brain,
+    executor_factory: Callable[[], Executor] = Executor,
+    warm_up: Optional[bool] = None,
+    parallel: bool = True
+) -> Tuple[Perception, Brain, Executor]:
+    """
+    初始化并预热核心组件
+    
+    三个组件互不依赖，默认在线程池中并行创建；预热（首次截屏、首次编码、API 连接）
+    也在各自线程中完成，使首个动作不再承担这些一次性开销。
+    
+    Args:
+        perception_factory / brain_factory / executor_factory: 组件构造函数
+        warm_up: 是否预热，默认使用配置中的 STARTUP_WARMUP
+        parallel: 是否并行初始化（False 时按顺序初始化，用于对比）
+    
+    Returns:
+        Tuple[Perception, Brain, Executor]: 初始化完成的组件
+    
+    Raises:
+        PerceptionError / CognitionError / ExecutionError: 任一组件初始化或预热失败
+    """
+    warm_up = config.STARTUP_WARMUP if warm_up is None else warm_up
+    
+    def _build(factory: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        component = factory()
+        if warm_up:
+            try:
+                component.warm_up()
+            except BaseException:
+                if isinstance(component, Executor):
+                    component.close()
+                raise
+        audit_logger.debug(f"{type(component).__name__} 就绪，耗时 {time.perf_counter() - start:.2f}s")
+        return component
+    
+    factories = (perception_factory, brain_factory, executor_factory)
+    if not parallel:
+        perception, brain, executor = (_build(factory) for factory in factories)
+        return perception, brain, executor
+    
+    with ThreadPoolExecutor(max_workers=len(factories), thread_name_prefix="startup") as pool:
+        futures = [pool.submit(_build, factory) for factory in factories]
+    results, errors = [], []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        # 其余组件已创建成功，释放执行器占用的输入设备
+        for component in results:
+            if isinstance(component, Executor):
+                component.close()
+        raise errors[0]
+    perception, brain, executor = results
+    return perception, brain, executor
+
 def validate_environment() -> None:
     """
     验证运行环境和配置
@@ -42,7 +131,7 @@ def validate_environment() -> None:
         
         # 显示配置信息
         config.display_info()
-        
+    
     except ConfigError as e:
         audit_logger.critical(f"配置验证失败: {e}")
         print(f"\n❌ 配置错误: {e}")
@@ -50,105 +139,249 @@ def validate_environment() -> None:
         print("参考 .env.example 文件获取配置模板。\n")
         sys.exit(1)
 
-def main() -> NoReturn:
+def open_checkpoint(resume: bool, task_desc: str) -> Optional[Checkpoint]:
+    """
+    打开断点续跑检查点（CHECKPOINT_PATH 为空时不保存）
+    
+    Args:
+        resume: 是否从已有检查点续跑
+        task_desc: 新任务的描述（续跑时使用检查点中的描述）
+    
+    Raises:
+        CheckpointError: 续跑时检查点不存在或已损坏
+    """
+    path = config.CHECKPOINT_PATH
+    if not path:
+        if resume:
+            raise CheckpointError("CHECKPOINT_PATH 未设置，无法续跑")
+        return None
+    if resume:
+        checkpoint = Checkpoint.load(path)
+        if checkpoint is None:
+            raise CheckpointError(f"未找到检查点: {path}")
+        return checkpoint
+    if os.path.exists(path):
+        audit_logger.warning(f"发现未完成任务的检查点 {path}，本次从头开始并将其覆盖；如需继续请使用 --resume")
+    return Checkpoint(path, task_desc)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="MediPilot - 临床医生 AI 自动化副驾驶")
+    parser.add_argument(
+        "--worklist", metavar="JOBS_JSONL",
+        help="批处理模式：按工作列表在多个虚拟显示上并行处理任务"
+    )
+    parser.add_argument("--sessions", type=int, help="批处理并行会话数（默认 WORKLIST_SESSIONS）")
+    parser.add_argument(
+        "--state", metavar="STATE_JSONL",
+        help="批处理状态文件，用于断点续跑（默认 <工作列表>.state.jsonl）"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="从上次中断处续跑（CHECKPOINT_PATH 中的检查点），调用模型前先在本地校验画面"
+    )
+    parser.add_argument(
+        "--record", metavar="DIR",
+        help="录制会话包（脱敏截图、提示词、模型响应、动作），供 medipilot.orchestration.replay 离线回放"
+    )
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="守护进程模式：组件常驻预热，通过本机 HTTP API (DAEMON_HOST:DAEMON_PORT) 提交任务"
+    )
+    return parser.parse_args(argv)
+
+def run_worklist(args: argparse.Namespace) -> None:
+    """
+    批处理模式入口
+    
+    中断后以相同参数重新运行即可续跑，已完成的任务会被跳过。
+    """
+    try:
+        jobs = load_jobs(args.worklist)
+        state_path = args.state or f"{args.worklist}.state.jsonl"
+        summary = WorklistScheduler(jobs, state_path, sessions=args.sessions).run()
+    except (WorklistError, DisplayError, CognitionError, ExecutionError, OSError) as e:
+        audit_logger.critical(f"批处理失败: {e}")
+        print(f"\n❌ 批处理错误: {e}\n")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\n批处理已中止，重新运行相同命令即可续跑。")
+        sys.exit(130)
+    
+    print(f"\n批处理完成: 成功 {summary['done']} 个，失败 {summary['failed']} 个，"
+          f"跳过 {summary['skipped']} 个。汇总见 {state_path}.summary.json\n")
+
+def log_cache_summary(brain: Brain) -> None:
+    """记录本次运行的提示缓存命中率与估计节省（回放等无统计的认知层替身跳过）"""
+    stats = getattr(brain, "cache_stats", None)
+    if stats is not None and stats.calls:
+        audit_logger.info(stats.describe())
+
+def run_daemon(perception: Perception, brain: Brain, executor: Executor, store: Optional[FindingsStore]) -> None:
+    """
+    守护进程模式入口
+    
+    组件已在启动时预热，免责声明已由操作员确认，对本次守护进程会话内的所有任务有效。
+    阻塞直至 Ctrl+C 或紧急停止。
+    """
+    report = None
+    if config.REPORT_MONITOR != config.EMR_MONITOR:
+        report = Perception(monitor=config.REPORT_MONITOR, pool=perception.pool)
+    daemon = AgentDaemon(
+        perception, brain, executor, report=report, store=store, max_iterations=100, token=config.DAEMON_TOKEN
+    )
+    try:
+        if daemon.token_generated:
+            write_token_file(config.DAEMON_TOKEN_FILE, daemon.token)
+            audit_logger.info(f"任务 API 访问令牌已生成并写入 {config.DAEMON_TOKEN_FILE}（仅当前用户可读）")
+        port = daemon.serve(config.DAEMON_HOST, config.DAEMON_PORT)
+    except (OSError, DaemonError) as e:
+        audit_logger.critical(f"任务 API 启动失败: {e}")
+        print(f"\n❌ 守护进程错误: {e}\n")
+        executor.close()
+        sys.exit(1)
+    
+    audit_logger.info(
+        f"守护进程已启动 | 任务 API: http://{config.DAEMON_HOST}:{port}/jobs | 会话 ID: {events.SESSION_ID} | "
+        "免责声明已于启动时确认，本次会话内不再重复提示"
+    )
+    print(f"守护进程运行中，任务 API: http://{config.DAEMON_HOST}:{port}/jobs（Ctrl+C 停止）")
+    try:
+        # 带超时等待，保证主线程能及时响应 Ctrl+C
+        while not daemon.wait(1.0):
+            pass
+        if daemon.stop_reason == "emergency_stop":
+            print("\n\n已触发紧急停止，守护进程已停止，排队中的任务已取消。")
+    except KeyboardInterrupt:
+        audit_logger.warning("\n用户手动停止守护进程 (Ctrl+C)")
+        daemon.stop()
+        print("\n\n守护进程已安全退出。")
+    finally:
+        log_cache_summary(brain)
+        executor.close()
+        audit_logger.info("MediPilot 已关闭")
+
+def main(argv: Optional[List[str]] = None) -> NoReturn:
     """
     主程序入口
     
     工作流程:
         1. 显示免责声明
         2. 验证配置
-        3. 初始化组件
-        4. 执行感知-认知-执行循环
+        3. 初始化组件（批处理模式下交由调度器按会话初始化）
+        4. 运行感知-认知-执行流水线（守护进程模式下改为通过 API 接收任务）
     """
+    args = parse_args(argv)
+    
     print("\n" + "=" * 60)
     print("🩺 MediPilot - 临床医生 AI 自动化副驾驶")
     print("=" * 60 + "\n")
     
-    # 1. 启动展示免责声明 (临床合规要求)
+    # 1. 启动展示免责声明 (临床合规要求)，同时在后台导入依赖
+    preload_dependencies()
     show_disclaimer()
     
     # 2. 验证配置
     validate_environment()
+    start_metrics()
+    profiling.install_signal_handler()
+    
+    if args.worklist:
+        run_worklist(args)
+        return
     
     # 3. 初始化核心组件
     try:
         audit_logger.info("开始初始化核心组件...")
-        perception = Perception()
-        brain = Brain()
-        executor = Executor()
-        audit_logger.info("✓ 所有组件初始化完成\n")
-        
-    except (PerceptionError, CognitionError, ExecutionError) as e:
+        start = time.perf_counter()
+        perception, brain, executor = init_components(
+            perception_factory=lambda: Perception(monitor=config.EMR_MONITOR)
+        )
+        # 模型看到的是 EMR 显示器的截图，执行层按该显示器的偏移换算坐标
+        executor.bind_monitor(perception.monitor_geometry())
+        # 输入动作后在本地校验输入框附近的区域，确认的输入不再需要模型核对
+        executor.verifier = default_verifier(perception.capture_region)
+        store = default_store()
+        audit_logger.info(f"✓ 所有组件初始化完成，耗时 {time.perf_counter() - start:.2f}s\n")
+    
+    except (PerceptionError, CognitionError, ExecutionError, EmergencyStop, FindingsStoreError, VerificationError) as e:
         audit_logger.critical(f"组件初始化失败: {e}")
         print(f"\n❌ 初始化错误: {e}\n")
         sys.exit(1)
     
-    # 4. 定义任务
-    task_desc = (
-        "从屏幕显示的化验单中提取 WBC, RBC, Hgb, PLT 指标，"
-        "并录入到电子病历系统对应的输入框中。"
-    )
+    if args.daemon:
+        run_daemon(perception, brain, executor, store)
+        return
+    
+    # 4. 定义任务（续跑时沿用检查点中的任务与提取结果）
+    try:
+        checkpoint = open_checkpoint(args.resume, config.TASK_DESCRIPTION)
+    except CheckpointError as e:
+        audit_logger.critical(f"无法续跑: {e}")
+        print(f"\n❌ 续跑错误: {e}\n")
+        sys.exit(1)
+    task_desc = config.TASK_DESCRIPTION if checkpoint is None else checkpoint.task_desc
     
     audit_logger.info("=" * 60)
     audit_logger.info("MediPilot 临床助手开始运行...")
     audit_logger.info(f"任务描述: {task_desc}")
+    audit_logger.info(f"会话 ID: {events.SESSION_ID}")
     audit_logger.info("=" * 60)
     
-    iteration_count = 0
-    max_iterations = 100  # 防止无限循环
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder(args.record, task_desc)
+        perception = recorder.perception(perception)
+        brain = recorder.brain(brain)
+        executor = recorder.executor(executor)
+        audit_logger.info(f"录制会话至: {args.record}")
+    
+    if config.REPORT_MONITOR != config.EMR_MONITOR:
+        # 双显示器：报告显示器提取与 EMR 显示器操作并行
+        report = Perception(monitor=config.REPORT_MONITOR, pool=perception.pool)
+        session = SplitScreenSession(
+            report, perception, brain, executor, task_desc, max_iterations=100, store=store,
+            checkpoint=checkpoint
+        )
+        pipeline = session.pipeline
+        run = session.run
+    else:
+        pipeline = AgentPipeline(perception, brain, executor, task_desc, max_iterations=100, checkpoint=checkpoint)
+        run = pipeline.run
     
     try:
-        while iteration_count < max_iterations:
-            iteration_count += 1
-            audit_logger.info(f"\n--- 迭代 #{iteration_count} ---")
-            
-            # A. 感知阶段
-            try:
-                img = perception.capture()
-                # 执行本地隐私脱敏 (不上传 PII 到云端)
-                img = perception.privacy_filter(img)
-                # 叠加 SoM 视觉锚点
-                img_with_som = perception.apply_som_overlay(img)
-            except PerceptionError as e:
-                audit_logger.error(f"感知阶段失败: {e}")
-                audit_logger.info("等待3秒后重试...")
-                time.sleep(3)
-                continue
-            
-            # B. 认知决策阶段
-            try:
-                # 传入当前任务描述及 SoM 图像
-                plan = brain.call_vision(img_with_som, Prompts.operation(task_desc))
-            except CognitionError as e:
-                audit_logger.error(f"认知阶段失败: {e}")
-                audit_logger.info("等待5秒后重试...")
-                time.sleep(5)
-                continue
-            
-            # C. 执行阶段
-            try:
-                is_finished = executor.execute(plan)
-                
-                if is_finished:
-                    audit_logger.info("\n" + "=" * 60)
-                    audit_logger.info("✓ 工作流程已成功完成")
-                    audit_logger.info(f"总迭代次数: {iteration_count}")
-                    audit_logger.info("=" * 60)
-                    break
-            except ExecutionError as e:
-                audit_logger.error(f"执行阶段失败: {e}")
-                audit_logger.info("继续下一次迭代...")
-                
-            # 控制采样频率，避免过度占用系统资源
-            time.sleep(config.SCREENSHOT_DELAY)
+        if run():
+            audit_logger.info("\n" + "=" * 60)
+            audit_logger.info("✓ 工作流程已成功完成")
+            audit_logger.info(f"总迭代次数: {pipeline.iteration_count}")
+            audit_logger.info("=" * 60)
+        else:
+            audit_logger.warning(f"达到最大迭代次数 ({pipeline.max_iterations})，程序终止")
         
-        if iteration_count >= max_iterations:
-            audit_logger.warning(f"达到最大迭代次数 ({max_iterations})，程序终止")
-            
+        # 汇总各阶段平均耗时，便于定位性能瓶颈
+        summary = " | ".join(f"{k}={v:.0f}ms" for k, v in pipeline.summary().items())
+        audit_logger.info(f"平均迭代耗时: {summary}")
+    
     except KeyboardInterrupt:
         audit_logger.warning("\n用户手动中止程序 (Ctrl+C)")
         print("\n\n程序已安全退出。")
-        
+        if checkpoint is not None and os.path.exists(checkpoint.path):
+            print("进度已保存，使用 python main.py --resume 可从中断处继续。")
+    
+    except EmergencyStop as e:
+        audit_logger.warning(f"🛑 紧急停止: {e}")
+        print("\n\n已触发紧急停止，程序已安全退出。")
+    
+    except CheckpointError as e:
+        audit_logger.critical(f"续跑校验失败: {e}")
+        print(f"\n❌ 续跑错误: {e}\n")
+        sys.exit(1)
+    
+    except (SplitScreenError, PerceptionError) as e:
+        audit_logger.critical(f"报告显示器提取失败: {e}")
+        print(f"\n❌ 报告提取错误: {e}\n")
+        sys.exit(1)
+    
     except Exception as e:
         audit_logger.critical(f"系统遭遇不可恢复错误: {e}", exc_info=True)
         print(f"\n\n❌ 严重错误: {e}")
@@ -156,6 +389,10 @@ def main() -> NoReturn:
         sys.exit(1)
     
     finally:
+        log_cache_summary(brain)
+        if recorder is not None:
+            recorder.close()
+        executor.close()
         audit_logger.info("MediPilot 已关闭")
         print("\n感谢使用 MediPilot！\n")
 
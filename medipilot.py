@@ -35,9 +35,12 @@ class MedicalTranslator:
         "MCV": "平均红细胞体积"
     }
 
+    # 按大写建索引，避免 "Hgb".upper() 查不到自身的键
+    _INDEX = {key.upper(): value for key, value in MAPPING.items()}
+
     @classmethod
     def translate(cls, term):
-        return cls.MAPPING.get(term.upper(), term)
+        return cls._INDEX.get(term.strip().upper(), term)
 
 # --- 2. 感知层 (Layer 1: Perception - The Eye) ---
 
@@ -0,0 +1,5 @@
+"""
+MediPilot: 临床医生 AI 自动化副驾驶
+
+架构：感知 (perception) -> 认知 (cognition) -> 执行 (execution)
+"""
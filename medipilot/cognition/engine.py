@@ -1,17 +1,90 @@
 import base64
 import json
 import io
+import time
+import threading
 from typing import Dict, Any, Optional
 from PIL import Image
-from openai import OpenAI
-from openai import APIError, RateLimitError, APIConnectionError
 from configs.settings import config
 from medipilot.utils.logger import audit_logger
+from medipilot.utils import events
+from medipilot.utils import metrics
+from medipilot.utils.frame_archive import FrameArchive, default_archive
+from medipilot.utils.lazy import lazy_import
+
+# openai SDK 导入耗时较长，创建客户端时才真正导入
+openai = lazy_import("openai")
 
 class CognitionError(Exception):
     """认知层异常"""
     pass
 
+# 提示词版本：修改系统消息或任何提示词的固定前缀时递增，便于将缓存命中率的变化对应到提示词变更
+PROMPT_VERSION = "2"
+
+SYSTEM_PROMPT = "你是一个极其严谨的医疗自动化助手。你的每一个操作都关系到医疗质量，必须严格遵守指令。"
+# 系统消息在所有请求中逐字节相同，只构造一次
+_SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+class PromptCacheStats:
+    """
+    提示缓存统计（线程安全）
+    
+    按 API usage 中报告的 cached_tokens 汇总输入 token 的缓存命中率；命中与未命中调用的
+    平均耗时之差乘以命中次数即为估计节省的时间，缓存 token 的折扣单价即为估计节省的费用。
+    """
+    
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hit_calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._seconds = {"hit": 0.0, "miss": 0.0}
+    
+    def record(self, prompt_tokens: int, cached_tokens: int, seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            if cached_tokens:
+                self.hit_calls += 1
+            self._seconds["hit" if cached_tokens else "miss"] += seconds
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: calls、hit_calls、prompt_tokens、cached_tokens、hit_ratio（按 token）、
+                  hit_latency / miss_latency（平均秒数，无样本时为 None）、saved_seconds、saved_cost（美元）
+        """
+        with self._lock:
+            misses = self.calls - self.hit_calls
+            hit_latency = self._seconds["hit"] / self.hit_calls if self.hit_calls else None
+            miss_latency = self._seconds["miss"] / misses if misses else None
+            saved_seconds = 0.0
+            if hit_latency is not None and miss_latency is not None:
+                saved_seconds = max(0.0, miss_latency - hit_latency) * self.hit_calls
+            return {
+                "calls": self.calls,
+                "hit_calls": self.hit_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "hit_ratio": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+                "hit_latency": hit_latency,
+                "miss_latency": miss_latency,
+                "saved_seconds": saved_seconds,
+                "saved_cost": self.cached_tokens * (config.LLM_INPUT_PRICE - config.LLM_CACHED_INPUT_PRICE) / 1_000_000,
+            }
+    
+    def describe(self) -> str:
+        """一行汇总，供审计日志使用"""
+        summary = self.summary()
+        return (
+            f"提示缓存命中率 {summary['hit_ratio']:.0%}（{summary['cached_tokens']}/{summary['prompt_tokens']} 输入 token）| "
+            f"命中调用 {summary['hit_calls']}/{summary['calls']} | "
+            f"估计节省 {summary['saved_seconds']:.1f}s、${summary['saved_cost']:.4f} | 提示词版本 {PROMPT_VERSION}"
+        )
+
 class Brain:
     """
     认知层：决策大脑
@@ -20,52 +93,86 @@ class Brain:
     Attributes:
         client: OpenAI客户端实例
         model: 使用的模型名称
+        archive: 审计截图归档（未启用时为 None）
+        cache_stats: 提示缓存命中统计
     """
     
-    def __init__(self, model: Optional[str] = None) -> None:
+    def __init__(self, model: Optional[str] = None, archive: Optional[FrameArchive] = None) -> None:
         """
         初始化认知引擎
         
         Args:
             model: 模型名称，默认使用配置中的VISION_MODEL
-            
+            archive: 审计截图归档，默认按 SCREENSHOT_ARCHIVE_DIR 配置启用
+        
         Raises:
             CognitionError: 初始化失败时抛出
         """
         try:
-            self.client = OpenAI(
+            self.client = openai.OpenAI(
                 api_key=config.OPENAI_API_KEY,
                 base_url=config.OPENAI_BASE_URL
             )
             self.model = model or config.VISION_MODEL
+            self.archive = archive or default_archive()
+            self.cache_stats = PromptCacheStats()
             audit_logger.info(f"认知引擎启动，当前模型: {self.model}")
         except Exception as e:
             audit_logger.critical(f"认知引擎初始化失败: {e}")
             raise CognitionError(f"无法初始化AI引擎: {e}")
-
+    
+    def warm_up(self) -> bool:
+        """
+        预热：完成首次图像编码并与 API 端点建立连接（连接由客户端连接池复用）
+        
+        连接失败不视为致命错误，首次调用时客户端会自动重试。
+        
+        Returns:
+            bool: 是否成功连接 API 端点
+        """
+        self._encode_image(Image.new("RGB", (64, 64), color="white"))
+        try:
+            self.client.with_options(max_retries=0, timeout=10.0).models.list()
+            return True
+        except openai.APIStatusError as e:
+            # 端点可达但不支持模型列表（部分兼容网关），连接已建立
+            audit_logger.debug(f"API 预热: 模型列表返回 {e.status_code}")
+            return True
+        except openai.APIError as e:
+            audit_logger.warning(f"API 预热连接失败，将在首次调用时重试: {e}")
+            return False
+    
     def _encode_image(self, image: Image.Image) -> str:
         """
         将 PIL 图像转换为 base64 编码，用于 API 传输
         
         Args:
             image: PIL图像对象
-            
+        
         Returns:
             str: Base64编码的图像字符串
-            
+        
         Raises:
             CognitionError: 图像编码失败时抛出
         """
         try:
             buffered = io.BytesIO()
             image.save(buffered, format="JPEG", quality=85)
-            encoded = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            # getbuffer 直接引用内部缓冲区，省去 getvalue 的一次整段复制
+            with buffered.getbuffer() as jpeg:
+                encoded = base64.b64encode(jpeg).decode('ascii')
             audit_logger.debug(f"图像编码完成，大小: {len(encoded)} 字符")
             return encoded
         except Exception as e:
             audit_logger.error(f"图像编码失败: {e}")
             raise CognitionError(f"图像编码错误: {e}")
-
+    
+    def _error_result(self, reason: str, error_type: str) -> Dict[str, Any]:
+        """构造错误结果并记录结构化错误事件（供审计索引按错误类型检索）"""
+        events.emit("error", stage="llm", error_type=error_type, model=self.model, reason=reason)
+        metrics.LLM_CALLS.inc(error_type=error_type)
+        return {"action": "error", "reason": reason, "error_type": error_type}
+    
     def call_vision(self, image: Image.Image, prompt: str) -> Dict[str, Any]:
         """
         调用视觉大模型进行分析
@@ -73,37 +180,60 @@ class Brain:
         Args:
             image: 经过脱敏和 SoM 处理的截图
             prompt: 系统或用户提示词
-            
+        
         Returns:
             dict: 模型生成的 JSON 结果
-            
+        
         Raises:
             CognitionError: API调用失败时抛出（严重错误）
         """
         try:
-            b64_img = self._encode_image(image)
-            audit_logger.info("正在发送视觉请求至大模型...")
+            # 归档发送给模型的帧（后台写入，不阻塞）
+            if self.archive is not None:
+                self.archive.submit(image)
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个极其严谨的医疗自动化助手。你的每一个操作都关系到医疗质量，必须严格遵守指令。"
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64_img}"}}
-                        ],
-                    }
-                ],
-                response_format={"type": "json_object"},
-                timeout=30.0  # 30秒超时
-            )
+            with events.span("encode") as encode_span:
+                b64_img = self._encode_image(image)
+                encode_span["payload_bytes"] = len(b64_img)
+            audit_logger.info("正在发送视觉请求至大模型...")
             
-            result = json.loads(response.choices[0].message.content)
+            with events.span("llm", model=self.model) as llm_span:
+                start = time.perf_counter()
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        _SYSTEM_MESSAGE,
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64_img}"}}
+                            ],
+                        }
+                    ],
+                    response_format={"type": "json_object"},
+                    timeout=30.0,  # 30秒超时
+                    extra_body={"prompt_cache_key": config.PROMPT_CACHE_KEY} if config.PROMPT_CACHE_KEY else None
+                )
+                seconds = time.perf_counter() - start
+                llm_span["prompt_version"] = PROMPT_VERSION
+                
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    llm_span["prompt_tokens"] = usage.prompt_tokens
+                    llm_span["completion_tokens"] = usage.completion_tokens
+                    details = getattr(usage, "prompt_tokens_details", None)
+                    cached = getattr(details, "cached_tokens", None) or 0
+                    llm_span["cached_tokens"] = cached
+                    metrics.LLM_TOKENS.inc(usage.prompt_tokens, kind="prompt")
+                    metrics.LLM_TOKENS.inc(usage.completion_tokens, kind="completion")
+                    metrics.LLM_TOKENS.inc(cached, kind="cached")
+                    metrics.LLM_SECONDS.observe(seconds, cache="hit" if cached else "miss")
+                    self.cache_stats.record(usage.prompt_tokens, cached, seconds)
+                    audit_logger.debug(f"提示缓存: {cached}/{usage.prompt_tokens} 输入 token 命中 | 耗时 {seconds * 1000:.0f}ms")
+                result = json.loads(response.choices[0].message.content)
+                llm_span["action"] = result.get("action")
+            metrics.LLM_CALLS.inc(error_type="none")
             audit_logger.info(f"模型思考结果: {result.get('thought', '无')[:100]}...")
             
             # 验证返回结果包含必要字段
@@ -111,53 +241,33 @@ class Brain:
                 audit_logger.warning("模型返回结果缺少关键字段，可能格式不正确")
             
             return result
-            
-        except RateLimitError as e:
+        
+        except openai.RateLimitError as e:
             audit_logger.error(f"API调用超出限额: {e}")
-            return {
-                "action": "error",
-                "reason": "API调用频率超限，请稍后重试",
-                "error_type": "rate_limit"
-            }
-        except APIConnectionError as e:
+            return self._error_result("API调用频率超限，请稍后重试", "rate_limit")
+        except openai.APIConnectionError as e:
             audit_logger.error(f"API连接失败: {e}")
-            return {
-                "action": "error",
-                "reason": "无法连接到API服务器，请检查网络",
-                "error_type": "connection"
-            }
-        except APIError as e:
+            return self._error_result("无法连接到API服务器，请检查网络", "connection")
+        except openai.APIError as e:
             audit_logger.error(f"API错误: {e}")
-            return {
-                "action": "error",
-                "reason": f"API调用错误: {str(e)}",
-                "error_type": "api"
-            }
+            return self._error_result(f"API调用错误: {str(e)}", "api")
         except json.JSONDecodeError as e:
             audit_logger.error(f"JSON解析失败: {e}")
-            return {
-                "action": "error",
-                "reason": "模型返回了无效的JSON格式",
-                "error_type": "json"
-            }
+            return self._error_result("模型返回了无效的JSON格式", "json")
         except Exception as e:
             audit_logger.critical(f"未预期的错误: {e}")
-            return {
-                "action": "error",
-                "reason": f"未知错误: {str(e)}",
-                "error_type": "unknown"
-            }
+            return self._error_result(f"未知错误: {str(e)}", "unknown")
 
 class Prompts:
     """
     临床定制化 Prompt 集
+    
+    每个提示词都由固定前缀（类属性，进程内只构造一次）加动态内容组成，动态内容（任务状态、分块坐标）
+    一律追加在末尾，服务端的提示缓存可以跨请求复用系统消息与固定前缀。
+    修改任何固定前缀文本时需同时递增 PROMPT_VERSION。
     """
-    @staticmethod
-    def extraction():
-        """
-        场景：医疗化验单结构化数据提取
-        """
-        return """
+    
+    EXTRACTION = """
         # 任务
         你是一个临床检验数据分析专家。请从覆盖了红色视觉网格的化验单截图中提取指标。
         
@@ -169,6 +279,7 @@ class Prompts:
         
         # 约束条件
         - 必须交叉核对指标名称及其对应的数值，防止行列错位。
+        - metric 与 unit 按化验单原文填写，无需统一名称或换算单位（由本地术语表完成）。
         - 仅提取数值。
         - 如果数值后带有 H/L (高/低) 标志，请忽略标志，只保留数值。
         - 若截图模糊，请在 confidence 字段中如实说明。
@@ -180,6 +291,7 @@ class Prompts:
                 {
                     "metric": "WBC",
                     "value": "7.2",
+                    "unit": "10^9/L",
                     "confidence": 0.98,
                     "target_field_hint": "白细胞"
                 }
@@ -188,15 +300,16 @@ class Prompts:
         }
         """
     
-    @staticmethod
-    def operation(task_state):
-        """
-        场景：基于视觉网格的 UI 自动化录入
+    TILE_EXTRACTION = EXTRACTION + """
+        # 分块说明
+        - 本图是整屏截图中的一个分块（位置见末尾“当前分块”），网格标签按整屏统一编号。
+        - 指标可能被分块边缘截断；只提取名称与数值都完整可见的指标。
+        - 每项 finding 增加 "coordinate": [x, y]，为该数值在本分块图像内的像素坐标（左上角为 [0, 0]）。
         """
-        return f"""
+    
+    OPERATION = """
         # 任务背景
-        你正在操作医院电子病历系统 (EMR)。
-        待录入数据内容: {task_state}
+        你正在操作医院电子病历系统 (EMR)，待录入数据见末尾“当前任务”。
         
         # 视觉环境
         屏幕上已叠加 [Set-of-Mark] 红色网格。每个交叉点附近都有标签（如 A1, B2）。
@@ -206,19 +319,50 @@ class Prompts:
         2. 锁定该输入框在网格中的坐标。
         3. 动作序列：
            - 'click': 点击输入框使其获得焦点。
-           - 'type': 输入对应数值。
+           - 'type': 输入对应数值。同一屏幕上可见多个待录入输入框时，可在一次 'type' 中用 fields
+             按录入顺序列出 [{"coordinate": [x, y], "text": "数值"}, ...]，系统逐个输入并在本地确认。
            - 'finish': 所有数据录入完毕后调用。
+        4. 当前任务中标注为"已在本地确认录入"的数值无需再次核对；标注为"请核对"的输入框需先确认再继续。
         
         # 安全禁令
         - 严禁点击“删除”、“重置”或“处方发送”等危险按钮，除非任务明确要求。
         - 若屏幕弹出任何异常警告（如‘病人ID不匹配’），请立即停止并报告。
         
         # 输出格式 (JSON)
-        {{
+        {
             "thought": "我发现 WBC 输入框位于网格 C5 区域，准备点击...",
             "action": "click" | "type" | "finish",
             "coordinate": [x, y],
             "text": "打字内容",
+            "fields": [{"coordinate": [x, y], "text": "打字内容"}],
             "reasoning": "为什么执行此操作"
-        }}
+        }
+        """
+    
+    @staticmethod
+    def extraction():
+        """
+        场景：医疗化验单结构化数据提取
+        """
+        return Prompts.EXTRACTION
+    
+    @staticmethod
+    def tile_extraction(box):
+        """
+        场景：高分辨率整屏分块提取（在 extraction 基础上要求给出分块内坐标）
+        """
+        x1, y1, x2, y2 = box
+        return Prompts.TILE_EXTRACTION + f"""
+        # 当前分块
+        x={x1}~{x2}、y={y1}~{y2}
+        """
+    
+    @staticmethod
+    def operation(task_state):
+        """
+        场景：基于视觉网格的 UI 自动化录入
+        """
+        return Prompts.OPERATION + f"""
+        # 当前任务
+        待录入数据内容: {task_state}
         """
@@ -0,0 +1,103 @@
+import time
+import threading
+from typing import Dict, Any, Optional
+from PIL import Image
+from medipilot.cognition.engine import Brain
+from medipilot.utils.logger import audit_logger
+from configs.settings import config
+
+class RateLimiter:
+    """
+    令牌桶限速器（线程安全）
+    
+    Attributes:
+        rate_per_minute: 每分钟允许的请求数
+        burst: 令牌桶容量（允许的瞬时突发请求数）
+    """
+    
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None) -> None:
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute 必须大于 0，当前值: {rate_per_minute}")
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst or max(1, int(rate_per_minute // 60) or 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate_per_minute / 60.0
+        )
+        self._updated = now
+    
+    def acquire(self) -> float:
+        """
+        获取一个令牌，必要时阻塞等待
+        
+        Returns:
+            float: 实际等待时间（秒）
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) * 60.0 / self.rate_per_minute
+            time.sleep(delay)
+            waited += delay
+
+class CognitionPool:
+    """
+    共享认知池：多个会话共用一个 Brain，统一限制并发数与请求速率
+    
+    对外暴露与 Brain 相同的 `call_vision` 接口，可直接替换 Brain 传给流水线。
+    
+    Attributes:
+        brain: 共享的认知引擎（OpenAI 客户端线程安全）
+        max_concurrency: 同时进行的模型请求上限
+        limiter: 请求速率限制器
+    """
+    
+    def __init__(
+        self,
+        brain: Brain,
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[float] = None
+    ) -> None:
+        self.brain = brain
+        self.max_concurrency = max_concurrency or config.COGNITION_MAX_CONCURRENCY
+        self.limiter = RateLimiter(requests_per_minute or config.COGNITION_RPM)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, float] = {"calls": 0, "errors": 0, "queued_seconds": 0.0}
+        audit_logger.info(
+            f"共享认知池已启动 | 并发上限: {self.max_concurrency} | "
+            f"速率上限: {self.limiter.rate_per_minute}/分钟"
+        )
+    
+    def call_vision(self, image: Image.Image, prompt: str) -> Dict[str, Any]:
+        """
+        在并发与速率限制下调用视觉大模型
+        
+        Args:
+            image: 经过脱敏和 SoM 处理的截图
+            prompt: 提示词
+        
+        Returns:
+            dict: 模型生成的 JSON 结果（错误时为 action=error 的结果）
+        """
+        start = time.monotonic()
+        with self._slots:
+            self.limiter.acquire()
+            queued = time.monotonic() - start
+            result = self.brain.call_vision(image, prompt)
+        
+        with self._stats_lock:
+            self.stats["calls"] += 1
+            self.stats["queued_seconds"] += queued
+            if result.get("action") == "error":
+                self.stats["errors"] += 1
+        return result
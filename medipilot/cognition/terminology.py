@@ -0,0 +1,395 @@
+"""
+临床检验术语规范化
+
+化验单上同一指标的写法五花八门（"Hgb" / "HGB" / "Hb" / "血红蛋白" / "ＨＧＢ" / "血红蛋白(HGB)"），
+单位也不统一（g/dL 与 g/L、10^3/uL 与 10^9/L）。本模块在本地完成名称与单位的统一，不再依赖模型:
+- 启动时把所有别名折叠（全角转半角、大小写折叠、去除空白与分隔符）后编入索引，精确匹配为一次字典查找；
+- 未命中时在长度相近的别名中做有界编辑距离的模糊匹配：允许的距离随别名长度缩放（不超过 15%），
+  中文名称只与开头两个字相同的别名比较（"嗜酸性" 与 "中性" 只差几个字，却是不同的指标），
+  多个指标同样接近时视为无法判断；模糊结果只用于展示与标记，合并去重只认精确匹配；
+- 单位换算按 (指标, 单位) 预先编成系数表，一批 findings 一次换算到标准单位并对照参考范围标记 H / L / N。
+
+参考范围为成人通用范围，仅用于提示，不替代化验单自身的参考范围。
+可通过 TERMINOLOGY_PATH 指向 JSON 文件补充或覆盖术语，格式与 `Term` 的参数一致:
+    [{"code": "CRP", "name": "C反应蛋白", "unit": "mg/L", "high": 10, "aliases": ["C-reactive protein"]}]
+"""
+import re
+import json
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import metrics
+from configs.settings import config
+
+class TerminologyError(Exception):
+    """术语表加载异常"""
+    pass
+
+# 折叠时去除的空白与分隔符（% 与 # 区分百分比与绝对值，必须保留）
+_SEPARATORS = re.compile(r"[\s\-_.:：·,，/\\]+")
+_PARENS = re.compile(r"^(.*?)[(\[（【](.*?)[)\]）】]\s*$")
+_FLAG_PATTERN = re.compile(r"\s*(?:[HL]|↑|↓|\*)\s*$", re.IGNORECASE)
+_CJK = re.compile(r"[\u3400-\u9fff]")
+
+def fold(text: str) -> str:
+    """名称折叠：NFKC（全角转半角）+ 大小写折叠 + 去除空白与分隔符"""
+    return _SEPARATORS.sub("", unicodedata.normalize("NFKC", text).casefold())
+
+def fold_unit(unit: str) -> str:
+    """
+    单位折叠：NFKC + 大小写折叠 + 去除空白，并统一幂次写法
+    
+    "×10⁹/L"、"x10^9/l"、"10*9/L"、"10E9/L" 均折叠为 "10^9/l"；"µmol/L" 与 "umol/L" 折叠为 "umol/l"
+    """
+    text = unicodedata.normalize("NFKC", unit).casefold().replace(" ", "")
+    text = text.replace("μ", "u").replace("×", "x")
+    text = re.sub(r"^x(?=10)", "", text)
+    return re.sub(r"^10(?:\*|e|\^|\*\*)?(\d+)(?=/)", r"10^\1", text)
+
+def parse_value(value: Any) -> Optional[float]:
+    """解析数值，去除末尾的 H/L/↑/↓/* 标志，无法解析时返回 None"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    text = _FLAG_PATTERN.sub("", unicodedata.normalize("NFKC", value).strip())
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+# 与指标无关的单位换算系数 (源单位 -> 标准单位)
+_COMMON_FACTORS: Dict[Tuple[str, str], float] = {
+    ("10^3/ul", "10^9/L"): 1.0,
+    ("k/ul", "10^9/L"): 1.0,
+    ("/ul", "10^9/L"): 1e-3,
+    ("/nl", "10^9/L"): 1.0,
+    ("10^6/ul", "10^12/L"): 1.0,
+    ("m/ul", "10^12/L"): 1.0,
+    ("/pl", "10^12/L"): 1.0,
+    ("g/dl", "g/L"): 10.0,
+    ("mg/dl", "g/L"): 0.01,
+    ("mg/dl", "mg/L"): 10.0,
+    ("l/l", "%"): 100.0,
+    ("um^3", "fL"): 1.0,
+    ("iu/l", "U/L"): 1.0,
+    ("meq/l", "mmol/L"): 1.0,
+}
+
+class Term:
+    """
+    一个检验指标
+    
+    Attributes:
+        code: 标准代码（如 HGB）
+        name: 中文标准名称
+        unit: 标准单位
+        low: 参考范围下限（标准单位），None 表示无下限
+        high: 参考范围上限（标准单位），None 表示无上限
+        aliases: 别名（中英文、缩写），代码与中文名称自动作为别名
+        factors: 该指标特有的单位换算系数 {源单位: 系数}，如血糖 mg/dL -> mmol/L
+    """
+    
+    def __init__(
+        self,
+        code: str,
+        name: str,
+        unit: str,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+        aliases: Sequence[str] = (),
+        factors: Optional[Dict[str, float]] = None
+    ) -> None:
+        self.code = code
+        self.name = name
+        self.unit = unit
+        self.low = low
+        self.high = high
+        self.aliases = tuple(aliases)
+        self.factors = dict(factors or {})
+    
+    def flag(self, value: float) -> str:
+        """对照参考范围：H 偏高 / L 偏低 / N 正常"""
+        if self.high is not None and value > self.high:
+            return "H"
+        if self.low is not None and value < self.low:
+            return "L"
+        return "N"
+
+BUILTIN_TERMS: Tuple[Term, ...] = (
+    # 血常规
+    Term("WBC", "白细胞计数", "10^9/L", 3.5, 9.5,
+         ["白细胞", "白细胞数", "white blood cell", "white blood cell count", "leukocyte", "leukocytes", "WBC count"]),
+    Term("RBC", "红细胞计数", "10^12/L", 3.8, 5.8,
+         ["红细胞", "红细胞数", "red blood cell", "red blood cell count", "erythrocyte", "erythrocytes", "RBC count"]),
+    Term("HGB", "血红蛋白", "g/L", 115, 175,
+         ["Hb", "Hgb", "血红蛋白浓度", "血色素", "hemoglobin", "haemoglobin"],
+         {"mmol/l": 16.11}),
+    Term("PLT", "血小板计数", "10^9/L", 125, 350,
+         ["血小板", "血小板数", "platelet", "platelets", "platelet count", "PLT count"]),
+    Term("HCT", "红细胞压积", "%", 35, 50,
+         ["红细胞比容", "红细胞比积", "PCV", "hematocrit", "haematocrit"]),
+    Term("MCV", "平均红细胞体积", "fL", 82, 100,
+         ["红细胞平均体积", "mean corpuscular volume"]),
+    Term("MCH", "平均红细胞血红蛋白含量", "pg", 27, 34,
+         ["平均血红蛋白含量", "红细胞平均血红蛋白量", "mean corpuscular hemoglobin"]),
+    Term("MCHC", "平均红细胞血红蛋白浓度", "g/L", 316, 354,
+         ["平均血红蛋白浓度", "红细胞平均血红蛋白浓度", "mean corpuscular hemoglobin concentration"]),
+    Term("NEUT%", "中性粒细胞百分比", "%", 40, 75,
+         ["中性粒细胞比率", "中性粒细胞比例", "中性粒细胞%", "NE%", "NEU%", "GRAN%", "neutrophil%", "neutrophils%"]),
+    Term("NEUT#", "中性粒细胞绝对值", "10^9/L", 1.8, 6.3,
+         ["中性粒细胞计数", "中性粒细胞数", "中性粒细胞#", "NE#", "NEU#", "GRAN#", "neutrophil#", "neutrophils#"]),
+    Term("LYMPH%", "淋巴细胞百分比", "%", 20, 50,
+         ["淋巴细胞比率", "淋巴细胞比例", "淋巴细胞%", "LY%", "LYM%", "lymphocyte%", "lymphocytes%"]),
+    Term("LYMPH#", "淋巴细胞绝对值", "10^9/L", 1.1, 3.2,
+         ["淋巴细胞计数", "淋巴细胞数", "淋巴细胞#", "LY#", "LYM#", "lymphocyte#", "lymphocytes#"]),
+    Term("MONO%", "单核细胞百分比", "%", 3, 10,
+         ["单核细胞比率", "单核细胞比例", "单核细胞%", "MO%", "MON%", "monocyte%", "monocytes%"]),
+    Term("MONO#", "单核细胞绝对值", "10^9/L", 0.1, 0.6,
+         ["单核细胞计数", "单核细胞数", "单核细胞#", "MO#", "MON#", "monocyte#", "monocytes#"]),
+    Term("EO%", "嗜酸性粒细胞百分比", "%", 0.4, 8.0,
+         ["嗜酸性粒细胞比率", "嗜酸性粒细胞比例", "嗜酸性粒细胞%", "嗜酸细胞%", "EOS%", "eosinophil%", "eosinophils%"]),
+    Term("EO#", "嗜酸性粒细胞绝对值", "10^9/L", 0.02, 0.52,
+         ["嗜酸性粒细胞计数", "嗜酸性粒细胞数", "嗜酸性粒细胞#", "嗜酸细胞#", "EOS#", "eosinophil#", "eosinophils#"]),
+    Term("BASO%", "嗜碱性粒细胞百分比", "%", 0, 1,
+         ["嗜碱性粒细胞比率", "嗜碱性粒细胞比例", "嗜碱性粒细胞%", "嗜碱细胞%", "BA%", "BAS%", "basophil%", "basophils%"]),
+    Term("BASO#", "嗜碱性粒细胞绝对值", "10^9/L", 0, 0.06,
+         ["嗜碱性粒细胞计数", "嗜碱性粒细胞数", "嗜碱性粒细胞#", "嗜碱细胞#", "BA#", "BAS#", "basophil#", "basophils#"]),
+    # 生化
+    Term("GLU", "葡萄糖", "mmol/L", 3.9, 6.1,
+         ["血糖", "空腹血糖", "血清葡萄糖", "glucose", "FPG"],
+         {"mg/dl": 0.0555}),
+    Term("CREA", "肌酐", "umol/L", 57, 111,
+         ["血肌酐", "血清肌酐", "Cr", "Scr", "creatinine"],
+         {"mg/dl": 88.4}),
+    Term("UREA", "尿素", "mmol/L", 3.1, 8.0,
+         ["尿素氮", "血尿素氮", "BUN", "urea nitrogen"],
+         {"mg/dl": 0.357}),
+    Term("ALT", "丙氨酸氨基转移酶", "U/L", 9, 50,
+         ["谷丙转氨酶", "GPT", "SGPT", "alanine aminotransferase"]),
+    Term("AST", "天门冬氨酸氨基转移酶", "U/L", 15, 40,
+         ["天冬氨酸氨基转移酶", "谷草转氨酶", "GOT", "SGOT", "aspartate aminotransferase"]),
+    Term("K", "钾", "mmol/L", 3.5, 5.3,
+         ["血钾", "血清钾", "K+", "potassium"]),
+    Term("NA", "钠", "mmol/L", 137, 147,
+         ["血钠", "血清钠", "Na+", "sodium"]),
+)
+
+def load_terms(path: str) -> List[Term]:
+    """
+    从 JSON 文件加载补充术语
+    
+    Raises:
+        TerminologyError: 文件无法读取或格式错误时抛出
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        return [Term(**entry) for entry in entries]
+    except (OSError, ValueError, TypeError) as e:
+        raise TerminologyError(f"术语表加载失败 {path}: {e}")
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """有界编辑距离：超过 limit 时提前返回 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class Terminology:
+    """
+    预编译的术语索引（线程安全，模糊匹配结果带缓存）
+    
+    Attributes:
+        terms: 标准代码 -> 指标
+        max_distance: 模糊匹配允许的最大编辑距离，0 表示只做精确匹配
+    """
+    
+    # 折叠后短于该长度的名称（K、Na、Hb 等）只做精确匹配，避免误配
+    MIN_FUZZY_LENGTH = 4
+    # 编辑距离不超过别名长度的该比例（拉丁字母名称）
+    FUZZY_RATIO = 0.15
+    # 中文名称的区分信息集中在开头（"中性" / "嗜酸性" / "嗜碱性" / "单核"），模糊匹配要求开头这几个字相同
+    CJK_HEAD = 2
+    
+    def __init__(self, terms: Iterable[Term] = BUILTIN_TERMS, max_distance: Optional[int] = None) -> None:
+        self.max_distance = config.TERMINOLOGY_MAX_DISTANCE if max_distance is None else max_distance
+        self.terms: Dict[str, Term] = {}
+        for term in terms:
+            current = self.terms.get(term.code)
+            if current is not None:
+                # 同一代码的补充条目覆盖名称与参考范围，合并别名与换算系数
+                term = Term(
+                    term.code, term.name, term.unit, term.low, term.high,
+                    current.aliases + term.aliases, {**current.factors, **term.factors}
+                )
+            self.terms[term.code] = term
+        
+        self._index: Dict[str, str] = {}
+        self._factors: Dict[Tuple[str, str], float] = {}
+        for term in self.terms.values():
+            for alias in (term.code, term.name, *term.aliases):
+                self._index[fold(alias)] = term.code
+            self._factors[(term.code, fold_unit(term.unit))] = 1.0
+            for (source, target), factor in _COMMON_FACTORS.items():
+                if target == term.unit:
+                    self._factors[(term.code, source)] = factor
+            for source, factor in term.factors.items():
+                self._factors[(term.code, fold_unit(source))] = factor
+        # 按长度分桶，模糊匹配只比较长度相近的别名
+        self._by_length: Dict[int, List[str]] = {}
+        for alias in self._index:
+            self._by_length.setdefault(len(alias), []).append(alias)
+        self._fuzzy_cache: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+    
+    def _limit(self, key: str, alias: str) -> int:
+        """与某个别名比较时允许的编辑距离，0 表示不参与模糊匹配"""
+        if _CJK.search(key) or _CJK.search(alias):
+            # 一个汉字即一个语素，只容许开头相同的别名中一个字的差异（OCR 错字）
+            return min(self.max_distance, 1) if key[:self.CJK_HEAD] == alias[:self.CJK_HEAD] else 0
+        return min(self.max_distance, int(len(alias) * self.FUZZY_RATIO))
+    
+    def _fuzzy(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._fuzzy_cache:
+                return self._fuzzy_cache[key]
+        best, codes = self.max_distance + 1, set()
+        for length in range(len(key) - self.max_distance, len(key) + self.max_distance + 1):
+            for alias in self._by_length.get(length, ()):
+                limit = self._limit(key, alias)
+                if limit < 1:
+                    continue
+                distance = _edit_distance(key, alias, limit)
+                if distance > limit:
+                    continue
+                if distance < best:
+                    best, codes = distance, {self._index[alias]}
+                elif distance == best:
+                    codes.add(self._index[alias])
+        code = next(iter(codes)) if len(codes) == 1 else None
+        with self._lock:
+            if len(self._fuzzy_cache) >= 4096:
+                self._fuzzy_cache.clear()
+            self._fuzzy_cache[key] = code
+        return code
+    
+    def lookup(self, metric: str, fuzzy: bool = True) -> Tuple[Optional[Term], str]:
+        """
+        查找指标
+        
+        依次尝试：整体精确匹配 -> 括号内/外部分精确匹配（"血红蛋白(HGB)"）-> 有界模糊匹配
+        
+        Args:
+            metric: 化验单上的指标名称
+            fuzzy: 精确匹配失败时是否尝试模糊匹配
+        
+        Returns:
+            Tuple[Optional[Term], str]: (指标, 匹配方式 exact / fuzzy / unknown)
+        """
+        text = unicodedata.normalize("NFKC", str(metric)).strip()
+        candidates = [text]
+        parts = _PARENS.match(text)
+        if parts:
+            candidates.extend(part for part in parts.groups() if part.strip())
+        keys = [fold(candidate) for candidate in candidates]
+        
+        for key in keys:
+            code = self._index.get(key)
+            if code is not None:
+                return self.terms[code], "exact"
+        if fuzzy and self.max_distance > 0:
+            for key in keys:
+                if len(key) >= self.MIN_FUZZY_LENGTH:
+                    code = self._fuzzy(key)
+                    if code is not None:
+                        return self.terms[code], "fuzzy"
+        return None, "unknown"
+    
+    def metric_key(self, metric: Any) -> str:
+        """
+        合并去重用的指标键：精确识别的指标为标准代码（"Hgb" 与 "血红蛋白" 相同），否则为折叠后的原始名称
+        
+        只认精确匹配：模糊匹配是推测，不能据此把两条不同名称的 finding 合并为一条。
+        """
+        term, _ = self.lookup(metric, fuzzy=False)
+        return fold(str(metric)) if term is None else term.code
+    
+    def factor(self, term: Term, unit: Optional[str]) -> Optional[float]:
+        """
+        单位换算系数（源单位 -> 标准单位），无法换算时返回 None
+        
+        未给出单位时同样返回 None：数值的量级无法判断（13.5 可能是 g/dL），不能按标准单位对照参考范围。
+        """
+        if not unit or not str(unit).strip():
+            return None
+        return self._factors.get((term.code, fold_unit(str(unit))))
+    
+    def normalize(self, findings: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量规范化 findings（不修改原始字段）
+        
+        每条结果在原字段基础上追加:
+            code / name: 标准代码与中文名称，未识别时为 None
+            match: exact / fuzzy / unknown
+            std_value / std_unit: 换算到标准单位后的数值与标准单位；数值无法解析、未给出单位或无法换算时 std_value 为 None
+            flag: 对照参考范围的 H / L / N，无法判断时为 None
+            reference_range: [下限, 上限]（标准单位）
+        
+        Args:
+            findings: 模型返回（或已初步规范化）的 findings
+        
+        Returns:
+            List[dict]: 规范化后的 findings，顺序与输入一致
+        """
+        resolved = [self.lookup(finding.get("metric", "")) for finding in findings]
+        factors = [
+            None if term is None else self.factor(term, finding.get("unit"))
+            for finding, (term, _) in zip(findings, resolved)
+        ]
+        values = [parse_value(finding.get("value")) for finding in findings]
+        
+        normalized = []
+        for finding, (term, match), factor, value in zip(findings, resolved, factors, values):
+            metrics.TERMS.inc(match=match)
+            row = dict(finding)
+            row.update({"code": None, "name": None, "match": match, "std_value": None,
+                        "std_unit": None, "flag": None, "reference_range": None})
+            if term is not None:
+                row.update({"code": term.code, "name": term.name, "std_unit": term.unit,
+                            "reference_range": [term.low, term.high]})
+                if factor is None:
+                    audit_logger.debug(f"无法换算单位: {term.code} {finding.get('unit') or '（未给出单位）'}")
+                elif value is not None:
+                    row["std_value"] = round(value * factor, 6)
+                    row["flag"] = term.flag(row["std_value"])
+            normalized.append(row)
+        return normalized
+
+_default: Optional[Terminology] = None
+_default_lock = threading.Lock()
+
+def default_terminology() -> Terminology:
+    """
+    按配置创建全局术语索引（内置术语 + TERMINOLOGY_PATH 中的补充术语）
+    
+    Raises:
+        TerminologyError: 补充术语表加载失败时抛出
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            terms: List[Term] = list(BUILTIN_TERMS)
+            if config.TERMINOLOGY_PATH:
+                terms.extend(load_terms(config.TERMINOLOGY_PATH))
+            _default = Terminology(terms)
+            audit_logger.debug(f"术语索引已编译 | 指标: {len(_default.terms)} | 别名: {len(_default._index)}")
+        return _default
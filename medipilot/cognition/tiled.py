@@ -0,0 +1,144 @@
+"""
+分块视觉提取：并发发送分块、合并回整屏坐标
+
+与 `report.extract_report`（滚动长图纵向分块、逐块串行调用）不同，这里面向单帧高分辨率整屏：
+需要发送的分块并发调用认知层（传入 CognitionPool 时受其并发与速率限制），
+未变化的分块复用上次的提取结果，最后将各分块的 findings 换算到整屏坐标并去除重叠区域的重复项。
+"""
+import math
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from PIL import Image
+from configs.settings import config
+from medipilot.cognition.engine import Prompts
+from medipilot.cognition.terminology import default_terminology
+from medipilot.perception.buffers import release
+from medipilot.perception.tiles import Box, Tile, Tiler
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import metrics
+
+def _metric_key(finding: Dict[str, Any]) -> str:
+    return default_terminology().metric_key(finding.get("metric", ""))
+
+def merge_tile_findings(findings: List[Dict[str, Any]], distance: float) -> List[Dict[str, Any]]:
+    """
+    合并各分块的 findings：重叠区域内被多个分块读到的同一项只保留置信度最高的一条
+    
+    来自不同分块的同名指标，整屏坐标相距不超过 distance 时视为同一项，缺少坐标时按数值判断；
+    同一分块内的同名指标（如同屏的两次化验结果）以及位置相距较远的同名指标都会保留。
+    
+    Args:
+        findings: 已换算为整屏坐标、带有来源分块 (tile) 的指标列表
+        distance: 判定为同一项的最大坐标距离（像素），通常取一个网格的大小
+    
+    Returns:
+        List[dict]: 去重后的指标列表（保持首次出现的顺序）
+    """
+    merged: List[Dict[str, Any]] = []
+    for finding in findings:
+        key = _metric_key(finding)
+        if not key:
+            continue
+        coordinate = finding.get("coordinate")
+        for index, current in enumerate(merged):
+            if _metric_key(current) != key or current.get("tile") == finding.get("tile"):
+                continue
+            other = current.get("coordinate")
+            if coordinate and other:
+                duplicate = math.dist(coordinate, other) <= distance
+            else:
+                duplicate = str(finding.get("value")).strip() == str(current.get("value")).strip()
+            if duplicate:
+                if (finding.get("confidence") or 0) > (current.get("confidence") or 0):
+                    merged[index] = finding
+                break
+        else:
+            merged.append(finding)
+    return merged
+
+class TiledVision:
+    """
+    分块视觉提取器
+    
+    Attributes:
+        brain: 认知层（Brain 或 CognitionPool，需提供 call_vision）
+        tiler: 整帧分块器
+        max_concurrency: 同时进行的分块请求数上限
+    """
+    
+    def __init__(self, brain: Any, tiler: Tiler, max_concurrency: Optional[int] = None) -> None:
+        self.brain = brain
+        self.tiler = tiler
+        self.max_concurrency = max_concurrency or config.COGNITION_MAX_CONCURRENCY
+        self._results: Dict[Box, List[Dict[str, Any]]] = {}
+    
+    def _call(self, tile: Tile) -> Dict[str, Any]:
+        result = self.brain.call_vision(tile.image, Prompts.tile_extraction(tile.box))
+        if result.get("action") == "error":
+            return result
+        findings = []
+        for finding in result.get("findings") or []:
+            finding = dict(finding, tile=list(tile.box))
+            coordinate = finding.pop("coordinate", None)
+            # 模型给出的坐标不在分块内时视为无效，只按数值去重
+            if isinstance(coordinate, (list, tuple)) and len(coordinate) == 2 and tile.contains(coordinate):
+                finding["coordinate"] = tile.to_global(coordinate)
+            findings.append(finding)
+        return {"findings": findings, "scan_quality": result.get("scan_quality")}
+    
+    def extract(self, image: Image.Image) -> Dict[str, Any]:
+        """
+        分块提取一帧整屏图像中的指标
+        
+        Args:
+            image: 已完成隐私脱敏、尚未叠加 SoM 的整帧
+        
+        Returns:
+            dict: {"findings": [...整屏坐标...], "tiles": {状态: 块数}, "errors": [...]}
+        """
+        tiles = self.tiler.split(image)
+        pending = [tile for tile in tiles if tile.status == "send"]
+        counts = {"send": 0, "blank": 0, "unchanged": 0}
+        for tile in tiles:
+            counts[tile.status] += 1
+            metrics.TILES.inc(status=tile.status)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pending)) or 1) as workers:
+                # 每个分块在调用方事件上下文的副本中运行，事件日志保留 session / iteration 等字段
+                futures = [
+                    workers.submit(contextvars.copy_context().run, self._call, tile) for tile in pending
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            release(*(tile.image for tile in pending))
+        
+        errors = []
+        for tile, result in zip(pending, results):
+            if result.get("action") == "error":
+                errors.append(dict(result, tile=list(tile.box)))
+                self.tiler.invalidate(tile.box)
+                self._results.pop(tile.box, None)
+            else:
+                self._results[tile.box] = result["findings"]
+        for tile in tiles:
+            if tile.status == "blank":
+                self._results.pop(tile.box, None)
+        
+        # 按分块顺序合并，未变化的分块复用上次结果
+        findings = [
+            finding for tile in tiles if tile.status != "blank"
+            for finding in self._results.get(tile.box, [])
+        ]
+        merged = merge_tile_findings(findings, distance=self.tiler.grid_size)
+        audit_logger.info(
+            f"分块提取完成 | 分块: {len(tiles)} (发送 {counts['send']}，空白 {counts['blank']}，"
+            f"未变化 {counts['unchanged']}) | 指标: {len(merged)} | 失败分块: {len(errors)}"
+        )
+        return {"findings": merged, "tiles": counts, "errors": errors}
+    
+    def reset(self) -> None:
+        """清空分块签名与缓存结果（如切换到另一位病人的页面）"""
+        self.tiler.invalidate()
+        self._results.clear()
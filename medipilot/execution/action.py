@@ -1,52 +1,389 @@
 import time
+import select
+import threading
 from typing import Dict, Any, List, Optional, Tuple
-import pyautogui
 from medipilot.utils.logger import audit_logger
+from medipilot.utils import metrics
+from medipilot.execution.verify import ActionVerifier, SKIPPED, VERIFIED
 from configs.settings import config
 
 class ExecutionError(Exception):
     """执行层异常"""
     pass
 
+class EmergencyStop(Exception):
+    """
+    紧急停止异常
+    
+    由鼠标甩至屏幕四角 (FAILSAFE) 或紧急停止热键触发。
+    刻意不继承 ExecutionError，确保主循环不会将其当作普通执行失败而继续运行。
+    """
+    pass
+
+class InputBackend:
+    """
+    输入后端接口
+    
+    执行层通过该接口驱动鼠标与键盘，具体实现负责动作节奏与紧急熔断检查。
+    所有动作在执行前都必须调用 `check_failsafe()`。
+    
+    Attributes:
+        name: 后端名称（与配置项 INPUT_BACKEND 对应）
+    """
+    
+    name: str = "base"
+    
+    def screen_size(self) -> Tuple[int, int]:
+        """返回屏幕尺寸 (width, height)"""
+        raise NotImplementedError
+    
+    def position(self) -> Tuple[int, int]:
+        """返回当前鼠标坐标 (x, y)"""
+        raise NotImplementedError
+    
+    def move_to(self, x: int, y: int) -> None:
+        """移动鼠标至指定坐标"""
+        raise NotImplementedError
+    
+    def click(self, x: Optional[int] = None, y: Optional[int] = None) -> None:
+        """在指定坐标（缺省为当前位置）单击左键"""
+        raise NotImplementedError
+    
+    def write(self, text: str) -> None:
+        """向当前焦点输入文本"""
+        raise NotImplementedError
+    
+    def scroll(self, amount: int) -> None:
+        """滚动滚轮，正数向上，负数向下"""
+        raise NotImplementedError
+    
+    def check_failsafe(self) -> None:
+        """
+        紧急熔断检查
+        
+        Raises:
+            EmergencyStop: 鼠标位于屏幕角落（FAILSAFE 启用时）
+        """
+        if not config.FAILSAFE:
+            return
+        x, y = self.position()
+        w, h = self.screen_size()
+        if (x, y) in ((0, 0), (0, h - 1), (w - 1, 0), (w - 1, h - 1)):
+            raise EmergencyStop(f"鼠标位于屏幕角落 ({x}, {y})，触发紧急熔断")
+    
+    def close(self) -> None:
+        """释放后端资源"""
+        pass
+
+class PyAutoGUIBackend(InputBackend):
+    """
+    基于 PyAutoGUI 的默认输入后端
+    
+    保留原有行为：PAUSE 动作限速、FAILSAFE 角落检测、0.5 秒平滑移动、0.1 秒打字间隔。
+    """
+    
+    name = "pyautogui"
+    
+    def __init__(self) -> None:
+        import pyautogui
+        self._pyautogui = pyautogui
+        pyautogui.PAUSE = config.PAUSE_INTERVAL
+        pyautogui.FAILSAFE = config.FAILSAFE
+    
+    def screen_size(self) -> Tuple[int, int]:
+        return tuple(self._pyautogui.size())
+    
+    def position(self) -> Tuple[int, int]:
+        return tuple(self._pyautogui.position())
+    
+    def check_failsafe(self) -> None:
+        # PyAutoGUI 在每次调用内部自行检查，这里将其异常统一转换为 EmergencyStop
+        pass
+    
+    def _call(self, func, *args, **kwargs) -> None:
+        try:
+            func(*args, **kwargs)
+        except self._pyautogui.FailSafeException as e:
+            raise EmergencyStop(f"PyAutoGUI 紧急熔断: {e}")
+    
+    def move_to(self, x: int, y: int) -> None:
+        # 临床环境建议平滑移动，避免突兀点击
+        self._call(self._pyautogui.moveTo, x, y, duration=0.5)
+    
+    def click(self, x: Optional[int] = None, y: Optional[int] = None) -> None:
+        self._call(self._pyautogui.click, x, y)
+    
+    def write(self, text: str) -> None:
+        # 模拟人类打字速度
+        self._call(self._pyautogui.write, text, interval=0.1)
+    
+    def scroll(self, amount: int) -> None:
+        self._call(self._pyautogui.scroll, amount)
+
+class XTestBackend(InputBackend):
+    """
+    基于 X11 XTEST 扩展的低延迟输入后端 (Linux)
+    
+    直接通过 python-xlib 注入输入事件，省去 PyAutoGUI 的 PAUSE 休眠与补间移动。
+    熔断语义保持一致：每个动作（以及每个字符）前检查鼠标是否位于屏幕角落；
+    另外监听紧急停止热键（默认 Pause 键），按下后所有后续动作立即抛出 EmergencyStop。
+    
+    Attributes:
+        display_name: X 显示名（如 ":99"），None 表示使用 $DISPLAY
+    """
+    
+    name = "xtest"
+    
+    # 无法直接通过 keysym 名称映射的常用字符
+    _SPECIAL_KEYSYMS = {"\n": "Return", "\t": "Tab", "\b": "BackSpace"}
+    
+    def __init__(self, display_name: Optional[str] = None) -> None:
+        try:
+            from Xlib import X, XK, display
+            from Xlib.ext import xtest
+        except ImportError as e:
+            raise ExecutionError(f"XTEST 后端需要 python-xlib: {e}")
+        
+        self._X = X
+        self._XK = XK
+        self._xtest = xtest
+        self.display_name = display_name
+        self._display = display.Display(display_name)
+        if not self._display.has_extension("XTEST"):
+            raise ExecutionError("X 服务器不支持 XTEST 扩展")
+        
+        screen = self._display.screen()
+        self._root = screen.root
+        self._size = (screen.width_in_pixels, screen.height_in_pixels)
+        self._stop_event = threading.Event()
+        self._closed = threading.Event()
+        self._hotkey_thread: Optional[threading.Thread] = None
+        if config.EMERGENCY_STOP_KEY:
+            self._start_hotkey_listener(display, config.EMERGENCY_STOP_KEY)
+    
+    def _start_hotkey_listener(self, display_module, key_name: str) -> None:
+        """在独立的 X 连接上抓取紧急停止热键"""
+        keysym = self._XK.string_to_keysym(key_name)
+        if not keysym:
+            audit_logger.warning(f"无法识别紧急停止热键 '{key_name}'，热键未启用")
+            return
+        
+        listener = display_module.Display(self.display_name)
+        keycode = listener.keysym_to_keycode(keysym)
+        root = listener.screen().root
+        root.grab_key(keycode, self._X.AnyModifier, True,
+                      self._X.GrabModeAsync, self._X.GrabModeAsync)
+        listener.sync()
+        
+        def _listen() -> None:
+            while not self._closed.is_set():
+                readable, _, _ = select.select([listener.fileno()], [], [], 0.2)
+                if not readable:
+                    continue
+                for _ in range(listener.pending_events()):
+                    event = listener.next_event()
+                    if event.type == self._X.KeyPress and event.detail == keycode:
+                        audit_logger.warning(f"🛑 检测到紧急停止热键 [{key_name}]")
+                        self._stop_event.set()
+            listener.close()
+        
+        self._hotkey_thread = threading.Thread(
+            target=_listen, name="EmergencyStopHotkey", daemon=True
+        )
+        self._hotkey_thread.start()
+        audit_logger.info(f"紧急停止热键已启用: [{key_name}]")
+    
+    def _pause(self) -> None:
+        if config.XTEST_PAUSE > 0:
+            time.sleep(config.XTEST_PAUSE)
+    
+    def screen_size(self) -> Tuple[int, int]:
+        return self._size
+    
+    def position(self) -> Tuple[int, int]:
+        pointer = self._root.query_pointer()
+        return pointer.root_x, pointer.root_y
+    
+    def check_failsafe(self) -> None:
+        if self._stop_event.is_set():
+            raise EmergencyStop("紧急停止热键已触发")
+        super().check_failsafe()
+    
+    def move_to(self, x: int, y: int) -> None:
+        self.check_failsafe()
+        self._xtest.fake_input(self._display, self._X.MotionNotify, x=int(x), y=int(y))
+        self._display.sync()
+        self._pause()
+    
+    def _button(self, button: int) -> None:
+        self._xtest.fake_input(self._display, self._X.ButtonPress, button)
+        self._xtest.fake_input(self._display, self._X.ButtonRelease, button)
+    
+    def click(self, x: Optional[int] = None, y: Optional[int] = None) -> None:
+        self.check_failsafe()
+        if x is not None and y is not None:
+            self._xtest.fake_input(self._display, self._X.MotionNotify, x=int(x), y=int(y))
+        self._button(1)
+        self._display.sync()
+        self._pause()
+    
+    def _keysym_for(self, char: str) -> int:
+        if char in self._SPECIAL_KEYSYMS:
+            return self._XK.string_to_keysym(self._SPECIAL_KEYSYMS[char])
+        code = ord(char)
+        # Latin-1 字符的 keysym 与码位一致，其余 Unicode 字符使用 0x01000000 偏移
+        return code if code < 0x100 else 0x01000000 | code
+    
+    def write(self, text: str) -> None:
+        shift = self._display.keysym_to_keycode(self._XK.XK_Shift_L)
+        for char in text:
+            self.check_failsafe()
+            keysym = self._keysym_for(char)
+            keycode = self._display.keysym_to_keycode(keysym)
+            if not keycode:
+                raise ExecutionError(f"当前键盘布局无法输入字符 '{char}'")
+            needs_shift = self._display.keycode_to_keysym(keycode, 0) != keysym
+            if needs_shift:
+                self._xtest.fake_input(self._display, self._X.KeyPress, shift)
+            self._xtest.fake_input(self._display, self._X.KeyPress, keycode)
+            self._xtest.fake_input(self._display, self._X.KeyRelease, keycode)
+            if needs_shift:
+                self._xtest.fake_input(self._display, self._X.KeyRelease, shift)
+            self._display.sync()
+        self._pause()
+    
+    def scroll(self, amount: int) -> None:
+        self.check_failsafe()
+        # 与 PyAutoGUI 在 X11 上的语义一致：每个单位对应一次滚轮点击
+        button = 4 if amount > 0 else 5
+        for _ in range(abs(int(amount))):
+            self._button(button)
+        self._display.sync()
+        self._pause()
+    
+    def close(self) -> None:
+        self._closed.set()
+        if self._hotkey_thread is not None:
+            self._hotkey_thread.join(timeout=1.0)
+        self._display.close()
+
+INPUT_BACKENDS = {
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    XTestBackend.name: XTestBackend,
+}
+
+def create_backend(name: Optional[str] = None, **kwargs: Any) -> InputBackend:
+    """
+    按名称创建输入后端
+    
+    Args:
+        name: 后端名称，默认使用配置中的 INPUT_BACKEND
+        **kwargs: 透传给后端构造函数的参数（如 XTEST 的 display_name）
+    
+    Returns:
+        InputBackend: 输入后端实例
+    
+    Raises:
+        ExecutionError: 后端名称未知时抛出
+    """
+    name = (name or config.INPUT_BACKEND).lower()
+    if name not in INPUT_BACKENDS:
+        raise ExecutionError(
+            f"未知的输入后端: '{name}'。可选值: {', '.join(INPUT_BACKENDS)}"
+        )
+    return INPUT_BACKENDS[name](**kwargs)
+
 class Executor:
     """
     执行层：负责 GUI 操作
     包含安全限速和临床复核逻辑提示。
     
     Attributes:
-        screen_size: 屏幕尺寸 (width, height)
+        backend: 输入后端 (PyAutoGUI / XTEST)
+        screen_size: 目标屏幕尺寸 (width, height)，绑定显示器后为该显示器的尺寸
+        origin: 目标显示器左上角的全局坐标，计划中的坐标加上该偏移后注入
+        last_succeeded: 最近一次 execute 的动作是否确认执行（无效坐标、缺少文本、执行出错时为 False）
+        verifier: 输入动作的本地校验器，None 表示不校验
+        last_typed: 最近一次 execute 实际输入的输入框 [{"coordinate", "text", "outcome", ...}]
     """
     
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        backend: Optional[InputBackend] = None,
+        monitor: Optional[Dict[str, int]] = None,
+        verifier: Optional[ActionVerifier] = None
+    ) -> None:
         """
         初始化执行器，配置安全参数
         
+        Args:
+            backend: 输入后端，默认按配置中的 INPUT_BACKEND 创建
+            monitor: 目标显示器几何信息（见 `Perception.monitor_geometry`），None 表示整个屏幕
+            verifier: 输入动作的本地校验器，None 表示不校验
+        
         Raises:
             ExecutionError: 初始化失败时抛出
         """
         try:
-            # 初始化 PyAutoGUI 安全设置
-            pyautogui.PAUSE = config.PAUSE_INTERVAL
-            pyautogui.FAILSAFE = config.FAILSAFE
+            self.backend = backend or create_backend()
             
             # 获取屏幕尺寸用于坐标验证
-            self.screen_size: Tuple[int, int] = pyautogui.size()
+            self.screen_size: Tuple[int, int] = self.backend.screen_size()
+            self.origin: Tuple[int, int] = (0, 0)
+            self.last_succeeded = False
+            self.verifier = verifier
+            self.last_typed: List[Dict[str, Any]] = []
+            if monitor is not None:
+                self.bind_monitor(monitor)
             
             audit_logger.info(
-                f"执行模块初始化完成 | 屏幕尺寸: {self.screen_size} | "
+                f"执行模块初始化完成 | 输入后端: {self.backend.name} | "
+                f"屏幕尺寸: {self.screen_size} | "
                 f"紧急熔断(FAILSAFE): {'启用' if config.FAILSAFE else '禁用'}"
             )
         except Exception as e:
             audit_logger.critical(f"执行模块初始化失败: {e}")
             raise ExecutionError(f"无法初始化GUI自动化: {e}")
     
+    def bind_monitor(self, monitor: Dict[str, int]) -> None:
+        """
+        绑定目标显示器
+        
+        模型看到的是该显示器的截图，计划中的坐标为显示器内的局部坐标：
+        按显示器尺寸校验，再加上显示器偏移换算为输入后端使用的全局坐标。
+        
+        Args:
+            monitor: {"left", "top", "width", "height"}
+        """
+        self.origin = (monitor["left"], monitor["top"])
+        self.screen_size = (monitor["width"], monitor["height"])
+        audit_logger.info(f"执行层绑定显示器 | 偏移: {self.origin} | 尺寸: {self.screen_size}")
+    
+    def _to_screen(self, x: int, y: int) -> Tuple[int, int]:
+        """显示器局部坐标 -> 全局坐标"""
+        return x + self.origin[0], y + self.origin[1]
+    
+    def warm_up(self) -> None:
+        """
+        预热：查询一次鼠标位置，提前建立输入通道并确认未处于紧急熔断位置
+        
+        Raises:
+            ExecutionError: 输入后端不可用时抛出
+            EmergencyStop: 鼠标位于屏幕角落（FAILSAFE 启用时）
+        """
+        try:
+            self.backend.position()
+        except Exception as e:
+            raise ExecutionError(f"输入后端不可用: {e}")
+        self.backend.check_failsafe()
+    
     def _validate_coordinate(self, coord: Optional[List[int]]) -> bool:
         """
         验证坐标的有效性
         
         Args:
             coord: 坐标列表 [x, y]
-            
+        
         Returns:
             bool: 坐标是否有效
         """
@@ -68,24 +405,26 @@ class Executor:
             return False
         
         return True
-
+    
     def execute(self, plan: Dict[str, Any]) -> bool:
         """
         根据认知层计划执行动作
         
         Args:
             plan: 模型生成的指令，包含 action, coordinate, text 等
-            
+        
         Returns:
             bool: 任务是否结束
-            
+        
         Raises:
-            pyautogui.FailSafeException: 用户触发紧急停止时抛出
+            EmergencyStop: 用户触发紧急停止（FAILSAFE 或热键）时抛出
         """
         action = plan.get("action", "unknown")
         coord = plan.get("coordinate")
         text = plan.get("text")
         reasoning = plan.get("reasoning", "未注明原因")
+        self.last_succeeded = False
+        self.last_typed = []
         
         # 处理错误状态
         if action == "error":
@@ -100,6 +439,7 @@ class Executor:
             return False
         
         audit_logger.info(f"执行动作: [{action.upper()}] | 理由: {reasoning}")
+        metrics.ACTIONS.inc(action=action)
         
         try:
             if action == "click":
@@ -107,43 +447,30 @@ class Executor:
                     audit_logger.error("点击动作坐标无效，跳过执行")
                     return False
                 
-                x, y = coord
-                # 临床环境建议平滑移动，避免突兀点击
-                pyautogui.moveTo(x, y, duration=0.5)
-                pyautogui.click()
+                x, y = self._to_screen(*coord)
+                self.backend.move_to(x, y)
+                self.backend.click()
                 audit_logger.info(f"✓ 点击坐标: ({x}, {y})")
-                
+            
             elif action == "type":
-                if not self._validate_coordinate(coord):
-                    audit_logger.error("输入动作坐标无效，跳过执行")
-                    return False
-                
-                if not text:
-                    audit_logger.warning("输入动作缺少文本内容")
+                fields = plan.get("fields")
+                if not isinstance(fields, list) or not fields:
+                    fields = [{"coordinate": coord, "text": text}]
+                if not self._type_fields(fields):
                     return False
-                
-                x, y = coord
-                # 先点击确保聚焦
-                pyautogui.click(x, y)
-                time.sleep(0.2)  # 等待输入框获得焦点
-                
-                # 模拟人类打字速度
-                text_str = str(text)
-                pyautogui.write(text_str, interval=0.1)
-                audit_logger.info(f"✓ 输入文本: '{text_str}' 于坐标 ({x}, {y})")
-                
+            
             elif action == "scroll":
                 # 支持滚动操作
                 amount = plan.get("amount", -500)
-                pyautogui.scroll(amount)
+                self.backend.scroll(amount)
                 audit_logger.info(f"✓ 滚动页面: {amount}")
-                
+            
             elif action == "wait":
                 # 支持等待操作
                 duration = plan.get("duration", 2)
                 audit_logger.info(f"等待 {duration} 秒...")
                 time.sleep(duration)
-                
+            
             elif action == "finish":
                 audit_logger.info("=" * 60)
                 audit_logger.info("✓ 任务执行完毕")
@@ -151,15 +478,94 @@ class Executor:
                 audit_logger.info("=" * 60)
                 # 在实际临床场景中，此处可弹出确认对话框
                 return True
-                
+            
             else:
                 audit_logger.warning(f"未知的动作类型: '{action}'，跳过执行")
-                
-        except pyautogui.FailSafeException:
+                return False
+            
+            self.last_succeeded = True
+        
+        except EmergencyStop:
             audit_logger.warning("🛑 用户触发紧急停止（FAILSAFE）")
             raise
         except Exception as e:
             audit_logger.error(f"执行动作时发生错误: {e}")
+            metrics.ACTION_ERRORS.inc(action=action)
             # 不抛出异常，而是继续执行
-            
+        
         return False
+    
+    def _type_fields(self, fields: List[Dict[str, Any]]) -> bool:
+        """
+        依次向一个或多个输入框输入文本
+        
+        每个输入框输入后做本地校验，未确认（failed / ambiguous / skipped）时停止，剩余输入框交由认知层重新规划；
+        未配置校验器或校验出错时只输入第一个输入框，不在无法确认的情况下连续盲输。
+        
+        Returns:
+            bool: 是否至少输入了一个输入框
+        """
+        for field in fields:
+            coord = field.get("coordinate") if isinstance(field, dict) else None
+            text = field.get("text") if isinstance(field, dict) else None
+            if not self._validate_coordinate(coord):
+                audit_logger.error("输入动作坐标无效，跳过执行")
+                break
+            if not text:
+                audit_logger.warning("输入动作缺少文本内容")
+                break
+            
+            x, y = self._to_screen(*coord)
+            # 先点击确保聚焦
+            self.backend.click(x, y)
+            time.sleep(0.2)  # 等待输入框获得焦点
+            
+            # 基准截图在点击之后：焦点框、高亮等点击引起的变化不能算作输入生效
+            box = before = None
+            if self.verifier is not None:
+                try:
+                    box = self.verifier.box(x, y, (*self.origin, *self.screen_size))
+                    before = self.verifier.snapshot(box)
+                except Exception as e:
+                    audit_logger.warning(f"校验区域截图失败，本次输入不做本地校验: {e}")
+            
+            text_str = str(text)
+            self.backend.write(text_str)
+            audit_logger.info(f"✓ 输入文本: '{text_str}' 于坐标 ({x}, {y})")
+            
+            entry: Dict[str, Any] = {"coordinate": list(coord), "text": text_str, "outcome": SKIPPED}
+            if before is not None:
+                try:
+                    entry.update(self.verifier.check(before, box, text_str))
+                except Exception as e:
+                    audit_logger.warning(f"本地校验失败，交由模型核对: {e}")
+            self.last_typed.append(entry)
+            # 未在本地确认（包括未配置校验器、截图或校验出错）时不再继续盲输
+            if entry["outcome"] != VERIFIED:
+                break
+        
+        remaining = len(fields) - len(self.last_typed)
+        if self.last_typed and remaining:
+            audit_logger.info(f"连续输入在第 {len(self.last_typed)} 个输入框后停止，剩余 {remaining} 个交由模型重新规划")
+        return bool(self.last_typed)
+    
+    def scroll_at(self, x: int, y: int, amount: int) -> None:
+        """
+        将鼠标移至指定区域后滚动（滚轮事件作用于指针下方的窗口）
+        
+        Args:
+            x: 目标区域内的横坐标（显示器局部坐标）
+            y: 目标区域内的纵坐标（显示器局部坐标）
+            amount: 滚动量，正数向上，负数向下
+        
+        Raises:
+            EmergencyStop: 用户触发紧急停止时抛出
+        """
+        x, y = self._to_screen(x, y)
+        self.backend.move_to(x, y)
+        self.backend.scroll(amount)
+        audit_logger.debug(f"在 ({x}, {y}) 处滚动: {amount}")
+    
+    def close(self) -> None:
+        """释放输入后端资源"""
+        self.backend.close()
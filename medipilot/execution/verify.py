@@ -0,0 +1,217 @@
+"""
+动作后本地校验
+
+`type` 动作执行前后各截取一次目标输入框附近的小区域，比较灰度差异判断数值是否已落入输入框，
+可选地再用本地数字模板确认输入框中出现了目标数字，无需整屏截图与模型调用:
+- verified: 区域内有与输入相符的局部变化（配置数字模板时模板也全部按顺序匹配）；
+- failed: 区域内几乎没有变化，输入没有生效；
+- ambiguous: 区域大面积变化（弹窗、页面跳转）或数字模板不匹配，无法在本地确认。
+failed 与 ambiguous 交由认知层在下一次迭代中核对，verified 的输入不再需要模型确认，
+因此同一屏上的多个输入框可以在一次 `type` 计划中连续录入。
+
+数字模板目录 (VERIFY_DIGIT_TEMPLATES) 中每个字符一张截图：0.png ~ 9.png，小数点为 dot.png，负号为 minus.png。
+"""
+import os
+import time
+from typing import Callable, Dict, Optional, Tuple
+from PIL import Image, ImageChops
+from medipilot.utils.logger import audit_logger
+from medipilot.utils.lazy import lazy_import
+from medipilot.utils import metrics
+from configs.settings import config
+
+# 模板匹配在首次使用时才导入
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+class VerificationError(Exception):
+    """动作校验配置异常"""
+    pass
+
+VERIFIED = "verified"
+FAILED = "failed"
+AMBIGUOUS = "ambiguous"
+SKIPPED = "skipped"
+
+# 灰度差超过该值的像素视为发生变化（过滤抗锯齿与光标闪烁）
+_PIXEL_THRESHOLD = 32
+_TEMPLATE_NAMES = {"dot": ".", "minus": "-"}
+
+Box = Tuple[int, int, int, int]
+
+def changed_ratio(before: Image.Image, after: Image.Image) -> Tuple[float, Optional[Box]]:
+    """
+    两张同尺寸截图中发生变化的像素比例
+    
+    Returns:
+        Tuple[float, Optional[Box]]: (变化比例 0~1, 变化区域的包围盒 (left, top, right, bottom))
+    """
+    diff = ImageChops.difference(before.convert("L"), after.convert("L"))
+    mask = diff.point(lambda value: 255 if value > _PIXEL_THRESHOLD else 0)
+    changed = mask.histogram()[255]
+    return changed / (mask.width * mask.height), mask.getbbox()
+
+def load_templates(path: str) -> Dict[str, "np.ndarray"]:
+    """
+    读取数字模板目录
+    
+    Raises:
+        VerificationError: 目录不存在或其中没有可用的模板时抛出
+    """
+    if not os.path.isdir(path):
+        raise VerificationError(f"数字模板目录不存在: {path}")
+    templates = {}
+    for filename in sorted(os.listdir(path)):
+        name, ext = os.path.splitext(filename)
+        char = _TEMPLATE_NAMES.get(name, name)
+        if ext.lower() != ".png" or len(char) != 1:
+            continue
+        with Image.open(os.path.join(path, filename)) as image:
+            templates[char] = np.asarray(image.convert("L"))
+    if not templates:
+        raise VerificationError(f"数字模板目录中没有可用的模板: {path}")
+    return templates
+
+class ActionVerifier:
+    """
+    输入动作的本地校验器
+    
+    Attributes:
+        grab: 截取全局坐标区域 (left, top, width, height) 的函数
+        region: 以输入坐标为中心的校验区域尺寸 (width, height)
+        min_change: 低于该变化比例视为输入未生效
+        max_change: 高于该变化比例视为界面发生了输入以外的变化
+        timeout: 输入后等待区域画面稳定的上限（秒）
+        templates: 字符 -> 灰度模板，None 表示只做差异比较
+        threshold: 模板匹配的最低相关系数
+    """
+    
+    def __init__(
+        self,
+        grab: Callable[[int, int, int, int], Image.Image],
+        region: Tuple[int, int] = (320, 48),
+        min_change: float = 0.003,
+        max_change: float = 0.5,
+        timeout: float = 0.5,
+        templates: Optional[Dict[str, "np.ndarray"]] = None,
+        threshold: float = 0.8
+    ) -> None:
+        self.grab = grab
+        self.region = region
+        self.min_change = min_change
+        self.max_change = max_change
+        self.timeout = timeout
+        self.templates = templates
+        self.threshold = threshold
+    
+    def box(self, x: int, y: int, bounds: Box) -> Box:
+        """
+        以 (x, y) 为中心、不超出 bounds 的校验区域
+        
+        Args:
+            x, y: 输入坐标（全局坐标）
+            bounds: 目标显示器范围 (left, top, width, height)
+        
+        Returns:
+            Box: (left, top, width, height)
+        """
+        left0, top0, width0, height0 = bounds
+        width, height = min(self.region[0], width0), min(self.region[1], height0)
+        left = min(max(x - width // 2, left0), left0 + width0 - width)
+        top = min(max(y - height // 2, top0), top0 + height0 - height)
+        return left, top, width, height
+    
+    def snapshot(self, box: Box) -> Image.Image:
+        return self.grab(*box)
+    
+    def _settle(self, box: Box) -> Image.Image:
+        """输入后等待区域画面稳定（输入法、控件重绘），超时返回最新一帧"""
+        deadline = time.monotonic() + self.timeout
+        image = self.grab(*box)
+        while time.monotonic() < deadline:
+            time.sleep(0.03)
+            current = self.grab(*box)
+            if changed_ratio(image, current)[0] == 0:
+                return current
+            image = current
+        return image
+    
+    def _match_text(self, image: Image.Image, text: str) -> Optional[bool]:
+        """
+        按从左到右的顺序在区域中逐个匹配字符模板
+        
+        Returns:
+            Optional[bool]: 是否全部匹配；文本含有没有模板的字符时为 None（不做模板检查）
+        """
+        if not self.templates or any(char not in self.templates for char in text):
+            return None
+        gray = np.asarray(image.convert("L"))
+        start = 0
+        for char in text:
+            template = self.templates[char]
+            height, width = template.shape
+            window = gray[:, start:]
+            if window.shape[0] < height or window.shape[1] < width:
+                return False
+            _, score, _, location = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+            if score < self.threshold:
+                return False
+            # 下一个字符从当前字符右半部分之后开始查找，重复数字不会匹配到同一位置
+            start += location[0] + max(1, width // 2)
+        return True
+    
+    def check(self, before: Image.Image, box: Box, text: str) -> Dict[str, object]:
+        """
+        比较输入前后的校验区域
+        
+        Args:
+            before: 输入前的区域截图
+            box: 校验区域 (left, top, width, height)
+            text: 输入的文本
+        
+        Returns:
+            dict: {"outcome", "change", "template", "ms"}
+        """
+        start = time.perf_counter()
+        after = self._settle(box)
+        change, bbox = changed_ratio(before, after)
+        template = None
+        if change < self.min_change:
+            outcome = FAILED
+        elif change > self.max_change:
+            outcome = AMBIGUOUS
+        else:
+            if bbox:
+                # 包围盒紧贴字形，外扩几个像素，保证模板（含字形四周的留白）能放进匹配窗口
+                left, top, right, bottom = bbox
+                bbox = (max(0, left - 4), max(0, top - 4), min(after.width, right + 4), min(after.height, bottom + 4))
+            template = self._match_text(after.crop(bbox) if bbox else after, text.strip())
+            outcome = AMBIGUOUS if template is False else VERIFIED
+        elapsed = (time.perf_counter() - start) * 1000
+        metrics.VERIFICATIONS.inc(outcome=outcome)
+        audit_logger.info(
+            f"本地校验: {outcome} | 区域变化: {change:.1%}"
+            + ("" if template is None else f" | 数字模板: {'匹配' if template else '不匹配'}")
+            + f" | 耗时: {elapsed:.0f}ms"
+        )
+        return {"outcome": outcome, "change": change, "template": template, "ms": elapsed}
+
+def default_verifier(grab: Callable[[int, int, int, int], Image.Image]) -> Optional[ActionVerifier]:
+    """
+    按配置创建校验器（VERIFY_ENABLED 关闭时返回 None）
+    
+    Raises:
+        VerificationError: 数字模板目录无效时抛出
+    """
+    if not config.VERIFY_ENABLED:
+        return None
+    templates = load_templates(config.VERIFY_DIGIT_TEMPLATES) if config.VERIFY_DIGIT_TEMPLATES else None
+    return ActionVerifier(
+        grab,
+        region=(config.VERIFY_REGION_WIDTH, config.VERIFY_REGION_HEIGHT),
+        min_change=config.VERIFY_MIN_CHANGE,
+        max_change=config.VERIFY_MAX_CHANGE,
+        timeout=config.VERIFY_TIMEOUT,
+        templates=templates,
+        threshold=config.VERIFY_TEMPLATE_THRESHOLD,
+    )
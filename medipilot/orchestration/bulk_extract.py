@@ -0,0 +1,369 @@
+"""
+离线批量化验单提取
+
+将目录中的化验单扫描件（图片或 PDF）流式送入提取流水线:
+    
+    解码/栅格化 -> 隐私脱敏 -> SoM 叠加   (进程池，CPU 密集)
+    -> call_vision + Prompts.extraction  (线程池，受共享认知池限速)
+    -> 规范化 findings 写入 JSONL（可选导出 Parquet）
+
+按文件内容哈希记录处理清单，重复运行时跳过已成功处理的文件；启用 FINDINGS_DB_PATH 时，
+换到新的输出目录重新处理的页面也会从提取结果存储中复用已核验的结果。
+
+用法:
+    python -m medipilot.orchestration.bulk_extract scans/ --out extracted/ --privacy-region 0,200,0,1240 \
+        --workers 4 --concurrency 4
+
+扫描件上病人信息的位置与 EMR 界面不同，必须通过 --privacy-region 显式指定脱敏区域。
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+from PIL import Image
+from medipilot.perception.screen import Perception
+from medipilot.cognition.engine import Brain, Prompts
+from medipilot.cognition.pool import CognitionPool
+from medipilot.cognition.terminology import default_terminology
+from medipilot.orchestration.report import extract_cached
+from medipilot.utils.findings_store import FindingsStore, FindingsStoreError, default_store
+from medipilot.utils.logger import audit_logger
+from configs.settings import config, ConfigError
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp"}
+PDF_SUFFIX = ".pdf"
+
+class BulkExtractError(Exception):
+    """离线批量提取异常"""
+    pass
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """流式计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def discover_reports(root: str) -> Iterator[str]:
+    """递归列出目录下的图片与 PDF 文件（按路径排序，保证输出稳定）"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            suffix = os.path.splitext(name)[1].lower()
+            if suffix in IMAGE_SUFFIXES or suffix == PDF_SUFFIX:
+                yield os.path.join(dirpath, name)
+
+def _rasterize(path: str, dpi: int) -> List[Image.Image]:
+    """将文件解码为 RGB 页面图像列表"""
+    if os.path.splitext(path)[1].lower() != PDF_SUFFIX:
+        with Image.open(path) as image:
+            return [image.convert("RGB")]
+    
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        raise BulkExtractError("处理 PDF 需要安装 PyMuPDF (pip install pymupdf)")
+    
+    pages = []
+    with fitz.open(path) as doc:
+        for page in doc:
+            pixmap = page.get_pixmap(dpi=dpi)
+            pages.append(Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples))
+    return pages
+
+# 每个预处理进程复用一个离线感知实例
+_worker_perception: Optional[Perception] = None
+
+def prepare_report(
+    path: str,
+    privacy_region: Optional[Tuple[int, int, int, int]],
+    dpi: int
+) -> List[Image.Image]:
+    """
+    进程池任务：解码/栅格化，并完成隐私脱敏与 SoM 叠加
+    
+    Args:
+        path: 化验单文件路径
+        privacy_region: 隐私区域 (y1, y2, x1, x2)，None 表示使用配置中为 EMR 界面设定的 PRIVACY_REGION
+        dpi: PDF 栅格化分辨率
+    
+    Returns:
+        List[Image.Image]: 可直接发送给模型的页面图像
+    """
+    global _worker_perception
+    if _worker_perception is None:
+        _worker_perception = Perception(headless=True)
+    perception = _worker_perception
+    pages = []
+    for page in _rasterize(path, dpi):
+        page = perception.privacy_filter(page, region=privacy_region)
+        pages.append(perception.apply_som_overlay(page))
+    return pages
+
+_FLAG_PATTERN = re.compile(r"\s*(?:[HL]|↑|↓)\s*$", re.IGNORECASE)
+
+def normalize_findings(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    规范化模型返回的 findings
+    
+    - 指标名去除首尾空白
+    - 去除数值后的 H/L/↑/↓ 标志，能解析为数字的转为 float（原始文本保留在 value_raw）
+    - confidence 转为 float
+    - 按术语表追加标准代码、中文名称、标准单位数值与参考范围标记（见 `Terminology.normalize`）
+    
+    Args:
+        result: `Prompts.extraction()` 对应的模型输出
+    
+    Returns:
+        List[dict]: 规范化后的指标列表
+    """
+    normalized = []
+    for finding in result.get("findings") or []:
+        metric = str(finding.get("metric", "")).strip()
+        if not metric:
+            continue
+        raw = finding.get("value")
+        value: Any = raw
+        if isinstance(raw, str):
+            text = _FLAG_PATTERN.sub("", raw.strip())
+            try:
+                value = float(text)
+            except ValueError:
+                value = text
+        try:
+            confidence: Optional[float] = float(finding.get("confidence"))
+        except (TypeError, ValueError):
+            confidence = None
+        normalized.append({
+            "metric": metric,
+            "value": value,
+            "value_raw": raw,
+            "unit": finding.get("unit"),
+            "confidence": confidence,
+            "target_field_hint": finding.get("target_field_hint"),
+        })
+    return default_terminology().normalize(normalized)
+
+class BulkExtractor:
+    """
+    离线批量提取流水线
+    
+    输出目录结构:
+        findings.jsonl   每行一个规范化指标
+        manifest.jsonl   每个文件一条处理记录（以内容哈希为键，用于续跑）
+        findings.parquet 可选，运行结束后由 findings.jsonl 导出
+    
+    Attributes:
+        input_dir: 化验单目录
+        output_dir: 输出目录
+        workers: 预处理进程数
+        cognition: 共享认知池（限制模型并发与速率）
+    """
+    
+    def __init__(
+        self,
+        input_dir: str,
+        output_dir: str,
+        workers: int = 4,
+        concurrency: int = 4,
+        privacy_region: Optional[Tuple[int, int, int, int]] = None,
+        dpi: int = 150,
+        cognition: Optional[Any] = None,
+        store: Optional[FindingsStore] = None
+    ) -> None:
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.workers = workers
+        self.concurrency = concurrency
+        self.privacy_region = privacy_region
+        self.dpi = dpi
+        self.cognition = cognition or CognitionPool(Brain(config.EXTRACTION_MODEL), max_concurrency=concurrency)
+        self.store = store
+        os.makedirs(output_dir, exist_ok=True)
+        self.findings_path = os.path.join(output_dir, "findings.jsonl")
+        self.manifest_path = os.path.join(output_dir, "manifest.jsonl")
+    
+    def processed_hashes(self) -> Set[str]:
+        """已成功处理的文件内容哈希"""
+        hashes: Set[str] = set()
+        if not os.path.exists(self.manifest_path):
+            return hashes
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("status") == "done":
+                    hashes.add(record["sha256"])
+        return hashes
+    
+    def _extract(self, path: str, sha256: str, pages: List[Image.Image]) -> Dict[str, Any]:
+        """线程池任务：逐页调用模型（已核验的页面从存储复用）并规范化结果"""
+        rows = []
+        scan_quality = []
+        for page_no, page in enumerate(pages, 1):
+            result = extract_cached(
+                self.store, page, lambda: self.cognition.call_vision(page, Prompts.extraction()),
+                source=path, model=config.EXTRACTION_MODEL
+            )
+            if result.get("action") == "error":
+                raise BulkExtractError(f"第 {page_no} 页提取失败 [{result.get('error_type')}]: {result.get('reason')}")
+            scan_quality.append(result.get("scan_quality"))
+            for finding in normalize_findings(result):
+                finding.update({"source": path, "sha256": sha256, "page": page_no})
+                rows.append(finding)
+        return {"pages": len(pages), "rows": rows, "scan_quality": scan_quality}
+    
+    def _write(self, path: str, record: Dict[str, Any], rows: List[Dict[str, Any]]) -> None:
+        """先写 findings 再写清单，保证清单中的 done 记录对应的数据已落盘"""
+        timestamp = datetime.now().isoformat()
+        if rows:
+            with open(self.findings_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    row["extracted_at"] = timestamp
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        record.update({"source": path, "timestamp": timestamp})
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def run(self) -> Dict[str, int]:
+        """
+        处理输入目录中所有未处理的文件
+        
+        Returns:
+            dict: 处理统计 {"done", "failed", "skipped", "findings"}
+        """
+        if self.privacy_region is None:
+            # PRIVACY_REGION 针对 EMR 界面的页眉设定，与扫描件上病人信息的位置无关
+            audit_logger.warning(
+                f"未指定扫描件的隐私区域，回退为 EMR 界面的 PRIVACY_REGION {config.PRIVACY_REGION}，"
+                "扫描件上的病人信息可能未被脱敏"
+            )
+        processed = self.processed_hashes()
+        stats = {"done": 0, "failed": 0, "skipped": 0, "findings": 0}
+        files = discover_reports(self.input_dir)
+        max_inflight = max(self.workers, self.concurrency) * 2
+        inflight: Dict[Future, Tuple[str, str, str]] = {}
+        
+        with ProcessPoolExecutor(max_workers=self.workers) as procs, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as threads:
+            
+            def _fill() -> None:
+                # 限制在途文件数量，保证内存占用与目录大小无关
+                while len(inflight) < max_inflight:
+                    path = next(files, None)
+                    if path is None:
+                        return
+                    sha256 = file_sha256(path)
+                    if sha256 in processed:
+                        stats["skipped"] += 1
+                        continue
+                    processed.add(sha256)  # 同一次运行中内容重复的文件只处理一次
+                    future = procs.submit(prepare_report, path, self.privacy_region, self.dpi)
+                    inflight[future] = ("prepare", path, sha256)
+            
+            _fill()
+            while inflight:
+                done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, path, sha256 = inflight.pop(future)
+                    try:
+                        if stage == "prepare":
+                            next_future = threads.submit(self._extract, path, sha256, future.result())
+                            inflight[next_future] = ("extract", path, sha256)
+                            continue
+                        output = future.result()
+                    except Exception as e:
+                        audit_logger.error(f"离线提取失败 {path}: {e}")
+                        self._write(path, {"sha256": sha256, "status": "failed", "error": str(e)}, [])
+                        stats["failed"] += 1
+                        continue
+                    
+                    self._write(path, {
+                        "sha256": sha256, "status": "done", "pages": output["pages"],
+                        "findings": len(output["rows"]), "scan_quality": output["scan_quality"],
+                    }, output["rows"])
+                    stats["done"] += 1
+                    stats["findings"] += len(output["rows"])
+                    audit_logger.info(f"✓ 已提取 {path}: {len(output['rows'])} 项指标")
+                _fill()
+        
+        audit_logger.info(
+            f"离线提取完成 | 成功: {stats['done']} | 失败: {stats['failed']} | "
+            f"跳过: {stats['skipped']} | 指标: {stats['findings']}"
+        )
+        return stats
+    
+    def export_parquet(self, path: Optional[str] = None) -> str:
+        """
+        将 findings.jsonl 导出为 Parquet
+        
+        Raises:
+            BulkExtractError: 未安装 pyarrow 时抛出
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise BulkExtractError("导出 Parquet 需要安装 pyarrow (pip install pyarrow)")
+        
+        path = path or os.path.join(self.output_dir, "findings.parquet")
+        rows = []
+        if os.path.exists(self.findings_path):
+            with open(self.findings_path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+        # value 可能是数字或文本，统一按文本存储，数值列单独保留
+        for row in rows:
+            row["value_numeric"] = row["value"] if isinstance(row["value"], float) else None
+            row["value"] = None if row["value"] is None else str(row["value"])
+            row["value_raw"] = None if row["value_raw"] is None else str(row["value_raw"])
+        pq.write_table(pa.Table.from_pylist(rows), path)
+        return path
+
+def _parse_region(text: str) -> Tuple[int, int, int, int]:
+    parts = [int(p) for p in text.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("格式应为 y1,y2,x1,x2")
+    return tuple(parts)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="离线批量化验单提取")
+    parser.add_argument("input_dir", help="化验单图片/PDF 目录")
+    parser.add_argument("--out", required=True, help="输出目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="预处理进程数")
+    parser.add_argument("--concurrency", type=int, default=config.COGNITION_MAX_CONCURRENCY,
+                        help="模型请求并发上限")
+    # PRIVACY_REGION 针对 EMR 界面设定，扫描件版式各异，必须显式指定
+    parser.add_argument("--privacy-region", type=_parse_region, required=True,
+                        help="扫描件上的隐私区域 y1,y2,x1,x2（像素，按 --dpi 栅格化后的坐标）")
+    parser.add_argument("--dpi", type=int, default=150, help="PDF 栅格化分辨率")
+    parser.add_argument("--parquet", action="store_true", help="结束后导出 findings.parquet")
+    args = parser.parse_args(argv)
+    
+    try:
+        config.validate()
+        extractor = BulkExtractor(
+            args.input_dir, args.out, workers=args.workers, concurrency=args.concurrency,
+            privacy_region=args.privacy_region, dpi=args.dpi, store=default_store()
+        )
+        stats = extractor.run()
+        if args.parquet:
+            print(f"Parquet 已导出: {extractor.export_parquet()}")
+    except (ConfigError, BulkExtractError, FindingsStoreError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    print(f"完成: 成功 {stats['done']}，失败 {stats['failed']}，"
+          f"跳过 {stats['skipped']}，指标 {stats['findings']}")
+
+if __name__ == "__main__":
+    main()
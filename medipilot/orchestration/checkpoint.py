@@ -0,0 +1,181 @@
+"""
+主循环断点续跑
+
+每个已确认的动作执行后，流水线把任务状态原子写入本地检查点文件（先写临时文件、fsync，再 os.replace）:
+任务描述、已提取的 findings、已录入的内容、上一步计划、迭代次数，以及该动作落定后画面的低分辨率灰度缩略图
+（动作与画面在同一次写入中保存，进程在任何时刻中断，缩略图都对应已记录的最后一个动作之后的界面）。
+
+进程崩溃或 Ctrl+C 后以 `python main.py --resume` 重新运行:
+- 报告提取结果直接从检查点恢复，不再调用模型；
+- 第一帧在调用模型前先与检查点中的缩略图做本地比对，EMR 界面已不是中断时的样子则拒绝续跑；
+- 已录入的内容附加在任务描述中，模型只需完成剩余部分。
+任务完成 (finish) 后检查点自动删除。
+"""
+import os
+import json
+import time
+import base64
+from typing import Any, Dict, List, Optional
+from PIL import Image, ImageChops, ImageStat
+from medipilot.execution.verify import FAILED
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events
+from configs.settings import config
+
+class CheckpointError(Exception):
+    """检查点读写或续跑校验异常"""
+    pass
+
+# 缩略图尺寸：足以区分不同界面，又对光标闪烁、单个输入框内容变化不敏感
+_THUMBNAIL_SIZE = (64, 36)
+
+def thumbnail(image: Image.Image) -> Image.Image:
+    """画面的低分辨率灰度缩略图，用于续跑前的本地比对"""
+    return image.convert("L").resize(_THUMBNAIL_SIZE, Image.BILINEAR)
+
+class Checkpoint:
+    """
+    单个任务的检查点
+    
+    Attributes:
+        path: 检查点文件路径
+        task_desc: 任务描述（不含续跑时附加的进度说明）
+        findings: 已从报告中提取的指标，未提取时为 None
+        filled: 已录入的内容 [{"iteration", "coordinate", "text"}]
+        last_plan: 上一个已确认执行的计划
+        iteration: 已完成的迭代次数
+        screen: 最后一个已记录动作落定后的画面缩略图
+        session: 写入检查点的运行会话 ID
+    """
+    
+    def __init__(self, path: str, task_desc: str) -> None:
+        self.path = path
+        self.task_desc = task_desc
+        self.findings: Optional[List[Dict[str, Any]]] = None
+        self.filled: List[Dict[str, Any]] = []
+        self.last_plan: Optional[Dict[str, Any]] = None
+        self.iteration = 0
+        self.screen: Optional[Image.Image] = None
+        self.session = events.SESSION_ID
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["Checkpoint"]:
+        """
+        读取检查点，文件不存在时返回 None
+        
+        Raises:
+            CheckpointError: 文件损坏时抛出
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            checkpoint = cls(path, data["task_desc"])
+            checkpoint.findings = data.get("findings")
+            checkpoint.filled = data.get("filled") or []
+            checkpoint.last_plan = data.get("last_plan")
+            checkpoint.iteration = int(data.get("iteration", 0))
+            checkpoint.session = data.get("session")
+            if data.get("screen"):
+                checkpoint.screen = Image.frombytes("L", _THUMBNAIL_SIZE, base64.b64decode(data["screen"]))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise CheckpointError(f"检查点文件损坏 {path}: {e}")
+        return checkpoint
+    
+    def save(self) -> None:
+        """原子写入：进程在任何时刻崩溃，文件中都是某一次完整的状态"""
+        data = {
+            "task_desc": self.task_desc,
+            "findings": self.findings,
+            "filled": self.filled,
+            "last_plan": self.last_plan,
+            "iteration": self.iteration,
+            "screen": None if self.screen is None else base64.b64encode(self.screen.tobytes()).decode("ascii"),
+            "session": self.session,
+            "updated": time.time(),
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+    
+    def clear(self) -> None:
+        """任务完成后删除检查点"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+    
+    def record(
+        self,
+        iteration: int,
+        plan: Dict[str, Any],
+        typed: Optional[List[Dict[str, Any]]] = None,
+        screen: Optional[Image.Image] = None
+    ) -> None:
+        """
+        记录一个已确认执行的动作及其落定后的画面
+        
+        Args:
+            iteration: 迭代编号
+            plan: 已执行的计划
+            typed: 执行层实际输入的输入框（见 `Executor.last_typed`），None 表示按计划中的 coordinate / text 记录
+            screen: 动作落定后的画面；截屏失败时为 None，保留原缩略图（续跑时宁可拒绝，也不跳过画面校验）
+        """
+        self.iteration = iteration
+        self.last_plan = plan
+        if screen is not None:
+            self.screen = thumbnail(screen)
+        if plan.get("action") == "type":
+            for entry in typed if typed is not None else [plan]:
+                # 本地校验确认未生效的输入不计入已录入
+                if entry.get("outcome") != FAILED:
+                    self.filled.append({"iteration": iteration, "coordinate": entry.get("coordinate"), "text": entry.get("text")})
+        self.save()
+    
+    def set_findings(self, findings: List[Dict[str, Any]]) -> None:
+        self.findings = findings
+        self.save()
+    
+    def difference(self, image: Image.Image) -> float:
+        """当前画面与检查点画面的平均灰度差（0~1），检查点中没有画面时为 0"""
+        if self.screen is None:
+            return 0.0
+        diff = ImageChops.difference(self.screen, thumbnail(image))
+        return ImageStat.Stat(diff).mean[0] / 255
+    
+    def verify(self, image: Image.Image, tolerance: Optional[float] = None) -> float:
+        """
+        续跑前的本地画面校验
+        
+        Returns:
+            float: 平均灰度差
+        
+        Raises:
+            CheckpointError: 画面与中断时差异过大
+        """
+        tolerance = config.CHECKPOINT_SCREEN_TOLERANCE if tolerance is None else tolerance
+        difference = self.difference(image)
+        if difference > tolerance:
+            raise CheckpointError(
+                f"当前屏幕与检查点中的界面不一致（差异 {difference:.1%}，上限 {tolerance:.1%}），"
+                "请将 EMR 恢复到中断时的界面后重试，或不带 --resume 重新开始"
+            )
+        audit_logger.info(f"续跑画面校验通过 | 差异: {difference:.1%} | 已完成迭代: {self.iteration}")
+        return difference
+    
+    def resume_task(self, task_desc: str) -> str:
+        """在任务描述后附加已完成的进度，供续跑时的操作提示词使用"""
+        lines = [task_desc, f"断点续跑：此前已完成 {self.iteration} 次迭代。"]
+        if self.filled:
+            done = "; ".join(f"{entry['text']} @ {entry['coordinate']}" for entry in self.filled)
+            lines.append(f"已录入的内容（不要重复录入）: {done}")
+        if self.last_plan:
+            lines.append(f"中断前最后一步动作: {json.dumps(self.last_plan, ensure_ascii=False)}")
+        return "\n".join(lines)
@@ -0,0 +1,510 @@
+"""
+守护进程模式：组件常驻预热，通过本机 HTTP API 提交任务
+
+`python main.py --daemon` 启动后只初始化、预热一次 Perception / Brain / Executor，免责声明也只在启动时
+由操作员确认一次；之后的任务通过 API 提交、排队，由单个工作线程依次在同一块屏幕上执行，
+任务开始时不再承担导入依赖、创建组件、首次截屏与建立 API 连接的开销。
+
+API（JSON，默认 http://127.0.0.1:8765）:
+- POST   /jobs              提交任务 {"task": 任务描述, "findings": [...], "report": "screen" 或图像路径, "report_id": 报告编号}
+                            findings 与 report 均为可选，二者都不提供时由模型在操作过程中自行读取屏幕
+- GET    /jobs              所有任务的状态
+- GET    /jobs/<id>         单个任务的状态
+- GET    /jobs/<id>/result  任务结果（任务未结束时返回 409）
+- DELETE /jobs/<id>         取消排队中的任务
+- GET    /health            守护进程状态
+所有请求都需携带 "Authorization: Bearer <令牌>"：未设置 DAEMON_TOKEN 时启动时随机生成，
+写入仅当前用户可读的 DAEMON_TOKEN_FILE (0600)。此外只接受 Host 为本机（或配置的监听地址）的请求，
+POST 的 Content-Type 必须为 application/json：浏览器中打开的网页无法借跨域简单请求或 DNS 重绑定
+提交任务（操控 EMR 的鼠标键盘）或读取任务结果中的患者数据。
+触发紧急停止后守护进程停止接收任务，排队中的任务全部取消。
+"""
+import os
+import hmac
+import json
+import time
+import secrets
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from PIL import Image
+from medipilot.perception.screen import Perception
+from medipilot.perception.buffers import release
+from medipilot.cognition.engine import Brain, Prompts
+from medipilot.execution.action import Executor, EmergencyStop
+from medipilot.orchestration.pipeline import AgentPipeline
+from medipilot.orchestration.report import extract_cached, extract_report
+from medipilot.orchestration.split_screen import SplitScreenSession, describe_findings
+from medipilot.utils.findings_store import FindingsStore
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events, metrics
+
+class DaemonError(Exception):
+    """守护进程任务提交或执行异常"""
+    pass
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# 内存中保留的已结束任务数，超出后丢弃最早的
+_MAX_FINISHED_JOBS = 1000
+# 请求体上限（字节）
+_MAX_BODY = 1024 * 1024
+_LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+def write_token_file(path: str, token: str) -> None:
+    """
+    将访问令牌写入仅当前用户可读写的文件 (0600)
+    
+    Raises:
+        DaemonError: 写入失败时抛出
+    """
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(token + "\n")
+        # 文件已存在时 os.open 不会修改权限
+        os.chmod(path, 0o600)
+    except OSError as e:
+        raise DaemonError(f"无法写入令牌文件 {path}: {e}")
+
+def _host_name(header: str) -> str:
+    """Host 头中的主机名（去除端口与 IPv6 方括号）"""
+    header = header.strip().lower()
+    if header.startswith("["):
+        return header[1:header.find("]")] if "]" in header else header
+    return header.rsplit(":", 1)[0] if header.count(":") == 1 else header
+
+class DaemonJob:
+    """
+    守护进程中的单个任务
+    
+    Attributes:
+        job_id: 任务 ID
+        task: 任务描述
+        findings: 随任务提交的待录入指标
+        report: 报告来源："screen" 表示从屏幕提取，其余为化验单图像路径
+        report_id: 报告编号（用于提取结果存储按编号复用）
+        status: queued / running / done / failed / cancelled
+        result: 任务结束后的结果
+        error: 失败原因
+    """
+    
+    def __init__(
+        self,
+        task: str,
+        findings: Optional[List[Dict[str, Any]]] = None,
+        report: Optional[str] = None,
+        report_id: Optional[str] = None
+    ) -> None:
+        self.job_id = uuid.uuid4().hex[:12]
+        self.task = task
+        self.findings = findings
+        self.report = report
+        self.report_id = report_id
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+    
+    @classmethod
+    def from_dict(cls, data: Any) -> "DaemonJob":
+        """
+        从 API 请求体创建任务
+        
+        Raises:
+            DaemonError: 字段缺失或类型错误时抛出
+        """
+        if not isinstance(data, dict):
+            raise DaemonError("请求体必须是 JSON 对象")
+        task = data.get("task")
+        if not isinstance(task, str) or not task.strip():
+            raise DaemonError("缺少任务描述 task")
+        findings = data.get("findings")
+        if findings is not None and not (
+            isinstance(findings, list) and all(isinstance(f, dict) and "metric" in f for f in findings)
+        ):
+            raise DaemonError("findings 必须是包含 metric 字段的对象列表")
+        report = data.get("report")
+        if report is not None and (not isinstance(report, str) or not report):
+            raise DaemonError("report 必须是 \"screen\" 或化验单图像路径")
+        if findings and report:
+            raise DaemonError("findings 与 report 只能提供其一")
+        report_id = data.get("report_id")
+        return cls(task.strip(), findings, report, None if report_id is None else str(report_id))
+    
+    @property
+    def queued_ms(self) -> Optional[float]:
+        """从提交到开始执行的等待时间（毫秒）"""
+        return None if self.started is None else (self.started - self.created) * 1000
+    
+    def to_dict(self, result: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "task": self.task,
+            "report": self.report,
+            "report_id": self.report_id,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "queued_ms": self.queued_ms,
+            "run_ms": None if self.finished is None or self.started is None else (self.finished - self.started) * 1000,
+            "error": self.error,
+        }
+        if result:
+            data["result"] = self.result
+        return data
+
+class AgentDaemon:
+    """
+    常驻的代理守护进程
+    
+    Attributes:
+        perception: 感知层（EMR 显示器）
+        brain: 认知层
+        executor: 执行层
+        report: 报告显示器的感知层，None 表示单显示器
+        store: 提取结果存储，None 表示不存储、不复用
+        max_iterations: 单个任务的最大迭代次数
+        token: API 访问令牌（未指定时随机生成，API 始终校验）
+        token_generated: 令牌是否为随机生成（需由调用方写入令牌文件告知客户端）
+        jobs: 任务 ID -> 任务（按提交顺序）
+        stop_reason: 守护进程停止的原因，运行中为 None
+    """
+    
+    def __init__(
+        self,
+        perception: Perception,
+        brain: Brain,
+        executor: Executor,
+        report: Optional[Perception] = None,
+        store: Optional[FindingsStore] = None,
+        max_iterations: int = 100,
+        token: Optional[str] = None
+    ) -> None:
+        self.perception = perception
+        self.brain = brain
+        self.executor = executor
+        self.report = report
+        self.store = store
+        self.max_iterations = max_iterations
+        self.token_generated = not token
+        self.token = token or secrets.token_urlsafe(32)
+        self.jobs: "OrderedDict[str, DaemonJob]" = OrderedDict()
+        self.stop_reason: Optional[str] = None
+        self._queue: "queue.Queue[DaemonJob]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def submit(self, data: Any) -> DaemonJob:
+        """
+        提交任务
+        
+        Raises:
+            DaemonError: 请求无效或守护进程已停止时抛出
+        """
+        if self._stopped.is_set():
+            raise DaemonError(f"守护进程已停止 ({self.stop_reason})，不再接收任务")
+        job = DaemonJob.from_dict(data)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._prune()
+        self._queue.put(job)
+        audit_logger.info(f"[{job.job_id}] 任务已提交 | 排队: {self._queue.qsize()}")
+        return job
+    
+    def get(self, job_id: str) -> Optional[DaemonJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+    
+    def list_jobs(self) -> List[DaemonJob]:
+        with self._lock:
+            return list(self.jobs.values())
+    
+    def cancel(self, job_id: str) -> bool:
+        """取消排队中的任务，已开始或已结束的任务不受影响"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            job.status = CANCELLED
+            job.finished = time.time()
+        metrics.DAEMON_JOBS.inc(status=CANCELLED)
+        audit_logger.info(f"[{job_id}] 任务已取消")
+        return True
+    
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (DONE, FAILED, CANCELLED)]
+        for job_id in finished[:max(0, len(finished) - _MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+    
+    def _extract(self, job: DaemonJob) -> List[Dict[str, Any]]:
+        """
+        从屏幕或化验单图像提取指标
+        
+        Raises:
+            DaemonError: 图像无法读取、提取失败或未提取到任何指标时抛出
+        """
+        if job.report == "screen":
+            result = extract_report(
+                self.perception, self.brain, self.executor, store=self.store, report_id=job.report_id
+            )
+        else:
+            try:
+                with Image.open(job.report) as image:
+                    filtered = self.perception.privacy_filter(image.convert("RGB"))
+            except OSError as e:
+                raise DaemonError(f"无法读取化验单图像 {job.report}: {e}")
+            
+            def _extract() -> Dict[str, Any]:
+                marked = self.perception.apply_som_overlay(filtered)
+                try:
+                    result = self.brain.call_vision(marked, Prompts.extraction())
+                finally:
+                    release(marked)
+                if result.get("action") == "error":
+                    return {"findings": [], "errors": [result]}
+                result.setdefault("errors", [])
+                return result
+            
+            result = extract_cached(
+                self.store, filtered, _extract, report_id=job.report_id, source=job.report,
+                model=getattr(self.brain, "model", None)
+            )
+        if result["errors"] and not result["findings"]:
+            raise DaemonError(f"化验单提取失败: {result['errors'][0].get('reason')}")
+        if not result.get("findings"):
+            raise DaemonError("化验单上未提取到任何指标")
+        return result["findings"]
+    
+    def run_job(self, job: DaemonJob) -> Dict[str, Any]:
+        """
+        使用常驻组件执行一个任务
+        
+        Returns:
+            dict: {"finished", "iterations", "findings", "timings"}
+        
+        Raises:
+            DaemonError: 化验单提取失败时抛出
+            EmergencyStop: 用户触发紧急停止时向上抛出
+        """
+        findings = job.findings
+        if job.report == "screen" and self.report is not None:
+            # 双显示器：报告显示器提取与 EMR 显示器首帧准备并行
+            session = SplitScreenSession(
+                self.report, self.perception, self.brain, self.executor, job.task,
+                max_iterations=self.max_iterations, store=self.store
+            )
+            pipeline = session.pipeline
+            finished = session.run()
+            findings = session.findings
+        else:
+            if job.report is not None:
+                findings = self._extract(job)
+            task = job.task
+            if findings:
+                task = f"{task}\n已提取的数据（以此为准）: {describe_findings(findings)}"
+            pipeline = AgentPipeline(
+                self.perception, self.brain, self.executor, task, max_iterations=self.max_iterations
+            )
+            finished = pipeline.run()
+        return {
+            "finished": finished,
+            "iterations": pipeline.iteration_count,
+            "findings": findings,
+            "timings": pipeline.summary(),
+        }
+    
+    def _work(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                job = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            with self._lock:
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+                job.started = time.time()
+            metrics.DAEMON_QUEUE_SECONDS.observe(job.started - job.created)
+            audit_logger.info(f"[{job.job_id}] 任务开始 | 排队等待: {job.queued_ms:.0f}ms | 任务: {job.task}")
+            
+            status, error = FAILED, None
+            try:
+                with events.bind(job=job.job_id):
+                    job.result = self.run_job(job)
+                status = DONE
+            except EmergencyStop as e:
+                error = f"紧急停止: {e}"
+                audit_logger.warning(f"🛑 [{job.job_id}] 紧急停止，守护进程停止接收任务: {e}")
+                self.stop("emergency_stop")
+            except Exception as e:
+                error = str(e)
+                audit_logger.error(f"[{job.job_id}] 任务失败: {e}", exc_info=not isinstance(e, DaemonError))
+            
+            with self._lock:
+                job.status, job.error, job.finished = status, error, time.time()
+            metrics.DAEMON_JOBS.inc(status=status)
+            audit_logger.info(
+                f"[{job.job_id}] 任务结束 | 状态: {status} | 耗时: {(job.finished - job.started):.1f}s"
+                + (f" | 迭代: {job.result['iterations']}" if job.result else "")
+            )
+    
+    def start(self) -> None:
+        """启动任务工作线程（任务依次执行，同一时间只有一个任务操作屏幕）"""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name="daemon-worker", daemon=True)
+            self._worker.start()
+    
+    def serve(self, host: str, port: int) -> int:
+        """
+        启动工作线程，并在后台线程启动任务提交 API
+        
+        Returns:
+            int: 实际监听的端口（port=0 时由系统分配）
+        """
+        daemon = self
+        allowed_hosts = {*_LOOPBACK_HOSTS, _host_name(host)}
+        
+        class _Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, payload: Any) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def _route(self) -> Optional[List[str]]:
+                # DNS 重绑定的页面以自己的域名作为 Host
+                if _host_name(self.headers.get("Host", "")) not in allowed_hosts:
+                    self._send(403, {"error": "Host 不被允许"})
+                    return None
+                header = self.headers.get("Authorization", "")
+                if not hmac.compare_digest(header.encode("utf-8"), f"Bearer {daemon.token}".encode("utf-8")):
+                    self._send(401, {"error": "未授权"})
+                    return None
+                return [part for part in self.path.split("?")[0].split("/") if part]
+            
+            def _job(self, job_id: str) -> Optional[DaemonJob]:
+                job = daemon.get(job_id)
+                if job is None:
+                    self._send(404, {"error": f"任务不存在: {job_id}"})
+                return job
+            
+            def do_GET(self) -> None:
+                parts = self._route()
+                if parts is None:
+                    return
+                if parts == ["health"]:
+                    self._send(200, {
+                        "status": "stopped" if daemon.stop_reason else "ok",
+                        "stop_reason": daemon.stop_reason,
+                        "queued": sum(1 for job in daemon.list_jobs() if job.status == QUEUED),
+                        "session": events.SESSION_ID,
+                    })
+                elif parts == ["jobs"]:
+                    self._send(200, {"jobs": [job.to_dict() for job in daemon.list_jobs()]})
+                elif len(parts) == 2 and parts[0] == "jobs":
+                    job = self._job(parts[1])
+                    if job is not None:
+                        self._send(200, job.to_dict())
+                elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+                    job = self._job(parts[1])
+                    if job is None:
+                        return
+                    if job.status in (QUEUED, RUNNING):
+                        self._send(409, {"error": "任务尚未结束", "status": job.status})
+                    else:
+                        self._send(200, job.to_dict(result=True))
+                else:
+                    self._send(404, {"error": "未知路径"})
+            
+            def do_POST(self) -> None:
+                parts = self._route()
+                if parts is None:
+                    return
+                if parts != ["jobs"]:
+                    self._send(404, {"error": "未知路径"})
+                    return
+                # 跨域简单请求只能使用 text/plain 等类型，要求 application/json 即需通过 CORS 预检
+                content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_type != "application/json":
+                    self._send(415, {"error": "Content-Type 必须为 application/json"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # 负数长度会让 rfile.read 一直读到客户端断开
+                    self._send(400, {"error": "Content-Length 无效"})
+                    return
+                if length > _MAX_BODY:
+                    self._send(413, {"error": "请求体过大"})
+                    return
+                try:
+                    job = daemon.submit(json.loads(self.rfile.read(length) or b"null"))
+                except ValueError as e:
+                    self._send(400, {"error": f"请求体不是有效的 JSON: {e}"})
+                    return
+                except DaemonError as e:
+                    self._send(503 if daemon.stop_reason else 400, {"error": str(e)})
+                    return
+                self._send(202, job.to_dict())
+            
+            def do_DELETE(self) -> None:
+                parts = self._route()
+                if parts is None:
+                    return
+                if len(parts) != 2 or parts[0] != "jobs":
+                    self._send(404, {"error": "未知路径"})
+                    return
+                job = self._job(parts[1])
+                if job is None:
+                    return
+                if daemon.cancel(job.job_id):
+                    self._send(200, job.to_dict())
+                else:
+                    self._send(409, {"error": "只能取消排队中的任务", "status": job.status})
+            
+            def log_message(self, format: str, *args) -> None:
+                # 请求本身不写入审计日志，任务提交与执行另有记录
+                pass
+        
+        self.start()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="daemon-http", daemon=True).start()
+        return self._server.server_address[1]
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """阻塞直至守护进程停止，返回是否已停止"""
+        return self._stopped.wait(timeout)
+    
+    def stop(self, reason: str = "shutdown") -> None:
+        """停止接收任务并取消排队中的任务（正在执行的任务不会被打断）"""
+        if self._stopped.is_set():
+            return
+        self.stop_reason = reason
+        self._stopped.set()
+        for job in self.list_jobs():
+            self.cancel(job.job_id)
+        if self._server is not None:
+            # 可能在请求处理线程之外的任意线程调用，shutdown 在独立线程中完成
+            server, self._server = self._server, None
+            threading.Thread(target=lambda: (server.shutdown(), server.server_close()), daemon=True).start()
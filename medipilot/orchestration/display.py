@@ -0,0 +1,112 @@
+import os
+import shutil
+import subprocess
+import time
+from typing import Optional
+from medipilot.utils.logger import audit_logger
+from configs.settings import config
+
+class DisplayError(Exception):
+    """虚拟显示异常"""
+    pass
+
+class VirtualDisplay:
+    """
+    Xvfb 虚拟显示
+    
+    每个批处理会话独占一个虚拟 X 显示，截屏与输入注入互不干扰。
+    支持上下文管理器用法::
+        
+        with VirtualDisplay() as display:
+            perception = Perception(display=display.name)
+    
+    Attributes:
+        number: 显示编号（如 99 对应 ":99"）
+        resolution: 屏幕规格，如 "1920x1080x24"
+        name: X 显示名，如 ":99"
+    """
+    
+    _SOCKET_DIR = "/tmp/.X11-unix"
+    
+    def __init__(self, number: Optional[int] = None, resolution: Optional[str] = None) -> None:
+        self.number = number
+        self.resolution = resolution or config.XVFB_RESOLUTION
+        self._process: Optional[subprocess.Popen] = None
+    
+    @property
+    def name(self) -> str:
+        return f":{self.number}"
+    
+    @classmethod
+    def _is_free(cls, number: int) -> bool:
+        return not (
+            os.path.exists(f"/tmp/.X{number}-lock")
+            or os.path.exists(os.path.join(cls._SOCKET_DIR, f"X{number}"))
+        )
+    
+    @classmethod
+    def _find_free_number(cls, start: int = 99) -> int:
+        for number in range(start, start + 100):
+            if cls._is_free(number):
+                return number
+        raise DisplayError("找不到可用的 X 显示编号")
+    
+    def start(self, timeout: float = 10.0) -> "VirtualDisplay":
+        """
+        启动 Xvfb 并等待其就绪
+        
+        Args:
+            timeout: 等待 X 套接字出现的最长时间（秒）
+        
+        Returns:
+            VirtualDisplay: 自身，便于链式调用
+        
+        Raises:
+            DisplayError: Xvfb 未安装或启动失败时抛出
+        """
+        if shutil.which("Xvfb") is None:
+            raise DisplayError("未找到 Xvfb，请先安装 (如 apt install xvfb)")
+        
+        if self.number is None:
+            self.number = self._find_free_number()
+        
+        self._process = subprocess.Popen(
+            ["Xvfb", self.name, "-screen", "0", self.resolution, "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        socket_path = os.path.join(self._SOCKET_DIR, f"X{self.number}")
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(socket_path):
+            if self._process.poll() is not None:
+                raise DisplayError(f"Xvfb {self.name} 启动失败，退出码 {self._process.returncode}")
+            if time.monotonic() >= deadline:
+                self.stop()
+                raise DisplayError(f"Xvfb {self.name} 启动超时")
+            time.sleep(0.05)
+        
+        audit_logger.info(f"虚拟显示已启动: {self.name} ({self.resolution})")
+        return self
+    
+    def env(self) -> dict:
+        """返回绑定到该显示的子进程环境变量"""
+        env = dict(os.environ)
+        env["DISPLAY"] = self.name
+        return env
+    
+    def stop(self) -> None:
+        """关闭 Xvfb"""
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            audit_logger.info(f"虚拟显示已关闭: {self.name}")
+        self._process = None
+    
+    def __enter__(self) -> "VirtualDisplay":
+        return self.start()
+    
+    def __exit__(self, *exc) -> None:
+        self.stop()
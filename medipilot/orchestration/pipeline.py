@@ -0,0 +1,411 @@
+import time
+import queue
+import contextvars
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+from medipilot.perception.screen import Perception, PerceptionError
+from medipilot.perception import buffers
+from medipilot.cognition.engine import Brain, Prompts, CognitionError
+from medipilot.execution.action import Executor, ExecutionError
+from medipilot.execution.verify import AMBIGUOUS, FAILED, VERIFIED
+from medipilot.orchestration.checkpoint import Checkpoint, CheckpointError
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events
+from medipilot.utils import memory, metrics
+from medipilot.utils.profiling import IterationProfiler, default_profiler
+from configs.settings import config
+
+class PipelineAborted(Exception):
+    """
+    流水线被外部中止
+    
+    由调用方设置共享的中止事件触发（如批处理中另一会话紧急停止或用户按下 Ctrl+C），
+    在迭代边界抛出，当前任务视为未完成。
+    """
+    pass
+
+class PreparedFrame:
+    """
+    已完成预处理（稳定等待 -> 脱敏 -> SoM）的一帧截图
+    
+    Attributes:
+        image: 可直接发送给认知层的图像，感知失败时为 None
+        timings: 预处理各阶段耗时（毫秒）
+        error: 感知阶段异常（如有）
+        buffers: 预处理各阶段产生的整帧图像，认知阶段结束后归还缓冲池
+        raw: 稳定后的原始画面（脱敏与 SoM 之前），供续跑时与检查点画面比对
+    """
+    
+    def __init__(
+        self,
+        image: Optional[Image.Image],
+        timings: Dict[str, float],
+        error: Optional[PerceptionError] = None,
+        buffers: Optional[List[Image.Image]] = None,
+        raw: Optional[Image.Image] = None
+    ) -> None:
+        self.image = image
+        self.timings = timings
+        self.error = error
+        self.buffers = buffers or []
+        self.raw = raw
+    
+    def release(self) -> None:
+        """归还本帧占用的缓冲区（此后 image 可能被下一帧覆盖）"""
+        buffers.release(*self.buffers)
+        self.buffers = []
+        self.raw = None
+
+class AgentPipeline:
+    """
+    事件驱动的感知-认知-执行流水线
+    
+    感知预处理运行在独立的预取线程中：步骤 N 的动作执行完毕后立即发出就绪信号，
+    预取线程随即等待画面稳定并完成脱敏与 SoM 叠加，为步骤 N+1 准备好输入帧。
+    固定的 SCREENSHOT_DELAY 休眠被画面稳定检测取代（SCREENSHOT_DELAY 仅作为等待上限），
+    每次迭代结束后记录各阶段及端到端耗时。
+    传入检查点时，每个已确认的动作执行后保存任务状态；检查点中已有进度时从中断处续跑。
+    
+    Attributes:
+        perception: 感知层实例
+        brain: 认知层实例
+        executor: 执行层实例
+        task_desc: 任务描述
+        max_iterations: 最大迭代次数
+        iteration_count: 已执行的迭代次数
+        timings: 每次迭代的耗时记录（毫秒），包含各阶段与 total
+        memory: 每次迭代的内存记录：峰值 / 当前 RSS（MB）与整帧缓冲区新分配 / 复用次数
+        profiler: 按需剖析器，在每个迭代边界检查是否需要开始 / 结束剖析
+        checkpoint: 断点续跑检查点，None 表示不保存
+        llm_calls_saved: 本地校验确认连续录入而省去的模型调用次数
+        abort: 共享中止事件，置位后在下一个迭代边界抛出 PipelineAborted，None 表示不监听
+    """
+    
+    STAGES = ("settle", "privacy", "som", "llm", "execute")
+    
+    def __init__(
+        self,
+        perception: Perception,
+        brain: Brain,
+        executor: Executor,
+        task_desc: str,
+        max_iterations: int = 100,
+        profiler: Optional[IterationProfiler] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        abort: Optional[threading.Event] = None
+    ) -> None:
+        self.perception = perception
+        self.brain = brain
+        self.executor = executor
+        self.task_desc = task_desc
+        self.max_iterations = max_iterations
+        self.iteration_count = 0
+        self.timings: List[Dict[str, float]] = []
+        self.memory: List[Dict[str, float]] = []
+        self.profiler = profiler or default_profiler()
+        self.checkpoint = checkpoint
+        self.llm_calls_saved = 0
+        self.abort = abort
+        
+        self._frame_requested = threading.Event()
+        self._stop = threading.Event()
+        self._frames: "queue.Queue[PreparedFrame]" = queue.Queue()
+        self._requested_at = 0.0
+        # 主线程已等待稳定的画面 (image, 耗时毫秒)，预取线程直接使用，不再重复等待
+        self._settled: Optional[Tuple[Image.Image, float]] = None
+        self._next_iteration = 1
+        self._prefetch_thread: Optional[threading.Thread] = None
+        self._buffer_counts = buffers.counts()
+    
+    def _settle(self) -> Tuple[Image.Image, float]:
+        """
+        等待画面稳定
+        
+        Returns:
+            Tuple[Image.Image, float]: (稳定后的画面, 耗时毫秒)
+        
+        Raises:
+            PerceptionError: 截屏失败时抛出
+        """
+        with events.span("capture") as span:
+            image, stable = self.perception.wait_until_stable(
+                timeout=config.SCREENSHOT_DELAY,
+                interval=config.SETTLE_POLL_INTERVAL,
+                stable_frames=config.SETTLE_STABLE_FRAMES
+            )
+            span["stable"] = stable
+        return image, span["duration_ms"]
+    
+    def _prepare_frame(self, settled: Optional[Tuple[Image.Image, float]] = None) -> PreparedFrame:
+        """
+        等待画面稳定并完成本地预处理
+        
+        Args:
+            settled: 已等待稳定的画面及耗时，None 时在此等待
+        """
+        timings: Dict[str, float] = {}
+        images: List[Image.Image] = []
+        try:
+            image, timings["settle"] = settled or self._settle()
+            images.append(image)
+            
+            # 执行本地隐私脱敏 (不上传 PII 到云端)
+            with events.span("privacy") as span:
+                image = self.perception.privacy_filter(image)
+            timings["privacy"] = span["duration_ms"]
+            images.append(image)
+            
+            # 叠加 SoM 视觉锚点
+            with events.span("som") as span:
+                image = self.perception.apply_som_overlay(image)
+            timings["som"] = span["duration_ms"]
+            images.append(image)
+            
+            # 中间帧可能仍被录制等包装层引用，统一在认知阶段结束后归还
+            return PreparedFrame(image, timings, buffers=images, raw=images[0])
+        except PerceptionError as e:
+            buffers.release(*images)
+            return PreparedFrame(None, timings, error=e)
+    
+    def _prefetch_loop(self) -> None:
+        """预取线程：收到就绪信号后准备下一帧"""
+        while True:
+            self._frame_requested.wait()
+            self._frame_requested.clear()
+            if self._stop.is_set():
+                return
+            settled, self._settled = self._settled, None
+            with events.bind(iteration=self._next_iteration):
+                self._frames.put(self._prepare_frame(settled))
+    
+    def _request_frame(self, settled: Optional[Tuple[Image.Image, float]] = None) -> None:
+        """
+        发出就绪信号：上一步动作已落定，可以开始准备下一帧
+        
+        Args:
+            settled: 主线程已等待稳定的画面及耗时（写检查点时），预取线程从脱敏开始处理
+        """
+        # 端到端耗时从动作落定、开始等待稳定时计起
+        self._requested_at = time.perf_counter() - (settled[1] / 1000 if settled else 0.0)
+        # 预取的帧属于下一次迭代
+        self._next_iteration = self.iteration_count + 1
+        self._settled = settled
+        self._frame_requested.set()
+    
+    def _sample_memory(self) -> Dict[str, float]:
+        """
+        采样自上次采样以来的峰值 RSS 与整帧缓冲区分配次数，并重置峰值
+        
+        Linux 下峰值为本次迭代内的峰值（/proc/self/clear_refs），其他平台为进程生命周期峰值。
+        """
+        peak = memory.peak_rss_bytes()
+        rss = memory.rss_bytes()
+        memory.reset_peak_rss()
+        counts = buffers.counts()
+        sample = {
+            "buffers_allocated": counts["allocated"] - self._buffer_counts["allocated"],
+            "buffers_reused": counts["reused"] - self._buffer_counts["reused"],
+        }
+        self._buffer_counts = counts
+        if peak is not None:
+            sample["peak_rss_mb"] = peak / 1024 / 1024
+            metrics.ITERATION_PEAK_RSS.set(peak)
+        if rss is not None:
+            sample["rss_mb"] = rss / 1024 / 1024
+        return sample
+    
+    def _report(self, timings: Dict[str, float], requested_at: float) -> None:
+        """记录本次迭代的阶段耗时与端到端耗时（自就绪信号发出起计）以及内存占用"""
+        timings["total"] = (time.perf_counter() - requested_at) * 1000
+        self.timings.append(timings)
+        metrics.ITERATIONS.inc(outcome="ok")
+        metrics.ITERATION_SECONDS.observe(timings["total"] / 1000)
+        stages = " | ".join(
+            f"{stage}={timings[stage]:.0f}ms" for stage in self.STAGES if stage in timings
+        )
+        
+        sample = self._sample_memory()
+        self.memory.append(sample)
+        rss = f" | 峰值RSS={sample['peak_rss_mb']:.0f}MB" if "peak_rss_mb" in sample else ""
+        audit_logger.info(
+            f"迭代 #{self.iteration_count} 耗时: {stages} | total={timings['total']:.0f}ms{rss} | "
+            f"缓冲区 新分配={sample['buffers_allocated']} 复用={sample['buffers_reused']}"
+        )
+    
+    def _verification_note(self, typed: List[Dict[str, Any]], llm_ms: float) -> str:
+        """
+        汇总执行层的本地校验结果
+        
+        已确认的输入告知模型无需再核对；未生效或无法确认的输入交由模型在下一次迭代中核对。
+        一次计划连续录入了 n 个输入框时，省去了其余 n-1 次模型调用。
+        
+        Returns:
+            str: 附加在下一次操作提示词中的说明，没有校验结果时为空
+        """
+        saved = len(typed) - 1
+        if saved > 0:
+            self.llm_calls_saved += saved
+            metrics.LLM_CALLS_SAVED.inc(saved)
+            audit_logger.info(f"本地校验确认连续录入 {len(typed)} 项，省去 {saved} 次模型调用（约 {saved * llm_ms:.0f}ms）")
+        
+        lines = []
+        verified = [entry for entry in typed if entry.get("outcome") == VERIFIED]
+        if verified:
+            done = "; ".join(f"{entry['text']} @ {entry['coordinate']}" for entry in verified)
+            lines.append(f"以下输入已在本地确认录入（无需再次核对）: {done}")
+        for entry in typed:
+            if entry.get("outcome") in (FAILED, AMBIGUOUS):
+                reason = "未生效" if entry["outcome"] == FAILED else "无法在本地确认"
+                lines.append(f"上一步输入{reason}，请核对该输入框: {entry['text']} @ {entry['coordinate']}")
+        return "".join("\n" + line for line in lines)
+    
+    def summary(self) -> Dict[str, float]:
+        """
+        汇总所有迭代的平均耗时
+        
+        Returns:
+            dict: {阶段名: 平均耗时（毫秒）}
+        """
+        result: Dict[str, float] = {}
+        for stage in self.STAGES + ("total",):
+            samples = [t[stage] for t in self.timings if stage in t]
+            if samples:
+                result[stage] = sum(samples) / len(samples)
+        return result
+    
+    def start_prefetch(self) -> None:
+        """
+        启动预取线程并开始准备第一帧
+        
+        run() 会自动调用；提前调用可让首帧的稳定等待与预处理与调用方的其他工作
+        （如另一显示器上的报告提取）并行。之后未调用 run() 时需调用 stop()。
+        """
+        if self._prefetch_thread is not None:
+            return
+        # 预取线程继承调用方的事件上下文（如批处理的 job 字段）
+        self._prefetch_thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._prefetch_loop,),
+            name="FramePrefetch", daemon=True
+        )
+        self._prefetch_thread.start()
+        self._request_frame()
+    
+    def stop(self) -> None:
+        """停止预取线程"""
+        self._stop.set()
+        self._frame_requested.set()
+        if self._prefetch_thread is not None:
+            self._prefetch_thread.join(timeout=config.SCREENSHOT_DELAY + 1.0)
+    
+    def run(self) -> bool:
+        """
+        运行流水线直至任务完成或达到最大迭代次数
+        
+        Returns:
+            bool: 任务是否完成
+        
+        Raises:
+            EmergencyStop: 用户触发紧急停止时向上抛出
+            PipelineAborted: 共享中止事件被置位时抛出
+            CheckpointError: 续跑时当前画面与检查点不一致
+        """
+        resuming = self.checkpoint is not None and self.checkpoint.iteration > 0
+        if resuming:
+            # 迭代编号与上限从中断处延续，模型只需完成剩余部分
+            self.iteration_count = self.checkpoint.iteration
+            self.task_desc = self.checkpoint.resume_task(self.task_desc)
+            audit_logger.info(f"从检查点续跑 | 已完成迭代: {self.iteration_count} | 已录入: {len(self.checkpoint.filled)} 项")
+        self.start_prefetch()
+        # 上一步输入的本地校验结果，附加在下一次操作提示词中
+        verification = ""
+        
+        try:
+            while self.iteration_count < self.max_iterations:
+                if self.abort is not None and self.abort.is_set():
+                    audit_logger.warning(f"流水线已中止 | 已完成迭代: {self.iteration_count}")
+                    raise PipelineAborted(f"已完成 {self.iteration_count} 次迭代后中止")
+                self.iteration_count += 1
+                self.profiler.step(self.iteration_count)
+                audit_logger.info(f"\n--- 迭代 #{self.iteration_count} ---")
+                
+                # A. 感知阶段（由预取线程完成）
+                frame = self._frames.get()
+                requested_at = self._requested_at
+                timings = dict(frame.timings)
+                if frame.error is not None:
+                    audit_logger.error(f"感知阶段失败: {frame.error}")
+                    metrics.ITERATIONS.inc(outcome="perception_error")
+                    audit_logger.info("等待3秒后重试...")
+                    time.sleep(3)
+                    self._request_frame()
+                    continue
+                
+                if self.checkpoint is not None:
+                    if resuming:
+                        # 调用模型前先在本地确认界面仍是中断时的样子；
+                        # 检查点保存的是稳定后的原始画面，须与未脱敏、未叠加网格的同一阶段画面比对
+                        resuming = False
+                        try:
+                            self.checkpoint.verify(frame.raw)
+                        except CheckpointError:
+                            frame.release()
+                            raise
+                
+                # B. 认知决策阶段
+                start = time.perf_counter()
+                try:
+                    with events.bind(iteration=self.iteration_count):
+                        plan = self.brain.call_vision(frame.image, Prompts.operation(self.task_desc + verification))
+                except CognitionError as e:
+                    frame.release()
+                    audit_logger.error(f"认知阶段失败: {e}")
+                    metrics.ITERATIONS.inc(outcome="cognition_error")
+                    audit_logger.info("等待5秒后重试...")
+                    time.sleep(5)
+                    self._request_frame()
+                    continue
+                timings["llm"] = (time.perf_counter() - start) * 1000
+                # 图像已编码发送，归还缓冲区供下一帧复用
+                frame.release()
+                
+                # C. 执行阶段
+                is_finished = False
+                with events.span(
+                    "execute", iteration=self.iteration_count, action=plan.get("action")
+                ) as span:
+                    try:
+                        is_finished = self.executor.execute(plan)
+                    except ExecutionError as e:
+                        span["error"] = type(e).__name__
+                        audit_logger.error(f"执行阶段失败: {e}")
+                        audit_logger.info("继续下一次迭代...")
+                timings["execute"] = span["duration_ms"]
+                
+                typed = getattr(self.executor, "last_typed", None)
+                verification = self._verification_note(typed or [], timings.get("llm", 0.0))
+                settled = None
+                if self.checkpoint is not None:
+                    if is_finished:
+                        self.checkpoint.clear()
+                    elif self.executor.last_succeeded:
+                        # 动作与其落定后的画面在同一次写入中保存；这一帧随后交给预取线程继续处理
+                        try:
+                            with events.bind(iteration=self.iteration_count + 1):
+                                settled = self._settle()
+                        except PerceptionError as e:
+                            audit_logger.warning(f"动作后截屏失败，检查点保留上一帧画面: {e}")
+                        self.checkpoint.record(self.iteration_count, plan, typed, settled[0] if settled else None)
+                
+                if is_finished:
+                    self._report(timings, requested_at)
+                    return True
+                
+                # 动作已落定：立即开始准备下一帧，与耗时汇报并行
+                self._request_frame(settled)
+                self._report(timings, requested_at)
+            
+            return False
+        finally:
+            self.profiler.stop()
+            self.stop()
@@ -0,0 +1,354 @@
+"""
+会话录制与离线回放
+
+录制: python main.py --record sessions/demo
+    每次迭代的（脱敏后）截图、提示词、模型响应与耗时、执行的动作写入会话包:
+        session.json        元数据（任务、屏幕尺寸、迭代数）
+        iterations.jsonl    每次迭代一行
+        frames/NNNN.png     脱敏后的截图（不含 SoM 叠加）
+
+回放: python -m medipilot.orchestration.replay sessions/demo --latency-scale 0
+    ReplayPerception 代替截屏按序返回录制帧，ReplayBrain 代替模型按序返回录制响应
+    （按录制延迟或缩放后的延迟等待），执行层使用真实 Executor + 无副作用的 ReplayBackend。
+    无需显示器与 API，可在 CI 中比较吞吐量与感知 / 执行路径的回归。
+
+注意: 录制帧已经过本地脱敏，但仍属临床界面截图，会话包应按审计数据同等管理。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+from medipilot.perception.screen import Perception, PerceptionError
+from medipilot.cognition.engine import Brain, CognitionError, PROMPT_VERSION
+from medipilot.execution.action import Executor, InputBackend
+from medipilot.orchestration.pipeline import AgentPipeline
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events
+
+class ReplayError(Exception):
+    """录制 / 回放异常"""
+    pass
+
+class SessionRecorder:
+    """
+    会话录制器
+    
+    通过 perception() / brain() / executor() 包装真实组件后交给 AgentPipeline，
+    录制不改变组件行为。流水线中一帧的脱敏、模型调用与执行严格串行，
+    因此以最近一次脱敏输出作为本次模型调用对应的帧。
+    
+    Attributes:
+        path: 会话包目录
+        count: 已录制的迭代数
+    """
+    
+    def __init__(self, path: str, task_desc: str = "") -> None:
+        self.path = path
+        self.task_desc = task_desc
+        self.count = 0
+        self.screen_size: Optional[Tuple[int, int]] = None
+        os.makedirs(os.path.join(path, "frames"), exist_ok=True)
+        self._file = open(os.path.join(path, "iterations.jsonl"), "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._frame: Optional[Image.Image] = None
+        self._record: Optional[Dict[str, Any]] = None
+        self._started = time.time()
+    
+    def perception(self, perception: Perception) -> "_RecordingPerception":
+        return _RecordingPerception(perception, self)
+    
+    def brain(self, brain: Brain) -> "_RecordingBrain":
+        return _RecordingBrain(brain, self)
+    
+    def executor(self, executor: Executor) -> "_RecordingExecutor":
+        self.screen_size = tuple(executor.screen_size)
+        return _RecordingExecutor(executor, self)
+    
+    def _on_frame(self, image: Image.Image) -> None:
+        with self._lock:
+            self._frame = image
+    
+    def _on_response(self, prompt: str, response: Optional[Dict[str, Any]], llm_ms: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._write_pending()
+            self.count += 1
+            frame = None
+            if self._frame is not None:
+                frame = f"frames/{self.count:04d}.png"
+                self._frame.save(os.path.join(self.path, frame), format="PNG")
+                self._frame = None
+            self._record = {
+                "iteration": self.count, "frame": frame, "prompt": prompt,
+                "response": response, "llm_ms": llm_ms, "error": error,
+                **{k: v for k, v in events.current().items() if k in ("session", "job")}
+            }
+            if error is not None:
+                self._write_pending()
+    
+    def _on_execute(self, finished: bool, execute_ms: float) -> None:
+        with self._lock:
+            if self._record is not None:
+                self._record.update(finished=finished, execute_ms=execute_ms)
+            self._write_pending()
+    
+    def _write_pending(self) -> None:
+        if self._record is not None:
+            self._file.write(json.dumps(self._record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._record = None
+    
+    def close(self) -> None:
+        """写出剩余记录与会话元数据"""
+        with self._lock:
+            self._write_pending()
+            self._file.close()
+        meta = {
+            "version": 1,
+            "task": self.task_desc,
+            "session": events.SESSION_ID,
+            "created": self._started,
+            "screen_size": list(self.screen_size) if self.screen_size else None,
+            "iterations": self.count,
+            "prompt_version": PROMPT_VERSION,
+        }
+        with open(os.path.join(self.path, "session.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        audit_logger.info(f"会话已录制: {self.path} ({self.count} 次迭代)")
+
+class _Wrapped:
+    """将未录制的属性透传给被包装的组件"""
+    
+    def __init__(self, inner: Any, recorder: SessionRecorder) -> None:
+        self._inner = inner
+        self._recorder = recorder
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+class _RecordingPerception(_Wrapped):
+    def privacy_filter(self, image: Image.Image, *args: Any, **kwargs: Any) -> Image.Image:
+        filtered = self._inner.privacy_filter(image, *args, **kwargs)
+        self._recorder._on_frame(filtered)
+        return filtered
+
+class _RecordingBrain(_Wrapped):
+    def call_vision(self, image: Image.Image, prompt: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            response = self._inner.call_vision(image, prompt)
+        except CognitionError as e:
+            self._recorder._on_response(prompt, None, (time.perf_counter() - start) * 1000, error=str(e))
+            raise
+        self._recorder._on_response(prompt, response, (time.perf_counter() - start) * 1000)
+        return response
+
+class _RecordingExecutor(_Wrapped):
+    def execute(self, plan: Dict[str, Any]) -> bool:
+        start = time.perf_counter()
+        finished = False
+        try:
+            finished = self._inner.execute(plan)
+            return finished
+        finally:
+            self._recorder._on_execute(finished, (time.perf_counter() - start) * 1000)
+
+def load_session(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    读取会话包
+    
+    Returns:
+        Tuple[dict, List[dict]]: (元数据, 迭代记录)
+    
+    Raises:
+        ReplayError: 会话包不存在或格式错误时抛出
+    """
+    try:
+        with open(os.path.join(path, "session.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "iterations.jsonl"), encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except (OSError, json.JSONDecodeError) as e:
+        raise ReplayError(f"无法读取会话包 {path}: {e}")
+    if not records:
+        raise ReplayError(f"会话包 {path} 中没有迭代记录")
+    return meta, records
+
+class ReplayPerception(Perception):
+    """
+    按序返回录制帧的感知层
+    
+    每次 wait_until_stable 切换到下一帧，随后走真实的稳定检测、脱敏与 SoM 路径。
+    录制帧用尽后重复最后一帧。
+    """
+    
+    def __init__(self, frames: List[Optional[str]]) -> None:
+        super().__init__(headless=True)
+        self.frames = frames
+        self._index = -1
+        self._cached: Tuple[int, Optional[Image.Image]] = (-1, None)
+    
+    def capture(self) -> Image.Image:
+        index = min(max(self._index, 0), len(self.frames) - 1)
+        if self._cached[0] == index:
+            return self._cached[1]
+        # 录制时缺帧则沿用前一帧
+        path = next((self.frames[i] for i in range(index, -1, -1) if self.frames[i]), None)
+        if path is None:
+            raise PerceptionError("会话包中没有可用的截图")
+        try:
+            with Image.open(path) as f:
+                image = f.convert("RGB")
+        except OSError as e:
+            raise PerceptionError(f"无法读取录制帧 {path}: {e}")
+        self._cached = (index, image)
+        return image
+    
+    def wait_until_stable(self, timeout: float, interval: float = 0.1, stable_frames: int = 2) -> Tuple[Image.Image, bool]:
+        self._index += 1
+        return super().wait_until_stable(timeout, interval=interval, stable_frames=stable_frames)
+
+class ReplayBrain(Brain):
+    """
+    按序返回录制响应的认知层
+    
+    保留真实的图像编码路径，模型调用以录制延迟 × latency_scale 的等待代替。
+    提示词与录制不一致时计入 prompt_mismatches（如提示词模板被修改）。
+    
+    Attributes:
+        records: 迭代记录
+        latency_scale: 延迟缩放系数，0 表示不等待
+        prompt_mismatches: 提示词不一致的次数
+    """
+    
+    def __init__(self, records: List[Dict[str, Any]], latency_scale: float = 1.0) -> None:
+        self.records = records
+        self.latency_scale = latency_scale
+        self.model = "replay"
+        self.archive = None
+        self.prompt_mismatches = 0
+        self._index = 0
+    
+    def call_vision(self, image: Image.Image, prompt: str) -> Dict[str, Any]:
+        record = self.records[min(self._index, len(self.records) - 1)]
+        self._index += 1
+        with events.span("encode") as span:
+            span["payload_bytes"] = len(self._encode_image(image))
+        with events.span("llm", model=self.model):
+            if self.latency_scale > 0:
+                time.sleep(record.get("llm_ms", 0.0) / 1000 * self.latency_scale)
+        if record.get("prompt") != prompt:
+            self.prompt_mismatches += 1
+        if record.get("error") is not None:
+            raise CognitionError(record["error"])
+        return dict(record["response"])
+
+class ReplayBackend(InputBackend):
+    """
+    无副作用的输入后端：记录动作而不驱动鼠标键盘
+    
+    Attributes:
+        calls: 动作记录，如 ("click", 100, 200)
+    """
+    
+    name = "replay"
+    
+    def __init__(self, screen_size: Tuple[int, int] = (1920, 1080)) -> None:
+        self._screen_size = tuple(screen_size)
+        self._position = (self._screen_size[0] // 2, self._screen_size[1] // 2)
+        self.calls: List[Tuple[Any, ...]] = []
+    
+    def screen_size(self) -> Tuple[int, int]:
+        return self._screen_size
+    
+    def position(self) -> Tuple[int, int]:
+        return self._position
+    
+    def move_to(self, x: int, y: int) -> None:
+        self._position = (x, y)
+        self.calls.append(("move", x, y))
+    
+    def click(self, x: Optional[int] = None, y: Optional[int] = None) -> None:
+        self.calls.append(("click", x, y))
+    
+    def write(self, text: str) -> None:
+        self.calls.append(("write", text))
+    
+    def scroll(self, amount: int) -> None:
+        self.calls.append(("scroll", amount))
+
+def replay(path: str, latency_scale: float = 1.0, max_iterations: Optional[int] = None) -> Dict[str, Any]:
+    """
+    回放会话包并汇总性能
+    
+    Args:
+        path: 会话包目录
+        latency_scale: 模型延迟缩放系数
+        max_iterations: 最大迭代次数，默认为录制的迭代数
+    
+    Returns:
+        dict: iterations、elapsed_s、iterations_per_s、各阶段平均耗时 (stages)、
+              注入的输入事件数、提示词不一致次数、是否与录制一样完成任务
+    
+    Raises:
+        ReplayError: 会话包无效时抛出
+    """
+    meta, records = load_session(path)
+    frames = [os.path.join(path, r["frame"]) if r.get("frame") else None for r in records]
+    perception = ReplayPerception(frames)
+    brain = ReplayBrain(records, latency_scale=latency_scale)
+    backend = ReplayBackend(tuple(meta.get("screen_size") or (1920, 1080)))
+    executor = Executor(backend=backend)
+    pipeline = AgentPipeline(
+        perception, brain, executor, meta.get("task", ""),
+        max_iterations=max_iterations or len(records)
+    )
+    
+    start = time.perf_counter()
+    with events.bind(replay=os.path.basename(os.path.normpath(path))):
+        finished = pipeline.run()
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "bundle": path,
+        "finished": finished,
+        "recorded_finished": any(r.get("finished") for r in records),
+        "iterations": pipeline.iteration_count,
+        "elapsed_s": elapsed,
+        "iterations_per_s": pipeline.iteration_count / elapsed if elapsed > 0 else 0.0,
+        "stages": pipeline.summary(),
+        "input_events": len(backend.calls),
+        "prompt_mismatches": brain.prompt_mismatches,
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="离线回放录制的会话并汇总性能")
+    parser.add_argument("bundle", help="会话包目录")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="模型延迟缩放系数，0 表示不等待")
+    parser.add_argument("--max-iterations", type=int, help="最大迭代次数（默认为录制的迭代数）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args(argv)
+    
+    try:
+        result = replay(args.bundle, latency_scale=args.latency_scale, max_iterations=args.max_iterations)
+    except ReplayError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    print(f"会话包: {result['bundle']}")
+    print(f"迭代: {result['iterations']} | 耗时: {result['elapsed_s']:.2f}s | "
+          f"吞吐: {result['iterations_per_s']:.2f} 次/秒")
+    print(" | ".join(f"{stage}={ms:.0f}ms" for stage, ms in result["stages"].items()))
+    if result["prompt_mismatches"]:
+        print(f"⚠️  {result['prompt_mismatches']} 次提示词与录制不一致")
+    if result["finished"] != result["recorded_finished"]:
+        print("⚠️  任务完成状态与录制不一致")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from PIL import Image
+from medipilot.perception.screen import Perception
+from medipilot.perception.stitch import stitch_pages, tile_image
+from medipilot.perception.buffers import release
+from medipilot.cognition.engine import Brain, Prompts
+from medipilot.cognition.terminology import default_terminology
+from medipilot.cognition.tiled import TiledVision
+from medipilot.execution.action import Executor
+from medipilot.utils.findings_store import FindingsStore, report_hash
+from medipilot.utils.logger import audit_logger
+from configs.settings import config
+
+def capture_report(
+    perception: Perception,
+    executor: Executor,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    max_pages: Optional[int] = None
+) -> Tuple[Image.Image, int]:
+    """
+    滚动报告区域并拼接为一张去重长图
+    
+    Args:
+        perception: 感知层实例
+        executor: 执行层实例（负责在报告区域内滚动）
+        region: 报告区域 (y1, y2, x1, x2)，默认使用配置中的 REPORT_PANE_REGION（整屏）
+        max_pages: 最多截取的页数，默认使用配置中的 REPORT_MAX_PAGES
+    
+    Returns:
+        Tuple[Image.Image, int]: (拼接后的长图, 截取页数)
+    """
+    region = region or config.REPORT_PANE_REGION
+    if region is None:
+        width, height = executor.screen_size
+        region_center = (width // 2, height // 2)
+    else:
+        y1, y2, x1, x2 = region
+        region_center = ((x1 + x2) // 2, (y1 + y2) // 2)
+    
+    pages = perception.capture_scrolling(
+        lambda: executor.scroll_at(*region_center, config.REPORT_SCROLL_AMOUNT),
+        region=region,
+        max_pages=max_pages or config.REPORT_MAX_PAGES
+    )
+    return stitch_pages(pages), len(pages)
+
+def merge_findings(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    合并多个分块的提取结果：同一指标出现在重叠区域时保留置信度最高的一条（别名按术语表视为同一指标）
+    
+    Args:
+        results: 各分块的模型输出
+    
+    Returns:
+        List[dict]: 去重后的指标列表（保持首次出现的顺序）
+    """
+    terminology = default_terminology()
+    merged: Dict[str, Dict[str, Any]] = {}
+    for result in results:
+        for finding in result.get("findings") or []:
+            key = terminology.metric_key(finding.get("metric", ""))
+            if not key:
+                continue
+            current = merged.get(key)
+            if current is None or (finding.get("confidence") or 0) > (current.get("confidence") or 0):
+                merged[key] = finding
+    return list(merged.values())
+
+def extract_cached(
+    store: Optional[FindingsStore],
+    image: Image.Image,
+    extract: Callable[[], Dict[str, Any]],
+    report_id: Optional[str] = None,
+    source: Optional[str] = None,
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    先查询提取结果存储，未命中时再调用 extract 并保存结果
+    
+    Args:
+        store: 提取结果存储，None 表示不存储、不复用
+        image: 用于计算内容哈希的化验单图像（已脱敏、未叠加 SoM）
+        extract: 实际调用模型的提取函数，返回 {"findings", "errors", ...}
+        report_id: 报告编号（重新扫描的纸质报告内容哈希不同，可按编号命中）
+        source: 来源说明（如 screen / report / 文件路径），仅用于留存
+        model: 提取模型名称，仅用于留存
+    
+    Returns:
+        dict: extract 的返回值，附加 "cached" 与 "report_hash"；命中时 findings 来自存储、errors 为空
+    """
+    if store is None:
+        result = extract()
+        result["cached"] = False
+        return result
+    
+    digest = report_hash(image)
+    cached = store.lookup(digest, report_id)
+    if cached is not None:
+        return {
+            "findings": cached["findings"], "scan_quality": cached["scan_quality"],
+            "errors": [], "cached": True, "report_hash": cached["report_hash"],
+        }
+    
+    result = extract()
+    # 部分分块失败时结果不完整，不保存，下次重新提取
+    if result.get("findings") and not result.get("errors"):
+        store.save(
+            digest, result["findings"], report_id=report_id, source=source,
+            model=model, scan_quality=result.get("scan_quality")
+        )
+    result.update({"cached": False, "report_hash": digest})
+    return result
+
+def extract_report(
+    perception: Perception,
+    brain: Brain,
+    executor: Executor,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    store: Optional[FindingsStore] = None,
+    report_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    多页化验单一次性提取：滚动拼接 -> 按模型输入尺寸分块 -> 逐块提取 -> 合并
+    
+    相比每屏一次 `call_vision`，重叠像素只发送一次，通常一到两次模型调用即可覆盖整份报告。
+    
+    Args:
+        perception: 感知层实例
+        brain: 认知层实例
+        executor: 执行层实例
+        region: 报告区域 (y1, y2, x1, x2)
+        store: 提取结果存储，已核验的同一份报告直接复用，不调用模型
+        report_id: 报告编号
+    
+    Returns:
+        dict: {"findings": [...], "pages": 截取页数, "tiles": 模型调用次数, "errors": [...], "cached": 是否复用}
+    """
+    stitched, page_count = capture_report(perception, executor, region)
+    
+    def _extract() -> Dict[str, Any]:
+        tiles = tile_image(stitched, config.MODEL_TILE_HEIGHT)
+        audit_logger.info(
+            f"报告拼接完成 | 页数: {page_count} | 长图尺寸: {stitched.size} | 分块: {len(tiles)}"
+        )
+        results = []
+        errors = []
+        for tile in tiles:
+            result = brain.call_vision(perception.apply_som_overlay(tile), Prompts.extraction())
+            if result.get("action") == "error":
+                errors.append(result)
+                continue
+            results.append(result)
+        
+        findings = merge_findings(results)
+        audit_logger.info(f"报告提取完成 | 指标: {len(findings)} | 失败分块: {len(errors)}")
+        return {"findings": findings, "tiles": len(tiles), "errors": errors}
+    
+    result = extract_cached(
+        store, stitched, _extract, report_id=report_id, source="report", model=getattr(brain, "model", None)
+    )
+    result["pages"] = page_count
+    result.setdefault("tiles", 0)
+    return result
+
+
+def extract_screen(
+    perception: Perception,
+    vision: TiledVision,
+    store: Optional[FindingsStore] = None,
+    report_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    高分辨率整屏分块提取：等待画面稳定 -> 整屏脱敏 -> 分块并发提取 -> 合并到整屏坐标
+    
+    适用于 4K / 多显示器：每个分块按原分辨率发送，小号数字不会因整帧缩放而无法辨认；
+    空白分块不发送，与上一次调用相比未变化的分块复用上次结果。
+    
+    Args:
+        perception: 感知层实例
+        vision: 分块视觉提取器（跨调用保留分块签名与结果）
+        store: 提取结果存储，已核验的同一屏报告直接复用，不调用模型
+        report_id: 报告编号
+    
+    Returns:
+        dict: {"findings": [...], "tiles": {状态: 块数}, "errors": [...], "cached": 是否复用}
+    """
+    frame, _ = perception.wait_until_stable(
+        timeout=config.SCREENSHOT_DELAY,
+        interval=config.SETTLE_POLL_INTERVAL,
+        stable_frames=config.SETTLE_STABLE_FRAMES
+    )
+    # 隐私区域按整屏坐标配置，必须在分块之前脱敏
+    filtered = perception.privacy_filter(frame)
+    try:
+        result = extract_cached(
+            store, filtered, lambda: vision.extract(filtered), report_id=report_id,
+            source="screen", model=getattr(vision.brain, "model", None)
+        )
+        result.setdefault("tiles", {})
+        return result
+    finally:
+        release(filtered, frame)
@@ -0,0 +1,192 @@
+"""
+双显示器会话：报告显示器提取 + EMR 显示器操作
+
+临床工作站常见的布局是一台显示器打开化验单、另一台显示器打开电子病历。
+按角色配置显示器 (REPORT_MONITOR / EMR_MONITOR) 后:
+- 报告显示器只做提取（一次 Prompts.extraction 调用，或传入 TiledVision 做高分辨率分块提取）；
+- EMR 显示器运行操作流水线，执行层绑定 EMR 显示器，模型给出的局部坐标加上显示器偏移后注入；
+- EMR 流水线的预取线程在报告提取期间就开始等待首帧稳定并完成预处理，两台显示器的工作并行进行；
+- 传入提取结果存储时，已核验过的同一屏报告直接复用存储中的结果，不调用模型；
+- 传入检查点时，提取结果随检查点保存，续跑时直接使用，不再重新提取。
+"""
+import time
+from typing import Any, Dict, List, Optional
+from medipilot.perception.screen import Perception
+from medipilot.perception.buffers import release
+from medipilot.cognition.engine import Brain, Prompts
+from medipilot.cognition.tiled import TiledVision
+from medipilot.cognition.terminology import default_terminology
+from medipilot.execution.action import Executor
+from medipilot.orchestration.pipeline import AgentPipeline
+from medipilot.orchestration.checkpoint import Checkpoint
+from medipilot.orchestration.report import extract_cached, extract_screen
+from medipilot.utils.findings_store import FindingsStore
+from medipilot.utils.logger import audit_logger
+from configs.settings import config
+
+class SplitScreenError(Exception):
+    """双显示器会话异常"""
+    pass
+
+def describe_findings(findings: List[Dict[str, Any]]) -> str:
+    """
+    将提取结果格式化为操作任务中的待录入数据，如 "白细胞计数(WBC)=7.2 10^9/L; 血红蛋白(HGB)=135 g/L"
+    
+    名称与单位先按本地术语表统一（"Hgb 13.5 g/dL" -> "血红蛋白(HGB)=135 g/L"），操作模型无需自行换算；
+    未识别的指标或无法换算的单位按化验单原文给出。
+    """
+    parts = []
+    for finding in default_terminology().normalize(findings):
+        name = finding.get("metric") if finding["code"] is None else f"{finding['name']}({finding['code']})"
+        if finding["std_value"] is not None:
+            text = f"{name}={finding['std_value']:g} {finding['std_unit']}"
+        else:
+            text = f"{name}={finding.get('value')}"
+            if finding.get("unit"):
+                text += f" {finding['unit']}"
+        parts.append(text)
+    return "; ".join(parts)
+
+class SplitScreenSession:
+    """
+    双显示器会话
+    
+    Attributes:
+        report: 报告显示器的感知层
+        emr: EMR 显示器的感知层
+        brain: 认知层（两条流水线共用，OpenAI 客户端线程安全）
+        executor: 执行层（绑定到 EMR 显示器）
+        task_desc: 操作任务描述，提取结果会追加在其后
+        vision: 报告显示器的分块提取器，None 表示整屏一次提取
+        store: 提取结果存储，None 表示不存储、不复用
+        checkpoint: 断点续跑检查点，None 表示不保存
+        findings: 本次会话使用的提取结果，run() 提取完成前为 None
+        pipeline: EMR 显示器上的操作流水线
+    """
+    
+    def __init__(
+        self,
+        report: Perception,
+        emr: Perception,
+        brain: Brain,
+        executor: Executor,
+        task_desc: str,
+        vision: Optional[TiledVision] = None,
+        max_iterations: int = 100,
+        store: Optional[FindingsStore] = None,
+        checkpoint: Optional[Checkpoint] = None
+    ) -> None:
+        self.report = report
+        self.emr = emr
+        self.brain = brain
+        self.executor = executor
+        self.task_desc = task_desc
+        self.vision = vision
+        self.store = store
+        self.checkpoint = checkpoint
+        self.findings: Optional[List[Dict[str, Any]]] = None
+        self.pipeline = AgentPipeline(
+            emr, brain, executor, task_desc, max_iterations=max_iterations, checkpoint=checkpoint
+        )
+    
+    def check_layout(self) -> Dict[str, Dict[str, int]]:
+        """
+        并发截取两台显示器，确认角色对应的显示器存在并可截屏
+        
+        Returns:
+            dict: {"report": 几何信息, "emr": 几何信息}
+        
+        Raises:
+            PerceptionError: 显示器不存在或截屏失败时抛出
+        """
+        layout = {"report": self.report.monitor_geometry(), "emr": self.emr.monitor_geometry()}
+        images = self.report.capture_monitors([self.report.monitor, self.emr.monitor])
+        release(*images.values())
+        audit_logger.info(
+            f"双显示器布局 | 报告: #{self.report.monitor} {layout['report']} | "
+            f"EMR: #{self.emr.monitor} {layout['emr']}"
+        )
+        return layout
+    
+    def extract(self) -> List[Dict[str, Any]]:
+        """
+        提取报告显示器上的指标
+        
+        Returns:
+            List[dict]: 模型返回的 findings
+        
+        Raises:
+            SplitScreenError: 提取失败或未提取到任何指标时抛出
+            PerceptionError: 截屏失败时抛出
+        """
+        start = time.perf_counter()
+        if self.vision is not None:
+            result = extract_screen(self.report, self.vision, store=self.store)
+            if result["errors"] and not result["findings"]:
+                raise SplitScreenError(f"报告显示器分块提取全部失败: {result['errors'][0].get('reason')}")
+        else:
+            frame, _ = self.report.wait_until_stable(
+                timeout=config.SCREENSHOT_DELAY,
+                interval=config.SETTLE_POLL_INTERVAL,
+                stable_frames=config.SETTLE_STABLE_FRAMES
+            )
+            filtered = self.report.privacy_filter(frame)
+            
+            def _extract() -> Dict[str, Any]:
+                marked = self.report.apply_som_overlay(filtered)
+                try:
+                    result = self.brain.call_vision(marked, Prompts.extraction())
+                finally:
+                    release(marked)
+                if result.get("action") == "error":
+                    return {"findings": [], "errors": [result]}
+                result.setdefault("errors", [])
+                return result
+            
+            try:
+                result = extract_cached(
+                    self.store, filtered, _extract, source="screen", model=getattr(self.brain, "model", None)
+                )
+            finally:
+                release(filtered, frame)
+            if result["errors"]:
+                error = result["errors"][0]
+                raise SplitScreenError(f"报告显示器提取失败 [{error.get('error_type')}]: {error.get('reason')}")
+        
+        findings = result.get("findings") or []
+        if not findings:
+            raise SplitScreenError("报告显示器上未提取到任何指标")
+        audit_logger.info(
+            f"报告显示器提取完成 | 指标: {len(findings)} | 复用存储: {'是' if result.get('cached') else '否'} | "
+            f"耗时: {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return findings
+    
+    def run(self) -> bool:
+        """
+        提取报告显示器上的指标，并在 EMR 显示器上完成录入
+        
+        Returns:
+            bool: 任务是否完成
+        
+        Raises:
+            SplitScreenError: 报告提取失败时抛出
+            EmergencyStop: 用户触发紧急停止时向上抛出
+        """
+        # EMR 首帧的稳定等待、脱敏与 SoM 与报告提取并行
+        self.pipeline.start_prefetch()
+        if self.checkpoint is not None and self.checkpoint.findings:
+            findings = self.checkpoint.findings
+            audit_logger.info(f"使用检查点中的提取结果 | 指标: {len(findings)}")
+        else:
+            try:
+                findings = self.extract()
+            except Exception:
+                self.pipeline.stop()
+                raise
+            if self.checkpoint is not None:
+                self.checkpoint.set_findings(findings)
+        self.findings = findings
+        
+        self.pipeline.task_desc = f"{self.task_desc}\n已从报告显示器提取的数据（以此为准）: {describe_findings(findings)}"
+        return self.pipeline.run()
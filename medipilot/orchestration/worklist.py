@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import queue
+import shlex
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+from medipilot.perception.screen import Perception
+from medipilot.cognition.engine import Brain
+from medipilot.cognition.pool import CognitionPool
+from medipilot.execution.action import Executor, EmergencyStop, create_backend
+from medipilot.execution.verify import default_verifier
+from medipilot.orchestration.display import VirtualDisplay
+from medipilot.orchestration.pipeline import AgentPipeline, PipelineAborted
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events
+from medipilot.utils.stats import summarize
+from configs.settings import config
+
+class WorklistError(Exception):
+    """批处理工作列表异常"""
+    pass
+
+class WorklistJob:
+    """
+    工作列表中的单个任务
+    
+    病人标识只用于在本地打开对应病历（EMR_OPEN_CMD），不会写入发送给大模型的任务描述。
+    
+    Attributes:
+        job_id: 任务唯一标识
+        report: 化验单来源（文件路径或 URL）
+        patient_id: 目标病人标识
+        task: 自定义任务描述，缺省使用配置中的 TASK_DESCRIPTION
+    """
+    
+    def __init__(self, job_id: str, report: str, patient_id: str, task: Optional[str] = None) -> None:
+        self.job_id = job_id
+        self.report = report
+        self.patient_id = patient_id
+        self.task = task
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WorklistJob":
+        """
+        从字典构建任务
+        
+        Raises:
+            WorklistError: 缺少必需字段时抛出
+        """
+        missing = [key for key in ("job_id", "report", "patient_id") if not data.get(key)]
+        if missing:
+            raise WorklistError(f"任务缺少必需字段: {', '.join(missing)} | {data}")
+        return cls(str(data["job_id"]), str(data["report"]), str(data["patient_id"]), data.get("task"))
+    
+    @property
+    def task_desc(self) -> str:
+        return self.task or config.TASK_DESCRIPTION
+
+def load_jobs(path: str) -> List[WorklistJob]:
+    """
+    读取 JSONL 格式的工作列表（每行一个任务）
+    
+    Args:
+        path: 工作列表文件路径
+    
+    Returns:
+        List[WorklistJob]: 任务列表
+    
+    Raises:
+        WorklistError: 文件格式错误或任务 ID 重复时抛出
+    """
+    jobs: List[WorklistJob] = []
+    seen: Set[str] = set()
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                job = WorklistJob.from_dict(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise WorklistError(f"{path}:{line_no} JSON 格式错误: {e}")
+            if job.job_id in seen:
+                raise WorklistError(f"{path}:{line_no} 任务 ID 重复: {job.job_id}")
+            seen.add(job.job_id)
+            jobs.append(job)
+    return jobs
+
+class WorklistState:
+    """
+    追加写入的任务状态文件 (JSONL)，用于断点续跑
+    
+    每次状态变化追加一条记录，同一任务以最后一条为准。
+    进程中断后重新运行时，已完成 (done) 的任务会被跳过，其余任务重新执行。
+    
+    Attributes:
+        path: 状态文件路径
+    """
+    
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """读取每个任务的最新状态记录"""
+        records: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程崩溃可能留下半行记录，忽略即可
+                    continue
+                records[record["job_id"]] = record
+        return records
+    
+    def completed_ids(self) -> Set[str]:
+        return {job_id for job_id, r in self.load().items() if r.get("status") == "done"}
+    
+    def record(self, job_id: str, status: str, **fields: Any) -> None:
+        """追加一条状态记录并立即落盘"""
+        record = {"job_id": job_id, "status": status, "timestamp": datetime.now().isoformat()}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+class WorklistMetrics:
+    """批处理吞吐、单任务延迟与失败统计（线程安全）"""
+    
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.latencies: List[float] = []
+        self.failures: Dict[str, int] = {}
+        self.done = 0
+        self.aborted = 0
+    
+    def job_done(self, latency: float) -> None:
+        with self._lock:
+            self.done += 1
+            self.latencies.append(latency)
+    
+    def job_failed(self, reason: str, latency: float) -> None:
+        with self._lock:
+            self.failures[reason] = self.failures.get(reason, 0) + 1
+            self.latencies.append(latency)
+    
+    def job_aborted(self) -> None:
+        """任务因其他会话紧急停止或用户中止而未完成（不计入失败，续跑时重新执行）"""
+        with self._lock:
+            self.aborted += 1
+    
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            failed = sum(self.failures.values())
+            return {
+                "done": self.done,
+                "failed": failed,
+                "failures": dict(self.failures),
+                "emergency_stops": self.failures.get("emergency_stop", 0),
+                "aborted": self.aborted,
+                "elapsed_seconds": elapsed,
+                "throughput_per_hour": self.done / elapsed * 3600 if elapsed > 0 else 0.0,
+                "latency_seconds": summarize(self.latencies),
+            }
+
+def _launch(template: str, env: Dict[str, str], **fields: str) -> Optional[subprocess.Popen]:
+    """按命令模板启动子进程（先分词再填充字段，路径含空格也安全）"""
+    if not template:
+        return None
+    args = [arg.format(**fields) for arg in shlex.split(template)]
+    return subprocess.Popen(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def _terminate(process: Optional[subprocess.Popen]) -> None:
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+class WorklistSession:
+    """
+    独立的代理会话：独占一个 Xvfb 虚拟显示及各自的 Perception / Executor
+    
+    Attributes:
+        index: 会话编号
+        cognition: 共享认知池
+        display: 会话绑定的虚拟显示
+    """
+    
+    def __init__(self, index: int, cognition: CognitionPool) -> None:
+        self.index = index
+        self.cognition = cognition
+        self.display: Optional[VirtualDisplay] = None
+        self.perception: Optional[Perception] = None
+        self.executor: Optional[Executor] = None
+    
+    def start(self) -> None:
+        """启动虚拟显示并初始化感知层与执行层"""
+        self.display = VirtualDisplay().start()
+        self.perception = Perception(display=self.display.name)
+        # PyAutoGUI 只能操作进程级的 $DISPLAY，多会话必须使用可绑定显示的 XTEST 后端
+        self.executor = Executor(
+            backend=create_backend("xtest", display_name=self.display.name),
+            verifier=default_verifier(self.perception.capture_region)
+        )
+    
+    def run_job(self, job: WorklistJob, abort: Optional[threading.Event] = None) -> bool:
+        """
+        在本会话的显示上打开病历与化验单并运行流水线
+        
+        Args:
+            job: 待执行的任务
+            abort: 全部会话共享的中止事件，置位后流水线在下一个迭代边界退出
+        
+        Returns:
+            bool: 任务是否完成
+        
+        Raises:
+            PipelineAborted: 中止事件被置位时抛出
+        """
+        env = self.display.env()
+        emr = _launch(config.EMR_OPEN_CMD, env, patient_id=job.patient_id, report=job.report)
+        viewer = _launch(config.REPORT_VIEWER_CMD, env, patient_id=job.patient_id, report=job.report)
+        try:
+            pipeline = AgentPipeline(self.perception, self.cognition, self.executor, job.task_desc, abort=abort)
+            with events.bind(job=job.job_id, worker=self.index):
+                finished = pipeline.run()
+            audit_logger.info(
+                f"[{job.job_id}] 会话 #{self.index} 结束 | 迭代: {pipeline.iteration_count} | "
+                f"完成: {'是' if finished else '否'}"
+            )
+            return finished
+        finally:
+            _terminate(viewer)
+            _terminate(emr)
+    
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.close()
+        if self.display is not None:
+            self.display.stop()
+
+class WorklistScheduler:
+    """
+    工作列表调度器：N 个独立会话并行消费任务队列，共享一个限速认知池
+    
+    Attributes:
+        jobs: 全部任务
+        state: 任务状态文件（断点续跑）
+        sessions: 并行会话数
+        cognition: 共享认知池
+        metrics: 吞吐与延迟统计
+    """
+    
+    def __init__(
+        self,
+        jobs: List[WorklistJob],
+        state_path: str,
+        sessions: Optional[int] = None,
+        cognition: Optional[CognitionPool] = None
+    ) -> None:
+        self.jobs = jobs
+        self.state = WorklistState(state_path)
+        self.sessions = sessions or config.WORKLIST_SESSIONS
+        self.cognition = cognition or CognitionPool(Brain())
+        self.metrics = WorklistMetrics()
+        self._stop = threading.Event()
+    
+    def pending_jobs(self) -> List[WorklistJob]:
+        """未完成的任务（已完成的任务在续跑时跳过）"""
+        completed = self.state.completed_ids()
+        return [job for job in self.jobs if job.job_id not in completed]
+    
+    def _worker(self, session: WorklistSession, jobs: "queue.Queue[WorklistJob]") -> None:
+        while not self._stop.is_set():
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                return
+            
+            self.state.record(job.job_id, "running", session=session.index)
+            start = time.monotonic()
+            try:
+                finished = session.run_job(job, self._stop)
+            except EmergencyStop as e:
+                # 先置位共享事件，其他会话的流水线在各自的下一个迭代边界退出
+                self._stop.set()
+                latency = time.monotonic() - start
+                audit_logger.warning(f"[{job.job_id}] 🛑 紧急停止，终止全部会话: {e}")
+                self.state.record(job.job_id, "failed", error="emergency_stop", latency_seconds=latency)
+                self.metrics.job_failed("emergency_stop", latency)
+                return
+            except PipelineAborted as e:
+                audit_logger.warning(f"[{job.job_id}] 会话 #{session.index} 已中止: {e}")
+                self.state.record(job.job_id, "failed", error="aborted")
+                self.metrics.job_aborted()
+                return
+            except Exception as e:
+                latency = time.monotonic() - start
+                audit_logger.error(f"[{job.job_id}] 任务失败: {e}")
+                self.state.record(job.job_id, "failed", error=type(e).__name__,
+                                  detail=str(e), latency_seconds=latency)
+                self.metrics.job_failed(type(e).__name__, latency)
+                continue
+            
+            latency = time.monotonic() - start
+            if finished:
+                self.state.record(job.job_id, "done", latency_seconds=latency)
+                self.metrics.job_done(latency)
+            else:
+                self.state.record(job.job_id, "failed", error="max_iterations", latency_seconds=latency)
+                self.metrics.job_failed("max_iterations", latency)
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        运行所有未完成任务
+        
+        Returns:
+            dict: 批处理汇总统计
+        """
+        pending = self.pending_jobs()
+        skipped = len(self.jobs) - len(pending)
+        audit_logger.info(
+            f"工作列表: 共 {len(self.jobs)} 个任务，待处理 {len(pending)} 个，"
+            f"已完成跳过 {skipped} 个 | 并行会话: {self.sessions}"
+        )
+        
+        jobs: "queue.Queue[WorklistJob]" = queue.Queue()
+        for job in pending:
+            jobs.put(job)
+        
+        sessions: List[WorklistSession] = []
+        threads: List[threading.Thread] = []
+        try:
+            # 顺序启动虚拟显示，避免并发分配到同一显示编号
+            for index in range(min(self.sessions, len(pending))):
+                session = WorklistSession(index + 1, self.cognition)
+                session.start()
+                sessions.append(session)
+            for session in sessions:
+                thread = threading.Thread(
+                    target=self._worker, args=(session, jobs),
+                    name=f"WorklistSession-{session.index}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            audit_logger.warning("用户中止批处理，正在等待会话退出；未完成的任务可续跑")
+            self._stop.set()
+            # 会话线程仍在操作各自的显示，须等其在迭代边界退出后才能关闭执行层与 Xvfb
+            for thread in threads:
+                thread.join()
+            raise
+        finally:
+            for session in sessions:
+                session.close()
+        
+        summary = self.metrics.summary()
+        summary["skipped"] = skipped
+        summary["cognition"] = dict(self.cognition.stats)
+        cache_stats = getattr(self.cognition.brain, "cache_stats", None)
+        if cache_stats is not None:
+            summary["prompt_cache"] = cache_stats.summary()
+        audit_logger.info(
+            f"批处理结束 | 完成: {summary['done']} | 失败: {summary['failed']} | "
+            f"吞吐: {summary['throughput_per_hour']:.1f} 个/小时 | "
+            f"延迟 p50: {summary['latency_seconds']['p50']:.1f}s | "
+            f"p95: {summary['latency_seconds']['p95']:.1f}s"
+        )
+        with open(f"{self.state.path}.summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
@@ -0,0 +1,143 @@
+"""
+整帧图像缓冲池
+
+每次迭代的截屏、脱敏与 SoM 叠加都会产生整帧大小的新图像，4K 分辨率下配合预取线程
+每秒分配数百 MB，长时间运行会造成堆碎片与 RSS 持续上涨。缓冲池按 (模式, 尺寸) 缓存
+已释放的 PIL 图像，下一帧直接在原有内存上写入像素。
+
+约定:
+- acquire / copy 返回的图像在 release 之前归调用方独占；
+- release 之后缓冲区随时可能被覆盖，需要跨迭代保留帧的调用方（如审计归档）必须自行复制；
+- 未 release 的图像照常由垃圾回收释放，只是失去复用的机会；
+- release 不属于任何缓冲池的图像时静默忽略，调用方无需区分来源。
+"""
+import threading
+import weakref
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+from configs.settings import config
+from medipilot.utils import metrics
+
+# id(图像) -> (图像弱引用, 分配它的缓冲池)；PIL 图像不可哈希，图像被回收时由弱引用回调移除
+# 字典的单次读写在 GIL 下是原子的，回调可能在任意线程的垃圾回收中触发，因此这里不加锁；
+# 回调以默认参数持有字典，解释器退出时模块全局变量已被清空也不会报错
+_owners: Dict[int, Tuple["weakref.ref[Image.Image]", "FramePool"]] = {}
+_counts = {"allocated": 0, "reused": 0}
+_counts_lock = threading.Lock()
+
+class FramePool:
+    """
+    整帧图像缓冲池（线程安全）
+    
+    Attributes:
+        capacity: 每种 (模式, 尺寸) 最多缓存的空闲缓冲区数，0 表示不缓存（每次新分配）
+        allocated: 新分配的缓冲区数
+        reused: 复用的缓冲区数
+    """
+    
+    def __init__(self, capacity: int = 4) -> None:
+        self.capacity = capacity
+        self.allocated = 0
+        self.reused = 0
+        self._free: Dict[Tuple[str, Tuple[int, int]], List[Image.Image]] = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, size: Tuple[int, int], mode: str = "RGB") -> Image.Image:
+        """
+        获取一块指定尺寸的缓冲图像（内容未定义，调用方负责写满）
+        
+        Args:
+            size: (width, height)
+            mode: PIL 图像模式
+        """
+        size = tuple(size)
+        with self._lock:
+            free = self._free.get((mode, size))
+            image = free.pop() if free else None
+            if image is not None:
+                self.reused += 1
+            else:
+                self.allocated += 1
+        _count("reused" if image is not None else "allocated")
+        if image is None:
+            image = Image.new(mode, size)
+            if self.capacity > 0:
+                key = id(image)
+                _owners[key] = (weakref.ref(image, lambda _ref, key=key, owners=_owners: owners.pop(key, None)), self)
+        return image
+    
+    def copy(self, image: Image.Image) -> Image.Image:
+        """复制图像到缓冲区（替代 Image.copy）"""
+        target = self.acquire(image.size, image.mode)
+        target.paste(image, (0, 0))
+        return target
+    
+    def preallocate(self, size: Tuple[int, int], count: Optional[int] = None, mode: str = "RGB") -> None:
+        """按屏幕尺寸预先分配缓冲区（默认填满容量），避免首个迭代的分配开销"""
+        count = self.capacity if count is None else min(count, self.capacity)
+        with self._lock:
+            missing = count - len(self._free.get((mode, tuple(size)), []))
+        images = [self.acquire(size, mode) for _ in range(max(0, missing))]
+        for image in images:
+            self.release(image)
+    
+    def release(self, image: Image.Image) -> None:
+        """归还缓冲区；非本池分配、池已满或重复归还时忽略"""
+        if _owner(image) is not self:
+            return
+        key = (image.mode, image.size)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.capacity and not any(item is image for item in free):
+                free.append(image)
+    
+    def clear(self) -> None:
+        """释放所有空闲缓冲区（如分辨率变化后）"""
+        with self._lock:
+            self._free.clear()
+    
+    @property
+    def free_bytes(self) -> int:
+        """空闲缓冲区占用的内存（按每像素 4 字节估算，PIL 的 RGB 图像即按 32 位存储）"""
+        with self._lock:
+            return sum(w * h * 4 * len(images) for (_, (w, h)), images in self._free.items())
+
+def _count(result: str) -> None:
+    with _counts_lock:
+        _counts[result] += 1
+    metrics.FRAME_BUFFERS.inc(result=result)
+
+def _owner(image: Image.Image) -> Optional[FramePool]:
+    entry = _owners.get(id(image))
+    if entry is not None and entry[0]() is image:
+        return entry[1]
+    return None
+
+def release(*images: Optional[Image.Image]) -> None:
+    """将图像归还给分配它的缓冲池（非池化图像与 None 忽略）"""
+    for image in images:
+        pool = _owner(image) if image is not None else None
+        if pool is not None:
+            pool.release(image)
+
+def counts() -> Dict[str, int]:
+    """
+    进程内所有缓冲池的累计获取次数
+    
+    Returns:
+        dict: {"allocated": 新分配数, "reused": 复用数}
+    """
+    with _counts_lock:
+        return dict(_counts)
+
+_default_pool: Optional[FramePool] = None
+_default_lock = threading.Lock()
+
+def default_pool() -> FramePool:
+    """按 FRAME_POOL_SIZE 配置创建的进程级缓冲池（单例）"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = FramePool(capacity=config.FRAME_POOL_SIZE)
+    return _default_pool
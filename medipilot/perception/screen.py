@@ -1,10 +1,18 @@
-import mss
-import cv2
-import numpy as np
-from typing import Optional
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from PIL import Image, ImageDraw
 from configs.settings import config
 from medipilot.utils.logger import audit_logger
+from medipilot.utils import metrics
+from medipilot.utils.lazy import lazy_import
+from medipilot.perception.buffers import FramePool, default_pool, release
+
+# 截屏与图像处理库在首次使用时才导入，缩短启动时间
+mss = lazy_import("mss")
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
 
 class PerceptionError(Exception):
     """感知层异常"""
@@ -15,40 +23,273 @@ class Perception:
     感知层：负责环境"观察"与隐私处理
     
     Attributes:
-        sct: MSS截屏对象
+        sct: MSS截屏对象（按线程隔离，MSS 实例不能跨线程共享）
+        display: 绑定的 X 显示名（如 ":99"），None 表示使用 $DISPLAY
+        headless: 是否为离线模式（不连接显示器）
+        pool: 整帧缓冲池，截屏、脱敏与 SoM 的输出图像从中获取
+        monitor: 默认截取的显示器编号（MSS 编号，1 为主显示器，0 为所有显示器拼接的虚拟屏幕）
     """
     
-    def __init__(self) -> None:
-        """初始化感知层，创建截屏实例"""
+    def __init__(
+        self,
+        display: Optional[str] = None,
+        headless: bool = False,
+        pool: Optional[FramePool] = None,
+        monitor: int = 1
+    ) -> None:
+        """
+        初始化感知层，创建截屏实例
+        
+        Args:
+            display: X 显示名（仅 Linux），用于批处理会话绑定各自的虚拟显示
+            headless: 离线模式，不连接显示器，仅使用脱敏与 SoM 等本地图像处理能力
+            pool: 整帧缓冲池，默认使用按 FRAME_POOL_SIZE 配置的进程级缓冲池
+            monitor: 默认截取的显示器编号（多显示器时按角色区分报告显示器与 EMR 显示器）
+        """
         try:
-            self.sct = mss.mss()
-            audit_logger.info("感知模块初始化完成")
+            self.display = display
+            self.headless = headless
+            self.pool = pool or default_pool()
+            self.monitor = monitor
+            self._local = threading.local()
+            self._capture_workers: Optional[ThreadPoolExecutor] = None
+            self._workers_lock = threading.Lock()
+            if not headless:
+                self._local.sct = self._create_sct()
+            suffix = f" | 显示: {display}" if display else ""
+            suffix += f" | 显示器: {monitor}" if monitor != 1 else ""
+            audit_logger.info(f"感知模块初始化完成{suffix}")
         except Exception as e:
             audit_logger.critical(f"感知模块初始化失败: {e}")
             raise PerceptionError(f"无法初始化截屏模块: {e}")
-
-    def capture(self) -> Image.Image:
+    
+    @property
+    def sct(self) -> "mss.base.MSSBase":
+        """当前线程的 MSS 截屏对象，首次在新线程访问时创建"""
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = self._create_sct()
+        return sct
+    
+    def _create_sct(self) -> "mss.base.MSSBase":
+        return mss.mss(display=self.display) if self.display else mss.mss()
+    
+    def warm_up(self) -> None:
+        """
+        预热：完成首次截屏与脱敏，提前导入 MSS / OpenCV / NumPy 并验证显示器可用，
+        并按屏幕尺寸预分配整帧缓冲区
+        
+        离线模式下只预热本地图像处理。
+        
+        Raises:
+            PerceptionError: 截屏失败时抛出
+        """
+        image = Image.new("RGB", (64, 64)) if self.headless else self.capture()
+        release(self.privacy_filter(image, region=(0, 8, 0, 8)), image)
+        if not self.headless:
+            self.pool.preallocate(image.size)
+    
+    def monitor_geometry(self, monitor: Optional[int] = None) -> Dict[str, int]:
+        """
+        显示器在虚拟屏幕中的位置与尺寸
+        
+        Args:
+            monitor: 显示器编号，默认为本实例的 monitor
+        
+        Returns:
+            dict: {"left", "top", "width", "height"}，left / top 即该显示器局部坐标到全局坐标的偏移
+        
+        Raises:
+            PerceptionError: 显示器不存在时抛出
+        """
+        index = self.monitor if monitor is None else monitor
+        monitors = self.sct.monitors
+        if not 0 <= index < len(monitors):
+            raise PerceptionError(f"显示器 {index} 不存在，当前共 {len(monitors) - 1} 个显示器")
+        return {key: monitors[index][key] for key in ("left", "top", "width", "height")}
+    
+    def capture(self, monitor: Optional[int] = None) -> Image.Image:
         """
         高频低延迟截屏
         
+        Args:
+            monitor: 显示器编号，默认为本实例的 monitor
+        
         Returns:
-            PIL.Image.Image: RGB格式的原始截图对象
-            
+            PIL.Image.Image: RGB格式的原始截图对象（来自缓冲池，用完后可 release 归还）
+        
         Raises:
             PerceptionError: 截屏失败时抛出
         """
         try:
-            monitor = self.sct.monitors[1]
-            sct_img = self.sct.grab(monitor)
-            # 转换为 RGB 格式供后续处理
-            image = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
+            sct_img = self.sct.grab(self.sct.monitors[self.monitor if monitor is None else monitor])
+            # 直接解码 MSS 的原始缓冲区（.bgra 会多复制一份）到池化图像，转换为 RGB 格式供后续处理
+            image = self.pool.acquire(sct_img.size)
+            image.frombytes(sct_img.raw, "raw", "BGRX")
             audit_logger.debug(f"截屏成功，尺寸: {image.size}")
             return image
         except Exception as e:
             audit_logger.error(f"截屏失败: {e}")
             raise PerceptionError(f"屏幕捕获失败: {e}")
-
-    def privacy_filter(self, image: Image.Image) -> Image.Image:
+    
+    def capture_region(self, left: int, top: int, width: int, height: int) -> Image.Image:
+        """
+        截取全局坐标下的小区域（如输入框附近，用于动作后本地校验）
+        
+        区域图像很小，直接分配，不经过整帧缓冲池。
+        
+        Raises:
+            PerceptionError: 截屏失败时抛出
+        """
+        try:
+            sct_img = self.sct.grab({"left": left, "top": top, "width": width, "height": height})
+            return Image.frombytes("RGB", sct_img.size, sct_img.raw, "raw", "BGRX")
+        except Exception as e:
+            raise PerceptionError(f"区域截屏失败: {e}")
+    
+    def capture_monitors(self, monitors: Sequence[int]) -> Dict[int, Image.Image]:
+        """
+        并发截取多个显示器
+        
+        每个截屏线程持有独立的 MSS 实例（线程池常驻，实例随线程复用），
+        总耗时约等于最慢的一个显示器而非各显示器之和。
+        
+        Args:
+            monitors: 显示器编号列表
+        
+        Returns:
+            Dict[int, Image.Image]: {显示器编号: 截图}（来自缓冲池，用完后可 release 归还）
+        
+        Raises:
+            PerceptionError: 任一显示器截屏失败时抛出（已截取的图像会归还缓冲池）
+        """
+        with self._workers_lock:
+            if self._capture_workers is None:
+                self._capture_workers = ThreadPoolExecutor(
+                    max_workers=max(2, len(monitors)), thread_name_prefix="MonitorCapture"
+                )
+        futures = {index: self._capture_workers.submit(self.capture, index) for index in monitors}
+        images: Dict[int, Image.Image] = {}
+        error: Optional[PerceptionError] = None
+        for index, future in futures.items():
+            try:
+                images[index] = future.result()
+            except PerceptionError as e:
+                error = error or e
+        if error is not None:
+            release(*images.values())
+            raise error
+        return images
+    
+    @staticmethod
+    def _frame_signature(image: Image.Image) -> bytes:
+        """生成低分辨率帧签名，用于快速判断画面是否变化"""
+        w, h = image.size
+        return image.resize((max(1, w // 16), max(1, h // 16)), Image.NEAREST).tobytes()
+    
+    def wait_until_stable(
+        self,
+        timeout: float,
+        interval: float = 0.1,
+        stable_frames: int = 2
+    ) -> Tuple[Image.Image, bool]:
+        """
+        等待屏幕画面稳定（动作生效、界面重绘完成）后返回最新一帧
+        
+        连续 `stable_frames` 次采样画面签名一致即视为稳定，
+        用于替代固定的 SCREENSHOT_DELAY 休眠。
+        
+        Args:
+            timeout: 最长等待时间（秒），超时后返回最后一帧
+            interval: 采样间隔（秒）
+            stable_frames: 判定稳定所需的连续一致次数
+        
+        Returns:
+            Tuple[Image.Image, bool]: (最新截图, 是否在超时前稳定)
+        
+        Raises:
+            PerceptionError: 截屏失败时抛出
+        """
+        deadline = time.monotonic() + timeout
+        image = self.capture()
+        signature = self._frame_signature(image)
+        unchanged = 0
+        captured = 1
+        stable = True
+        
+        while unchanged < stable_frames:
+            if time.monotonic() >= deadline:
+                audit_logger.debug(f"等待画面稳定超时 ({timeout}s)，使用最新一帧")
+                stable = False
+                break
+            time.sleep(interval)
+            # 被新帧取代的旧帧立即归还缓冲池，稳定等待期间只占用两块缓冲区
+            previous, image = image, self.capture()
+            release(previous)
+            captured += 1
+            current = self._frame_signature(image)
+            unchanged = unchanged + 1 if current == signature else 0
+            signature = current
+        
+        metrics.FRAMES.inc(result="used")
+        metrics.FRAMES.inc(captured - 1, result="skipped")
+        return image, stable
+    
+    def capture_scrolling(
+        self,
+        scroll: Callable[[], None],
+        region: Optional[Tuple[int, int, int, int]] = None,
+        max_pages: int = 10
+    ) -> List[Image.Image]:
+        """
+        滚动截取报告区域的全部页面
+        
+        每页先在整屏坐标下完成隐私脱敏，再裁剪出报告区域；
+        滚动后画面不再变化（已到底部）或达到页数上限时停止。
+        
+        Args:
+            scroll: 执行一次滚动的回调（通常由执行层在报告区域内滚动）
+            region: 报告区域 (y1, y2, x1, x2)，None 表示整屏
+            max_pages: 最多截取的页数
+        
+        Returns:
+            List[Image.Image]: 已脱敏的页面列表，可交给 `stitch_pages()` 拼接
+        
+        Raises:
+            PerceptionError: 截屏失败时抛出
+        """
+        def _crop(frame: Image.Image) -> Image.Image:
+            filtered = self.privacy_filter(frame)
+            if filtered is not frame:
+                release(frame)
+            if region is None:
+                return filtered
+            y1, y2, x1, x2 = region
+            page = filtered.crop((x1, y1, x2, y2))
+            release(filtered)
+            return page
+        
+        pages = [_crop(self.capture())]
+        while len(pages) < max_pages:
+            scroll()
+            frame, _ = self.wait_until_stable(
+                timeout=config.SCREENSHOT_DELAY,
+                interval=config.SETTLE_POLL_INTERVAL,
+                stable_frames=config.SETTLE_STABLE_FRAMES
+            )
+            page = _crop(frame)
+            if page.tobytes() == pages[-1].tobytes():
+                break
+            pages.append(page)
+        
+        audit_logger.debug(f"滚动截取完成，共 {len(pages)} 页")
+        return pages
+    
+    def privacy_filter(
+        self,
+        image: Image.Image,
+        region: Optional[Tuple[int, int, int, int]] = None
+    ) -> Image.Image:
         """
         本地 PII (个人身份信息) 脱敏过滤
         
@@ -58,61 +299,69 @@ class Perception:
         
         Args:
             image: 原始截图
-            
+            region: 隐私区域 (y1, y2, x1, x2)，默认使用配置中的 PRIVACY_REGION
+        
         Returns:
             PIL.Image.Image: 脱敏后的截图
-            
+        
         Raises:
             PerceptionError: 图像处理失败时抛出
         """
         try:
-            cv_img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
             # 从配置获取隐私保护区域 [y1, y2, x1, x2]
-            y1, y2, x1, x2 = config.PRIVACY_REGION
+            region = region or config.PRIVACY_REGION
+            y1, y2, x1, x2 = region
             
             # 验证区域有效性
-            height, width = cv_img.shape[:2]
+            width, height = image.size
             if y2 > height or x2 > width:
                 audit_logger.warning(
-                    f"隐私区域 {config.PRIVACY_REGION} 超出图像边界 ({width}x{height})，"
+                    f"隐私区域 {region} 超出图像边界 ({width}x{height})，"
                     "将调整为图像范围内"
                 )
                 y2 = min(y2, height)
                 x2 = min(x2, width)
             
-            # 执行高斯模糊
-            roi = cv_img[y1:y2, x1:x2]
-            if roi.size > 0:  # 确保ROI非空
+            # 整帧复制到池化缓冲区，只对隐私区域做颜色无关的高斯模糊（无需整帧 RGB/BGR 往返转换）
+            output = self.pool.copy(image)
+            if y2 > y1 and x2 > x1:  # 确保ROI非空
+                box = (x1, y1, x2, y2)
+                roi = np.asarray(image.crop(box))
                 blurred_roi = cv2.GaussianBlur(roi, (99, 99), 30)  # 增强模糊程度
-                cv_img[y1:y2, x1:x2] = blurred_roi
-                audit_logger.debug(f"已应用隐私过滤: 区域 {config.PRIVACY_REGION}")
+                output.paste(Image.fromarray(blurred_roi), box)
+                audit_logger.debug(f"已应用隐私过滤: 区域 {region}")
             else:
                 audit_logger.warning(f"隐私区域为空，跳过模糊处理")
             
-            return Image.fromarray(cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB))
-            
+            return output
+        
         except Exception as e:
             audit_logger.error(f"隐私过滤失败: {e}")
             # 即使失败也返回原图，但记录错误
             audit_logger.warning("⚠️  隐私过滤失败，返回原始图像。请检查配置！")
             return image
-
-    def apply_som_overlay(self, image: Image.Image, grid_size: int = 80) -> Image.Image:
+    
+    def apply_som_overlay(
+        self,
+        image: Image.Image,
+        grid_size: int = 80,
+        origin: Tuple[int, int] = (0, 0)
+    ) -> Image.Image:
         """
         视觉锚点叠加 (Set-of-Mark)
         
         功能:
             在图像上绘制红色网格并标注坐标 (如 A1, B2)，
             协助大模型理解 UI 元素的相对位置。
-            
+        
         Args:
             image: 待处理图像
             grid_size: 网格大小（像素），默认80
-            
+            origin: 图像左上角在整屏中的坐标；分块时传入分块起点，网格线与标签均按整屏坐标绘制
+        
         Returns:
             PIL.Image.Image: 带有网格标注的图像
-            
+        
         Raises:
             PerceptionError: 网格绘制失败时抛出
         """
@@ -124,22 +373,25 @@ class Perception:
                 )
                 grid_size = 80
             
-            # 创建图像副本以避免修改原图
-            image = image.copy()
+            # 在池化缓冲区上绘制，避免修改原图
+            image = self.pool.copy(image)
             draw = ImageDraw.Draw(image)
             w, h = image.size
+            ox, oy = origin
+            # 第一条网格线在图像内的位置（origin 对齐到网格时为 0）
+            x0, y0 = -ox % grid_size, -oy % grid_size
             
             # 绘制网格线
-            for x in range(0, w, grid_size):
+            for x in range(x0, w, grid_size):
                 draw.line([(x, 0), (x, h)], fill=(255, 0, 0, 100), width=1)
-            for y in range(0, h, grid_size):
+            for y in range(y0, h, grid_size):
                 draw.line([(0, y), (w, y)], fill=(255, 0, 0, 100), width=1)
-                
+            
             # 标注坐标文字
-            for x in range(0, w, grid_size):
-                for y in range(0, h, grid_size):
-                    col_idx = x // grid_size
-                    row_idx = y // grid_size
+            for x in range(x0, w, grid_size):
+                for y in range(y0, h, grid_size):
+                    col_idx = (x + ox) // grid_size
+                    row_idx = (y + oy) // grid_size
                     # 生成 A0, B1 风格的标签
                     col_label = ""
                     temp_idx = col_idx
@@ -152,7 +404,7 @@ class Perception:
             
             audit_logger.debug(f"SoM网格叠加完成，网格大小: {grid_size}px")
             return image
-            
+        
         except Exception as e:
             audit_logger.error(f"SoM网格绘制失败: {e}")
             raise PerceptionError(f"无法绘制视觉网格: {e}")
@@ -0,0 +1,131 @@
+from typing import List, Optional
+from PIL import Image
+from medipilot.utils.logger import audit_logger
+from medipilot.utils.lazy import lazy_import
+
+# 仅在滚动拼接时才需要，首次使用时导入
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# 行哈希使用的固定随机权重（按列宽缓存），同一进程内结果稳定
+_HASH_WEIGHTS = {}
+# 行哈希按行分块计算时，每块 uint64 临时数组的字节上限
+_HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+def row_hashes(pixels: "np.ndarray") -> "np.ndarray":
+    """
+    计算每一行像素的 64 位哈希（向量化，单帧 4K 约数毫秒）
+    
+    按行分块扩展为 uint64 再乘加，临时内存不超过 _HASH_CHUNK_BYTES，
+    而不是整帧 8 倍大小的副本（4K 约 200MB）。
+    
+    Args:
+        pixels: 形状为 (H, W, C) 或 (H, W) 的 uint8 数组
+    
+    Returns:
+        np.ndarray: 形状为 (H,) 的 uint64 数组
+    """
+    rows = pixels.reshape(pixels.shape[0], -1)
+    width = rows.shape[1]
+    weights = _HASH_WEIGHTS.get(width)
+    if weights is None:
+        rng = np.random.default_rng(width)
+        weights = _HASH_WEIGHTS[width] = rng.integers(1, 2 ** 63, size=width, dtype=np.uint64)
+    step = max(1, _HASH_CHUNK_BYTES // (width * 8))
+    hashes = np.empty(rows.shape[0], dtype=np.uint64)
+    for start in range(0, rows.shape[0], step):
+        # uint64 乘加按 2^64 自然回绕，等价于模运算
+        hashes[start:start + step] = rows[start:start + step].astype(np.uint64) @ weights
+    return hashes
+
+def find_overlap(
+    previous: "np.ndarray",
+    current: "np.ndarray",
+    min_overlap: int = 8,
+    template_rows: int = 48,
+    threshold: float = 0.98
+) -> Optional[int]:
+    """
+    计算 current 顶部与 previous 底部重叠的行数
+    
+    优先使用行哈希做精确匹配；若因抗锯齿、光标闪烁等原因无法精确匹配，
+    则退化为以 current 顶部条带在 previous 中做模板匹配。
+    
+    Args:
+        previous: 上一页像素 (H, W, C)
+        current: 当前页像素 (H, W, C)，宽度须与上一页一致
+        min_overlap: 精确匹配时的最小重叠行数
+        template_rows: 模板匹配使用的条带高度
+        threshold: 模板匹配的最低归一化相关系数
+    
+    Returns:
+        Optional[int]: 重叠行数；等于页高表示页面未滚动；None 表示找不到重叠
+    """
+    prev_hash = row_hashes(previous)
+    curr_hash = row_hashes(current)
+    height = len(prev_hash)
+    
+    # 候选起点：previous 中与 current 首行相同的行，从重叠最大的开始验证
+    for start in np.flatnonzero(prev_hash == curr_hash[0]):
+        overlap = height - int(start)
+        if overlap < min_overlap or overlap > len(curr_hash):
+            continue
+        if np.array_equal(prev_hash[start:], curr_hash[:overlap]):
+            return overlap
+    
+    rows = min(template_rows, current.shape[0], previous.shape[0])
+    strip = current[:rows]
+    # 纯色条带（如空白区域）无法可靠定位
+    if strip.std() < 1.0:
+        return None
+    scores = cv2.matchTemplate(previous, strip, cv2.TM_CCOEFF_NORMED)
+    _, best, _, location = cv2.minMaxLoc(scores)
+    if best < threshold:
+        return None
+    return height - location[1]
+
+def stitch_pages(pages: List[Image.Image]) -> Image.Image:
+    """
+    将连续滚动截取的页面拼接为一张去重后的长图
+    
+    Args:
+        pages: 按滚动顺序排列、宽度一致的页面
+    
+    Returns:
+        PIL.Image.Image: 拼接后的长图
+    """
+    arrays = [np.asarray(page) for page in pages]
+    parts = [arrays[0]]
+    for previous, current in zip(arrays, arrays[1:]):
+        overlap = find_overlap(previous, current)
+        if overlap is None:
+            audit_logger.warning("未找到页面重叠区域，直接拼接（可能存在重复或遗漏）")
+            overlap = 0
+        if overlap < current.shape[0]:
+            parts.append(current[overlap:])
+    return Image.fromarray(np.vstack(parts))
+
+def tile_image(image: Image.Image, max_height: int, overlap: int = 40) -> List[Image.Image]:
+    """
+    将长图纵向切分为不超过 max_height 的分块，相邻分块保留重叠以免切断文字行
+    
+    Args:
+        image: 待切分图像
+        max_height: 每块最大高度（像素）
+        overlap: 相邻分块的重叠高度（像素）
+    
+    Returns:
+        List[Image.Image]: 分块列表
+    """
+    width, height = image.size
+    if height <= max_height:
+        return [image]
+    step = max(1, max_height - overlap)
+    tiles = []
+    top = 0
+    while True:
+        bottom = min(top + max_height, height)
+        tiles.append(image.crop((0, top, width, bottom)))
+        if bottom >= height:
+            return tiles
+        top += step
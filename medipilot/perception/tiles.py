@@ -0,0 +1,143 @@
+"""
+高分辨率整帧分块
+
+4K 或多显示器整帧缩放到模型输入尺寸后，化验单上的小号数字会糊成一片；整帧原分辨率发送
+又慢又贵。分块模式把脱敏后的整帧切成相互重叠的分块，每块单独叠加 SoM 网格：
+- 分块起点对齐到网格，各块的网格线与整屏一致，标签按整屏坐标编号（同一位置在任何分块中标签相同）；
+- 纯色空白分块（低灰度标准差）直接跳过；
+- 与上一帧逐像素相同（内容摘要一致）的分块标记为 unchanged，由调用方复用上次的结果。
+  这里不能用等待稳定时的降采样签名：化验单上只改了一位数字的分块也会被判为相同，从而复用旧值。
+分块内坐标通过 `Tile.to_global` 换算回整屏坐标。
+"""
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+from PIL import Image, ImageStat
+from configs.settings import config
+from medipilot.utils.logger import audit_logger
+from medipilot.perception.screen import Perception
+
+Box = Tuple[int, int, int, int]
+
+def tile_digest(crop: Image.Image) -> bytes:
+    """分块的精确内容摘要（每个像素都参与计算）"""
+    return hashlib.blake2b(crop.tobytes(), digest_size=16).digest()
+
+class Tile:
+    """
+    整帧中的一个分块
+    
+    Attributes:
+        box: 分块在整屏中的范围 (x1, y1, x2, y2)
+        status: send（需要发送）/ blank（空白，跳过）/ unchanged（与上一帧相同，复用结果）
+        image: 已叠加整屏坐标 SoM 网格的分块图像，仅 status 为 send 时存在（来自缓冲池）
+    """
+    
+    def __init__(self, box: Box, status: str, image: Optional[Image.Image] = None) -> None:
+        self.box = box
+        self.status = status
+        self.image = image
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        x1, y1, x2, y2 = self.box
+        return x2 - x1, y2 - y1
+    
+    def contains(self, coordinate: Sequence[float]) -> bool:
+        """分块内坐标是否落在分块范围内"""
+        width, height = self.size
+        return 0 <= coordinate[0] <= width and 0 <= coordinate[1] <= height
+    
+    def to_global(self, coordinate: Sequence[float]) -> List[int]:
+        """分块内坐标 -> 整屏坐标"""
+        return [int(round(coordinate[0])) + self.box[0], int(round(coordinate[1])) + self.box[1]]
+
+def plan_tiles(size: Tuple[int, int], tile_size: int, overlap: int, grid_size: int = 80) -> List[Box]:
+    """
+    计算分块范围：起点与步长对齐到网格，相邻分块至少重叠 overlap 像素
+    
+    Args:
+        size: 整帧尺寸 (width, height)
+        tile_size: 分块边长上限（像素），向下取整到网格的整数倍
+        overlap: 相邻分块的最小重叠（像素），向上取整到网格的整数倍
+        grid_size: SoM 网格大小（像素）
+    
+    Returns:
+        List[Box]: 按行优先排列的分块 (x1, y1, x2, y2)
+    """
+    tile = max(grid_size, tile_size // grid_size * grid_size)
+    overlap = -(-overlap // grid_size) * grid_size
+    step = max(grid_size, tile - overlap)
+    
+    def _starts(length: int) -> List[int]:
+        starts = [0]
+        while starts[-1] + tile < length:
+            starts.append(starts[-1] + step)
+        return starts
+    
+    width, height = size
+    return [
+        (x, y, min(x + tile, width), min(y + tile, height))
+        for y in _starts(height) for x in _starts(width)
+    ]
+
+class Tiler:
+    """
+    有状态的分块器：记住每个分块上一帧的内容摘要，用于跳过未变化的分块
+    
+    Attributes:
+        perception: 感知层实例（SoM 叠加与缓冲池）
+        tile_size: 分块边长上限（像素）
+        overlap: 相邻分块的最小重叠（像素）
+        grid_size: SoM 网格大小（像素）
+        blank_stddev: 灰度标准差低于该值的分块视为空白
+    """
+    
+    def __init__(
+        self,
+        perception: Perception,
+        tile_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+        grid_size: int = 80,
+        blank_stddev: Optional[float] = None
+    ) -> None:
+        self.perception = perception
+        self.tile_size = tile_size or config.TILE_SIZE
+        self.overlap = config.TILE_OVERLAP if overlap is None else overlap
+        self.grid_size = grid_size
+        self.blank_stddev = config.TILE_BLANK_STDDEV if blank_stddev is None else blank_stddev
+        self._signatures: Dict[Box, bytes] = {}
+    
+    def split(self, image: Image.Image) -> List[Tile]:
+        """
+        切分一帧已脱敏的整屏图像
+        
+        Args:
+            image: 已完成隐私脱敏、尚未叠加 SoM 的整帧
+        
+        Returns:
+            List[Tile]: 全部分块；status 为 send 的分块持有图像，用完后应 release 归还缓冲池
+        """
+        tiles = []
+        for box in plan_tiles(image.size, self.tile_size, self.overlap, self.grid_size):
+            crop = image.crop(box)
+            signature = tile_digest(crop)
+            previous = self._signatures.get(box)
+            self._signatures[box] = signature
+            if ImageStat.Stat(crop.convert("L")).stddev[0] < self.blank_stddev:
+                tiles.append(Tile(box, "blank"))
+            elif signature == previous:
+                tiles.append(Tile(box, "unchanged"))
+            else:
+                overlay = self.perception.apply_som_overlay(crop, self.grid_size, origin=box[:2])
+                tiles.append(Tile(box, "send", overlay))
+        
+        sent = sum(tile.status == "send" for tile in tiles)
+        audit_logger.debug(f"整帧分块完成: 共 {len(tiles)} 块，需发送 {sent} 块")
+        return tiles
+    
+    def invalidate(self, box: Optional[Box] = None) -> None:
+        """丢弃分块签名（如该分块调用失败），下一帧无论是否变化都会重新发送；None 表示全部"""
+        if box is None:
+            self._signatures.clear()
+        else:
+            self._signatures.pop(box, None)
@@ -0,0 +1,322 @@
+"""
+审计日志归档与 SQLite 索引
+
+结构化事件在写入 JSONL 的同时批量写入 SQLite 索引（会话、任务、迭代、动作、错误类型、时间），
+合规检索无需解压、扫描数月的日志归档。
+
+用法:
+    python -m medipilot.utils.audit_index query --session 20261019-081500-1234
+    python -m medipilot.utils.audit_index query --error rate_limit --since 7d
+    python -m medipilot.utils.audit_index rebuild logs/ logs/archive/
+"""
+import io
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from configs.settings import config
+
+class AuditIndexError(Exception):
+    """审计索引异常"""
+    pass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session TEXT,
+    job TEXT,
+    iteration INTEGER,
+    event TEXT,
+    stage TEXT,
+    action TEXT,
+    error TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_session ON events (session, ts);
+CREATE INDEX IF NOT EXISTS idx_events_job ON events (job, ts);
+CREATE INDEX IF NOT EXISTS idx_events_action ON events (action, ts);
+CREATE INDEX IF NOT EXISTS idx_events_error ON events (error, ts);
+"""
+
+def _row(record: Dict[str, Any]) -> tuple:
+    error = record.get("error_type") or record.get("error")
+    return (
+        float(record.get("ts", 0.0)),
+        record.get("session"),
+        None if record.get("job") is None else str(record.get("job")),
+        record.get("iteration"),
+        record.get("event"),
+        record.get("stage"),
+        record.get("action"),
+        error,
+        json.dumps(record, ensure_ascii=False, default=str),
+    )
+
+class AuditIndex:
+    """
+    结构化事件的 SQLite 索引
+    
+    Attributes:
+        path: 索引数据库路径
+    """
+    
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30.0)
+        # WAL 模式下写入不阻塞查询，多进程写入由 busy timeout 排队
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+    
+    def insert(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        批量写入事件
+        
+        Returns:
+            int: 写入条数
+        """
+        rows = [_row(record) for record in records]
+        if rows:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO events (ts, session, job, iteration, event, stage, action, error, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+        return len(rows)
+    
+    def query(
+        self,
+        session: Optional[str] = None,
+        job: Optional[str] = None,
+        action: Optional[str] = None,
+        error: Optional[str] = None,
+        stage: Optional[str] = None,
+        iteration: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按条件查询事件（均为精确匹配，时间为 Unix 时间戳），结果按时间排序
+        
+        Args:
+            error: 错误类型；传入 "*" 匹配所有带错误的事件
+        
+        Returns:
+            List[dict]: 原始事件
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (
+            ("session", session), ("job", job), ("action", action),
+            ("stage", stage), ("iteration", iteration)
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if error == "*":
+            clauses.append("error IS NOT NULL")
+        elif error is not None:
+            clauses.append("error = ?")
+            params.append(error)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        
+        sql = "SELECT data FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts, id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(data) for (data,) in self.conn.execute(sql, params)]
+    
+    def rebuild(self, paths: Iterable[str]) -> int:
+        """
+        清空索引并从事件日志（含 .gz / .zst 归档）重建
+        
+        Args:
+            paths: 事件日志文件或目录
+        
+        Returns:
+            int: 重建后的事件条数
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM events")
+        total = 0
+        batch: List[Dict[str, Any]] = []
+        for path in _event_files(paths):
+            for record in read_events(path):
+                batch.append(record)
+                if len(batch) >= 5000:
+                    total += self.insert(batch)
+                    batch = []
+        return total + self.insert(batch)
+    
+    def close(self) -> None:
+        self.conn.close()
+
+def _open_text(path: str):
+    """按扩展名打开（可能已压缩的）日志文件"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise AuditIndexError(f"读取 {path} 需要 zstandard: pip install zstandard")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取事件日志，跳过损坏的行"""
+    with _open_text(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+_EVENT_FILE = re.compile(r"^medipilot_events_\d{4}-\d{2}-\d{2}(\.\d+)?\.jsonl(\.gz|\.zst)?$")
+
+def _event_files(paths: Iterable[str]) -> List[str]:
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(str(p) for p in sorted(Path(path).iterdir()) if _EVENT_FILE.match(p.name))
+        else:
+            files.append(path)
+    return files
+
+class IndexHandler(logging.Handler):
+    """
+    将结构化事件写入 SQLite 索引的日志处理器（运行在后台写入线程中）
+    
+    emit 只缓存记录，flush 时批量写入，与写入线程的刷新策略保持一致。
+    数据库连接在首次写入时于当前进程、当前线程中创建。
+    """
+    
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self._buffer: List[Dict[str, Any]] = []
+        self._index: Optional[AuditIndex] = None
+        self._owner: Optional[tuple] = None
+        if hasattr(os, "register_at_fork"):
+            # 子进程不应重复写入父进程尚未提交的记录
+            os.register_at_fork(after_in_child=self._buffer.clear)
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        if isinstance(record.msg, dict):
+            self._buffer.append(record.msg)
+    
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        owner = (os.getpid(), threading.get_ident())
+        try:
+            if self._index is None or self._owner != owner:
+                self._index = AuditIndex(self.path)
+                self._owner = owner
+            self._index.insert(self._buffer)
+        except sqlite3.Error as e:
+            # 索引失败不影响 JSONL 事件日志本身，可事后用 rebuild 补建
+            sys.stderr.write(f"审计索引写入失败: {e}\n")
+        self._buffer.clear()
+    
+    def close(self) -> None:
+        self.flush()
+        if self._index is not None and self._owner == (os.getpid(), threading.get_ident()):
+            self._index.close()
+        self._index = None
+        super().close()
+
+_RELATIVE = re.compile(r"^(\d+)([smhd])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_time(value: str) -> float:
+    """
+    解析时间参数：相对时间（如 30m / 12h / 7d）或 ISO 日期时间
+    
+    Returns:
+        float: Unix 时间戳
+    """
+    match = _RELATIVE.match(value)
+    if match:
+        return time.time() - int(match.group(1)) * _UNITS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError("时间格式应为 30m / 12h / 7d 或 ISO 日期 (2026-10-01T08:00)")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="审计日志索引查询")
+    parser.add_argument("--index", default=config.AUDIT_INDEX_PATH, help="索引数据库路径")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    query = commands.add_parser("query", help="按条件查询事件，逐行输出 JSON")
+    query.add_argument("--session", help="运行会话 ID")
+    query.add_argument("--job", help="批处理任务 ID")
+    query.add_argument("--action", help="动作类型 (click / type / finish ...)")
+    query.add_argument("--error", help="错误类型 (rate_limit / connection ...)，* 表示任意错误")
+    query.add_argument("--stage", help="阶段 (capture / privacy / som / encode / llm / execute)")
+    query.add_argument("--iteration", type=int, help="迭代号")
+    query.add_argument("--since", type=parse_time, help="起始时间")
+    query.add_argument("--until", type=parse_time, help="结束时间")
+    query.add_argument("--limit", type=int, help="最多返回条数")
+    query.add_argument("--count", action="store_true", help="仅输出条数")
+    
+    rebuild = commands.add_parser("rebuild", help="从事件日志与归档重建索引")
+    rebuild.add_argument("paths", nargs="+", help="事件日志文件或目录")
+    args = parser.parse_args(argv)
+    
+    if not args.index:
+        print("❌ 未配置索引路径 (AUDIT_INDEX_PATH)")
+        sys.exit(1)
+    
+    try:
+        index = AuditIndex(args.index)
+        if args.command == "rebuild":
+            start = time.perf_counter()
+            total = index.rebuild(args.paths)
+            print(f"索引重建完成: {total} 条事件，耗时 {time.perf_counter() - start:.1f}s")
+            return
+        
+        start = time.perf_counter()
+        results = index.query(
+            session=args.session, job=args.job, action=args.action, error=args.error,
+            stage=args.stage, iteration=args.iteration, since=args.since, until=args.until,
+            limit=args.limit
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        if args.count:
+            print(len(results))
+        else:
+            for record in results:
+                print(json.dumps(record, ensure_ascii=False))
+        sys.stderr.write(f"{len(results)} 条结果，查询耗时 {elapsed:.1f}ms\n")
+    except (sqlite3.Error, AuditIndexError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
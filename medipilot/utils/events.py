@@ -0,0 +1,77 @@
+import os
+import time
+import contextvars
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+from medipilot.utils.logger import event_logger
+from medipilot.utils import metrics
+from configs.settings import config
+
+# 本次运行的会话 ID（进程池子进程沿用父进程的 ID），用于按会话检索审计事件
+SESSION_ID = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+# 当前上下文的公共字段（如 iteration、job），自动附加到每个事件
+_context: contextvars.ContextVar = contextvars.ContextVar("medipilot_event_context", default={})
+
+def emit(event: str, **fields: Any) -> None:
+    """
+    输出一条结构化事件（写入 medipilot_events_YYYY-MM-DD.jsonl）
+    
+    Args:
+        event: 事件类型，如 "span"
+        **fields: 事件字段，与当前上下文字段合并
+    """
+    if not config.EVENT_LOG_ENABLED:
+        return
+    record = {"ts": time.time(), "event": event, "session": SESSION_ID}
+    record.update(_context.get())
+    record.update(fields)
+    event_logger.info(record)
+
+def current() -> Dict[str, Any]:
+    """返回当前上下文字段（含会话 ID），供后台线程延迟输出事件时使用"""
+    return {"session": SESSION_ID, **_context.get()}
+
+@contextmanager
+def bind(**fields: Any) -> Iterator[None]:
+    """
+    在上下文范围内为所有事件附加公共字段
+    
+    Example:
+        with events.bind(iteration=3):
+            ...
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+@contextmanager
+def span(stage: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    记录一个阶段的起止时间（time.monotonic，单位秒）
+    
+    产出的 dict 可在阶段内补充字段（如 payload_bytes、action），
+    退出后其中的 duration_ms 可供调用方复用。阶段内抛出异常时记录 error 字段。
+    
+    Args:
+        stage: 阶段名 (capture / privacy / som / encode / llm / execute)
+        **fields: 附加字段
+    
+    Yields:
+        dict: 本阶段事件的字段
+    """
+    record: Dict[str, Any] = dict(fields)
+    start = time.monotonic()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        end = time.monotonic()
+        record["duration_ms"] = (end - start) * 1000
+        metrics.STAGE_SECONDS.observe(end - start, stage=stage)
+        emit("span", stage=stage, start=start, end=end, **record)
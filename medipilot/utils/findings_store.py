@@ -0,0 +1,314 @@
+"""
+化验单提取结果的本地 SQLite 存储
+
+提取提示词返回的 findings 按化验单内容哈希（以及可选的报告编号）持久化，并按会话、指标、时间建立索引。
+提取前先查询存储：同一份化验单再次打开或重新扫描时直接复用已核验的结果，不再调用大模型。
+
+核验 (verified) 的含义:
+- 所有指标的置信度都不低于 FINDINGS_REUSE_CONFIDENCE 时自动视为已核验；
+- 否则需人工复核后通过 `verify` 子命令标记；未核验的结果只做留存，下次仍会重新提取。
+
+用法:
+    python -m medipilot.utils.findings_store query --metric WBC --since 7d
+    python -m medipilot.utils.findings_store verify <report_hash>
+"""
+import sys
+import json
+import time
+import atexit
+import hashlib
+import sqlite3
+import argparse
+import threading
+import os
+from typing import Any, Dict, List, Optional
+from PIL import Image
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events, metrics
+from medipilot.utils.audit_index import parse_time
+from configs.settings import config
+
+class FindingsStoreError(Exception):
+    """提取结果存储异常"""
+    pass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_hash TEXT PRIMARY KEY,
+    report_id TEXT,
+    session TEXT,
+    job TEXT,
+    source TEXT,
+    model TEXT,
+    scan_quality TEXT,
+    verified INTEGER NOT NULL,
+    created REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    report_hash TEXT NOT NULL,
+    session TEXT,
+    metric TEXT NOT NULL,
+    value TEXT,
+    unit TEXT,
+    confidence REAL,
+    ts REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_id ON reports (report_id, created);
+CREATE INDEX IF NOT EXISTS idx_reports_session ON reports (session, created);
+CREATE INDEX IF NOT EXISTS idx_findings_report ON findings (report_hash);
+CREATE INDEX IF NOT EXISTS idx_findings_session ON findings (session, ts);
+CREATE INDEX IF NOT EXISTS idx_findings_metric ON findings (metric, ts);
+CREATE INDEX IF NOT EXISTS idx_findings_ts ON findings (ts);
+"""
+
+def report_hash(image: Image.Image) -> str:
+    """化验单图像的内容哈希（像素、尺寸与模式，与编码格式无关）"""
+    digest = hashlib.sha256(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def _confidence(finding: Dict[str, Any]) -> Optional[float]:
+    try:
+        return float(finding.get("confidence"))
+    except (TypeError, ValueError):
+        return None
+
+class FindingsStore:
+    """
+    提取结果存储（线程安全）
+    
+    Attributes:
+        path: 数据库路径
+        min_confidence: 自动视为已核验的最低置信度
+    """
+    
+    def __init__(self, path: str, min_confidence: Optional[float] = None) -> None:
+        """
+        Raises:
+            FindingsStoreError: 数据库无法打开或初始化时抛出
+        """
+        self.path = path
+        self.min_confidence = config.FINDINGS_REUSE_CONFIDENCE if min_confidence is None else min_confidence
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            # 分块提取与离线批处理会在多个线程中读写，连接由锁串行化
+            self.conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            raise FindingsStoreError(f"无法打开提取结果存储 {path}: {e}")
+        self._lock = threading.Lock()
+    
+    def lookup(self, report_hash: Optional[str] = None, report_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        查找可复用的已核验结果：优先按内容哈希，其次按报告编号（重新扫描的纸质报告哈希不同）
+        
+        Returns:
+            Optional[dict]: {"report_hash", "report_id", "findings", "scan_quality", "created"}，未命中时为 None
+        """
+        row = None
+        with self._lock:
+            for column, value in (("report_hash", report_hash), ("report_id", report_id)):
+                if value is None:
+                    continue
+                row = self.conn.execute(
+                    f"SELECT report_hash, report_id, scan_quality, created FROM reports "
+                    f"WHERE {column} = ? AND verified = 1 ORDER BY created DESC LIMIT 1",
+                    (value,)
+                ).fetchone()
+                if row is not None:
+                    break
+            if row is None:
+                metrics.FINDINGS_CACHE.inc(result="miss")
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE reports SET hits = hits + 1 WHERE report_hash = ?", (row[0],))
+            findings = [
+                json.loads(data) for (data,) in self.conn.execute(
+                    "SELECT data FROM findings WHERE report_hash = ? ORDER BY id", (row[0],)
+                )
+            ]
+        metrics.FINDINGS_CACHE.inc(result="hit")
+        audit_logger.info(f"复用已存储的提取结果 | 报告: {row[0][:12]} | 指标: {len(findings)}")
+        return {
+            "report_hash": row[0], "report_id": row[1], "findings": findings,
+            "scan_quality": row[2], "created": row[3],
+        }
+    
+    def save(
+        self,
+        report_hash: str,
+        findings: List[Dict[str, Any]],
+        report_id: Optional[str] = None,
+        source: Optional[str] = None,
+        model: Optional[str] = None,
+        scan_quality: Optional[str] = None
+    ) -> bool:
+        """
+        保存（覆盖）一份化验单的提取结果
+        
+        Returns:
+            bool: 是否自动核验通过（之后可直接复用）
+        """
+        confidences = [_confidence(finding) for finding in findings]
+        verified = bool(findings) and all(c is not None and c >= self.min_confidence for c in confidences)
+        context = events.current()
+        session, job = context.get("session"), context.get("job")
+        now = time.time()
+        rows = [
+            (
+                report_hash, session, str(finding.get("metric", "")).strip(),
+                None if finding.get("value") is None else str(finding.get("value")),
+                finding.get("unit"), confidence, now,
+                json.dumps(finding, ensure_ascii=False, default=str),
+            )
+            for finding, confidence in zip(findings, confidences)
+        ]
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM findings WHERE report_hash = ?", (report_hash,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO reports "
+                "(report_hash, report_id, session, job, source, model, scan_quality, verified, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (report_hash, report_id, session, None if job is None else str(job), source, model,
+                 None if scan_quality is None else str(scan_quality), int(verified), now)
+            )
+            self.conn.executemany(
+                "INSERT INTO findings (report_hash, session, metric, value, unit, confidence, ts, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        if not verified:
+            audit_logger.info(f"提取结果已存储，置信度未达复用阈值，需人工复核 | 报告: {report_hash[:12]}")
+        return verified
+    
+    def verify(self, report_hash: str) -> bool:
+        """
+        人工复核后将结果标记为已核验
+        
+        Returns:
+            bool: 是否找到该报告
+        """
+        with self._lock, self.conn:
+            cursor = self.conn.execute("UPDATE reports SET verified = 1 WHERE report_hash = ?", (report_hash,))
+        return cursor.rowcount > 0
+    
+    def query(
+        self,
+        session: Optional[str] = None,
+        metric: Optional[str] = None,
+        report_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按条件查询指标（指标名不区分大小写），结果按时间排序
+        
+        Returns:
+            List[dict]: 指标原始记录，附带 report_hash、report_id、verified 与 ts
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if session is not None:
+            clauses.append("f.session = ?")
+            params.append(session)
+        if metric is not None:
+            clauses.append("f.metric = ? COLLATE NOCASE")
+            params.append(metric)
+        if report_id is not None:
+            clauses.append("r.report_id = ?")
+            params.append(report_id)
+        if since is not None:
+            clauses.append("f.ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("f.ts < ?")
+            params.append(until)
+        
+        sql = (
+            "SELECT f.data, f.report_hash, r.report_id, r.verified, f.ts "
+            "FROM findings f JOIN reports r ON r.report_hash = f.report_hash"
+        )
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY f.ts, f.id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [
+            dict(json.loads(data), report_hash=digest, report_id=rid, verified=bool(verified), ts=ts)
+            for data, digest, rid, verified, ts in rows
+        ]
+    
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+_default: Optional[FindingsStore] = None
+_default_lock = threading.Lock()
+
+def default_store() -> Optional[FindingsStore]:
+    """
+    按配置创建全局提取结果存储（FINDINGS_DB_PATH 为空时返回 None，即不存储、不复用）
+    """
+    global _default
+    if not config.FINDINGS_DB_PATH:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = FindingsStore(config.FINDINGS_DB_PATH)
+            atexit.register(_default.close)
+            audit_logger.info(f"提取结果存储已启用 | 路径: {config.FINDINGS_DB_PATH}")
+        return _default
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="化验单提取结果查询与人工核验")
+    parser.add_argument("--db", default=config.FINDINGS_DB_PATH, help="数据库路径")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    query = commands.add_parser("query", help="按条件查询指标，逐行输出 JSON")
+    query.add_argument("--session", help="运行会话 ID")
+    query.add_argument("--metric", help="指标名 (WBC / Hgb ...)")
+    query.add_argument("--report-id", help="报告编号")
+    query.add_argument("--since", type=parse_time, help="起始时间")
+    query.add_argument("--until", type=parse_time, help="结束时间")
+    query.add_argument("--limit", type=int, help="最多返回条数")
+    
+    verify = commands.add_parser("verify", help="人工复核后标记为已核验（之后可直接复用）")
+    verify.add_argument("report_hash", help="报告内容哈希")
+    args = parser.parse_args(argv)
+    
+    if not args.db or not os.path.exists(args.db):
+        print(f"❌ 数据库不存在: {args.db or '(FINDINGS_DB_PATH 未设置)'}")
+        sys.exit(1)
+    try:
+        store = FindingsStore(args.db)
+    except FindingsStoreError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    try:
+        if args.command == "verify":
+            if not store.verify(args.report_hash):
+                print(f"❌ 未找到报告: {args.report_hash}")
+                sys.exit(1)
+            print(f"✓ 已标记为已核验: {args.report_hash}")
+            return
+        for finding in store.query(
+            session=args.session, metric=args.metric, report_id=args.report_id,
+            since=args.since, until=args.until, limit=args.limit
+        ):
+            print(json.dumps(finding, ensure_ascii=False))
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
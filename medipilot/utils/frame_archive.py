@@ -0,0 +1,393 @@
+"""
+审计截图归档：保存每一帧发送给模型的图像，用于事后复核"模型看到了什么"
+
+- 按内容哈希寻址，完全相同的帧只存一份；
+- 与上一帧相近的帧只保存变化的图块 (tile delta)，每隔若干帧保存一次完整关键帧；
+- 写入在后台线程完成，不阻塞主循环；
+- 超过磁盘配额时按关键帧链整体淘汰最旧的数据。
+
+用法:
+    python -m medipilot.utils.frame_archive export --session <ID> --out frames/
+"""
+import io
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import hashlib
+import sqlite3
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events, metrics
+from medipilot.utils.lazy import lazy_import
+from configs.settings import config
+
+np = lazy_import("numpy")
+
+class FrameArchiveError(Exception):
+    """截图归档异常"""
+    pass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    base TEXT,
+    chain TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chains (
+    chain TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    hash TEXT NOT NULL,
+    session TEXT,
+    job TEXT,
+    iteration INTEGER,
+    context TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entries_session ON entries (session, iteration);
+CREATE INDEX IF NOT EXISTS idx_chains_last_used ON chains (last_used);
+"""
+
+def frame_hash(pixels: "np.ndarray") -> str:
+    """以尺寸与原始像素计算内容哈希"""
+    digest = hashlib.sha256(str(pixels.shape).encode())
+    digest.update(np.ascontiguousarray(pixels).data)
+    return digest.hexdigest()
+
+def changed_tiles(previous: "np.ndarray", current: "np.ndarray", tile: int) -> "np.ndarray":
+    """
+    比较两帧，返回发生变化的图块掩码
+    
+    Returns:
+        np.ndarray: 形状为 (行数, 列数) 的布尔数组
+    """
+    height, width = current.shape[:2]
+    rows = -(-height // tile)
+    cols = -(-width // tile)
+    diff = np.any(previous != current, axis=2) if current.ndim == 3 else previous != current
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:height, :width] = diff
+    return padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+class FrameArchive:
+    """
+    内容寻址的截图归档（后台写入线程在首次提交时启动）
+    
+    Attributes:
+        root: 归档目录（objects/ 存放图像数据，archive.sqlite3 存放清单）
+        quota_bytes: 磁盘配额（字节）
+        tile: 增量比较的图块边长（像素）
+        keyframe_interval: 连续增量帧的最大数量，超过后保存完整关键帧
+        max_delta_ratio: 变化图块占比超过该值时保存完整帧
+        dropped: 因队列已满而未归档的帧数
+    """
+    
+    def __init__(
+        self,
+        root: str,
+        quota_mb: float = 2048,
+        tile: int = 64,
+        keyframe_interval: int = 30,
+        max_delta_ratio: float = 0.5,
+        max_pending: int = 64
+    ) -> None:
+        self.root = root
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.tile = tile
+        self.keyframe_interval = keyframe_interval
+        self.max_delta_ratio = max_delta_ratio
+        self.dropped = 0
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        
+        self._queue: "queue.Queue[Optional[Tuple[Image.Image, Dict[str, Any], float]]]" = queue.Queue(max_pending)
+        # 每个会话（worker）各自的上一帧: (哈希, 像素, 所在链, 链长度)
+        self._previous: Dict[Any, Tuple[str, np.ndarray, str, int]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+    
+    # --- 调用方（热路径） ---
+    
+    def submit(self, image: Image.Image) -> bool:
+        """
+        提交一帧待归档（非阻塞）。当前事件上下文（会话、任务、迭代）随帧一起记录
+        
+        Returns:
+            bool: 是否已入队；后台积压时丢弃并返回 False
+        """
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="frame-archive", daemon=True)
+                    self._thread.start()
+        try:
+            # 复制一份：调用方的帧可能来自整帧缓冲池，迭代结束后即被复用
+            self._queue.put_nowait((image.copy(), events.current(), time.time()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.ARCHIVE_FRAMES.inc(result="dropped")
+            if self.dropped % 100 == 1:
+                audit_logger.warning(f"截图归档积压，已丢弃 {self.dropped} 帧")
+            return False
+    
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """写完队列中剩余的帧后停止后台线程"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+    
+    # --- 后台线程 ---
+    
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(os.path.join(self.root, "archive.sqlite3"), timeout=30.0)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+    
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            image, context, ts = item
+            try:
+                self._store(image, context, ts)
+            except (OSError, sqlite3.Error, ValueError) as e:
+                audit_logger.error(f"截图归档失败: {e}")
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def _object_path(self, digest: str, kind: str) -> str:
+        ext = ".png" if kind == "full" else ".delta.npz"
+        return os.path.join(self.root, "objects", digest[:2], digest + ext)
+    
+    def _store(self, image: Image.Image, context: Dict[str, Any], ts: float) -> None:
+        pixels = np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+        digest = frame_hash(pixels)
+        stream = context.get("worker")
+        db = self._db()
+        
+        row = db.execute("SELECT chain FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if row is not None:
+            # 完全相同的帧：只记录引用
+            chain = row[0]
+            length = self._previous.get(stream, ("", None, "", 0))[3]
+            metrics.ARCHIVE_FRAMES.inc(result="dedup")
+            with db:
+                db.execute("UPDATE chains SET last_used = ? WHERE chain = ?", (ts, chain))
+        else:
+            chain, length = self._write_object(db, digest, pixels, stream, ts)
+        
+        self._previous[stream] = (digest, pixels, chain, length)
+        with db:
+            db.execute(
+                "INSERT INTO entries (ts, hash, session, job, iteration, context) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    ts, digest, context.get("session"),
+                    None if context.get("job") is None else str(context.get("job")),
+                    context.get("iteration"), json.dumps(context, ensure_ascii=False, default=str)
+                )
+            )
+        events.emit("frame", frame=digest, **context)
+        self._enforce_quota(db)
+    
+    def _write_object(
+        self,
+        db: sqlite3.Connection,
+        digest: str,
+        pixels: "np.ndarray",
+        stream: Any,
+        ts: float
+    ) -> Tuple[str, int]:
+        previous = self._previous.get(stream)
+        kind = "full"
+        if (
+            previous is not None
+            and previous[1].shape == pixels.shape
+            and previous[3] < self.keyframe_interval
+            and db.execute("SELECT 1 FROM chains WHERE chain = ?", (previous[2],)).fetchone()
+        ):
+            mask = changed_tiles(previous[1], pixels, self.tile)
+            if mask.mean() <= self.max_delta_ratio:
+                kind = "delta"
+        
+        metrics.ARCHIVE_FRAMES.inc(result=kind)
+        path = self._object_path(digest, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        if kind == "full":
+            Image.fromarray(pixels).save(tmp, format="PNG", compress_level=6)
+            base, chain, length = None, digest, 0
+        else:
+            base, chain, length = previous[0], previous[2], previous[3] + 1
+            rows, cols = np.nonzero(mask)
+            tiles = [
+                pixels[r * self.tile:(r + 1) * self.tile, c * self.tile:(c + 1) * self.tile]
+                for r, c in zip(rows, cols)
+            ]
+            buffer = io.BytesIO()
+            np.savez_compressed(
+                buffer, rows=rows, cols=cols, tile=self.tile,
+                # 边缘图块尺寸可能不足 tile，逐块存放
+                **{f"t{i}": t for i, t in enumerate(tiles)}
+            )
+            with open(tmp, "wb") as f:
+                f.write(buffer.getvalue())
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        
+        with db:
+            db.execute(
+                "INSERT INTO objects (hash, kind, base, chain, size, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, kind, base, chain, size, ts)
+            )
+            db.execute(
+                "INSERT INTO chains (chain, bytes, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT(chain) DO UPDATE SET bytes = bytes + excluded.bytes, last_used = excluded.last_used",
+                (chain, size, ts)
+            )
+        return chain, length
+    
+    def _enforce_quota(self, db: sqlite3.Connection) -> None:
+        """超出配额时按最近使用时间淘汰最旧的关键帧链（关键帧及其全部增量帧）"""
+        total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM chains").fetchone()[0]
+        if total <= self.quota_bytes:
+            return
+        active = {previous[2] for previous in self._previous.values()}
+        target = int(self.quota_bytes * 0.9)
+        for chain, size in db.execute("SELECT chain, bytes FROM chains ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            if chain in active:
+                continue
+            for digest, kind in db.execute("SELECT hash, kind FROM objects WHERE chain = ?", (chain,)).fetchall():
+                try:
+                    os.remove(self._object_path(digest, kind))
+                except OSError:
+                    pass
+            with db:
+                db.execute("DELETE FROM objects WHERE chain = ?", (chain,))
+                db.execute("DELETE FROM chains WHERE chain = ?", (chain,))
+            total -= size
+            audit_logger.info(f"截图归档超出配额，已淘汰关键帧链 {chain[:12]}（{size / 1024:.0f} KB）")
+    
+    # --- 读取 ---
+    
+    def load(self, digest: str) -> Image.Image:
+        """
+        按哈希还原一帧图像
+        
+        Raises:
+            FrameArchiveError: 帧不存在或已被淘汰
+        """
+        conn = sqlite3.connect(os.path.join(self.root, "archive.sqlite3"), timeout=30.0)
+        try:
+            return Image.fromarray(self._load_pixels(conn, digest))
+        finally:
+            conn.close()
+    
+    def _load_pixels(self, conn: sqlite3.Connection, digest: str) -> "np.ndarray":
+        row = conn.execute("SELECT kind, base FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise FrameArchiveError(f"帧不存在或已被淘汰: {digest}")
+        kind, base = row
+        path = self._object_path(digest, kind)
+        if kind == "full":
+            return np.asarray(Image.open(path).convert("RGB"))
+        
+        pixels = self._load_pixels(conn, base).copy()
+        with np.load(path) as delta:
+            tile = int(delta["tile"])
+            for i, (r, c) in enumerate(zip(delta["rows"], delta["cols"])):
+                block = delta[f"t{i}"]
+                pixels[r * tile:r * tile + block.shape[0], c * tile:c * tile + block.shape[1]] = block
+        return pixels
+    
+    def entries(
+        self,
+        session: Optional[str] = None,
+        job: Optional[str] = None,
+        iteration: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """按会话、任务、迭代查询归档记录"""
+        clauses, params = [], []
+        for column, value in (("session", session), ("job", job), ("iteration", iteration)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT ts, hash, session, job, iteration FROM entries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        conn = sqlite3.connect(os.path.join(self.root, "archive.sqlite3"), timeout=30.0)
+        try:
+            conn.executescript(_SCHEMA)
+            rows = conn.execute(sql + " ORDER BY ts, id", params).fetchall()
+        finally:
+            conn.close()
+        keys = ("ts", "hash", "session", "job", "iteration")
+        return [dict(zip(keys, row)) for row in rows]
+
+_default: Optional[FrameArchive] = None
+_default_lock = threading.Lock()
+
+def default_archive() -> Optional[FrameArchive]:
+    """
+    按配置创建全局截图归档（SCREENSHOT_ARCHIVE_DIR 为空时返回 None，即不归档）
+    """
+    global _default
+    if not config.SCREENSHOT_ARCHIVE_DIR:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = FrameArchive(config.SCREENSHOT_ARCHIVE_DIR, quota_mb=config.SCREENSHOT_ARCHIVE_QUOTA_MB)
+            atexit.register(_default.close)
+            audit_logger.info(
+                f"截图归档已启用 | 目录: {config.SCREENSHOT_ARCHIVE_DIR} | "
+                f"配额: {config.SCREENSHOT_ARCHIVE_QUOTA_MB:.0f} MB"
+            )
+        return _default
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="审计截图归档导出")
+    parser.add_argument("--root", default=config.SCREENSHOT_ARCHIVE_DIR, help="归档目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="按会话 / 任务 / 迭代导出 PNG")
+    export.add_argument("--session", help="运行会话 ID")
+    export.add_argument("--job", help="批处理任务 ID")
+    export.add_argument("--iteration", type=int, help="迭代号")
+    export.add_argument("--out", required=True, help="输出目录")
+    args = parser.parse_args(argv)
+    
+    if not args.root or not os.path.isdir(args.root):
+        print(f"❌ 归档目录不存在: {args.root or '(未配置 SCREENSHOT_ARCHIVE_DIR)'}")
+        sys.exit(1)
+    
+    archive = FrameArchive(args.root)
+    os.makedirs(args.out, exist_ok=True)
+    exported = missing = 0
+    for entry in archive.entries(session=args.session, job=args.job, iteration=args.iteration):
+        name = f"{entry['session']}_{entry['job'] or '-'}_{entry['iteration'] or 0:04d}_{entry['hash'][:12]}.png"
+        try:
+            archive.load(entry["hash"]).save(os.path.join(args.out, name))
+            exported += 1
+        except FrameArchiveError:
+            missing += 1
+    print(f"已导出 {exported} 帧，已淘汰 {missing} 帧 -> {args.out}")
+
+if __name__ == "__main__":
+    main()
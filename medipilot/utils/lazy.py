@@ -0,0 +1,79 @@
+"""
+重量级依赖的延迟导入
+
+openai、cv2、numpy、mss 等模块导入耗时可达数百毫秒，而多数命令行工具与测试只用到其中一部分。
+lazy_import 返回模块代理，首次访问属性时才真正导入，此后属性直接从代理自身读取。
+Pillow 仍为即时导入：首帧截屏必然用到，且各模块的类型注解 (Image.Image) 在定义时就会访问它。
+    
+    np = lazy_import("numpy")      # 此时尚未导入
+    np.zeros(3)                    # 首次访问时导入 numpy
+"""
+import sys
+import types
+import importlib
+import threading
+
+class _LazyModule(types.ModuleType):
+    """模块代理：首次访问属性时导入真实模块并复制其命名空间"""
+    
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+    
+    def _load(self) -> types.ModuleType:
+        # 导入本身由导入锁保护；此处的锁只保证命名空间只复制一次
+        with self.__dict__["_lazy_lock"]:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_module"] = module
+            return module
+    
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+    
+    def __dir__(self):
+        return dir(self._load())
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    延迟导入模块
+    
+    Args:
+        name: 模块全名（如 "numpy"、"mss.tools"）
+    
+    Returns:
+        ModuleType: 已导入时直接返回模块，否则返回首次访问属性时导入的代理
+    """
+    module = sys.modules.get(name)
+    if module is not None and not isinstance(module, _LazyModule):
+        return module
+    return _LazyModule(name)
+
+def is_loaded(module: types.ModuleType) -> bool:
+    """代理是否已完成导入（对普通模块恒为 True）"""
+    return not isinstance(module, _LazyModule) or module.__dict__["_lazy_module"] is not None
+
+def preload(*names: str) -> threading.Thread:
+    """
+    在后台线程导入模块，不阻塞调用方
+    
+    用于在等待用户输入（如确认免责声明）期间提前完成耗时的导入；
+    之后访问对应的 lazy_import 代理时会等待后台导入完成而不会重复导入。
+    导入失败（如缺少可选依赖或显示器）时忽略，留待实际使用时报错。
+    
+    Returns:
+        threading.Thread: 后台导入线程
+    """
+    def _run() -> None:
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass
+    
+    thread = threading.Thread(target=_run, name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -1,46 +1,491 @@
+import atexit
+import gzip
+import json
 import logging
+import logging.handlers
+import multiprocessing.util
 import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
 from datetime import datetime
+from typing import Callable, List, Optional, Tuple
 from configs.settings import config
+from medipilot.utils.audit_index import IndexHandler
 
-def setup_logger(name="MediPilot"):
+class _DeferredFileHandler(logging.FileHandler):
+    """只写入不刷新的文件处理器，由后台写入线程按持久化策略统一 flush"""
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+    
+    def sync(self, fsync: bool = False) -> None:
+        """刷新缓冲区，fsync=True 时同时落盘"""
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.stream.flush()
+                if fsync:
+                    os.fsync(self.stream.fileno())
+        finally:
+            self.release()
+
+def _compress(source: str, target: str, method: str) -> None:
+    """压缩归档日志并删除原文件（zstandard 未安装时退回 gzip）"""
+    try:
+        if method == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                method = "gzip"
+                target = target[:-len(".zst")] + ".gz"
+            else:
+                with open(source, "rb") as src, open(target, "wb") as dst:
+                    zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+        if method == "gzip":
+            with open(source, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(source)
+    except OSError as e:
+        # 压缩失败时保留未压缩的归档，不丢失审计记录
+        sys.stderr.write(f"日志归档压缩失败 {source}: {e}\n")
+
+class _RotatingFileHandler(_DeferredFileHandler):
     """
-    配置临床审计日志记录器
+    按日期与大小轮转的日志文件处理器
     
-    功能:
-    1. 记录所有自动化操作步骤，用于事后追溯 (Audit Trail)。
-    2. 区分常规操作信息 (INFO) 和 潜在风险警告 (WARNING).
-    3. 日志文件按日期归档，便于医院信息科管理。
+    当前文件始终为 logs/<prefix>_YYYY-MM-DD.<suffix>；跨天或超过 max_bytes 时移入
+    logs/archive/<prefix>_YYYY-MM-DD.NNN.<suffix> 并在独立线程中压缩（gzip / zstd / none）。
+    只有创建处理器的进程负责轮转，进程池子进程只追加写入。
+    """
+    
+    def __init__(
+        self,
+        log_dir: str,
+        prefix: str,
+        suffix: str,
+        max_bytes: int = 0,
+        compression: str = "gzip"
+    ) -> None:
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.archive_dir = os.path.join(log_dir, "archive")
+        self._date = self._today()
+        self._owner_pid = os.getpid()
+        super().__init__(self._path_for(self._date), encoding='utf-8', delay=True)
+        self._archive_stale()
+    
+    @staticmethod
+    def _today() -> str:
+        return datetime.now().strftime('%Y-%m-%d')
+    
+    def _path_for(self, date: str) -> str:
+        return os.path.join(self.log_dir, f"{self.prefix}_{date}.{self.suffix}")
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if os.getpid() == self._owner_pid and self._should_rotate():
+                self._rotate()
+        except OSError:
+            self.handleError(record)
+        super().emit(record)
+    
+    def _should_rotate(self) -> bool:
+        if self._today() != self._date:
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() >= self.max_bytes
+    
+    def _rotate(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self._archive(self.baseFilename, self._date)
+        self._date = self._today()
+        self.baseFilename = os.path.abspath(self._path_for(self._date))
+    
+    def _archive(self, path: str, date: str) -> None:
+        """将已关闭的日志文件移入归档目录并在后台压缩"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        os.makedirs(self.archive_dir, exist_ok=True)
+        index = 1
+        while any(
+            os.path.exists(os.path.join(self.archive_dir, f"{self.prefix}_{date}.{index:03d}.{self.suffix}{ext}"))
+            for ext in ("", ".gz", ".zst")
+        ):
+            index += 1
+        target = os.path.join(self.archive_dir, f"{self.prefix}_{date}.{index:03d}.{self.suffix}")
+        os.replace(path, target)
+        if self.compression in ("gzip", "zstd"):
+            ext = ".gz" if self.compression == "gzip" else ".zst"
+            threading.Thread(
+                target=_compress, args=(target, target + ext, self.compression),
+                name="audit-archiver"
+            ).start()
+    
+    def _archive_stale(self) -> None:
+        """归档以往运行遗留的非当日日志文件"""
+        pattern = re.compile(rf"^{re.escape(self.prefix)}_(\d{{4}}-\d{{2}}-\d{{2}})\.{re.escape(self.suffix)}$")
+        try:
+            names = os.listdir(self.log_dir)
+        except OSError:
+            return
+        for name in names:
+            match = pattern.match(name)
+            if match and match.group(1) != self._date:
+                try:
+                    self._archive(os.path.join(self.log_dir, name), match.group(1))
+                except OSError:
+                    pass
+
+class _FlushRequest:
+    """写入线程处理到此标记时立即刷新并通知等待方"""
+    
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+_STOP = object()
+
+class AuditWriter:
+    """
+    审计日志后台写入线程
+    
+    调用方只把日志记录放入内存队列（QueueHandler），文件与控制台 I/O 全部在本线程完成。
+    持久化策略:
+    1. 级别不低于 AUDIT_FLUSH_LEVEL 的记录（如执行动作的 INFO）写入后立即 flush；
+    2. 更低级别的记录（如 DEBUG）批量写入，最迟每 AUDIT_FLUSH_INTERVAL 秒 flush 一次；
+    3. AUDIT_FSYNC 开启时每次 flush 后 fsync，保证掉电不丢失；
+    4. 退出时排空队列后再关闭文件，不丢失任何记录。
+    
+    Attributes:
+        queue: 日志记录队列（无界，避免调用方阻塞或丢弃审计记录）
+        handlers: 实际执行写入的处理器
+    """
+    
+    def __init__(
+        self,
+        handlers: List[logging.Handler],
+        flush_level: int = logging.INFO,
+        flush_interval: float = 1.0,
+        batch_size: int = 256,
+        fsync: bool = False
+    ) -> None:
+        self.handlers = handlers
+        self.flush_level = flush_level
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._dirty = False
+        self._last_flush = time.monotonic()
+    
+    def start(self) -> None:
+        """启动后台写入线程"""
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush_if_due()
+                continue
+            
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            urgent = False
+            for item in batch:
+                if item is _STOP:
+                    self._flush()
+                    return
+                if isinstance(item, _FlushRequest):
+                    self._flush()
+                    item.done.set()
+                    continue
+                for handler in self.handlers:
+                    if item.levelno >= handler.level:
+                        handler.handle(item)
+                self._dirty = True
+                urgent = urgent or item.levelno >= self.flush_level
+            
+            if urgent:
+                self._flush()
+            else:
+                self._flush_if_due()
+    
+    def _flush_if_due(self) -> None:
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+    
+    def _flush(self) -> None:
+        for handler in self.handlers:
+            # 与 logging 的约定一致：写入失败不应终止写入线程
+            try:
+                if isinstance(handler, _DeferredFileHandler):
+                    handler.sync(self.fsync)
+                else:
+                    handler.flush()
+            except (OSError, ValueError):
+                pass
+        self._dirty = False
+        self._last_flush = time.monotonic()
+    
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """
+        等待队列中已有的记录全部写入并刷新
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            bool: 是否在超时前完成
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        request = _FlushRequest()
+        self.queue.put(request)
+        return request.done.wait(timeout)
+    
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """排空队列、刷新并关闭所有处理器（可重复调用）"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+        for handler in self.handlers:
+            handler.close()
+    
+    def _reinit_after_fork(self) -> None:
+        # 子进程（如批量提取的进程池）不会继承父进程的写入线程，需重建队列与线程
+        self.queue = queue.SimpleQueue()
+        self._dirty = False
+        self.start()
+
+class _RawQueueHandler(logging.handlers.QueueHandler):
+    """原样入队、不在调用方格式化的队列处理器（结构化事件的序列化在写入线程完成）"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class _JsonFormatter(logging.Formatter):
+    """将 dict 类型的日志消息序列化为单行 JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+class _DeferredSetupHandler(logging.Handler):
     """
+    占位处理器：收到第一条记录时才配置真正的处理器并转交该记录
+    
+    使导入 logger 模块没有副作用（不创建目录、文件与写入线程），
+    同时保证未显式配置的调用方（命令行工具、测试）仍能正常写出审计日志。
+    """
+    
+    def __init__(self, name: str, setup: Callable[[str], logging.Logger]) -> None:
+        super().__init__()
+        self._name = name
+        self._setup = setup
+    
+    def handle(self, record: logging.LogRecord) -> bool:
+        try:
+            logger = self._setup(self._name)
+        except Exception:
+            # 日志目录不可写等情况：与 logging 的约定一致，不向调用方抛出
+            self.handleError(record)
+            return False
+        # 其余已有的处理器（如测试挂载的采集器）由 Logger.callHandlers 照常调用
+        for handler in _writer_handlers(logger):
+            handler.handle(record)
+        return True
+
+_writers: List[Tuple[AuditWriter, logging.handlers.QueueHandler]] = []
+_setup_lock = threading.RLock()
+
+def _writer_handlers(logger: logging.Logger) -> List[logging.Handler]:
+    return [queue_handler for _, queue_handler in _writers if queue_handler in logger.handlers]
+
+def _configured(logger: logging.Logger) -> bool:
+    return bool(_writer_handlers(logger))
+
+def _remove_deferred(logger: logging.Logger) -> None:
+    # 赋值新列表而非原地删除：Logger.callHandlers 可能正在遍历旧列表
+    logger.handlers = [h for h in logger.handlers if not isinstance(h, _DeferredSetupHandler)]
+
+def _log_dir() -> str:
     # 确保日志目录存在
     log_dir = "logs"
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
+    return log_dir
+
+def _file_handler(prefix: str, suffix: str) -> _RotatingFileHandler:
+    return _RotatingFileHandler(
+        _log_dir(), prefix, suffix,
+        max_bytes=int(config.AUDIT_ROTATE_MAX_MB * 1024 * 1024),
+        compression=config.AUDIT_COMPRESSION.lower()
+    )
 
-    # 日志文件名: medipilot_YYYY-MM-DD.log
-    log_file = os.path.join(log_dir, f"medipilot_{datetime.now().strftime('%Y-%m-%d')}.log")
+def _attach_writer(
+    logger: logging.Logger,
+    writer: AuditWriter,
+    handler_cls: type = logging.handlers.QueueHandler
+) -> None:
+    """启动写入线程并将其队列挂载到 logger 上"""
+    if not _writers:
+        atexit.register(shutdown_logging)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(
+                before=_before_fork,
+                after_in_parent=_after_fork_in_parent,
+                after_in_child=_after_fork_in_child
+            )
+    writer.start()
+    queue_handler = handler_cls(writer.queue)
+    logger.addHandler(queue_handler)
+    _writers.append((writer, queue_handler))
+    # multiprocessing 子进程以 os._exit 退出、不执行 atexit，改用其退出钩子排空队列
+    multiprocessing.util.register_after_fork(writer, _register_process_finalizer)
 
+def setup_logger(name="MediPilot"):
+    """
+    配置临床审计日志记录器
+    
+    功能:
+    1. 记录所有自动化操作步骤，用于事后追溯 (Audit Trail)。
+    2. 区分常规操作信息 (INFO) 和 潜在风险警告 (WARNING).
+    3. 日志文件按日期归档，便于医院信息科管理。
+    4. 调用方只做入队，文件与控制台写入由后台线程 AuditWriter 完成，不阻塞主循环。
+    """
     logger = logging.getLogger(name)
     logger.setLevel(config.LOG_LEVEL)
-
+    
     # 避免重复添加 handler
-    if not logger.handlers:
-        # 文件处理器 - 用于存档
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    with _setup_lock:
+        if _configured(logger):
+            return logger
+        # 文件处理器 - 用于存档，文件名: medipilot_YYYY-MM-DD.log，按日期与大小轮转压缩
+        file_handler = _file_handler("medipilot", "log")
         file_formatter = logging.Formatter(
             '%(asctime)s - [%(levelname)s] - [临床操作审计] - %(message)s'
         )
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
-
+        
         # 控制台处理器 - 用于实时监控
         console_handler = logging.StreamHandler()
         console_formatter = logging.Formatter(
             '%(asctime)s - [%(levelname)s] - %(message)s'
         )
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        
+        _remove_deferred(logger)
+        _attach_writer(logger, AuditWriter(
+            [file_handler, console_handler],
+            flush_level=logging.getLevelName(config.AUDIT_FLUSH_LEVEL.upper()),
+            flush_interval=config.AUDIT_FLUSH_INTERVAL,
+            batch_size=config.AUDIT_BATCH_SIZE,
+            fsync=config.AUDIT_FSYNC
+        ))
+    return logger
+
+def setup_event_logger(name="MediPilotEvents"):
+    """
+    配置结构化事件日志记录器（与审计日志并行输出）
+    
+    每条记录为一个 dict，写入线程将其序列化为一行 JSON，
+    文件名: medipilot_events_YYYY-MM-DD.jsonl，并写入 SQLite 索引 (AUDIT_INDEX_PATH)。
+    事件按批量策略刷新。
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    # 事件不进入人类可读的审计日志
+    logger.propagate = False
+    
+    with _setup_lock:
+        if _configured(logger):
+            return logger
+        file_handler = _file_handler("medipilot_events", "jsonl")
+        file_handler.setFormatter(_JsonFormatter())
+        handlers: List[logging.Handler] = [file_handler]
+        # 同步写入 SQLite 索引，供合规检索
+        if config.AUDIT_INDEX_PATH:
+            handlers.append(IndexHandler(config.AUDIT_INDEX_PATH))
+        _remove_deferred(logger)
+        _attach_writer(logger, AuditWriter(
+            handlers,
+            flush_level=logging.CRITICAL + 1,
+            flush_interval=config.AUDIT_FLUSH_INTERVAL,
+            batch_size=config.AUDIT_BATCH_SIZE
+        ), handler_cls=_RawQueueHandler)
+    return logger
+
+def _stream_handlers() -> List[logging.StreamHandler]:
+    return [
+        handler for writer, _ in _writers for handler in writer.handlers
+        if isinstance(handler, logging.StreamHandler)
+    ]
+
+def _before_fork() -> None:
+    # 刷新并锁住文件缓冲区，避免子进程继承尚未写出的数据而重复写入
+    for handler in _stream_handlers():
+        handler.acquire()
+        try:
+            if handler.stream is not None:
+                handler.stream.flush()
+        except (OSError, ValueError):
+            pass
+
+def _after_fork_in_parent() -> None:
+    for handler in _stream_handlers():
+        handler.release()
+
+def _after_fork_in_child() -> None:
+    for writer, queue_handler in _writers:
+        writer._reinit_after_fork()
+        queue_handler.queue = writer.queue
 
+def _register_process_finalizer(writer: AuditWriter) -> None:
+    multiprocessing.util.Finalize(writer, writer.stop, exitpriority=-100)
+
+def flush_logging(timeout: Optional[float] = 5.0) -> bool:
+    """等待已提交的审计日志与事件全部写入磁盘"""
+    return all([writer.flush(timeout) for writer, _ in _writers])
+
+def shutdown_logging() -> None:
+    """排空审计日志队列并关闭文件（程序退出时自动调用）"""
+    for writer, _ in _writers:
+        writer.stop()
+
+def _deferred_logger(name: str, setup: Callable[[str], logging.Logger], level: int) -> logging.Logger:
+    """返回尚未创建文件与写入线程的 logger，首条记录到达时才调用 setup 完成配置"""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        logger.setLevel(level)
+        logger.addHandler(_DeferredSetupHandler(name, setup))
     return logger
 
-audit_logger = setup_logger()
+# 导入本模块不创建日志目录、文件或线程；入口程序可显式调用 setup_logger / setup_event_logger 提前配置
+audit_logger = _deferred_logger("MediPilot", setup_logger, config.LOG_LEVEL)
+event_logger = _deferred_logger("MediPilotEvents", setup_event_logger, logging.INFO)
+event_logger.propagate = False
@@ -0,0 +1,60 @@
+"""
+进程内存统计（RSS 与峰值 RSS）
+
+Linux 下读取 /proc/self/status 的 VmRSS / VmHWM，并可通过 /proc/self/clear_refs
+重置峰值，从而得到单次迭代内的峰值 RSS；其他平台退回 resource.getrusage
+（只能得到进程生命周期内的峰值）。
+"""
+import sys
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_STATUS_PATH = "/proc/self/status"
+_CLEAR_REFS_PATH = "/proc/self/clear_refs"
+
+def _read_status() -> Dict[str, int]:
+    """读取 /proc/self/status 中以 kB 为单位的字段（字节）"""
+    values: Dict[str, int] = {}
+    try:
+        with open(_STATUS_PATH, encoding="ascii") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    values[key] = int(parts[0]) * 1024
+    except OSError:
+        pass
+    return values
+
+def _maxrss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def rss_bytes() -> Optional[int]:
+    """当前 RSS（字节），无法获取时返回 None"""
+    return _read_status().get("VmRSS")
+
+def peak_rss_bytes() -> Optional[int]:
+    """峰值 RSS（字节）：上次 reset_peak_rss 以来的峰值，不支持重置的平台为进程生命周期峰值"""
+    return _read_status().get("VmHWM") or _maxrss_bytes()
+
+def reset_peak_rss() -> bool:
+    """
+    将峰值 RSS 重置为当前 RSS（Linux 4.0+）
+    
+    Returns:
+        bool: 是否成功重置
+    """
+    try:
+        with open(_CLEAR_REFS_PATH, "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
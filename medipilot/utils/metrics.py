@@ -0,0 +1,243 @@
+"""
+进程内指标注册表与 Prometheus 文本格式导出
+
+METRICS_ENABLED 关闭时所有指标操作在第一行直接返回，几乎没有开销。
+开启后通过本地 HTTP 端点 (默认 http://127.0.0.1:9464/metrics) 提供抓取，
+并在进程退出时写入 METRICS_DUMP_PATH。
+"""
+import os
+import atexit
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from configs.settings import config
+
+# 延迟（秒）直方图的默认分桶
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Registry:
+    """
+    指标注册表
+    
+    Attributes:
+        enabled: 是否记录指标
+        metrics: 已注册的指标（按注册顺序）
+    """
+    
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.metrics: List["_Metric"] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def register(self, metric: "_Metric") -> "_Metric":
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        """输出 Prometheus 文本格式 (text/plain; version=0.0.4)"""
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+    
+    def dump(self, path: str) -> None:
+        """将当前指标写入文件（原子替换）"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+    
+    def serve(self, host: str, port: int) -> int:
+        """
+        在后台线程启动 HTTP 抓取端点
+        
+        Returns:
+            int: 实际监听的端口（port=0 时由系统分配）
+        """
+        registry = self
+        
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format: str, *args) -> None:
+                # 抓取请求不写入审计日志
+                pass
+        
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+    
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+REGISTRY = Registry(enabled=config.METRICS_ENABLED)
+
+class _Metric:
+    kind = "untyped"
+    
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        registry: Registry = REGISTRY
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.registry = registry
+        self._lock = threading.Lock()
+        registry.register(self)
+    
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+    
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    
+    kind = "counter"
+    
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels: object) -> float:
+        return self._values.get(self._key(labels), 0.0)
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value:g}" for key, value in items]
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+    
+    kind = "gauge"
+    
+    def set(self, value: float, **labels: object) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    """分桶直方图（累计计数、总和与样本数）"""
+    
+    kind = "histogram"
+    
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签: [各分桶计数..., +Inf 计数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+    
+    def observe(self, value: float, **labels: object) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+    
+    def count(self, **labels: object) -> int:
+        state = self._values.get(self._key(labels))
+        return int(sum(state[:-1])) if state else 0
+    
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _format_labels(self.label_names, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative:g}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {state[-1]:g}")
+            lines.append(f"{self.name}_count{labels} {cumulative:g}")
+        return lines
+
+# --- 指标定义 ---
+STAGE_SECONDS = Histogram("medipilot_stage_seconds", "各阶段耗时（秒）", ["stage"])
+ITERATION_SECONDS = Histogram("medipilot_iteration_seconds", "单次迭代端到端耗时（秒）")
+ITERATIONS = Counter("medipilot_iterations_total", "主循环迭代次数", ["outcome"])
+FRAMES = Counter("medipilot_frames_total", "截屏帧数（used: 送入后续阶段，skipped: 等待稳定时丢弃）", ["result"])
+LLM_CALLS = Counter("medipilot_llm_calls_total", "大模型调用次数，按错误类型（成功为 none）", ["error_type"])
+LLM_TOKENS = Counter("medipilot_llm_tokens_total", "大模型 token 用量（cached 为命中提示缓存的输入 token）", ["kind"])
+LLM_SECONDS = Histogram("medipilot_llm_seconds", "大模型调用耗时（秒），按是否命中提示缓存（hit / miss）", ["cache"])
+ACTIONS = Counter("medipilot_actions_total", "执行的动作数，按动作类型", ["action"])
+ACTION_ERRORS = Counter("medipilot_action_errors_total", "执行失败的动作数，按动作类型", ["action"])
+ARCHIVE_FRAMES = Counter("medipilot_archive_frames_total", "截图归档帧数（dedup 为内容哈希命中）", ["result"])
+FRAME_BUFFERS = Counter("medipilot_frame_buffers_total", "整帧缓冲区获取次数（allocated: 新分配，reused: 复用）", ["result"])
+ITERATION_PEAK_RSS = Gauge("medipilot_iteration_peak_rss_bytes", "最近一次迭代的峰值 RSS（字节）")
+FINDINGS_CACHE = Counter("medipilot_findings_cache_total", "提取结果存储查询次数（hit: 复用已核验结果，miss: 调用模型）", ["result"])
+TERMS = Counter("medipilot_terms_total", "指标名称规范化次数，按匹配方式（exact / fuzzy / unknown）", ["match"])
+VERIFICATIONS = Counter("medipilot_verifications_total", "输入动作本地校验次数，按结果（verified / failed / ambiguous）", ["outcome"])
+LLM_CALLS_SAVED = Counter("medipilot_llm_calls_saved_total", "本地校验确认后省去的模型调用次数")
+DAEMON_JOBS = Counter("medipilot_daemon_jobs_total", "守护进程任务数，按结束状态（done / failed / cancelled）", ["status"])
+DAEMON_QUEUE_SECONDS = Histogram("medipilot_daemon_queue_seconds", "守护进程任务从提交到开始执行的等待时间（秒）")
+TILES = Counter("medipilot_tiles_total", "整帧分块数（send: 发送，blank: 空白跳过，unchanged: 复用上次结果）", ["status"])
+
+def start(host: Optional[str] = None, port: Optional[int] = None, dump_path: Optional[str] = None) -> Optional[int]:
+    """
+    启用指标：启动 HTTP 端点并注册退出时的指标转储（METRICS_ENABLED 关闭时不做任何事）
+    
+    Returns:
+        Optional[int]: HTTP 端点端口；未启用或端口为 0 时为 None
+    """
+    if not REGISTRY.enabled:
+        return None
+    dump_path = dump_path if dump_path is not None else config.METRICS_DUMP_PATH
+    if dump_path:
+        atexit.register(REGISTRY.dump, dump_path)
+    port = port if port is not None else config.METRICS_PORT
+    if not port:
+        return None
+    return REGISTRY.serve(host or config.METRICS_HOST, port)
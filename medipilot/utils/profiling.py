@@ -0,0 +1,210 @@
+"""
+按需性能剖析
+
+线上某次迭代变慢时无需重启：
+- 发送 SIGUSR1 (kill -USR1 <pid>)，或创建触发文件 PROFILE_TRIGGER_PATH（内容可写迭代次数），
+  即对接下来的 N 次迭代启用 cProfile 与 tracemalloc；剖析进行中再次触发则提前结束。
+- 报告写入 PROFILE_DIR，文件名带会话 ID 与迭代号，可与审计日志、事件索引对照。
+
+cProfile 只统计驱动主循环的线程；预取线程中的截屏 / 脱敏 / SoM 耗时见结构化事件的 span。
+"""
+import io
+import os
+import time
+import signal
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from typing import List, Optional
+from medipilot.utils.logger import audit_logger
+from medipilot.utils import events
+from configs.settings import config
+
+# tracemalloc 记录的调用栈深度
+TRACE_FRAMES = 10
+
+class IterationProfiler:
+    """
+    以迭代为单位的按需剖析器
+    
+    主循环在每次迭代开始时调用 step(iteration)，结束时调用 stop()。
+    arm() / toggle() 只设置标志（可在信号处理函数中调用），真正的启停发生在下一个迭代边界。
+    
+    Attributes:
+        output_dir: 报告目录
+        iterations: 每次触发剖析的迭代数
+        memory: 是否同时记录 tracemalloc 快照
+        trigger_path: 触发文件路径，留空则只响应信号与 arm()
+        reports: 已写出的报告路径
+    """
+    
+    def __init__(
+        self,
+        output_dir: str,
+        iterations: int = 5,
+        memory: bool = True,
+        trigger_path: Optional[str] = None
+    ) -> None:
+        self.output_dir = output_dir
+        self.iterations = iterations
+        self.memory = memory
+        self.trigger_path = trigger_path
+        self.reports: List[str] = []
+        
+        self._requested = 0
+        self._cancel = False
+        self._profile: Optional[cProfile.Profile] = None
+        self._owner: Optional[int] = None
+        self._remaining = 0
+        self._profiled: List[int] = []
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+        self._started_at = 0.0
+    
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+    
+    def arm(self, iterations: Optional[int] = None) -> None:
+        """请求从下一次迭代开始剖析"""
+        self._requested = max(1, iterations or self.iterations)
+    
+    def toggle(self, iterations: Optional[int] = None) -> None:
+        """未在剖析时启动，剖析进行中则在下一个迭代边界提前结束"""
+        if self.active or self._requested:
+            self._requested = 0
+            self._cancel = True
+        else:
+            self.arm(iterations)
+    
+    def _check_trigger(self) -> None:
+        if not self.trigger_path or not os.path.exists(self.trigger_path):
+            return
+        try:
+            with open(self.trigger_path, encoding="utf-8") as f:
+                content = f.read().strip()
+            os.remove(self.trigger_path)
+        except OSError:
+            return
+        self.toggle(int(content) if content.isdigit() else None)
+    
+    def step(self, iteration: int) -> None:
+        """
+        迭代边界：结算上一次迭代，并按需开始或结束剖析
+        
+        Args:
+            iteration: 即将开始的迭代号
+        """
+        if self.active and self._owner != threading.get_ident():
+            # 并发的批处理会话中只由启动剖析的线程驱动
+            return
+        self._check_trigger()
+        
+        if self.active:
+            self._remaining -= 1
+            if self._remaining <= 0 or self._cancel:
+                self._finish()
+        self._cancel = False
+        
+        if self._requested and not self.active:
+            self._start(self._requested)
+            self._requested = 0
+        if self.active:
+            self._profiled.append(iteration)
+    
+    def stop(self) -> None:
+        """主循环结束：写出进行中的剖析报告"""
+        if self.active and self._owner == threading.get_ident():
+            self._finish()
+    
+    def _start(self, iterations: int) -> None:
+        self._remaining = iterations
+        self._profiled = []
+        self._owner = threading.get_ident()
+        self._started_at = time.time()
+        if self.memory:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start(TRACE_FRAMES)
+            self._snapshot = tracemalloc.take_snapshot()
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # 同一线程已有其他剖析器（如外部以 cProfile 运行）
+            audit_logger.warning(f"无法启动剖析: {e}")
+            self._profile = None
+            self._stop_tracing()
+            return
+        audit_logger.info(f"🔬 开始剖析接下来的 {iterations} 次迭代")
+    
+    def _stop_tracing(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+        self._started_tracing = False
+        self._snapshot = None
+    
+    def _finish(self) -> None:
+        profile, self._profile = self._profile, None
+        profile.disable()
+        
+        first = self._profiled[0] if self._profiled else 0
+        last = self._profiled[-1] if self._profiled else 0
+        name = f"profile_{events.SESSION_ID}_iter{first}-{last}"
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, name)
+        elapsed = time.time() - self._started_at
+        
+        stream = io.StringIO()
+        stream.write(f"会话: {events.SESSION_ID}\n迭代: {', '.join(map(str, self._profiled))}\n")
+        stream.write(f"耗时: {elapsed:.2f}s\n\n")
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(40)
+        stats.sort_stats("tottime").print_stats(20)
+        
+        if self._snapshot is not None:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            stream.write(
+                f"\n内存分配 (tracemalloc): 当前 {current / 1024 / 1024:.1f}MB，"
+                f"峰值 {peak / 1024 / 1024:.1f}MB\n剖析期间增长最多的位置:\n"
+            )
+            for diff in snapshot.compare_to(self._snapshot, "lineno")[:25]:
+                stream.write(f"  {diff}\n")
+        self._stop_tracing()
+        
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(stream.getvalue())
+        # 原始数据可用 snakeviz / pstats 进一步分析
+        profile.dump_stats(base + ".prof")
+        self.reports.append(base + ".txt")
+        events.emit("profile", iterations=self._profiled, report=base + ".txt", duration_ms=elapsed * 1000)
+        audit_logger.info(f"🔬 剖析报告已写入: {base}.txt")
+
+_default: Optional[IterationProfiler] = None
+
+def default_profiler() -> IterationProfiler:
+    """按配置创建的进程级剖析器（单例）"""
+    global _default
+    if _default is None:
+        _default = IterationProfiler(
+            config.PROFILE_DIR,
+            iterations=config.PROFILE_ITERATIONS,
+            memory=config.PROFILE_MEMORY,
+            trigger_path=config.PROFILE_TRIGGER_PATH or None
+        )
+    return _default
+
+def install_signal_handler(profiler: Optional[IterationProfiler] = None) -> bool:
+    """
+    注册 SIGUSR1 以切换剖析（需在主线程调用；Windows 无此信号，可使用触发文件）
+    
+    Returns:
+        bool: 是否已注册
+    """
+    if not hasattr(signal, "SIGUSR1") or threading.current_thread() is not threading.main_thread():
+        return False
+    profiler = profiler or default_profiler()
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.toggle())
+    return True
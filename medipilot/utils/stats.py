@@ -0,0 +1,108 @@
+import sys
+import json
+import math
+import argparse
+from typing import Dict, Iterable, List, Optional
+
+# 流水线阶段的标准顺序，用于输出排序
+STAGE_ORDER = ("capture", "privacy", "som", "encode", "llm", "execute")
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    计算分位数（线性插值）
+    
+    Args:
+        samples: 样本列表（无需排序）
+        q: 分位点，取值 0-100
+    
+    Returns:
+        float: 分位数，样本为空时返回 0.0
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * q / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[int(rank)]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(samples: Iterable[float], quantiles: Iterable[float] = (50, 95, 99)) -> Dict[str, float]:
+    """
+    汇总样本的数量、均值、分位数与最大值
+    
+    Args:
+        samples: 样本序列
+        quantiles: 需要计算的分位点
+    
+    Returns:
+        dict: 如 {"count": 10, "mean": 1.2, "p50": 1.0, "p95": 2.0, "p99": 2.1, "max": 2.2}
+    """
+    values = list(samples)
+    result: Dict[str, float] = {"count": len(values)}
+    result["mean"] = sum(values) / len(values) if values else 0.0
+    for q in quantiles:
+        result[f"p{q:g}"] = percentile(values, q)
+    result["max"] = max(values) if values else 0.0
+    return result
+
+def stage_durations(paths: Iterable[str], event: str = "span") -> Dict[str, List[float]]:
+    """
+    从结构化事件日志 (JSONL) 中按阶段收集耗时
+    
+    Args:
+        paths: 事件日志文件路径
+        event: 需要统计的事件类型
+    
+    Returns:
+        dict: {阶段名: [duration_ms, ...]}，损坏的行会被跳过
+    """
+    durations: Dict[str, List[float]] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("event") != event or "duration_ms" not in record:
+                    continue
+                durations.setdefault(record.get("stage", "?"), []).append(float(record["duration_ms"]))
+    return durations
+
+def _stage_key(stage: str):
+    return (STAGE_ORDER.index(stage) if stage in STAGE_ORDER else len(STAGE_ORDER), stage)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="统计结构化事件日志中各阶段耗时分位数")
+    parser.add_argument("paths", nargs="+", help="事件日志文件 (logs/medipilot_events_*.jsonl)")
+    parser.add_argument("--stage", action="append", help="仅统计指定阶段（可重复）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args(argv)
+    
+    try:
+        durations = stage_durations(args.paths)
+    except OSError as e:
+        print(f"❌ 无法读取事件日志: {e}")
+        sys.exit(1)
+    if args.stage:
+        durations = {stage: v for stage, v in durations.items() if stage in args.stage}
+    
+    report = {stage: summarize(durations[stage]) for stage in sorted(durations, key=_stage_key)}
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    if not report:
+        print("未找到阶段耗时事件")
+        return
+    
+    print(f"{'stage':<10}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for stage, row in report.items():
+        print(
+            f"{stage:<10}{row['count']:>8}{row['mean']:>10.1f}{row['p50']:>10.1f}"
+            f"{row['p95']:>10.1f}{row['p99']:>10.1f}{row['max']:>10.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
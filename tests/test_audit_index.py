@@ -0,0 +1,88 @@
+"""
+MediPilot 审计日志归档与索引单元测试
+"""
+import gzip
+import json
+import time
+import logging
+import threading
+import pytest
+from medipilot.utils.audit_index import AuditIndex, parse_time, main as index_main
+from medipilot.utils.logger import _RotatingFileHandler
+
+def _event(ts, **fields):
+    return {"ts": ts, "event": "span", **fields}
+
+class TestAuditIndex:
+    """审计索引测试类"""
+    
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = AuditIndex(str(tmp_path / "index.sqlite3"))
+        now = time.time()
+        index.insert([
+            _event(now - 10 * 86400, session="S1", iteration=1, stage="llm", event="error", error_type="rate_limit"),
+            _event(now - 3600, session="S2", iteration=1, stage="execute", action="click"),
+            _event(now - 3500, session="S2", iteration=2, stage="execute", action="type"),
+            _event(now - 3400, session="S2", iteration=3, stage="llm", event="error", error_type="rate_limit"),
+            _event(now - 3300, session="S2", iteration=3, stage="execute", action="click", error="ExecutionError"),
+        ])
+        yield index
+        index.close()
+    
+    def test_query_session_actions(self, index):
+        actions = [r["action"] for r in index.query(session="S2", stage="execute")]
+        assert actions == ["click", "type", "click"]
+    
+    def test_query_errors_since(self, index):
+        assert len(index.query(error="rate_limit")) == 2
+        recent = index.query(error="rate_limit", since=parse_time("7d"))
+        assert [r["session"] for r in recent] == ["S2"]
+        assert len(index.query(error="*")) == 3
+    
+    def test_rebuild_from_archives(self, tmp_path, index):
+        archive = tmp_path / "archive"
+        archive.mkdir()
+        with gzip.open(archive / "medipilot_events_2026-10-01.001.jsonl.gz", "wt", encoding="utf-8") as f:
+            f.write(json.dumps(_event(1.0, session="OLD", action="click")) + "\n")
+        (tmp_path / "medipilot_events_2026-10-02.jsonl").write_text(
+            json.dumps(_event(2.0, session="OLD", action="finish")) + "\n{损坏", encoding="utf-8"
+        )
+        assert index.rebuild([str(archive), str(tmp_path)]) == 2
+        assert [r["action"] for r in index.query(session="OLD")] == ["click", "finish"]
+    
+    def test_cli_query(self, tmp_path, index, capsys):
+        index_main(["--index", index.path, "query", "--session", "S2", "--action", "click", "--count"])
+        assert capsys.readouterr().out.strip() == "2"
+
+class TestRotation:
+    """日志轮转测试类"""
+    
+    def test_size_rotation_compresses(self, tmp_path):
+        handler = _RotatingFileHandler(str(tmp_path), "medipilot", "log", max_bytes=200, compression="gzip")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        for i in range(20):
+            handler.emit(logging.makeLogRecord({"msg": f"执行动作 #{i:02d} " + "x" * 40}))
+        handler.close()
+        for thread in threading.enumerate():
+            if thread.name == "audit-archiver":
+                thread.join()
+        
+        archives = sorted((tmp_path / "archive").iterdir())
+        assert archives and all(p.name.endswith(".log.gz") for p in archives)
+        lines = []
+        for path in archives:
+            lines += gzip.open(path, "rt", encoding="utf-8").read().splitlines()
+        lines += open(handler.baseFilename, encoding="utf-8").read().splitlines()
+        assert lines == [f"执行动作 #{i:02d} " + "x" * 40 for i in range(20)]
+    
+    def test_stale_files_archived(self, tmp_path):
+        (tmp_path / "medipilot_2020-01-01.log").write_text("旧日志\n", encoding="utf-8")
+        handler = _RotatingFileHandler(str(tmp_path), "medipilot", "log", compression="none")
+        handler.close()
+        assert (tmp_path / "archive" / "medipilot_2020-01-01.001.log").exists()
+        assert not (tmp_path / "medipilot_2020-01-01.log").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,34 @@
+"""
+MediPilot 感知微基准工具单元测试
+"""
+from benchmarks.bench_perception import compare_results, measure, synthetic_frame
+
+def _result(median_ms, peak_kb=1024.0):
+    return {"median_ms": median_ms, "peak_kb": peak_kb}
+
+class TestBenchPerception:
+    """感知微基准测试类"""
+    
+    def test_compare_flags_time_regression(self):
+        baseline = {"som[1080p]": _result(10.0), "encode[1080p]": _result(10.0)}
+        current = {"som[1080p]": _result(12.0), "encode[1080p]": _result(10.5), "new[4k]": _result(1.0)}
+        
+        rows = {row["name"]: row for row in compare_results(baseline, current, threshold=0.15)}
+        assert set(rows) == {"som[1080p]", "encode[1080p]"}
+        assert rows["som[1080p]"]["regression"] is True
+        assert rows["encode[1080p]"]["regression"] is False
+    
+    def test_compare_ignores_small_memory_jitter(self):
+        rows = compare_results({"a": _result(10.0, 0.5)}, {"a": _result(10.0, 2.0)})
+        assert rows[0]["regression"] is False
+        
+        rows = compare_results({"a": _result(10.0, 4096.0)}, {"a": _result(10.0, 8192.0)})
+        assert rows[0]["regression"] is True
+    
+    def test_measure(self):
+        frame = synthetic_frame(320, 240)
+        result = measure(lambda: frame.copy(), repeat=3)
+        
+        assert result["repeat"] == 3
+        assert 0 <= result["min_ms"] <= result["median_ms"]
+        assert frame.size == (320, 240)
@@ -0,0 +1,117 @@
+"""
+MediPilot 整帧缓冲池单元测试
+"""
+import pytest
+from PIL import Image
+from medipilot.perception.buffers import FramePool, counts, release
+from medipilot.perception.screen import Perception
+from medipilot.orchestration.pipeline import AgentPipeline
+from tests.test_pipeline import ScriptedBrain, RecordingExecutor
+
+class _Shot:
+    def __init__(self, size, color):
+        self.size = size
+        self.raw = bytearray(Image.new("RGBA", size, color).tobytes("raw", "BGRA"))
+
+class _Screen:
+    """按序返回纯色帧的 MSS 替身"""
+    
+    def __init__(self, size=(320, 240), step=10):
+        self.monitors = [{}, {"left": 0, "top": 0, "width": size[0], "height": size[1]}]
+        self.size = size
+        self.step = step
+        self.grabs = 0
+    
+    def grab(self, monitor):
+        self.grabs += 1
+        return _Shot(self.size, (self.step * self.grabs % 256, 0, 0, 255))
+
+class _ScreenPerception(Perception):
+    """所有线程共用同一 MSS 替身的感知层（流水线在预取线程中截屏）"""
+    
+    def __init__(self, pool, step=10):
+        self.screen = _Screen(step=step)
+        super().__init__(headless=True, pool=pool)
+    
+    def _create_sct(self):
+        return self.screen
+
+class TestFramePool:
+    """缓冲池测试类"""
+    
+    def test_reuses_released_buffer(self):
+        pool = FramePool(capacity=2)
+        first = pool.acquire((64, 48))
+        release(first)
+        second = pool.acquire((64, 48))
+        
+        assert second is first
+        assert (pool.allocated, pool.reused) == (1, 1)
+        # 尺寸不同的请求不会拿到错误大小的缓冲区
+        assert pool.acquire((32, 32)).size == (32, 32)
+    
+    def test_ignores_foreign_and_duplicate_release(self):
+        pool = FramePool(capacity=4)
+        foreign = Image.new("RGB", (64, 48))
+        pool.release(foreign)
+        release(foreign, None)
+        assert pool.acquire((64, 48)) is not foreign
+        
+        image = pool.acquire((64, 48))
+        release(image, image)
+        assert pool.acquire((64, 48)) is image
+        assert pool.acquire((64, 48)) is not image
+    
+    def test_copy_and_preallocate(self):
+        pool = FramePool(capacity=3)
+        pool.preallocate((64, 48))
+        assert pool.allocated == 3
+        assert pool.free_bytes == 3 * 64 * 48 * 4
+        
+        source = Image.new("RGB", (64, 48), color=(1, 2, 3))
+        copied = pool.copy(source)
+        assert copied is not source
+        assert copied.tobytes() == source.tobytes()
+        assert pool.allocated == 3
+    
+    def test_zero_capacity_disables_reuse(self):
+        pool = FramePool(capacity=0)
+        image = pool.acquire((16, 16))
+        release(image)
+        assert pool.acquire((16, 16)) is not image
+        assert pool.reused == 0
+
+class TestPooledPerception:
+    """池化感知路径测试类"""
+    
+    def test_capture_decodes_into_pool(self):
+        pool = FramePool(capacity=2)
+        perception = _ScreenPerception(pool)
+        first = perception.capture()
+        assert first.getpixel((0, 0)) == (10, 0, 0)
+        release(first)
+        
+        second = perception.capture()
+        assert second is first
+        assert second.getpixel((0, 0)) == (20, 0, 0)
+    
+    def test_pipeline_bounds_allocations(self, sample_action_plan):
+        pool = FramePool(capacity=4)
+        # 画面不变，等待稳定只需两帧
+        perception = _ScreenPerception(pool, step=0)
+        brain = ScriptedBrain([sample_action_plan] * 5 + [{"action": "finish"}])
+        before = counts()
+        
+        pipeline = AgentPipeline(perception, brain, RecordingExecutor(), "任务", max_iterations=10)
+        assert pipeline.run() is True
+        
+        # 首帧之后各阶段全部复用缓冲区
+        assert pool.allocated <= 4
+        assert pool.reused > 0
+        assert len(pipeline.memory) == 6
+        assert sum(m["buffers_allocated"] for m in pipeline.memory) == counts()["allocated"] - before["allocated"]
+        assert all("peak_rss_mb" in m for m in pipeline.memory)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,96 @@
+"""
+MediPilot 离线批量提取单元测试
+"""
+import json
+import pytest
+from PIL import Image
+from medipilot.orchestration.bulk_extract import BulkExtractor, main, normalize_findings
+
+class FakeCognition:
+    """返回固定提取结果的认知池替身"""
+    
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+    
+    def call_vision(self, image, prompt):
+        self.calls += 1
+        assert image.size == (640, 480)
+        return self.result
+
+@pytest.fixture
+def report_dir(tmp_path):
+    """包含两张内容相同、一张不同的化验单目录"""
+    reports = tmp_path / "reports"
+    (reports / "sub").mkdir(parents=True)
+    Image.new('RGB', (640, 480), color='white').save(reports / "a.png")
+    Image.new('RGB', (640, 480), color='white').save(reports / "sub" / "a_copy.png")
+    Image.new('RGB', (640, 480), color='gray').save(reports / "b.jpg")
+    (reports / "notes.txt").write_text("ignored")
+    return reports
+
+class TestNormalizeFindings:
+    """findings 规范化测试类"""
+    
+    def test_strips_flags_and_parses_numbers(self):
+        result = {"findings": [
+            {"metric": " WBC ", "value": "11.2 H", "confidence": "0.9"},
+            {"metric": "Hgb", "value": "142↓", "unit": "g/L"},
+            {"metric": "", "value": "1"},
+            {"metric": "备注", "value": "阴性"},
+        ]}
+        rows = normalize_findings(result)
+        assert [r["metric"] for r in rows] == ["WBC", "Hgb", "备注"]
+        assert rows[0]["value"] == 11.2 and rows[0]["value_raw"] == "11.2 H"
+        assert rows[0]["confidence"] == 0.9
+        assert rows[1]["value"] == 142.0
+        assert rows[2]["value"] == "阴性"
+    
+    def test_missing_findings(self):
+        assert normalize_findings({"thought": "无"}) == []
+
+class TestBulkExtractor:
+    """离线批量提取测试类"""
+    
+    def test_run_and_resume(self, report_dir, tmp_path, sample_medical_data):
+        out = tmp_path / "out"
+        cognition = FakeCognition(sample_medical_data)
+        extractor = BulkExtractor(str(report_dir), str(out), workers=1, concurrency=2,
+                                  cognition=cognition)
+        stats = extractor.run()
+        
+        # 内容相同的副本按哈希只处理一次
+        assert stats == {"done": 2, "failed": 0, "skipped": 1, "findings": 8}
+        assert cognition.calls == 2
+        rows = [json.loads(l) for l in (out / "findings.jsonl").read_text(encoding="utf-8").splitlines()]
+        assert len(rows) == 8
+        assert {r["metric"] for r in rows} == {"WBC", "RBC", "Hgb", "PLT"}
+        assert all(len(r["sha256"]) == 64 for r in rows)
+        
+        # 再次运行时所有文件均已处理
+        stats = BulkExtractor(str(report_dir), str(out), workers=1, cognition=cognition).run()
+        assert stats["done"] == 0 and stats["skipped"] == 3
+        assert cognition.calls == 2
+    
+    def test_model_error_is_recorded_and_retried(self, report_dir, tmp_path):
+        out = tmp_path / "out"
+        failing = FakeCognition({"action": "error", "error_type": "rate_limit", "reason": "限流"})
+        stats = BulkExtractor(str(report_dir), str(out), workers=1, cognition=failing).run()
+        assert stats["failed"] == 2 and stats["done"] == 0
+        
+        # 失败的文件不计入已处理，下次运行会重试
+        ok = FakeCognition({"findings": [{"metric": "WBC", "value": "7.2"}]})
+        stats = BulkExtractor(str(report_dir), str(out), workers=1, cognition=ok).run()
+        assert stats["done"] == 2
+    
+    def test_cli_requires_privacy_region(self, report_dir, tmp_path, capsys):
+        """PRIVACY_REGION 针对 EMR 界面设定，命令行不允许省略扫描件的脱敏区域"""
+        with pytest.raises(SystemExit) as exc:
+            main([str(report_dir), "--out", str(tmp_path / "out")])
+        assert exc.value.code == 2
+        assert "--privacy-region" in capsys.readouterr().err
+        assert not (tmp_path / "out").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,159 @@
+"""
+MediPilot 断点续跑单元测试
+"""
+import os
+import pytest
+from PIL import Image, ImageDraw
+from configs.settings import config
+from medipilot.execution.action import Executor
+from medipilot.perception.screen import Perception
+from medipilot.orchestration.checkpoint import Checkpoint, CheckpointError
+from medipilot.orchestration.pipeline import AgentPipeline
+from medipilot.orchestration.replay import ReplayBackend
+
+class ScreenPerception:
+    """返回固定画面的感知层替身"""
+    
+    def __init__(self, color="white"):
+        self.color = color
+    
+    def wait_until_stable(self, timeout, interval=0.1, stable_frames=2):
+        image = Image.new("RGB", (320, 240), color=self.color)
+        ImageDraw.Draw(image).rectangle((20, 20, 120, 60), fill="black")
+        return image, True
+    
+    def privacy_filter(self, image):
+        return image
+    
+    def apply_som_overlay(self, image, grid_size=80):
+        return image
+
+class FormPerception(Perception):
+    """离线感知层：返回固定的 1920x1080 表单，脱敏与 SoM 使用真实实现"""
+    
+    def __init__(self):
+        super().__init__(headless=True)
+        self.form = Image.new("RGB", (1920, 1080), color="white")
+        draw = ImageDraw.Draw(self.form)
+        for y in range(0, 1080, 40):
+            draw.text((20, y), "患者 张三 ID 123456 | WBC 7.2 | HGB 135", fill="black")
+        draw.rectangle((600, 300, 900, 340), outline="black")
+    
+    def wait_until_stable(self, timeout, interval=0.1, stable_frames=2):
+        return self.form.copy(), True
+
+class InterruptingBrain:
+    """按顺序返回计划，计划用完时模拟 Ctrl+C"""
+    
+    def __init__(self, plans):
+        self.plans = list(plans)
+        self.prompts = []
+    
+    def call_vision(self, image, prompt):
+        self.prompts.append(prompt)
+        if not self.plans:
+            raise KeyboardInterrupt
+        return self.plans.pop(0)
+
+def _pipeline(brain, checkpoint, color="white"):
+    executor = Executor(backend=ReplayBackend((320, 240)))
+    return AgentPipeline(ScreenPerception(color), brain, executor, "录入血常规", max_iterations=10, checkpoint=checkpoint)
+
+class TestCheckpoint:
+    """检查点测试类"""
+    
+    def test_interrupted_run_resumes_after_verification(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        brain = InterruptingBrain([
+            {"action": "click", "coordinate": [50, 40]},
+            {"action": "type", "coordinate": [50, 40], "text": "7.2"},
+            # 坐标越界的动作未确认执行，不计入检查点
+            {"action": "type", "coordinate": [900, 40], "text": "135"},
+        ])
+        with pytest.raises(KeyboardInterrupt):
+            _pipeline(brain, Checkpoint(path, "录入血常规")).run()
+        
+        checkpoint = Checkpoint.load(path)
+        assert checkpoint.iteration == 2
+        assert checkpoint.filled == [{"iteration": 2, "coordinate": [50, 40], "text": "7.2"}]
+        assert checkpoint.last_plan["text"] == "7.2"
+        assert not os.path.exists(path + ".tmp")
+        
+        brain = InterruptingBrain([{"action": "finish"}])
+        pipeline = _pipeline(brain, checkpoint)
+        assert pipeline.run() is True
+        assert pipeline.iteration_count == 3
+        assert "已录入的内容（不要重复录入）: 7.2 @ [50, 40]" in brain.prompts[0]
+        # 任务完成后检查点删除
+        assert not os.path.exists(path)
+    
+    def test_resume_rejects_different_screen(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        with pytest.raises(KeyboardInterrupt):
+            _pipeline(InterruptingBrain([{"action": "click", "coordinate": [50, 40]}]), Checkpoint(path, "录入")).run()
+        
+        brain = InterruptingBrain([{"action": "finish"}])
+        with pytest.raises(CheckpointError):
+            _pipeline(brain, Checkpoint.load(path), color="gray").run()
+        # 校验在调用模型之前完成，检查点保留
+        assert brain.prompts == []
+        assert Checkpoint.load(path).iteration == 1
+    
+    def test_resume_accepts_screen_changed_by_confirmed_click(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        perception = ScreenPerception()
+        
+        class NavigatingBackend(ReplayBackend):
+            """点击后 EMR 切换到另一个界面"""
+            
+            def click(self, x=None, y=None):
+                super().click(x, y)
+                perception.color = "gray"
+        
+        class CrashingCheckpoint(Checkpoint):
+            """动作写入检查点后进程立即中断（下一帧尚未开始处理）"""
+            
+            def record(self, *args, **kwargs):
+                super().record(*args, **kwargs)
+                raise KeyboardInterrupt
+        
+        brain = InterruptingBrain([{"action": "click", "coordinate": [50, 40]}])
+        executor = Executor(backend=NavigatingBackend((320, 240)))
+        pipeline = AgentPipeline(perception, brain, executor, "录入", max_iterations=10, checkpoint=CrashingCheckpoint(path, "录入"))
+        with pytest.raises(KeyboardInterrupt):
+            pipeline.run()
+        
+        # 检查点中的画面是点击之后的界面
+        brain = InterruptingBrain([{"action": "finish"}])
+        assert _pipeline(brain, Checkpoint.load(path), color="gray").run() is True
+        assert len(brain.prompts) == 1
+    
+    def test_resume_compares_raw_frames(self, tmp_path, monkeypatch):
+        """检查点画面与续跑画面都取脱敏与 SoM 之前的原始帧，同一界面不应产生固定差异"""
+        # 脱敏模糊与 SoM 网格在 1920x1080 表单上约产生 2% 的差异，收紧上限使其足以导致误判
+        monkeypatch.setattr(config, "CHECKPOINT_SCREEN_TOLERANCE", 0.01)
+        path = str(tmp_path / "checkpoint.json")
+        brain = InterruptingBrain([{"action": "click", "coordinate": [700, 320]}])
+        executor = Executor(backend=ReplayBackend((1920, 1080)))
+        with pytest.raises(KeyboardInterrupt):
+            AgentPipeline(FormPerception(), brain, executor, "录入", max_iterations=10,
+                          checkpoint=Checkpoint(path, "录入")).run()
+        
+        checkpoint = Checkpoint.load(path)
+        assert checkpoint.difference(FormPerception().form) == 0
+        brain = InterruptingBrain([{"action": "finish"}])
+        executor = Executor(backend=ReplayBackend((1920, 1080)))
+        pipeline = AgentPipeline(FormPerception(), brain, executor, "录入", max_iterations=10, checkpoint=checkpoint)
+        assert pipeline.run() is True
+        assert len(brain.prompts) == 1
+    
+    def test_corrupt_file(self, tmp_path):
+        path = tmp_path / "checkpoint.json"
+        path.write_text('{"task_desc": ', encoding="utf-8")
+        with pytest.raises(CheckpointError):
+            Checkpoint.load(str(path))
+        assert Checkpoint.load(str(tmp_path / "missing.json")) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,163 @@
+"""
+MediPilot 守护进程模式单元测试
+"""
+import os
+import json
+import time
+import socket
+import urllib.request
+import urllib.error
+import pytest
+from PIL import Image
+from medipilot.execution.action import Executor
+from medipilot.orchestration.daemon import AgentDaemon, DaemonError, CANCELLED, DONE, write_token_file
+from medipilot.orchestration.replay import ReplayBackend
+
+class ScreenPerception:
+    """返回固定画面的感知层替身"""
+    
+    def wait_until_stable(self, timeout, interval=0.1, stable_frames=2):
+        return Image.new("RGB", (320, 240), "white"), True
+    
+    def privacy_filter(self, image):
+        return image
+    
+    def apply_som_overlay(self, image, grid_size=80):
+        return image
+
+class RecordingBrain:
+    """提取提示词返回固定 findings，操作提示词直接结束"""
+    
+    def __init__(self):
+        self.prompts = []
+    
+    def call_vision(self, image, prompt):
+        self.prompts.append(prompt)
+        if "临床检验数据分析专家" in prompt:
+            return {"findings": [{"metric": "Hgb", "value": "142", "unit": "g/L", "confidence": 0.95}]}
+        return {"action": "finish"}
+
+_TOKEN = "test-token"
+
+@pytest.fixture
+def daemon():
+    daemon = AgentDaemon(
+        ScreenPerception(), RecordingBrain(), Executor(backend=ReplayBackend((320, 240))), max_iterations=3, token=_TOKEN
+    )
+    yield daemon
+    daemon.stop()
+
+def _request(port, method, path, body=None, token=_TOKEN, headers=None):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}", method=method,
+        data=None if body is None else json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json", **(headers or {})},
+    )
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def _wait(port, job_id):
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        status, job = _request(port, "GET", f"/jobs/{job_id}")
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("任务未在预期时间内结束")
+
+class TestDaemonApi:
+    """任务提交 API 测试类"""
+    
+    def test_submit_and_fetch_result(self, daemon):
+        port = daemon.serve("127.0.0.1", 0)
+        status, job = _request(port, "POST", "/jobs", {
+            "task": "录入血常规", "findings": [{"metric": "WBC", "value": "7.2", "unit": "10^9/L"}]
+        })
+        assert status == 202 and job["status"] in ("queued", "running")
+        
+        assert _wait(port, job["job_id"])["status"] == DONE
+        status, body = _request(port, "GET", f"/jobs/{job['job_id']}/result")
+        assert status == 200
+        assert body["result"]["finished"] is True and body["queued_ms"] >= 0
+        assert "已提取的数据（以此为准）: 白细胞计数(WBC)=7.2 10^9/L" in daemon.brain.prompts[-1]
+        
+        assert [j["job_id"] for j in _request(port, "GET", "/jobs")[1]["jobs"]] == [job["job_id"]]
+        assert _request(port, "GET", "/jobs/missing")[0] == 404
+        assert _request(port, "POST", "/jobs", {"findings": []})[0] == 400
+    
+    def test_report_image_is_extracted_before_operating(self, daemon, tmp_path):
+        path = tmp_path / "report.png"
+        Image.new("RGB", (640, 480), "white").save(path)
+        port = daemon.serve("127.0.0.1", 0)
+        
+        job = _wait(port, _request(port, "POST", "/jobs", {"task": "录入", "report": str(path)})[1]["job_id"])
+        assert job["status"] == DONE
+        result = _request(port, "GET", f"/jobs/{job['job_id']}/result")[1]["result"]
+        assert result["findings"][0]["metric"] == "Hgb"
+        assert "血红蛋白(HGB)=142 g/L" in daemon.brain.prompts[-1]
+        
+        missing = _wait(port, _request(port, "POST", "/jobs", {"task": "录入", "report": str(tmp_path / "x.png")})[1]["job_id"])
+        assert missing["status"] == "failed" and "无法读取化验单图像" in missing["error"]
+    
+    def test_invalid_content_length(self, daemon):
+        port = daemon.serve("127.0.0.1", 0)
+        for value in ("abc", "-1"):
+            with socket.create_connection(("127.0.0.1", port), timeout=5) as conn:
+                conn.sendall((
+                    f"POST /jobs HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {_TOKEN}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {value}\r\n\r\n"
+                ).encode("ascii"))
+                assert conn.recv(1024).startswith(b"HTTP/1.0 400")
+    
+    def test_token_required(self, daemon):
+        daemon.token = "secret"
+        port = daemon.serve("127.0.0.1", 0)
+        assert _request(port, "GET", "/health")[0] == 401
+        status, health = _request(port, "GET", "/health", token="secret")
+        assert status == 200 and health["status"] == "ok" and health["queued"] == 0
+    
+    def test_browser_requests_rejected(self, daemon):
+        port = daemon.serve("127.0.0.1", 0)
+        # 跨域简单请求（text/plain）与 DNS 重绑定（外部域名作为 Host）
+        assert _request(port, "POST", "/jobs", {"task": "a"}, headers={"Content-Type": "text/plain"})[0] == 415
+        assert _request(port, "GET", "/jobs", headers={"Host": f"evil.example:{port}"})[0] == 403
+        assert _request(port, "GET", "/health", headers={"Host": f"localhost:{port}"})[0] == 200
+        assert daemon.list_jobs() == []
+    
+    def test_token_generated_when_unset(self, tmp_path):
+        daemon = AgentDaemon(ScreenPerception(), RecordingBrain(), Executor(backend=ReplayBackend((320, 240))))
+        assert daemon.token_generated and len(daemon.token) >= 32
+        path = tmp_path / "daemon.token"
+        write_token_file(str(path), daemon.token)
+        assert path.read_text(encoding="utf-8").strip() == daemon.token
+        assert os.stat(path).st_mode & 0o777 == 0o600
+        
+        port = daemon.serve("127.0.0.1", 0)
+        try:
+            assert _request(port, "GET", "/health", token=None)[0] == 401
+            assert _request(port, "GET", "/health", token=daemon.token)[0] == 200
+        finally:
+            daemon.stop()
+
+class TestDaemonQueue:
+    """排队与停止测试类"""
+    
+    def test_cancel_and_stop(self, daemon):
+        # 未启动工作线程，任务停留在队列中
+        first, second = daemon.submit({"task": "a"}), daemon.submit({"task": "b"})
+        assert daemon.cancel(first.job_id) is True
+        assert daemon.cancel(first.job_id) is False
+        
+        daemon.stop("emergency_stop")
+        assert second.status == CANCELLED
+        with pytest.raises(DaemonError):
+            daemon.submit({"task": "c"})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,90 @@
+"""
+MediPilot 结构化事件日志单元测试
+"""
+import json
+import logging
+import pytest
+from medipilot.utils import events
+from medipilot.utils.logger import event_logger
+from medipilot.utils.stats import stage_durations, main as stats_main
+from medipilot.orchestration.pipeline import AgentPipeline
+from tests.test_pipeline import FakePerception, ScriptedBrain, RecordingExecutor
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record.msg)
+
+@pytest.fixture
+def captured_events():
+    handler = _ListHandler()
+    event_logger.addHandler(handler)
+    yield handler.records
+    event_logger.removeHandler(handler)
+
+class TestEvents:
+    """结构化事件测试类"""
+    
+    def test_span_fields(self, captured_events):
+        with events.bind(iteration=7):
+            with events.span("encode") as span:
+                span["payload_bytes"] = 1024
+        
+        record = captured_events[-1]
+        assert record["event"] == "span"
+        assert record["stage"] == "encode"
+        assert record["iteration"] == 7
+        assert record["payload_bytes"] == 1024
+        assert record["end"] >= record["start"]
+        assert record["duration_ms"] == span["duration_ms"]
+    
+    def test_span_records_error(self, captured_events):
+        with pytest.raises(ValueError):
+            with events.span("execute"):
+                raise ValueError("坐标越界")
+        assert captured_events[-1]["error"] == "ValueError"
+    
+    def test_pipeline_emits_stage_spans(self, captured_events, sample_action_plan):
+        brain = ScriptedBrain([sample_action_plan, {"action": "finish"}])
+        pipeline = AgentPipeline(FakePerception(), brain, RecordingExecutor(), "任务", max_iterations=5)
+        with events.bind(job="J1"):
+            assert pipeline.run() is True
+        
+        spans = [(r["iteration"], r["stage"]) for r in captured_events if r["event"] == "span"]
+        for iteration in (1, 2):
+            for stage in ("capture", "privacy", "som", "execute"):
+                assert (iteration, stage) in spans
+        # 预取线程继承调用方上下文
+        assert all(r["job"] == "J1" for r in captured_events)
+        execute = [r for r in captured_events if r["stage"] == "execute"]
+        assert [r["action"] for r in execute] == ["click", "finish"]
+
+class TestStageStats:
+    """阶段耗时统计 CLI 测试类"""
+    
+    def test_stage_durations(self, tmp_path, capsys):
+        path = tmp_path / "events.jsonl"
+        lines = [
+            json.dumps({"event": "span", "stage": "llm", "duration_ms": float(ms)})
+            for ms in range(1, 101)
+        ]
+        lines.append(json.dumps({"event": "span", "stage": "som", "duration_ms": 5.0}))
+        lines.append("{损坏的行")
+        path.write_text("\n".join(lines), encoding="utf-8")
+        
+        durations = stage_durations([str(path)])
+        assert len(durations["llm"]) == 100
+        assert durations["som"] == [5.0]
+        
+        stats_main([str(path), "--json"])
+        report = json.loads(capsys.readouterr().out)
+        assert list(report) == ["som", "llm"]
+        assert report["llm"]["p50"] == pytest.approx(50.5)
+        assert report["llm"]["p99"] == pytest.approx(99.01)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,97 @@
+"""
+MediPilot 执行层单元测试
+"""
+import pytest
+from medipilot.execution.action import (
+    Executor, InputBackend, EmergencyStop, ExecutionError, create_backend
+)
+
+class FakeBackend(InputBackend):
+    """记录调用的内存输入后端，无需真实显示器"""
+    
+    name = "fake"
+    
+    def __init__(self, pointer=(500, 500)):
+        self.calls = []
+        self.pointer = pointer
+    
+    def screen_size(self):
+        return (1920, 1080)
+    
+    def position(self):
+        return self.pointer
+    
+    def move_to(self, x, y):
+        self.check_failsafe()
+        self.calls.append(("move_to", x, y))
+    
+    def click(self, x=None, y=None):
+        self.check_failsafe()
+        self.calls.append(("click", x, y))
+    
+    def write(self, text):
+        self.check_failsafe()
+        self.calls.append(("write", text))
+    
+    def scroll(self, amount):
+        self.check_failsafe()
+        self.calls.append(("scroll", amount))
+
+class TestExecutor:
+    """执行层测试类"""
+    
+    @pytest.fixture
+    def backend(self):
+        return FakeBackend()
+    
+    @pytest.fixture
+    def executor(self, backend):
+        return Executor(backend=backend)
+    
+    def test_initialization_uses_backend_screen_size(self, executor):
+        """测试屏幕尺寸来自输入后端"""
+        assert executor.screen_size == (1920, 1080)
+    
+    def test_click(self, executor, backend, sample_action_plan):
+        """测试点击动作"""
+        assert executor.execute(sample_action_plan) is False
+        x, y = sample_action_plan["coordinate"]
+        assert backend.calls == [("move_to", x, y), ("click", None, None)]
+    
+    def test_type(self, executor, backend):
+        """测试输入动作先聚焦再输入"""
+        plan = {"action": "type", "coordinate": [450, 600], "text": 7.2}
+        executor.execute(plan)
+        assert backend.calls == [("click", 450, 600), ("write", "7.2")]
+    
+    def test_invalid_coordinate_skipped(self, executor, backend):
+        """测试越界坐标不会触发任何输入"""
+        executor.execute({"action": "click", "coordinate": [5000, 10]})
+        assert backend.calls == []
+    
+    def test_finish(self, executor):
+        """测试结束动作"""
+        assert executor.execute({"action": "finish"}) is True
+    
+    def test_failsafe_corner_raises_emergency_stop(self, backend, executor):
+        """测试鼠标位于屏幕角落时触发紧急停止"""
+        backend.pointer = (0, 0)
+        with pytest.raises(EmergencyStop):
+            executor.execute({"action": "click", "coordinate": [100, 100]})
+        
+        backend.pointer = (1919, 1079)
+        with pytest.raises(EmergencyStop):
+            executor.execute({"action": "scroll"})
+    
+    def test_emergency_stop_is_not_execution_error(self):
+        """紧急停止不能被主循环当作普通执行错误吞掉"""
+        assert not issubclass(EmergencyStop, ExecutionError)
+    
+    def test_unknown_backend(self):
+        """测试未知后端名称"""
+        with pytest.raises(ExecutionError):
+            create_backend("nonexistent")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,160 @@
+"""
+MediPilot 提取结果存储单元测试
+"""
+import json
+import pytest
+from PIL import Image
+from medipilot.perception.screen import Perception
+from medipilot.utils import events
+from medipilot.utils.findings_store import FindingsStore, main as store_main, report_hash
+from medipilot.orchestration.report import extract_cached
+from medipilot.orchestration.bulk_extract import BulkExtractor
+from medipilot.orchestration.replay import ReplayBackend
+from medipilot.execution.action import Executor
+from medipilot.orchestration.split_screen import SplitScreenSession
+
+_FINDINGS = [
+    {"metric": "WBC", "value": "7.2", "unit": "10^9/L", "confidence": 0.98},
+    {"metric": "Hgb", "value": "142", "unit": "g/L", "confidence": 0.95},
+]
+
+class _Shot:
+    def __init__(self, size):
+        self.size = size
+        self.raw = bytearray(Image.new("RGBA", size, (200, 200, 200, 255)).tobytes("raw", "BGRA"))
+
+class _Screen:
+    """双显示器 MSS 替身：报告显示器 640x480，EMR 显示器 800x600"""
+    monitors = [
+        {"left": 0, "top": 0, "width": 1440, "height": 600},
+        {"left": 0, "top": 0, "width": 640, "height": 480},
+        {"left": 640, "top": 0, "width": 800, "height": 600},
+    ]
+    
+    def grab(self, monitor):
+        return _Shot((monitor["width"], monitor["height"]))
+
+class _ScreenPerception(Perception):
+    def __init__(self, monitor):
+        super().__init__(headless=True, monitor=monitor)
+    
+    def _create_sct(self):
+        return _Screen()
+
+class _Brain:
+    """提取提示词返回固定 findings，操作提示词直接结束"""
+    
+    def __init__(self):
+        self.extractions = 0
+    
+    def call_vision(self, image, prompt):
+        if "临床检验数据分析专家" in prompt:
+            self.extractions += 1
+            return {"findings": [dict(f) for f in _FINDINGS]}
+        return {"action": "finish"}
+
+class _Cognition:
+    def __init__(self):
+        self.calls = 0
+    
+    def call_vision(self, image, prompt):
+        self.calls += 1
+        return {"findings": [dict(f) for f in _FINDINGS]}
+
+@pytest.fixture
+def store(tmp_path):
+    store = FindingsStore(str(tmp_path / "findings.sqlite3"), min_confidence=0.9)
+    yield store
+    store.close()
+
+class TestFindingsStore:
+    """存储与核验测试类"""
+    
+    def test_reuses_only_verified_results(self, store):
+        assert store.save("a" * 64, _FINDINGS, report_id="R001") is True
+        low = [dict(_FINDINGS[0], confidence=0.6)]
+        assert store.save("b" * 64, low) is False
+        
+        assert store.lookup("a" * 64)["findings"] == _FINDINGS
+        # 重新扫描的报告内容哈希不同，按报告编号命中
+        assert store.lookup("c" * 64, report_id="R001")["report_hash"] == "a" * 64
+        # 低置信度结果需人工复核后才可复用
+        assert store.lookup("b" * 64) is None
+        assert store.verify("b" * 64) is True
+        assert store.lookup("b" * 64)["findings"] == low
+        assert store.verify("d" * 64) is False
+    
+    def test_query_by_session_and_metric(self, store):
+        with events.bind(session="s1"):
+            store.save("a" * 64, _FINDINGS)
+        with events.bind(session="s2"):
+            store.save("b" * 64, [dict(_FINDINGS[0], value="6.9")])
+        
+        rows = store.query(metric="wbc")
+        assert [(r["value"], r["report_hash"]) for r in rows] == [("7.2", "a" * 64), ("6.9", "b" * 64)]
+        assert [r["metric"] for r in store.query(session="s1")] == ["WBC", "Hgb"]
+        assert store.query(session="s1", since=rows[-1]["ts"] + 1) == []
+    
+    def test_report_hash_ignores_encoding(self, tmp_path):
+        image = Image.new("RGB", (64, 48), "white")
+        image.save(tmp_path / "a.png")
+        image.save(tmp_path / "a.bmp")
+        
+        assert report_hash(Image.open(tmp_path / "a.png")) == report_hash(Image.open(tmp_path / "a.bmp"))
+        assert report_hash(image) != report_hash(Image.new("RGB", (64, 48), "gray"))
+    
+    def test_cli_query(self, store, capsys):
+        store.save("a" * 64, _FINDINGS)
+        store_main(["--db", store.path, "query", "--metric", "Hgb"])
+        rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [r["value"] for r in rows] == ["142"]
+
+class TestCachedExtraction:
+    """提取前查询存储测试类"""
+    
+    def test_second_extraction_skips_model(self, store):
+        image = Image.new("RGB", (64, 48), "white")
+        calls = []
+        
+        def _extract():
+            calls.append(1)
+            return {"findings": list(_FINDINGS), "errors": []}
+        
+        first = extract_cached(store, image, _extract)
+        second = extract_cached(store, image, _extract)
+        assert len(calls) == 1
+        assert (first["cached"], second["cached"]) == (False, True)
+        assert second["findings"] == _FINDINGS
+    
+    def test_partial_failure_is_not_stored(self, store):
+        image = Image.new("RGB", (64, 48), "white")
+        extract_cached(store, image, lambda: {"findings": list(_FINDINGS), "errors": [{"reason": "超时"}]})
+        assert store.lookup(report_hash(image)) is None
+    
+    def test_split_screen_reopened_report(self, store):
+        brain = _Brain()
+        for _ in range(2):
+            report, emr = _ScreenPerception(1), _ScreenPerception(2)
+            executor = Executor(backend=ReplayBackend((1440, 600)), monitor=emr.monitor_geometry())
+            session = SplitScreenSession(report, emr, brain, executor, "录入血常规", max_iterations=2, store=store)
+            assert session.run() is True
+            assert "白细胞计数(WBC)=7.2 10^9/L" in session.pipeline.task_desc
+        
+        # 同一份报告第二次打开时不再调用提取提示词
+        assert brain.extractions == 1
+    
+    def test_bulk_reuses_store_across_output_dirs(self, tmp_path, store):
+        reports = tmp_path / "reports"
+        reports.mkdir()
+        Image.new("RGB", (640, 480), "white").save(reports / "a.png")
+        Image.new("RGB", (640, 480), "gray").save(reports / "b.png")
+        cognition = _Cognition()
+        
+        BulkExtractor(str(reports), str(tmp_path / "out1"), workers=1, cognition=cognition, store=store).run()
+        stats = BulkExtractor(str(reports), str(tmp_path / "out2"), workers=1, cognition=cognition, store=store).run()
+        assert cognition.calls == 2
+        assert stats["done"] == 2 and stats["findings"] == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
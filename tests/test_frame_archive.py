@@ -0,0 +1,73 @@
+"""
+MediPilot 审计截图归档单元测试
+"""
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from medipilot.utils import events
+from medipilot.utils.frame_archive import FrameArchive, FrameArchiveError
+
+def _screen(seed=0, size=(300, 200)):
+    """模拟一帧带噪声的屏幕截图"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+
+def _objects(archive, kind):
+    ext = ".png" if kind == "full" else ".delta.npz"
+    return [
+        name for _, _, files in os.walk(os.path.join(archive.root, "objects"))
+        for name in files if name.endswith(ext)
+    ]
+
+class TestFrameArchive:
+    """截图归档测试类"""
+    
+    def test_identical_frames_stored_once(self, tmp_path):
+        archive = FrameArchive(str(tmp_path))
+        frame = Image.fromarray(_screen())
+        with events.bind(iteration=1):
+            archive.submit(frame)
+        with events.bind(iteration=2):
+            archive.submit(frame.copy())
+        archive.close()
+        
+        entries = archive.entries(session=events.SESSION_ID)
+        assert [e["iteration"] for e in entries] == [1, 2]
+        assert entries[0]["hash"] == entries[1]["hash"]
+        assert len(_objects(archive, "full")) == 1
+    
+    def test_delta_roundtrip(self, tmp_path):
+        archive = FrameArchive(str(tmp_path), tile=64)
+        first = _screen()
+        second = first.copy()
+        second[70:90, 10:50] = 255  # 仅一个输入框发生变化
+        third = second.copy()
+        third[190:200, 290:300] = 0  # 右下角不足一个图块的边缘区域
+        for pixels in (first, second, third):
+            archive.submit(Image.fromarray(pixels))
+        archive.close()
+        
+        assert len(_objects(archive, "full")) == 1
+        assert len(_objects(archive, "delta")) == 2
+        hashes = [e["hash"] for e in archive.entries()]
+        for digest, expected in zip(hashes, (first, second, third)):
+            assert np.array_equal(np.asarray(archive.load(digest)), expected)
+    
+    def test_quota_evicts_oldest_chain(self, tmp_path):
+        # 每条链只有一个关键帧，配额约容纳两帧噪声 PNG
+        archive = FrameArchive(str(tmp_path), quota_mb=0.4, keyframe_interval=0)
+        for seed in range(4):
+            archive.submit(Image.fromarray(_screen(seed)))
+        archive.close()
+        
+        hashes = [e["hash"] for e in archive.entries()]
+        assert len(hashes) == 4
+        with pytest.raises(FrameArchiveError):
+            archive.load(hashes[0])
+        # 最新一帧始终保留
+        assert np.array_equal(np.asarray(archive.load(hashes[-1])), _screen(3))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
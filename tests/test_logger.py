@@ -0,0 +1,67 @@
+"""
+MediPilot 审计日志单元测试
+"""
+import logging
+import logging.handlers
+import pytest
+from medipilot.utils.logger import AuditWriter, _DeferredFileHandler
+
+def _make_logger(writer, name):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(writer.queue))
+    return logger
+
+class TestAuditWriter:
+    """后台写入线程测试类"""
+    
+    def test_info_flushed_immediately(self, tmp_path):
+        log_file = tmp_path / "audit.log"
+        writer = AuditWriter([_DeferredFileHandler(log_file, encoding='utf-8')], flush_interval=60)
+        writer.start()
+        logger = _make_logger(writer, "test.audit.info")
+        
+        logger.info("执行点击: (10, 20)")
+        assert writer.flush()
+        assert "执行点击: (10, 20)" in log_file.read_text(encoding='utf-8')
+        writer.stop()
+    
+    def test_stop_drains_queue(self, tmp_path):
+        """退出时队列中的低级别记录不丢失"""
+        log_file = tmp_path / "audit.log"
+        writer = AuditWriter(
+            [_DeferredFileHandler(log_file, encoding='utf-8')],
+            flush_interval=60,
+            batch_size=16
+        )
+        writer.start()
+        logger = _make_logger(writer, "test.audit.drain")
+        
+        for i in range(1000):
+            logger.debug(f"record {i}")
+        writer.stop()
+        
+        lines = log_file.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 1000
+        assert lines[-1].endswith("record 999")
+    
+    def test_exception_text_preserved(self, tmp_path):
+        log_file = tmp_path / "audit.log"
+        writer = AuditWriter([_DeferredFileHandler(log_file, encoding='utf-8')])
+        writer.start()
+        logger = _make_logger(writer, "test.audit.exc")
+        
+        try:
+            raise ValueError("坐标越界")
+        except ValueError:
+            logger.exception("执行失败")
+        writer.stop()
+        
+        content = log_file.read_text(encoding='utf-8')
+        assert "执行失败" in content
+        assert "ValueError: 坐标越界" in content
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
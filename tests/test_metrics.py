@@ -0,0 +1,75 @@
+"""
+MediPilot 指标导出单元测试
+"""
+import urllib.request
+import pytest
+from medipilot.utils import events, metrics
+from medipilot.utils.metrics import Registry, Counter, Histogram
+
+@pytest.fixture
+def registry():
+    registry = Registry(enabled=True)
+    yield registry
+    registry.shutdown()
+
+class TestMetrics:
+    """指标注册表测试类"""
+    
+    def test_counter_render(self, registry):
+        counter = Counter("test_actions_total", "动作数", ["action"], registry=registry)
+        counter.inc(action="click")
+        counter.inc(2, action="click")
+        counter.inc(action="type")
+        
+        text = registry.render()
+        assert "# TYPE test_actions_total counter" in text
+        assert 'test_actions_total{action="click"} 3' in text
+        assert 'test_actions_total{action="type"} 1' in text
+    
+    def test_histogram_buckets_are_cumulative(self, registry):
+        histogram = Histogram("test_seconds", "耗时", ["stage"], registry=registry, buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value, stage="llm")
+        
+        text = registry.render()
+        assert 'test_seconds_bucket{stage="llm",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{stage="llm",le="1"} 3' in text
+        assert 'test_seconds_bucket{stage="llm",le="+Inf"} 4' in text
+        assert 'test_seconds_count{stage="llm"} 4' in text
+        assert 'test_seconds_sum{stage="llm"} 4.25' in text
+        assert histogram.count(stage="llm") == 4
+    
+    def test_disabled_registry_is_noop(self):
+        registry = Registry(enabled=False)
+        counter = Counter("test_total", "计数", registry=registry)
+        histogram = Histogram("test_seconds", "耗时", registry=registry)
+        counter.inc()
+        histogram.observe(1.0)
+        
+        assert counter.value() == 0
+        assert histogram.count() == 0
+        assert "test_total 1" not in registry.render()
+    
+    def test_http_endpoint(self, registry):
+        Counter("test_frames_total", "帧数", ["result"], registry=registry).inc(result="used")
+        port = registry.serve("127.0.0.1", 0)
+        
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert 'test_frames_total{result="used"} 1' in body
+    
+    def test_dump(self, registry, tmp_path):
+        Counter("test_total", "计数", registry=registry).inc()
+        path = tmp_path / "metrics.prom"
+        registry.dump(str(path))
+        
+        assert "test_total 1" in path.read_text(encoding="utf-8")
+    
+    def test_span_observes_stage(self, monkeypatch):
+        monkeypatch.setattr(metrics.REGISTRY, "enabled", True)
+        before = metrics.STAGE_SECONDS.count(stage="som")
+        with events.span("som"):
+            pass
+        
+        assert metrics.STAGE_SECONDS.count(stage="som") == before + 1
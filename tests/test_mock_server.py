@@ -0,0 +1,94 @@
+"""
+MediPilot 模拟视觉服务单元测试
+"""
+import random
+import pytest
+from PIL import Image
+from benchmarks.mock_vision_server import MockVisionServer, parse_latency
+from medipilot.cognition.engine import Brain, Prompts
+from configs.settings import config
+
+@pytest.fixture
+def start_server(monkeypatch):
+    servers = []
+    
+    def _start(**kwargs):
+        server = MockVisionServer(seed=0, **kwargs)
+        port = server.start()
+        servers.append(server)
+        monkeypatch.setattr(config, "OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+        monkeypatch.setattr(config, "OPENAI_API_KEY", "sk-test")
+        brain = Brain(model="mock")
+        brain.client = brain.client.with_options(max_retries=0)
+        return server, brain
+    
+    yield _start
+    for server in servers:
+        server.stop()
+
+class TestMockVisionServer:
+    """模拟服务测试类"""
+    
+    def test_rule_based_plans(self, start_server):
+        server, brain = start_server()
+        image = Image.new('RGB', (320, 240), color='white')
+        
+        actions = [brain.call_vision(image, Prompts.operation("WBC: 7.2"))["action"] for _ in range(3)]
+        assert actions == ["click", "type", "finish"]
+        assert "findings" in brain.call_vision(image, Prompts.extraction())
+        assert server.stats == {"ok": 4}
+    
+    def test_scripted_plans(self, start_server):
+        plans = [{"action": "scroll", "amount": -3}]
+        _, brain = start_server(plans=plans)
+        image = Image.new('RGB', (320, 240), color='white')
+        
+        assert brain.call_vision(image, "任意提示词") == plans[0]
+    
+    @pytest.mark.parametrize("fault, error_type", [
+        ("rate_limit", "rate_limit"),
+        ("server_error", "api"),
+        ("malformed", "json"),
+    ])
+    def test_fault_injection(self, start_server, fault, error_type):
+        server, brain = start_server(**{fault: 1.0})
+        image = Image.new('RGB', (320, 240), color='white')
+        
+        result = brain.call_vision(image, Prompts.operation("WBC: 7.2"))
+        assert result["action"] == "error"
+        assert result["error_type"] == error_type
+        assert server.stats == {fault: 1}
+    
+    def test_parse_latency(self):
+        rng = random.Random(0)
+        assert parse_latency("fixed:0.5")(rng) == 0.5
+        assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+        assert parse_latency("lognormal:1.0,0.3")(rng) > 0
+        with pytest.raises(ValueError):
+            parse_latency("gamma:1")
+
+class TestPromptCache:
+    """提示词固定前缀与缓存命中统计测试类"""
+    
+    def test_dynamic_state_follows_static_prefix(self):
+        first, second = Prompts.operation("WBC: 7.2"), Prompts.operation("Hgb: 135")
+        assert first.startswith(Prompts.OPERATION) and second.startswith(Prompts.OPERATION)
+        assert "WBC: 7.2" not in Prompts.OPERATION
+        tile = Prompts.tile_extraction((0, 0, 640, 480))
+        assert tile.startswith(Prompts.TILE_EXTRACTION) and Prompts.TILE_EXTRACTION.startswith(Prompts.extraction())
+    
+    def test_cached_tokens_recorded(self, start_server):
+        server, brain = start_server(cache_min_tokens=128)
+        image = Image.new('RGB', (320, 240), color='white')
+        
+        brain.call_vision(image, Prompts.operation("WBC: 7.2"))
+        brain.call_vision(image, Prompts.operation("Hgb: 135"))
+        summary = brain.cache_stats.summary()
+        assert summary["calls"] == 2 and summary["hit_calls"] == 1
+        assert summary["cached_tokens"] % 128 == 0 and 0 < summary["hit_ratio"] < 1
+        assert summary["saved_cost"] > 0
+        
+        # 前缀不足最小长度时不命中
+        server.cache_min_tokens = 4096
+        brain.call_vision(image, Prompts.operation("PLT: 210"))
+        assert brain.cache_stats.hit_calls == 1
@@ -0,0 +1,108 @@
+"""
+MediPilot 流水线编排单元测试
+"""
+import pytest
+from PIL import Image
+from medipilot.perception.screen import Perception
+from medipilot.orchestration.pipeline import AgentPipeline
+
+class FakePerception:
+    """返回固定图像的感知层替身"""
+    
+    def __init__(self):
+        self.frames = 0
+    
+    def wait_until_stable(self, timeout, interval=0.1, stable_frames=2):
+        self.frames += 1
+        return Image.new('RGB', (320, 240), color='white'), True
+    
+    def privacy_filter(self, image):
+        return image
+    
+    def apply_som_overlay(self, image, grid_size=80):
+        return image
+
+class ScriptedBrain:
+    """按顺序返回预设计划的认知层替身"""
+    
+    def __init__(self, plans):
+        self.plans = list(plans)
+        self.prompts = []
+    
+    def call_vision(self, image, prompt):
+        self.prompts.append(prompt)
+        return self.plans.pop(0)
+
+class RecordingExecutor:
+    """记录动作的执行层替身"""
+    
+    def __init__(self):
+        self.actions = []
+    
+    def execute(self, plan):
+        self.actions.append(plan["action"])
+        return plan["action"] == "finish"
+
+class SequencePerception(Perception):
+    """按序列返回截图的感知层，用于测试画面稳定检测"""
+    
+    def __init__(self, images):
+        self.images = list(images)
+    
+    def capture(self):
+        return self.images.pop(0) if len(self.images) > 1 else self.images[0]
+
+class TestAgentPipeline:
+    """流水线测试类"""
+    
+    def test_run_until_finish(self, sample_action_plan):
+        """测试流水线运行至 finish 并记录各阶段耗时"""
+        perception = FakePerception()
+        brain = ScriptedBrain([sample_action_plan, {"action": "finish"}])
+        executor = RecordingExecutor()
+        
+        pipeline = AgentPipeline(perception, brain, executor, "录入 WBC", max_iterations=10)
+        assert pipeline.run() is True
+        
+        assert executor.actions == ["click", "finish"]
+        assert pipeline.iteration_count == 2
+        assert len(pipeline.timings) == 2
+        for timings in pipeline.timings:
+            for stage in AgentPipeline.STAGES + ("total",):
+                assert stage in timings
+                assert timings[stage] >= 0
+        assert "录入 WBC" in brain.prompts[0]
+    
+    def test_max_iterations(self, sample_action_plan):
+        """测试达到最大迭代次数后停止"""
+        brain = ScriptedBrain([sample_action_plan] * 3)
+        pipeline = AgentPipeline(FakePerception(), brain, RecordingExecutor(), "任务", max_iterations=3)
+        assert pipeline.run() is False
+        assert pipeline.iteration_count == 3
+        assert set(pipeline.summary()) == set(AgentPipeline.STAGES) | {"total"}
+
+class TestWaitUntilStable:
+    """画面稳定检测测试类"""
+    
+    def test_returns_after_stable_frames(self):
+        """画面变化停止后返回最新一帧"""
+        white = Image.new('RGB', (320, 240), color='white')
+        black = Image.new('RGB', (320, 240), color='black')
+        perception = SequencePerception([black, white, white, white])
+        
+        image, stable = perception.wait_until_stable(timeout=5.0, interval=0.0, stable_frames=2)
+        assert stable is True
+        assert image.getpixel((0, 0)) == (255, 255, 255)
+    
+    def test_timeout_returns_latest_frame(self):
+        """画面持续变化时超时返回"""
+        frames = [Image.new('RGB', (320, 240), color=(i, i, i)) for i in range(200)]
+        perception = SequencePerception(frames)
+        
+        image, stable = perception.wait_until_stable(timeout=0.05, interval=0.01)
+        assert stable is False
+        assert isinstance(image, Image.Image)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,63 @@
+"""
+MediPilot 按需剖析单元测试
+"""
+import os
+from medipilot.utils.profiling import IterationProfiler
+from medipilot.orchestration.pipeline import AgentPipeline
+from tests.test_pipeline import FakePerception, ScriptedBrain, RecordingExecutor
+
+class TestIterationProfiler:
+    """剖析器测试类"""
+    
+    def test_idle_by_default(self, tmp_path):
+        profiler = IterationProfiler(str(tmp_path), trigger_path=str(tmp_path / "trigger"))
+        for iteration in range(1, 4):
+            profiler.step(iteration)
+        profiler.stop()
+        
+        assert not profiler.active
+        assert profiler.reports == []
+    
+    def test_profiles_next_iterations(self, tmp_path):
+        profiler = IterationProfiler(str(tmp_path), iterations=2)
+        profiler.step(1)
+        profiler.arm()
+        profiler.step(2)
+        assert profiler.active
+        profiler.step(3)
+        profiler.step(4)
+        
+        assert not profiler.active
+        assert len(profiler.reports) == 1
+        report = profiler.reports[0]
+        assert report.endswith("_iter2-3.txt")
+        assert os.path.exists(report.replace(".txt", ".prof"))
+        content = open(report, encoding="utf-8").read()
+        assert "迭代: 2, 3" in content
+        assert "tracemalloc" in content
+    
+    def test_trigger_file_toggles(self, tmp_path):
+        trigger = tmp_path / "profile.trigger"
+        profiler = IterationProfiler(str(tmp_path), iterations=10, memory=False, trigger_path=str(trigger))
+        trigger.write_text("3")
+        profiler.step(1)
+        assert profiler.active
+        assert not trigger.exists()
+        
+        # 剖析进行中再次触发则提前结束
+        trigger.write_text("")
+        profiler.step(2)
+        assert not profiler.active
+        assert profiler.reports[0].endswith("_iter1-1.txt")
+    
+    def test_pipeline_reports_on_exit(self, tmp_path, sample_action_plan):
+        profiler = IterationProfiler(str(tmp_path), iterations=10, memory=False)
+        profiler.arm()
+        brain = ScriptedBrain([sample_action_plan, {"action": "finish"}])
+        pipeline = AgentPipeline(
+            FakePerception(), brain, RecordingExecutor(), "任务", max_iterations=10, profiler=profiler
+        )
+        assert pipeline.run() is True
+        
+        assert not profiler.active
+        assert profiler.reports[0].endswith("_iter1-2.txt")
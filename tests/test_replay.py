@@ -0,0 +1,65 @@
+"""
+MediPilot 会话录制与回放单元测试
+"""
+import time
+import pytest
+from PIL import Image
+from medipilot.execution.action import Executor
+from medipilot.orchestration.pipeline import AgentPipeline
+from medipilot.orchestration.replay import (
+    SessionRecorder, ReplayBackend, ReplayBrain, ReplayError, load_session, replay
+)
+from tests.test_pipeline import FakePerception, ScriptedBrain
+
+@pytest.fixture
+def bundle(tmp_path, sample_action_plan):
+    path = tmp_path / "session"
+    recorder = SessionRecorder(str(path), "录入 WBC")
+    brain = ScriptedBrain([sample_action_plan, {"action": "finish"}])
+    executor = Executor(backend=ReplayBackend((1920, 1080)))
+    pipeline = AgentPipeline(
+        recorder.perception(FakePerception()), recorder.brain(brain), recorder.executor(executor),
+        "录入 WBC", max_iterations=10
+    )
+    assert pipeline.run() is True
+    recorder.close()
+    return path
+
+class TestReplay:
+    """录制与回放测试类"""
+    
+    def test_bundle_layout(self, bundle):
+        meta, records = load_session(str(bundle))
+        
+        assert meta["iterations"] == 2
+        assert meta["screen_size"] == [1920, 1080]
+        assert [r["response"]["action"] for r in records] == ["click", "finish"]
+        assert records[-1]["finished"] is True
+        assert "录入 WBC" in records[0]["prompt"]
+        assert (bundle / records[0]["frame"]).exists()
+    
+    def test_replay_reproduces_session(self, bundle):
+        result = replay(str(bundle), latency_scale=0)
+        
+        assert result["finished"] is True
+        assert result["recorded_finished"] is True
+        assert result["iterations"] == 2
+        assert result["prompt_mismatches"] == 0
+        # click 动作经由真实 Executor 注入 move + click
+        assert result["input_events"] == 2
+        for stage in ("settle", "privacy", "som", "llm", "execute", "total"):
+            assert stage in result["stages"]
+    
+    def test_scaled_latency(self, bundle):
+        _, records = load_session(str(bundle))
+        records[0]["llm_ms"] = 200.0
+        brain = ReplayBrain(records, latency_scale=0.5)
+        image = Image.new('RGB', (320, 240), color='white')
+        
+        start = time.perf_counter()
+        assert brain.call_vision(image, records[0]["prompt"])["action"] == "click"
+        assert time.perf_counter() - start >= 0.1
+    
+    def test_missing_bundle(self, tmp_path):
+        with pytest.raises(ReplayError):
+            load_session(str(tmp_path / "missing"))
@@ -0,0 +1,139 @@
+"""
+MediPilot 多显示器角色与双显示器会话单元测试
+"""
+import threading
+import time
+import pytest
+from PIL import Image
+from medipilot.perception.screen import Perception, PerceptionError
+from medipilot.execution.action import Executor
+from medipilot.orchestration.replay import ReplayBackend
+from medipilot.orchestration.split_screen import SplitScreenError, SplitScreenSession
+
+# 左侧报告显示器 640x480，右侧 EMR 显示器 800x600
+_MONITORS = [
+    {"left": 0, "top": 0, "width": 1440, "height": 600},
+    {"left": 0, "top": 0, "width": 640, "height": 480},
+    {"left": 640, "top": 0, "width": 800, "height": 600},
+]
+_COLORS = {1: (200, 200, 200, 255), 2: (40, 40, 40, 255)}
+
+class _Shot:
+    def __init__(self, size, color):
+        self.size = size
+        self.raw = bytearray(Image.new("RGBA", size, color).tobytes("raw", "BGRA"))
+
+class _MultiScreen:
+    """双显示器 MSS 替身：每台显示器纯色，记录截屏线程"""
+    
+    def __init__(self, delay=0.0):
+        self.monitors = _MONITORS
+        self.delay = delay
+        self.threads = set()
+    
+    def grab(self, monitor):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        index = self.monitors.index(monitor)
+        return _Shot((monitor["width"], monitor["height"]), _COLORS.get(index, (0, 0, 0, 255)))
+
+class _MultiScreenPerception(Perception):
+    def __init__(self, screen, monitor=1):
+        self.screen = screen
+        super().__init__(headless=True, monitor=monitor)
+    
+    def _create_sct(self):
+        return self.screen
+
+class _RoleBrain:
+    """提取提示词返回 findings，操作提示词按顺序返回计划"""
+    
+    def __init__(self, plans, findings=None):
+        self.plans = list(plans)
+        self.findings = [{"metric": "WBC", "value": "7.2", "unit": "10^9/L"}] if findings is None else findings
+        self.prompts = []
+        self.sizes = []
+    
+    def call_vision(self, image, prompt):
+        self.prompts.append(prompt)
+        self.sizes.append(image.size)
+        if "临床检验数据分析专家" in prompt:
+            return {"findings": self.findings}
+        return self.plans.pop(0)
+
+class TestMonitorCapture:
+    """多显示器截屏测试类"""
+    
+    def test_capture_and_geometry_follow_monitor_role(self):
+        screen = _MultiScreen()
+        emr = _MultiScreenPerception(screen, monitor=2)
+        
+        assert emr.capture().size == (800, 600)
+        assert emr.capture(1).size == (640, 480)
+        assert emr.monitor_geometry() == {"left": 640, "top": 0, "width": 800, "height": 600}
+        with pytest.raises(PerceptionError):
+            emr.monitor_geometry(3)
+    
+    def test_capture_monitors_concurrently(self):
+        screen = _MultiScreen(delay=0.1)
+        perception = _MultiScreenPerception(screen)
+        
+        start = time.perf_counter()
+        images = perception.capture_monitors([1, 2])
+        elapsed = time.perf_counter() - start
+        
+        assert images[1].getpixel((0, 0)) == (200, 200, 200)
+        assert images[2].getpixel((0, 0)) == (40, 40, 40)
+        assert len(screen.threads) == 2
+        assert elapsed < 0.19
+
+class TestMonitorExecutor:
+    """执行层显示器偏移测试类"""
+    
+    def test_translates_local_coordinates(self):
+        backend = ReplayBackend((1440, 600))
+        executor = Executor(backend=backend, monitor=_MONITORS[2])
+        
+        executor.execute({"action": "click", "coordinate": [100, 50]})
+        executor.execute({"action": "type", "coordinate": [10, 20], "text": "7.2"})
+        # 局部坐标按 EMR 显示器尺寸校验，越界的动作不执行
+        executor.execute({"action": "click", "coordinate": [900, 50]})
+        
+        assert backend.calls == [("move", 740, 50), ("click", None, None), ("click", 650, 20), ("write", "7.2")]
+
+class TestSplitScreenSession:
+    """双显示器会话测试类"""
+    
+    def _session(self, brain, backend):
+        screen = _MultiScreen()
+        report = _MultiScreenPerception(screen, monitor=1)
+        emr = _MultiScreenPerception(screen, monitor=2)
+        executor = Executor(backend=backend, monitor=emr.monitor_geometry())
+        return SplitScreenSession(report, emr, brain, executor, "录入血常规", max_iterations=5)
+    
+    def test_extracts_report_then_operates_on_emr(self):
+        backend = ReplayBackend((1440, 600))
+        brain = _RoleBrain([
+            {"action": "type", "coordinate": [100, 50], "text": "7.2"},
+            {"action": "finish"},
+        ])
+        session = self._session(brain, backend)
+        
+        assert session.check_layout()["emr"]["left"] == 640
+        assert session.run() is True
+        
+        # 提取使用报告显示器的截图，操作使用 EMR 显示器的截图
+        assert brain.sizes == [(640, 480), (800, 600), (800, 600)]
+        assert "白细胞计数(WBC)=7.2 10^9/L" in brain.prompts[1]
+        assert ("click", 740, 50) in backend.calls
+    
+    def test_empty_extraction_stops_emr_pipeline(self):
+        session = self._session(_RoleBrain([], findings=[]), ReplayBackend((1440, 600)))
+        
+        with pytest.raises(SplitScreenError):
+            session.run()
+        assert not session.pipeline._prefetch_thread.is_alive()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,109 @@
+"""
+MediPilot 启动路径单元测试（延迟导入、无副作用的日志模块、并行初始化）
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from main import init_components
+from medipilot.perception.screen import Perception, PerceptionError
+from medipilot.cognition.engine import Brain
+from medipilot.execution.action import Executor
+from medipilot.orchestration.replay import ReplayBackend
+from medipilot.utils.lazy import is_loaded, lazy_import
+from configs.settings import config
+
+PROJECT_ROOT = str(Path(__file__).parent.parent)
+
+def _run_python(code, cwd):
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT, OPENAI_API_KEY="sk-test")
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.split()
+
+class _ClosingBackend(ReplayBackend):
+    closed = False
+    
+    def close(self):
+        self.closed = True
+
+class TestLazyImport:
+    """延迟导入测试类"""
+    
+    def test_imports_on_first_attribute(self, tmp_path, monkeypatch):
+        (tmp_path / "slow_dep.py").write_text("VALUE = 42\n", encoding="utf-8")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        
+        module = lazy_import("slow_dep")
+        assert "slow_dep" not in sys.modules
+        assert not is_loaded(module)
+        
+        assert module.VALUE == 42
+        assert is_loaded(module)
+        assert "slow_dep" in sys.modules
+        monkeypatch.delitem(sys.modules, "slow_dep")
+    
+    def test_main_defers_heavy_dependencies(self, tmp_path):
+        loaded = _run_python(
+            "import sys, main; print(*[m for m in ('openai', 'cv2', 'numpy', 'mss') if m in sys.modules])",
+            tmp_path
+        )
+        assert loaded == []
+
+class TestLoggerSideEffects:
+    """日志模块导入副作用测试类"""
+    
+    def test_import_creates_nothing_until_first_record(self, tmp_path):
+        before, threads, after = _run_python(
+            "import os, threading\n"
+            "from medipilot.utils.logger import audit_logger, flush_logging\n"
+            "print(os.path.exists('logs'), threading.active_count())\n"
+            "audit_logger.info('首条审计记录')\n"
+            "flush_logging()\n"
+            "print(any(name.endswith('.log') for name in os.listdir('logs')))",
+            tmp_path
+        )
+        assert (before, threads, after) == ("False", "1", "True")
+        log = next((tmp_path / "logs").glob("medipilot_*.log")).read_text(encoding="utf-8")
+        assert "首条审计记录" in log
+
+class TestInitComponents:
+    """组件并行初始化测试类"""
+    
+    def test_parallel_init_and_warm_up(self, monkeypatch):
+        monkeypatch.setattr(config, "OPENAI_API_KEY", "sk-test")
+        backend = ReplayBackend()
+        perception, brain, executor = init_components(
+            perception_factory=lambda: Perception(headless=True),
+            brain_factory=Brain,
+            executor_factory=lambda: Executor(backend=backend),
+            warm_up=False
+        )
+        assert isinstance(perception, Perception)
+        assert isinstance(brain, Brain)
+        assert executor.backend is backend
+        
+        # 离线感知与执行层预热无需显示器
+        perception.warm_up()
+        executor.warm_up()
+    
+    def test_failure_releases_executor(self, monkeypatch):
+        monkeypatch.setattr(config, "OPENAI_API_KEY", "sk-test")
+        backend = _ClosingBackend()
+        
+        def _broken():
+            raise PerceptionError("无显示器")
+        
+        with pytest.raises(PerceptionError):
+            init_components(
+                perception_factory=_broken,
+                brain_factory=Brain,
+                executor_factory=lambda: Executor(backend=backend),
+                warm_up=False
+            )
+        assert backend.closed
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
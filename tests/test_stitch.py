@@ -0,0 +1,97 @@
+"""
+MediPilot 滚动拼接单元测试
+"""
+import tracemalloc
+import numpy as np
+import pytest
+from PIL import Image
+from medipilot.perception import stitch
+from medipilot.perception.stitch import find_overlap, row_hashes, stitch_pages, tile_image
+from medipilot.orchestration.report import merge_findings
+
+@pytest.fixture
+def long_report():
+    """模拟一份高 1000 像素、内容随机的长报告"""
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(1000, 200, 3), dtype=np.uint8)
+
+def _pages(report, page_height, step):
+    """按固定步长模拟滚动截取"""
+    tops = list(range(0, report.shape[0] - page_height + 1, step))
+    if tops[-1] + page_height < report.shape[0]:
+        tops.append(report.shape[0] - page_height)
+    return [Image.fromarray(report[top:top + page_height]) for top in tops]
+
+class TestStitch:
+    """滚动拼接测试类"""
+    
+    def test_find_overlap_exact(self, long_report):
+        previous = long_report[0:300]
+        current = long_report[180:480]
+        assert find_overlap(previous, current) == 120
+    
+    def test_row_hashes_chunked(self, long_report, monkeypatch):
+        """分块计算与整帧一次计算的结果一致"""
+        expected = row_hashes(long_report)
+        monkeypatch.setattr(stitch, "_HASH_CHUNK_BYTES", 7 * 600 * 8)
+        assert np.array_equal(row_hashes(long_report), expected)
+        assert len(set(expected.tolist())) == 1000
+    
+    def test_row_hashes_memory_is_bounded(self):
+        """4K 帧的行哈希不再生成整帧 uint64 副本（约 200MB）"""
+        frame = np.zeros((2160, 3840, 3), dtype=np.uint8)
+        row_hashes(frame[:1])  # 预先生成该列宽的权重
+        tracemalloc.start()
+        try:
+            row_hashes(frame)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < 4 * stitch._HASH_CHUNK_BYTES
+    
+    def test_find_overlap_no_scroll(self, long_report):
+        page = long_report[0:300]
+        assert find_overlap(page, page.copy()) == 300
+    
+    def test_find_overlap_template_fallback(self, long_report):
+        """轻微噪声导致行哈希失配时，使用模板匹配"""
+        previous = long_report[0:300].astype(np.int16)
+        current = long_report[200:500].astype(np.int16)
+        current[:, :, 0] += 1  # 整体亮度轻微变化
+        previous = np.clip(previous, 0, 255).astype(np.uint8)
+        current = np.clip(current, 0, 255).astype(np.uint8)
+        assert find_overlap(previous, current) == 100
+    
+    def test_find_overlap_none(self):
+        rng = np.random.default_rng(1)
+        a = rng.integers(0, 256, size=(100, 50, 3), dtype=np.uint8)
+        b = rng.integers(0, 256, size=(100, 50, 3), dtype=np.uint8)
+        assert find_overlap(a, b) is None
+    
+    def test_stitch_reconstructs_report(self, long_report):
+        pages = _pages(long_report, page_height=300, step=220)
+        stitched = stitch_pages(pages)
+        assert np.array_equal(np.asarray(stitched), long_report)
+    
+    def test_tile_image(self):
+        image = Image.new('RGB', (200, 1000))
+        tiles = tile_image(image, max_height=400, overlap=40)
+        assert all(t.size[1] <= 400 for t in tiles)
+        assert tiles[-1].size[1] > 0
+        # 分块覆盖全图
+        assert 360 * (len(tiles) - 1) + tiles[-1].size[1] == 1000
+        assert tile_image(image, max_height=2000) == [image]
+    
+    def test_merge_findings_keeps_highest_confidence(self):
+        results = [
+            {"findings": [{"metric": "WBC", "value": "7.2", "confidence": 0.7}]},
+            {"findings": [{"metric": "wbc", "value": "7.2", "confidence": 0.95},
+                          {"metric": "PLT", "value": "210", "confidence": 0.9}]},
+        ]
+        merged = merge_findings(results)
+        assert [f["metric"] for f in merged] == ["wbc", "PLT"]
+        assert merged[0]["confidence"] == 0.95
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,142 @@
+"""
+MediPilot 临床检验术语规范化单元测试
+"""
+import json
+import pytest
+from medipilot.cognition.terminology import (
+    Terminology, TerminologyError, fold, fold_unit, load_terms, BUILTIN_TERMS
+)
+from medipilot.orchestration.report import merge_findings
+from medipilot.orchestration.split_screen import describe_findings
+
+@pytest.fixture
+def terminology():
+    return Terminology(max_distance=2)
+
+class TestLookup:
+    """指标名称匹配测试类"""
+    
+    @pytest.mark.parametrize("metric", ["Hgb", "HGB", "hb", "ＨＧＢ", " 血红蛋白 ", "Haemoglobin", "血红蛋白(Hb)", "血红蛋白（HGB）"])
+    def test_exact_aliases(self, terminology, metric):
+        term, match = terminology.lookup(metric)
+        assert (term.code, match) == ("HGB", "exact")
+    
+    def test_width_and_case_folding(self):
+        assert fold("ＮＥＵＴ％") == fold("neut%") == "neut%"
+        assert fold("White Blood-Cell") == "whitebloodcell"
+    
+    def test_fuzzy_match_is_bounded(self, terminology):
+        assert terminology.lookup("Hemoglobn") == (terminology.terms["HGB"], "fuzzy")
+        assert terminology.lookup("白细跑计数")[0].code == "WBC"
+        # 同样接近多个指标时不做判断；过短的名称只做精确匹配
+        assert terminology.lookup("NEUT") == (None, "unknown")
+        assert terminology.lookup("Kx") == (None, "unknown")
+        assert Terminology(max_distance=0).lookup("Hemoglobn") == (None, "unknown")
+    
+    def test_fuzzy_never_crosses_analytes(self, terminology):
+        # 白细胞分类各项只差一两个字，必须各自精确命中
+        for metric, code in (("嗜酸性粒细胞百分比", "EO%"), ("嗜碱性粒细胞百分比", "BASO%"),
+                             ("嗜酸性粒细胞计数", "EO#"), ("嗜碱性粒细胞绝对值", "BASO#"), ("单核细胞比率", "MONO%")):
+            assert terminology.lookup(metric) == (terminology.terms[code], "exact")
+        # 术语表中没有对应指标时，开头不同的中文名称不会被模糊匹配到其他指标
+        partial = Terminology([term for term in BUILTIN_TERMS if not term.code.startswith(("EO", "BASO"))], max_distance=2)
+        for metric in ("嗜酸性粒细胞百分比", "嗜碱性粒细胞百分比", "嗜酸性粒细胞计数", "嗜碱性粒细胞绝对值"):
+            assert partial.lookup(metric) == (None, "unknown")
+        row = terminology.normalize([{"metric": "嗜酸性粒细胞百分比", "value": "3.0", "unit": "%"}])[0]
+        assert (row["code"], row["flag"]) == ("EO%", "N")
+    
+    def test_merge_findings_keeps_differential(self):
+        results = [{"findings": [
+            {"metric": "中性粒细胞百分比", "value": "60", "confidence": 0.9},
+            {"metric": "嗜酸性粒细胞百分比", "value": "3", "confidence": 0.95},
+            {"metric": "嗜碱性粒细胞百分比", "value": "0.5", "confidence": 0.95},
+        ]}]
+        assert [f["value"] for f in merge_findings(results)] == ["60", "3", "0.5"]
+        # 模糊匹配只是推测，不作为合并依据
+        results = [{"findings": [
+            {"metric": "Hgb", "value": "142", "confidence": 0.9},
+            {"metric": "Hemoglobn", "value": "14.2", "confidence": 0.8},
+        ]}]
+        assert len(merge_findings(results)) == 2
+    
+    def test_merge_findings_dedups_aliases(self):
+        results = [
+            {"findings": [{"metric": "Hgb", "value": "142", "confidence": 0.8}]},
+            {"findings": [{"metric": "血红蛋白", "value": "142", "confidence": 0.9}]},
+        ]
+        assert [f["metric"] for f in merge_findings(results)] == ["血红蛋白"]
+
+class TestNormalize:
+    """批量规范化测试类"""
+    
+    def test_units_and_reference_ranges(self, terminology):
+        rows = terminology.normalize([
+            {"metric": "Hgb", "value": "10.5 L", "unit": "g/dL"},
+            {"metric": "WBC", "value": 12500, "unit": "/µL"},
+            {"metric": "PLT", "value": "210", "unit": "×10⁹/L"},
+            {"metric": "血糖", "value": "90", "unit": "mg/dl"},
+            {"metric": "HCT", "value": "0.42", "unit": "L/L"},
+            {"metric": "备注", "value": "阴性"},
+        ])
+        
+        assert [(r["code"], r["std_value"], r["std_unit"], r["flag"]) for r in rows] == [
+            ("HGB", 105.0, "g/L", "L"),
+            ("WBC", 12.5, "10^9/L", "H"),
+            ("PLT", 210.0, "10^9/L", "N"),
+            ("GLU", 4.995, "mmol/L", "N"),
+            ("HCT", 42.0, "%", "N"),
+            (None, None, None, None),
+        ]
+        # 原始字段保持不变
+        assert rows[0]["metric"] == "Hgb" and rows[0]["value"] == "10.5 L"
+        assert rows[0]["name"] == "血红蛋白" and rows[5]["match"] == "unknown"
+    
+    def test_unknown_unit_keeps_code(self, terminology):
+        row = terminology.normalize([{"metric": "WBC", "value": "7.2", "unit": "furlongs"}])[0]
+        assert row["code"] == "WBC" and row["std_value"] is None and row["flag"] is None
+    
+    def test_missing_unit_is_not_assumed_canonical(self, terminology):
+        # 13.5 很可能是 g/dL，不能按 g/L 判为偏低
+        row = terminology.normalize([{"metric": "Hgb", "value": "13.5"}])[0]
+        assert (row["code"], row["std_value"], row["flag"]) == ("HGB", None, None)
+    
+    def test_describe_findings_uses_standard_names_and_units(self):
+        text = describe_findings([
+            {"metric": "Hgb", "value": "13.5", "unit": "g/dL"},
+            {"metric": "WBC", "value": "7.2"},
+            {"metric": "备注", "value": "阴性"},
+        ])
+        assert text == "血红蛋白(HGB)=135 g/L; 白细胞计数(WBC)=7.2; 备注=阴性"
+    
+    def test_unit_folding(self):
+        assert fold_unit("x10^9/l") == fold_unit("10*9/L") == fold_unit("10E9/L") == "10^9/l"
+
+class TestCustomTerms:
+    """补充术语表测试类"""
+    
+    def test_extends_and_overrides_builtin(self, tmp_path):
+        path = tmp_path / "terms.json"
+        path.write_text(json.dumps([
+            {"code": "CRP", "name": "C反应蛋白", "unit": "mg/L", "high": 10, "aliases": ["超敏C反应蛋白"]},
+            {"code": "WBC", "name": "白细胞计数", "unit": "10^9/L", "low": 4.0, "high": 10.0, "aliases": ["白血球"]},
+        ], ensure_ascii=False), encoding="utf-8")
+        terminology = Terminology(list(BUILTIN_TERMS) + load_terms(str(path)))
+        
+        rows = terminology.normalize([
+            {"metric": "超敏C反应蛋白", "value": "1.2", "unit": "mg/dL"},
+            {"metric": "白血球", "value": "3.8", "unit": "10^9/L"},
+            {"metric": "leukocytes", "value": "3.8", "unit": "10^9/L"},
+        ])
+        assert [(r["code"], r["std_value"], r["flag"]) for r in rows] == [
+            ("CRP", 12.0, "H"), ("WBC", 3.8, "L"), ("WBC", 3.8, "L")
+        ]
+    
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / "terms.json"
+        path.write_text('[{"code": "CRP"}]', encoding="utf-8")
+        with pytest.raises(TerminologyError):
+            load_terms(str(path))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,156 @@
+"""
+MediPilot 高分辨率整帧分块提取单元测试
+"""
+import threading
+import time
+import cv2
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from medipilot.perception.screen import Perception
+from medipilot.perception.tiles import Tiler, plan_tiles
+from medipilot.cognition.tiled import TiledVision, merge_tile_findings
+
+# 色块颜色 -> 指标名（SoM 网格为红色，不会被误认）
+_MARKERS = {(0, 0, 255): "WBC", (0, 160, 0): "PLT"}
+
+class _MarkerBrain:
+    """按分块中的色块返回指标与分块内坐标，并记录并发调用数"""
+    
+    def __init__(self, fail_first=False):
+        self.calls = 0
+        self.peak_inflight = 0
+        self.fail_first = fail_first
+        self._inflight = 0
+        self._lock = threading.Lock()
+    
+    def call_vision(self, image, prompt):
+        with self._lock:
+            self.calls += 1
+            self._inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self._inflight)
+            fail = self.fail_first and self.calls == 1
+        time.sleep(0.05)
+        with self._lock:
+            self._inflight -= 1
+        if fail:
+            return {"action": "error", "reason": "超时", "error_type": "connection"}
+        
+        pixels = np.asarray(image)
+        findings = []
+        for color, metric in _MARKERS.items():
+            mask = np.all(pixels == color, axis=-1).astype(np.uint8)
+            count, _, _, centroids = cv2.connectedComponentsWithStats(mask)
+            for cx, cy in centroids[1:count]:
+                findings.append({"metric": metric, "value": "7.2", "confidence": 0.9, "coordinate": [cx, cy]})
+        return {"findings": findings, "scan_quality": "High"}
+
+def _frame():
+    """白底 640x480：WBC 色块位于两个分块的重叠区，PLT 色块只在右下分块中"""
+    image = Image.new("RGB", (640, 480), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((280, 40, 289, 49), fill=(0, 0, 255))
+    draw.rectangle((600, 400, 609, 409), fill=(0, 160, 0))
+    return image
+
+def _vision(brain):
+    tiler = Tiler(Perception(headless=True), tile_size=320, overlap=80, grid_size=80, blank_stddev=2.0)
+    return TiledVision(brain, tiler, max_concurrency=4)
+
+class TestPlanTiles:
+    """分块规划测试类"""
+    
+    def test_covers_frame_with_grid_aligned_overlap(self):
+        boxes = plan_tiles((3840, 2160), tile_size=1000, overlap=100, grid_size=80)
+        xs = sorted({box[0] for box in boxes})
+        
+        assert all(box[0] % 80 == 0 and box[1] % 80 == 0 for box in boxes)
+        assert max(box[2] for box in boxes) == 3840 and max(box[3] for box in boxes) == 2160
+        # 边长向下取整到 960，重叠向上取整到 160
+        assert xs[:2] == [0, 800]
+        assert all(box[2] - box[0] <= 960 for box in boxes)
+    
+    def test_tile_labels_match_full_frame(self):
+        perception = Perception(headless=True)
+        frame = Image.new("RGB", (640, 480), "white")
+        full = perception.apply_som_overlay(frame)
+        
+        for box in plan_tiles(frame.size, tile_size=320, overlap=80):
+            tile = perception.apply_som_overlay(frame.crop(box), origin=box[:2])
+            assert tile.tobytes() == full.crop(box).tobytes()
+    
+    def test_single_digit_change_is_resent(self):
+        tiler = Tiler(Perception(headless=True), tile_size=320, overlap=80, grid_size=80, blank_stddev=2.0)
+        
+        def _report(value):
+            image = Image.new("RGB", (640, 480), "white")
+            ImageDraw.Draw(image).text((430, 330), f"WBC  {value}  10^9/L", fill="black")
+            return image
+        
+        before, after = _report("7.2"), _report("7.3")
+        tiler.split(before)
+        statuses = {tile.box: tile.status for tile in tiler.split(after)}
+        # 只有数字所在的分块发生了变化，必须重新发送，其余分块复用
+        changed = {box for box in statuses if before.crop(box).tobytes() != after.crop(box).tobytes()}
+        assert changed
+        assert {box for box, status in statuses.items() if status == "send"} == changed
+
+class TestTiledVision:
+    """分块并发提取测试类"""
+    
+    def test_merges_findings_into_screen_space(self):
+        brain = _MarkerBrain()
+        result = _vision(brain).extract(_frame())
+        
+        # 六个分块中只有含色块的三个被发送，且并发调用
+        assert result["tiles"] == {"send": 3, "blank": 3, "unchanged": 0}
+        assert brain.calls == 3
+        assert brain.peak_inflight > 1
+        
+        findings = {f["metric"]: f for f in result["findings"]}
+        assert len(result["findings"]) == 2
+        assert findings["WBC"]["coordinate"] == pytest.approx([285, 45], abs=1)
+        assert findings["PLT"]["coordinate"] == pytest.approx([605, 405], abs=1)
+    
+    def test_unchanged_tiles_reuse_results(self):
+        brain = _MarkerBrain()
+        vision = _vision(brain)
+        first = vision.extract(_frame())
+        second = vision.extract(_frame())
+        
+        assert brain.calls == 3
+        assert second["tiles"] == {"send": 0, "blank": 3, "unchanged": 3}
+        assert second["findings"] == first["findings"]
+    
+    def test_failed_tile_is_resent(self):
+        brain = _MarkerBrain(fail_first=True)
+        vision = _vision(brain)
+        first = vision.extract(_frame())
+        second = vision.extract(_frame())
+        
+        assert len(first["errors"]) == 1
+        assert second["tiles"]["send"] == 1
+        assert len(second["findings"]) == 2
+
+class TestMergeTileFindings:
+    """分块结果合并测试类"""
+    
+    def test_keeps_distinct_readings(self):
+        findings = [
+            {"metric": "WBC", "value": "7.2", "confidence": 0.8, "coordinate": [100, 100], "tile": [0, 0]},
+            {"metric": "wbc", "value": "7.2", "confidence": 0.95, "coordinate": [104, 98], "tile": [80, 0]},
+            # 同一分块中的同名指标（如两次化验）不合并
+            {"metric": "WBC", "value": "6.9", "confidence": 0.9, "coordinate": [140, 100], "tile": [80, 0]},
+            # 缺少坐标时按数值判断
+            {"metric": "PLT", "value": "210", "confidence": 0.7, "tile": [0, 0]},
+            {"metric": "PLT", "value": "210", "confidence": 0.6, "tile": [80, 0]},
+        ]
+        merged = merge_tile_findings(findings, distance=80)
+        
+        assert [(f["metric"], f["value"], f["confidence"]) for f in merged] == [
+            ("wbc", "7.2", 0.95), ("WBC", "6.9", 0.9), ("PLT", "210", 0.7)
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
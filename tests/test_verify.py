@@ -0,0 +1,184 @@
+"""
+MediPilot 动作后本地校验单元测试
+"""
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from medipilot.execution.action import Executor, InputBackend
+from medipilot.execution.verify import ActionVerifier, load_templates, VERIFIED, FAILED, AMBIGUOUS, SKIPPED
+from medipilot.orchestration.pipeline import AgentPipeline
+
+_FONT = ImageFont.load_default()
+
+class ScreenBackend(InputBackend):
+    """在内存画面上模拟输入：点击记录焦点，输入时在焦点处绘制文本"""
+    
+    name = "screen"
+    
+    def __init__(self, mode="text", dead_rows=(), focus_ring=False):
+        self.screen = Image.new("RGB", (640, 480), "white")
+        self.mode = mode
+        # 点击时在输入框周围绘制焦点框
+        self.focus_ring = focus_ring
+        # 这些行上的输入框不接受输入
+        self.dead_rows = set(dead_rows)
+        self.focus = (0, 0)
+        self.written = []
+    
+    def screen_size(self):
+        return self.screen.size
+    
+    def position(self):
+        return self.focus
+    
+    def move_to(self, x, y):
+        self.focus = (x, y)
+    
+    def click(self, x=None, y=None):
+        if x is not None:
+            self.focus = (x, y)
+            if self.focus_ring:
+                ImageDraw.Draw(self.screen).rectangle((x - 60, y - 10, x + 60, y + 10), outline="blue", width=2)
+    
+    def write(self, text):
+        self.written.append(text)
+        draw = ImageDraw.Draw(self.screen)
+        x, y = self.focus
+        if y in self.dead_rows:
+            return
+        if self.mode == "text":
+            draw.text((x, y - 5), text, fill="black", font=_FONT)
+        elif self.mode == "popup":
+            draw.rectangle((0, 0, 639, 479), fill="gray")
+    
+    def scroll(self, amount):
+        pass
+    
+    def grab(self, left, top, width, height):
+        return self.screen.crop((left, top, left + width, top + height))
+
+def _executor(backend, **kwargs):
+    verifier = ActionVerifier(backend.grab, region=(160, 32), timeout=0.05, **kwargs)
+    return Executor(backend=backend, verifier=verifier)
+
+class TestVerifier:
+    """输入校验测试类"""
+    
+    def test_outcomes(self):
+        for mode, outcome in (("text", VERIFIED), ("none", FAILED), ("popup", AMBIGUOUS)):
+            executor = _executor(ScreenBackend(mode))
+            executor.execute({"action": "type", "coordinate": [100, 100], "text": "7.2"})
+            assert [entry["outcome"] for entry in executor.last_typed] == [outcome]
+    
+    def test_batch_stops_at_first_unconfirmed_field(self):
+        backend = ScreenBackend("text")
+        executor = _executor(backend)
+        fields = [
+            {"coordinate": [100, 100], "text": "7.2"},
+            {"coordinate": [100, 200], "text": "142"},
+            {"coordinate": [100, 300], "text": "210"},
+        ]
+        executor.execute({"action": "type", "fields": fields})
+        assert backend.written == ["7.2", "142", "210"]
+        assert executor.last_succeeded is True
+        
+        backend.mode = "none"
+        executor.execute({"action": "type", "fields": fields})
+        assert backend.written[3:] == ["7.2"]
+        assert [entry["outcome"] for entry in executor.last_typed] == [FAILED]
+    
+    def test_batch_without_verifier_types_first_field_only(self):
+        backend = ScreenBackend("text")
+        executor = Executor(backend=backend)
+        executor.execute({"action": "type", "fields": [
+            {"coordinate": [100, 100], "text": "7.2"}, {"coordinate": [100, 200], "text": "142"}
+        ]})
+        assert backend.written == ["7.2"]
+        assert executor.last_typed[0]["outcome"] == SKIPPED
+    
+    def test_focus_ring_is_not_mistaken_for_input(self):
+        backend = ScreenBackend("none", focus_ring=True)
+        executor = _executor(backend)
+        executor.execute({"action": "type", "fields": [
+            {"coordinate": [100, 100], "text": "7.2"}, {"coordinate": [100, 200], "text": "142"}
+        ]})
+        assert [entry["outcome"] for entry in executor.last_typed] == [FAILED]
+        assert backend.written == ["7.2"]
+    
+    def test_batch_stops_when_verifier_errors(self):
+        backend = ScreenBackend("text")
+        executor = _executor(backend)
+        
+        def broken(box):
+            raise OSError("截图失败")
+        executor.verifier.snapshot = broken
+        executor.execute({"action": "type", "fields": [
+            {"coordinate": [100, 100], "text": "7.2"}, {"coordinate": [100, 200], "text": "142"}
+        ]})
+        assert backend.written == ["7.2"]
+        assert [entry["outcome"] for entry in executor.last_typed] == [SKIPPED]
+    
+    def test_digit_templates(self, tmp_path):
+        for char, name in (("1", "1"), ("4", "4"), ("2", "2"), ("7", "7"), (".", "dot")):
+            glyph = Image.new("L", (8, 12), 255)
+            ImageDraw.Draw(glyph).text((1, 0), char, fill=0, font=_FONT)
+            glyph.save(tmp_path / f"{name}.png")
+        templates = load_templates(str(tmp_path))
+        assert set(templates) == {"1", "4", "2", "7", "."}
+        
+        executor = _executor(ScreenBackend("text"), templates=templates, threshold=0.9)
+        executor.execute({"action": "type", "coordinate": [100, 100], "text": "142"})
+        assert executor.last_typed[0]["template"] is True
+        
+        # 输入框中实际出现的数字与计划不符（如输入法吞字）时交由模型核对
+        backend = ScreenBackend("text")
+        executor = _executor(backend, templates=templates, threshold=0.9)
+        write = backend.write
+        backend.write = lambda text: write("17")
+        executor.execute({"action": "type", "coordinate": [100, 100], "text": "142"})
+        assert executor.last_typed[0]["outcome"] == AMBIGUOUS
+
+class ScreenPerception:
+    def __init__(self, backend):
+        self.backend = backend
+    
+    def wait_until_stable(self, timeout, interval=0.1, stable_frames=2):
+        return self.backend.screen.copy(), True
+    
+    def privacy_filter(self, image):
+        return image
+    
+    def apply_som_overlay(self, image, grid_size=80):
+        return image
+
+class ScriptedBrain:
+    def __init__(self, plans):
+        self.plans = list(plans)
+        self.prompts = []
+    
+    def call_vision(self, image, prompt):
+        self.prompts.append(prompt)
+        return self.plans.pop(0)
+
+class TestPipelineVerification:
+    """流水线中的校验结果测试类"""
+    
+    def test_verified_batch_saves_calls_and_failures_escalate(self):
+        backend = ScreenBackend("text", dead_rows=[300])
+        brain = ScriptedBrain([
+            {"action": "type", "fields": [
+                {"coordinate": [100, 100], "text": "7.2"}, {"coordinate": [100, 200], "text": "142"}
+            ]},
+            {"action": "type", "coordinate": [100, 300], "text": "210"},
+            {"action": "finish"},
+        ])
+        pipeline = AgentPipeline(ScreenPerception(backend), brain, _executor(backend), "录入血常规", max_iterations=5)
+        
+        assert pipeline.run() is True
+        assert pipeline.llm_calls_saved == 1
+        assert "以下输入已在本地确认录入（无需再次核对）: 7.2 @ [100, 100]; 142 @ [100, 200]" in brain.prompts[1]
+        assert "上一步输入未生效，请核对该输入框: 210 @ [100, 300]" in brain.prompts[2]
+        assert "7.2 @ [100, 100]" not in brain.prompts[2]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,175 @@
+"""
+MediPilot 批处理工作列表单元测试
+"""
+import time
+import queue
+import threading
+import pytest
+from PIL import Image
+from medipilot.execution.action import EmergencyStop
+from medipilot.orchestration.pipeline import AgentPipeline
+from medipilot.cognition.pool import RateLimiter, CognitionPool
+from medipilot.orchestration.worklist import (
+    WorklistJob, WorklistState, WorklistScheduler, WorklistError, load_jobs
+)
+
+class CountingBrain:
+    """记录最大并发数的认知层替身"""
+    
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+    
+    def call_vision(self, image, prompt):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)
+        with self._lock:
+            self.active -= 1
+        return {"action": "finish"}
+
+class FakePerception:
+    """返回固定图像的感知层替身"""
+    
+    def wait_until_stable(self, timeout, interval=0.1, stable_frames=2):
+        return Image.new('RGB', (64, 48), color='white'), True
+    
+    def privacy_filter(self, image):
+        return image
+    
+    def apply_som_overlay(self, image, grid_size=80):
+        return image
+
+class LoopingExecutor:
+    """永不完成的执行层替身，可在指定次数后触发紧急停止"""
+    
+    def __init__(self, stop_after=None):
+        self.stop_after = stop_after
+        self.actions = 0
+        self.last_succeeded = True
+    
+    def execute(self, plan):
+        self.actions += 1
+        if self.actions == self.stop_after:
+            raise EmergencyStop("FAILSAFE")
+        time.sleep(0.01)
+        return False
+
+class WaitingBrain:
+    """始终返回等待动作的认知层替身"""
+    
+    def call_vision(self, image, prompt):
+        return {"action": "wait"}
+
+class FakeSession:
+    """不启动虚拟显示、直接运行流水线的会话替身"""
+    
+    def __init__(self, index, executor):
+        self.index = index
+        self.executor = executor
+    
+    def run_job(self, job, abort=None):
+        pipeline = AgentPipeline(FakePerception(), WaitingBrain(),  self.executor, job.task_desc,
+                                 max_iterations=2000, abort=abort)
+        return pipeline.run()
+
+class TestWorklist:
+    """工作列表测试类"""
+    
+    def test_load_jobs(self, tmp_path):
+        """测试读取 JSONL 工作列表"""
+        path = tmp_path / "jobs.jsonl"
+        path.write_text(
+            '{"job_id": "1", "report": "a.pdf", "patient_id": "P1"}\n\n'
+            '{"job_id": "2", "report": "b.pdf", "patient_id": "P2", "task": "录入 WBC"}\n',
+            encoding="utf-8"
+        )
+        jobs = load_jobs(str(path))
+        assert [job.job_id for job in jobs] == ["1", "2"]
+        assert jobs[1].task_desc == "录入 WBC"
+    
+    def test_load_jobs_rejects_duplicates(self, tmp_path):
+        """测试重复任务 ID"""
+        path = tmp_path / "jobs.jsonl"
+        line = '{"job_id": "1", "report": "a.pdf", "patient_id": "P1"}\n'
+        path.write_text(line * 2, encoding="utf-8")
+        with pytest.raises(WorklistError):
+            load_jobs(str(path))
+    
+    def test_job_requires_fields(self):
+        """测试缺少必需字段"""
+        with pytest.raises(WorklistError):
+            WorklistJob.from_dict({"job_id": "1", "report": "a.pdf"})
+    
+    def test_resume_skips_completed_jobs(self, tmp_path):
+        """测试续跑时跳过已完成任务，中断 (running) 与失败的任务重新执行"""
+        state_path = str(tmp_path / "state.jsonl")
+        state = WorklistState(state_path)
+        state.record("1", "running")
+        state.record("1", "done", latency_seconds=3.0)
+        state.record("2", "running")
+        state.record("3", "failed", error="max_iterations")
+        # 模拟崩溃留下的半行记录
+        with open(state_path, "a", encoding="utf-8") as f:
+            f.write('{"job_id": "4", "sta')
+        
+        jobs = [WorklistJob(str(i), f"{i}.pdf", f"P{i}") for i in range(1, 5)]
+        scheduler = WorklistScheduler(jobs, state_path, sessions=2, cognition=object())
+        assert [job.job_id for job in scheduler.pending_jobs()] == ["2", "3", "4"]
+    
+    def test_emergency_stop_halts_other_sessions(self, tmp_path):
+        """测试一个会话紧急停止后，其他会话在迭代边界退出且任务可续跑"""
+        jobs = [WorklistJob("1", "1.pdf", "P1"), WorklistJob("2", "2.pdf", "P2")]
+        state_path = str(tmp_path / "state.jsonl")
+        scheduler = WorklistScheduler(jobs, state_path, sessions=2, cognition=object())
+        pending = queue.Queue()
+        for job in jobs:
+            pending.put(job)
+        
+        stopping = LoopingExecutor(stop_after=20)
+        running = LoopingExecutor()
+        threads = [
+            threading.Thread(target=scheduler._worker, args=(FakeSession(2, running), pending), daemon=True),
+            threading.Thread(target=scheduler._worker, args=(FakeSession(1, stopping), pending), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        
+        assert not any(thread.is_alive() for thread in threads)
+        assert running.actions < 2000
+        summary = scheduler.metrics.summary()
+        assert summary["emergency_stops"] == 1
+        assert summary["aborted"] == 1
+        assert summary["done"] == 0
+        assert [job.job_id for job in scheduler.pending_jobs()] == ["1", "2"]
+
+class TestCognitionPool:
+    """共享认知池测试类"""
+    
+    def test_concurrency_limit(self):
+        """测试并发上限"""
+        brain = CountingBrain()
+        pool = CognitionPool(brain, max_concurrency=2, requests_per_minute=60000)
+        threads = [threading.Thread(target=pool.call_vision, args=(None, "")) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert brain.max_active <= 2
+        assert pool.stats["calls"] == 8
+    
+    def test_rate_limiter_blocks_when_empty(self):
+        """令牌耗尽后需要等待补充"""
+        limiter = RateLimiter(rate_per_minute=600, burst=1)
+        assert limiter.acquire() == 0.0
+        start = time.monotonic()
+        limiter.acquire()
+        assert time.monotonic() - start >= 0.05
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])